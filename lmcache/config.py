@@ -42,7 +42,8 @@ class LMCacheEngineConfig:
     local_device: Optional[str]
     max_local_cache_size: int
     remote_url: Optional[str]
-    remote_serde: Optional[str]  # Can be "torch" or "cachegen"
+    # "fast", "torch", "safetensor", "cachegen", "zstd" or "lz4"
+    remote_serde: Optional[str]
 
     pipelined_backend: bool
 
@@ -55,13 +56,49 @@ class LMCacheEngineConfig:
     blend_add_special_in_precomp: bool
     # whether to add special tokens in pre-computations
 
+    # The bandwidth cap of the background puts to the remote backend in
+    # MB/s, 0 means unlimited
+    remote_put_bandwidth: float = 0.0
+    # The maximum number of pending puts to the remote backend, the new
+    # puts are dropped when it is reached. 0 means unlimited
+    max_queued_remote_puts: int = 0
+    # The maximum number of queued non-blocking puts of each backend,
+    # 0 means unbounded. Opt-in, as a bound with the "block" policy makes
+    # the non-blocking puts wait once the queue is full
+    put_queue_size: int = 0
+    # What to do when a put queue is full, can be "block", "drop_newest",
+    # "drop_oldest" or "coalesce"
+    put_queue_policy: str = "block"
+    # Whether the "fast" remote serde adds a crc32 of the payload to each
+    # chunk and verifies it when loading
+    remote_serde_checksum: bool = False
+    # The compression level of the "zstd" remote serde
+    compression_level: int = 3
+    # The quantization profile of the "cachegen" remote serde, see
+    # lmcache.storage_backend.serde.cachegen_calibration. None means the
+    # built-in profile of the model
+    cachegen_profile: Optional[str] = None
+    # The number of workers that serialize the non-blocking remote puts,
+    # 0 means serializing in the put thread
+    serde_workers: int = 0
+    # "thread" or "process", the process workers get the chunks through
+    # shared memory
+    serde_worker_type: str = "thread"
+    # The maximum number of chunks waiting for each serde worker, the puts
+    # block when it is reached. 0 means unbounded
+    serde_queue_size: int = 16
+    # The number of pinned CPU buffers that the chunks retrieved from the
+    # remote backend are decoded into before being copied to the GPU,
+    # 0 means decoding into new tensors
+    remote_staging_buffers: int = 4
+
     @staticmethod
     def from_defaults(
             chunk_size: int = 256,
             local_device: str = "cuda",
             max_local_cache_size: int = 5,
             remote_url: Optional[str] = "redis://localhost:6379",
-            remote_serde: Optional[str] = "torch",
+            remote_serde: Optional[str] = "fast",
             pipelined_backend: bool = False,
             save_decode_cache: bool = False,
             enable_blending: bool = False,
@@ -82,7 +119,7 @@ class LMCacheEngineConfig:
         backend: str = "cuda",
         max_local_cache_size: int = 5,
         persist_path: Optional[str] = None,
-        remote_serde: Optional[str] = "torch",
+        remote_serde: Optional[str] = "fast",
         pipelined_backend: bool = False,
         save_decode_cache: bool = False,
     ) -> "LMCacheEngineConfig":
@@ -138,6 +175,17 @@ class LMCacheEngineConfig:
                                      blend_default_separator)
         blend_add_special_in_precomp = config.get(
             "blend_add_special_in_precomp", False)
+        remote_put_bandwidth = config.get("remote_put_bandwidth", 0.0)
+        max_queued_remote_puts = config.get("max_queued_remote_puts", 0)
+        put_queue_size = config.get("put_queue_size", 0)
+        put_queue_policy = config.get("put_queue_policy", "block")
+        remote_serde_checksum = config.get("remote_serde_checksum", False)
+        compression_level = config.get("compression_level", 3)
+        cachegen_profile = config.get("cachegen_profile", None)
+        serde_workers = config.get("serde_workers", 0)
+        serde_worker_type = config.get("serde_worker_type", "thread")
+        serde_queue_size = config.get("serde_queue_size", 16)
+        remote_staging_buffers = config.get("remote_staging_buffers", 4)
 
         match local_device:
             case "cpu" | "cuda" | None:
@@ -170,6 +218,17 @@ class LMCacheEngineConfig:
             blend_min_tokens,
             blend_separator,
             blend_add_special_in_precomp,
+            remote_put_bandwidth=remote_put_bandwidth,
+            max_queued_remote_puts=max_queued_remote_puts,
+            put_queue_size=put_queue_size,
+            put_queue_policy=put_queue_policy,
+            remote_serde_checksum=remote_serde_checksum,
+            compression_level=compression_level,
+            cachegen_profile=cachegen_profile,
+            serde_workers=serde_workers,
+            serde_worker_type=serde_worker_type,
+            serde_queue_size=serde_queue_size,
+            remote_staging_buffers=remote_staging_buffers,
         )
 
     @staticmethod
@@ -226,6 +285,34 @@ class LMCacheEngineConfig:
         config.blend_add_special_in_precomp = bool(
             parse_env(get_env_name("blend_add_special_in_precomp"),
                       config.blend_add_special_in_precomp))
+        config.remote_put_bandwidth = float(
+            parse_env(get_env_name("remote_put_bandwidth"),
+                      config.remote_put_bandwidth))
+        config.max_queued_remote_puts = int(
+            parse_env(get_env_name("max_queued_remote_puts"),
+                      config.max_queued_remote_puts))
+        config.put_queue_size = int(
+            parse_env(get_env_name("put_queue_size"), config.put_queue_size))
+        config.put_queue_policy = parse_env(get_env_name("put_queue_policy"),
+                                            config.put_queue_policy)
+        config.remote_serde_checksum = str(
+            parse_env(get_env_name("remote_serde_checksum"),
+                      config.remote_serde_checksum)).lower() in ["true", "1"]
+        config.compression_level = int(
+            parse_env(get_env_name("compression_level"),
+                      config.compression_level))
+        config.cachegen_profile = parse_env(get_env_name("cachegen_profile"),
+                                            config.cachegen_profile)
+        config.serde_workers = int(
+            parse_env(get_env_name("serde_workers"), config.serde_workers))
+        config.serde_worker_type = parse_env(get_env_name("serde_worker_type"),
+                                             config.serde_worker_type)
+        config.serde_queue_size = int(
+            parse_env(get_env_name("serde_queue_size"),
+                      config.serde_queue_size))
+        config.remote_staging_buffers = int(
+            parse_env(get_env_name("remote_staging_buffers"),
+                      config.remote_staging_buffers))
 
         return config
 
@@ -5,6 +5,7 @@ import torch
 
 from lmcache.config import LMCacheEngineMetadata
 from lmcache.experimental.config import LMCacheEngineConfig
+from lmcache.experimental.fp8_codec import FP8KVCodec
 from lmcache.experimental.gpu_connector import GPUConnectorInterface
 from lmcache.experimental.memory_management import (MemoryAllocatorInterface,
                                                     MixedMemoryAllocator)
@@ -57,6 +58,21 @@ class LMCacheEngine:
         # NOTE: Unix systems use fork by default
         multiprocessing.set_start_method('spawn', force=True)
 
+        # The KV chunks are down-cast to fp8 when they are stored, and
+        # up-cast when they are retrieved
+        self.fp8_codec: Optional[FP8KVCodec] = None
+        if config.fp8_format is not None:
+            serdes = [config.local_disk_serde]
+            if config.remote_url is not None:
+                serdes.append(str(config.remote_serde))
+            if any(serde in ["kivi", "cachegen"] for serde in serdes):
+                raise ValueError("The fp8 storage cannot be used with the "
+                                 "kivi and cachegen serdes, which expect "
+                                 "the KV cache in the model dtype")
+            self.fp8_codec = FP8KVCodec(config.fp8_format,
+                                        config.fp8_scale_granularity,
+                                        metadata.kv_dtype)
+
         self.storage_manager = StorageManager(config, metadata,
                                               self.memory_allocator)
 
@@ -100,7 +116,11 @@ class LMCacheEngine:
             num_tokens = end - start
             kv_shape = self.gpu_connector.get_shape(num_tokens)
             kv_dtype = self.metadata.kv_dtype
-            memory_obj = self.storage_manager.allocate(kv_shape, kv_dtype)
+            if self.fp8_codec is not None:
+                memory_obj = self.storage_manager.allocate(
+                    self.fp8_codec.packed_shape(kv_shape), torch.uint8)
+            else:
+                memory_obj = self.storage_manager.allocate(kv_shape, kv_dtype)
             if memory_obj is None:
                 logger.warning("Failed to allocate memory for the KV cache.\n"
                                "The KV cache will not be stored.")
@@ -111,7 +131,11 @@ class LMCacheEngine:
             # and bringing big overhead
             # self.put_queue.put((key, memory_obj, start, end, kwargs))
 
-            self.gpu_connector.from_gpu(memory_obj, start, end, **kwargs)
+            if self.fp8_codec is not None:
+                self.fp8_codec.from_gpu(self.gpu_connector, memory_obj,
+                                        kv_shape, start, end, **kwargs)
+            else:
+                self.gpu_connector.from_gpu(memory_obj, start, end, **kwargs)
             self.storage_manager.put(key, memory_obj)
         self.stats_monitor.on_store_finished(monitor_req_id)
 
@@ -166,7 +190,11 @@ class LMCacheEngine:
             # For example, disk->gpu is faster than disk->cpu->gpu.
             # RDMA is another example.
 
-            self.gpu_connector.to_gpu(memory_obj, start, end, **kwargs)
+            if self.fp8_codec is not None:
+                self.fp8_codec.to_gpu(self.gpu_connector, memory_obj, start,
+                                      end, **kwargs)
+            else:
+                self.gpu_connector.to_gpu(memory_obj, start, end, **kwargs)
             self.memory_allocator.ref_count_down(memory_obj)
 
         self.stats_monitor.on_retrieve_finished(monitor_req_id,
@@ -185,6 +213,18 @@ class LMCacheEngine:
                 tokens, mask):
             self.storage_manager.prefetch(key)
 
+    def cancel_prefetch(
+        self,
+        tokens: torch.Tensor,
+        mask: Optional[torch.Tensor] = None,
+    ) -> None:
+        """Cancel the ongoing prefetches of the tokens, e.g., when the
+        request is aborted before it is scheduled
+        """
+        for start, end, key in self.token_database.process_tokens(
+                tokens, mask):
+            self.storage_manager.cancel_prefetch(key)
+
     # TODO(Jiayi): Currently, search_range is only used for testing.
     def lookup(
         self,
@@ -19,7 +19,8 @@ class LMCacheEngineConfig:
     max_local_disk_size: float  # in GB
 
     remote_url: Optional[str]
-    remote_serde: Optional[str]  # Can be "naive" or "cachegen"
+    # "naive", "kivi", "cachegen", "zstd" or "lz4"
+    remote_serde: Optional[str]
 
     save_decode_cache: bool  # whether to store decode kv cache
 
@@ -27,6 +28,41 @@ class LMCacheEngineConfig:
     blend_recompute_ratio: float  # the ratio of blending recompute
     blend_min_tokens: int  # the minimum number of tokens for blending
 
+    # The bandwidth cap of the background puts to the remote backend in
+    # MB/s, 0 means unlimited
+    remote_put_bandwidth: float = 0.0
+    # The maximum number of pending puts to the remote backend, the new
+    # puts are dropped when it is reached. 0 means unlimited
+    max_queued_remote_puts: int = 0
+    # The number of bits (2, 4 or 8) of the "kivi" remote serde
+    kivi_bits: int = 4
+    # The number of tokens (keys) or channels (values) that share a
+    # quantization scale in the "kivi" remote serde
+    kivi_group_size: int = 64
+    # The compression level of the "zstd" remote serde
+    compression_level: int = 3
+    # The quantization profile of the "cachegen" remote serde, see
+    # lmcache.storage_backend.serde.cachegen_calibration. None means the
+    # built-in profile of the model
+    cachegen_profile: Optional[str] = None
+    # The number of threads that serialize the remote puts, 0 means
+    # serializing on the thread that stores the KV cache
+    serde_workers: int = 0
+    # The maximum number of chunks waiting for each serde thread, the puts
+    # block when it is reached. 0 means unbounded
+    serde_queue_size: int = 16
+    # The serde of the local disk backend, "naive" (raw bytes), "kivi",
+    # "cachegen", "zstd" or "lz4". The chunks are encoded once for the
+    # local disk and the remote backends if they use the same serde
+    local_disk_serde: str = "naive"
+    # Store the KV cache as fp8, "e4m3" or "e5m2", in all the backends.
+    # The fp8 chunks have their own keys, and are not shared with the
+    # engines storing the KV cache in another format. None means storing
+    # it in the dtype of the model
+    fp8_format: Optional[str] = None
+    # The granularity of the fp8 scales, "token" or "channel"
+    fp8_scale_granularity: str = "token"
+
     @staticmethod
     def from_defaults(
         chunk_size: int = 256,
@@ -126,6 +162,17 @@ class LMCacheEngineConfig:
         enable_blending = config.get("enable_blending", False)
         blend_recompute_ratio = config.get("blend_recompute_ratio", 0.15)
         blend_min_tokens = config.get("blend_min_tokens", 256)
+        remote_put_bandwidth = config.get("remote_put_bandwidth", 0.0)
+        max_queued_remote_puts = config.get("max_queued_remote_puts", 0)
+        kivi_bits = config.get("kivi_bits", 4)
+        kivi_group_size = config.get("kivi_group_size", 64)
+        compression_level = config.get("compression_level", 3)
+        cachegen_profile = config.get("cachegen_profile", None)
+        serde_workers = config.get("serde_workers", 0)
+        serde_queue_size = config.get("serde_queue_size", 16)
+        local_disk_serde = config.get("local_disk_serde", "naive")
+        fp8_format = config.get("fp8_format", None)
+        fp8_scale_granularity = config.get("fp8_scale_granularity", "token")
 
         match local_disk:
             case None:
@@ -154,6 +201,17 @@ class LMCacheEngineConfig:
             enable_blending,
             blend_recompute_ratio,
             blend_min_tokens,
+            remote_put_bandwidth=remote_put_bandwidth,
+            max_queued_remote_puts=max_queued_remote_puts,
+            kivi_bits=kivi_bits,
+            kivi_group_size=kivi_group_size,
+            compression_level=compression_level,
+            cachegen_profile=cachegen_profile,
+            serde_workers=serde_workers,
+            serde_queue_size=serde_queue_size,
+            local_disk_serde=local_disk_serde,
+            fp8_format=fp8_format,
+            fp8_scale_granularity=fp8_scale_granularity,
         )
 
     @staticmethod
@@ -219,6 +277,34 @@ class LMCacheEngineConfig:
         config.blend_min_tokens = to_int(
             parse_env(get_env_name("blend_min_tokens"),
                       config.blend_min_tokens))
+        config.remote_put_bandwidth = to_float(
+            parse_env(get_env_name("remote_put_bandwidth"),
+                      config.remote_put_bandwidth))
+        config.max_queued_remote_puts = to_int(
+            parse_env(get_env_name("max_queued_remote_puts"),
+                      config.max_queued_remote_puts))
+        config.kivi_bits = to_int(
+            parse_env(get_env_name("kivi_bits"), config.kivi_bits))
+        config.kivi_group_size = to_int(
+            parse_env(get_env_name("kivi_group_size"), config.kivi_group_size))
+        config.compression_level = to_int(
+            parse_env(get_env_name("compression_level"),
+                      config.compression_level))
+        config.cachegen_profile = parse_env(get_env_name("cachegen_profile"),
+                                            config.cachegen_profile)
+        config.serde_workers = to_int(
+            parse_env(get_env_name("serde_workers"), config.serde_workers))
+        config.serde_queue_size = to_int(
+            parse_env(get_env_name("serde_queue_size"),
+                      config.serde_queue_size))
+        config.local_disk_serde = str(
+            parse_env(get_env_name("local_disk_serde"),
+                      config.local_disk_serde))
+        config.fp8_format = parse_env(get_env_name("fp8_format"),
+                                      config.fp8_format)
+        config.fp8_scale_granularity = str(
+            parse_env(get_env_name("fp8_scale_granularity"),
+                      config.fp8_scale_granularity))
         return config
 
     def to_original_config(self) -> orig_config.LMCacheEngineConfig:
@@ -0,0 +1,213 @@
+from enum import Enum
+from typing import Optional
+
+import torch
+
+from lmcache.experimental.gpu_connector import GPUConnectorInterface
+from lmcache.experimental.memory_management import (MemoryFormat, MemoryObj,
+                                                    MemoryObjMetadata,
+                                                    TensorMemoryObj)
+from lmcache.logging import init_logger
+from lmcache.utils import _lmcache_nvtx_annotate
+
+logger = init_logger(__name__)
+
+FP8_DTYPES = {
+    "e4m3": torch.float8_e4m3fn,
+    "e5m2": torch.float8_e5m2,
+}
+
+# The scales are float32, stored as 4 bytes next to the fp8 values
+SCALE_BYTES = 4
+
+# Avoids dividing by zero on all-zero tokens or channels
+MIN_SCALE = 1e-12
+
+
+class FP8ScaleGranularity(Enum):
+    TOKEN = "token"
+    """One scale per (k/v, layer, token), over the hidden dim
+    """
+    CHANNEL = "channel"
+    """One scale per (k/v, layer, channel), over the tokens of the chunk
+    """
+
+
+def fp8_packed_shape(shape: torch.Size,
+                     granularity: FP8ScaleGranularity) -> torch.Size:
+    """
+    The shape of the uint8 tensor that packs a KV chunk of shape
+    [2, num_layers, num_tokens, hidden_dim] with its scales.
+
+    The per-token scales are appended to the hidden dim of each token, and
+    the per-channel scales are appended as extra rows after the tokens.
+    """
+    kv, num_layers, num_tokens, hidden_dim = shape
+    if granularity == FP8ScaleGranularity.TOKEN:
+        return torch.Size(
+            [kv, num_layers, num_tokens, hidden_dim + SCALE_BYTES])
+    return torch.Size([kv, num_layers, num_tokens + SCALE_BYTES, hidden_dim])
+
+
+def fp8_unpacked_shape(packed_shape: torch.Size,
+                       granularity: FP8ScaleGranularity) -> torch.Size:
+    """
+    The inverse of fp8_packed_shape
+    """
+    kv, num_layers, num_tokens, hidden_dim = packed_shape
+    if granularity == FP8ScaleGranularity.TOKEN:
+        return torch.Size(
+            [kv, num_layers, num_tokens, hidden_dim - SCALE_BYTES])
+    return torch.Size([kv, num_layers, num_tokens - SCALE_BYTES, hidden_dim])
+
+
+def quantize_fp8(kv: torch.Tensor, fp8_dtype: torch.dtype,
+                 granularity: FP8ScaleGranularity) -> torch.Tensor:
+    """
+    Down-cast a KV chunk to fp8 with float32 absmax scales.
+
+    Input:
+        kv: the KV chunk, [2, num_layers, num_tokens, hidden_dim]
+        fp8_dtype: torch.float8_e4m3fn or torch.float8_e5m2
+        granularity: the granularity of the scales
+
+    Returns:
+        the packed uint8 tensor (see fp8_packed_shape), on the device of kv
+    """
+    fp8_max = torch.finfo(fp8_dtype).max
+    dim = -1 if granularity == FP8ScaleGranularity.TOKEN else -2
+    scales = kv.abs().amax(dim=dim, keepdim=True).float()
+    scales = scales.div_(fp8_max).clamp_(min=MIN_SCALE)
+    # NOTE: clamped as the rounding can go past the fp8 range, which is
+    # NaN for e4m3
+    values = (kv.float() / scales).clamp_(-fp8_max, fp8_max).to(fp8_dtype)
+
+    if granularity == FP8ScaleGranularity.TOKEN:
+        # [..., num_tokens, 1] float32 -> [..., num_tokens, 4] uint8
+        return torch.cat([values.view(torch.uint8),
+                          scales.view(torch.uint8)],
+                         dim=-1)
+
+    # [..., 1, hidden_dim] float32 -> [..., 4, hidden_dim] uint8
+    scale_rows = scales.view(torch.uint8).reshape(*scales.shape[:-2],
+                                                  SCALE_BYTES, -1)
+    return torch.cat([values.view(torch.uint8), scale_rows], dim=-2)
+
+
+def dequantize_fp8(packed: torch.Tensor, fp8_dtype: torch.dtype,
+                   granularity: FP8ScaleGranularity,
+                   out: torch.Tensor) -> torch.Tensor:
+    """
+    Up-cast a packed fp8 KV chunk.
+
+    Input:
+        packed: the packed uint8 tensor from quantize_fp8
+        fp8_dtype: the fp8 dtype it was quantized to
+        granularity: the granularity of its scales
+        out: the output KV chunk, on the device of packed, with the shape
+            fp8_unpacked_shape(packed.shape)
+
+    Returns:
+        out
+    """
+    if granularity == FP8ScaleGranularity.TOKEN:
+        hidden_dim = packed.shape[-1] - SCALE_BYTES
+        values = packed[..., :hidden_dim].view(fp8_dtype)
+        scales = packed[..., hidden_dim:].contiguous().view(torch.float32)
+    else:
+        num_tokens = packed.shape[-2] - SCALE_BYTES
+        values = packed[..., :num_tokens, :].view(fp8_dtype)
+        scales = packed[..., num_tokens:, :].reshape(*packed.shape[:-2], 1,
+                                                     -1).view(torch.float32)
+    out.copy_(values.float().mul_(scales))
+    return out
+
+
+class FP8KVCodec:
+    """
+    Stores the KV chunks as fp8, which holds about twice as many chunks in
+    the same memory. The chunks are keyed by the fp8 mode (see
+    ChunkedTokenDatabase), so they are only loaded by the engines with the
+    same mode.
+
+    The chunks are moved between the serving engine and a staging buffer
+    in the model dtype by the GPU connector, and converted on the device
+    of the staging buffer (the GPU if there is one), so only the fp8 bytes
+    cross PCIe. The staging buffer is shared by the stores and retrieves,
+    which run on the thread of the serving engine.
+    """
+
+    def __init__(self,
+                 fp8_format: str,
+                 granularity: str,
+                 kv_dtype: torch.dtype,
+                 device: Optional[str] = None):
+        if fp8_format not in FP8_DTYPES:
+            raise ValueError(f"Invalid fp8 format: {fp8_format}, "
+                             f"should be one of {list(FP8_DTYPES)}")
+        self.fp8_dtype = FP8_DTYPES[fp8_format]
+        try:
+            self.granularity = FP8ScaleGranularity(granularity)
+        except ValueError:
+            raise ValueError(
+                f"Invalid fp8 scale granularity: {granularity}") from None
+        self.kv_dtype = kv_dtype
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device
+        self.buffer: Optional[torch.Tensor] = None
+        logger.info(f"Storing the KV cache as {fp8_format} with "
+                    f"per-{granularity} scales")
+
+    def packed_shape(self, kv_shape: torch.Size) -> torch.Size:
+        return fp8_packed_shape(kv_shape, self.granularity)
+
+    def _staging_obj(self, kv_shape: torch.Size) -> TensorMemoryObj:
+        num_elements = kv_shape.numel()
+        if self.buffer is None or self.buffer.numel() < num_elements:
+            self.buffer = torch.empty(num_elements,
+                                      dtype=self.kv_dtype,
+                                      device=self.device)
+        raw_data = self.buffer[:num_elements]
+        metadata = MemoryObjMetadata(kv_shape,
+                                     self.kv_dtype,
+                                     address=0,
+                                     phy_size=num_elements *
+                                     self.kv_dtype.itemsize,
+                                     ref_count=1,
+                                     fmt=MemoryFormat.KV_BLOB)
+        return TensorMemoryObj(raw_data, metadata)
+
+    @_lmcache_nvtx_annotate
+    def from_gpu(self, gpu_connector: GPUConnectorInterface,
+                 memory_obj: MemoryObj, kv_shape: torch.Size, start: int,
+                 end: int, **kwargs) -> None:
+        """
+        Fill the packed memory_obj with the KV cache of the tokens
+        [start, end) through the GPU connector
+        """
+        staging_obj = self._staging_obj(kv_shape)
+        gpu_connector.from_gpu(staging_obj, start, end, **kwargs)
+        assert staging_obj.tensor is not None
+        assert memory_obj.tensor is not None
+        packed = quantize_fp8(staging_obj.tensor, self.fp8_dtype,
+                              self.granularity)
+        memory_obj.tensor.copy_(packed)
+        memory_obj.metadata.fmt = MemoryFormat.KV_BLOB
+
+    @_lmcache_nvtx_annotate
+    def to_gpu(self, gpu_connector: GPUConnectorInterface,
+               memory_obj: MemoryObj, start: int, end: int, **kwargs) -> None:
+        """
+        Up-cast the packed memory_obj and load it into the KV cache of the
+        tokens [start, end) through the GPU connector
+        """
+        assert memory_obj.tensor is not None
+        # NOTE: blocking, as memory_obj is released once this returns
+        packed = memory_obj.tensor.to(self.device)
+        staging_obj = self._staging_obj(
+            fp8_unpacked_shape(packed.shape, self.granularity))
+        assert staging_obj.tensor is not None
+        dequantize_fp8(packed, self.fp8_dtype, self.granularity,
+                       staging_obj.tensor)
+        gpu_connector.to_gpu(staging_obj, start, end, **kwargs)
@@ -1,5 +1,7 @@
 import abc
 import ctypes
+import mmap
+import os
 import threading
 from dataclasses import dataclass
 from enum import Enum
@@ -575,6 +577,38 @@ class HostMemoryAllocator(MemoryAllocatorInterface):
             return self.allocator.get_ref_count(memory_obj)
 
 
+class SharedMemoryAllocator(HostMemoryAllocator):
+    """Allocates memory in a pre-allocated file-backed arena (e.g., under
+    /dev/shm), which can be mapped by other processes on the same host.
+    The address of a MemoryObj is its offset in the file.
+    """
+
+    def __init__(self, path: str, size: int):
+        """
+        :param str path: The path of the shared memory file.
+        :param int size: The size of the shared memory in bytes.
+        """
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, size)
+            self.mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        buffer = torch.frombuffer(self.mmap, dtype=torch.uint8)
+        self.allocator = TensorMemoryAllocator(buffer)
+
+        self.host_mem_lock = threading.Lock()
+
+    def close(self):
+        """
+        Remove the shared memory file. The processes that have mapped it
+        can still access the memory.
+        """
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
 class PinMemoryAllocator(MemoryAllocatorInterface):
     """Allocates memory in the pre-allocated pinned memory.
     """
@@ -1,13 +1,13 @@
 import struct
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 import torch
 
 from lmcache.experimental.memory_management import MemoryFormat
 from lmcache.utils import CacheEngineKey
 
-MAX_KEY_LENGTH = 150
+MAX_CLIENT_META_LENGTH = 65535
 
 
 class Constants:
@@ -16,10 +16,33 @@ class Constants:
     CLIENT_EXIST = 3
     CLIENT_LIST = 4
 
+    # Shared-memory transport (lm+shm://). The offsets in the shared
+    # memory arena are sent as SHM_OFFSET right after the meta messages.
+    CLIENT_SHM_HANDSHAKE = 5
+    CLIENT_SHM_GET = 6
+    CLIENT_SHM_RELEASE = 7
+    CLIENT_SHM_ALLOC = 8
+    CLIENT_SHM_COMMIT = 9
+
+    # Admin commands, the responses carry a JSON payload
+    CLIENT_STATS = 10
+    CLIENT_DELETE = 11
+    CLIENT_FLUSH = 12
+    # Removes the chunks of the key's model_name, and of its world_size
+    # if it is not 0
+    CLIENT_INVALIDATE = 13
+
     SERVER_SUCCESS = 200
+    # A GET hit of a hot key that the server has copied to the next
+    # servers on the hash ring, the clients may read it from any of them
+    SERVER_SUCCESS_REPLICATED = 201
     SERVER_FAIL = 400
 
 
+# The offset of a chunk in the shared memory arena, -1 means that the
+# payload follows in the socket instead
+SHM_OFFSET = struct.Struct("q")
+
 DTYPE_TO_INT = {
     None: 0,
     torch.half: 1,
@@ -81,10 +104,161 @@ class RedisMetadata:
                              INT_TO_DTYPE[dtype], MemoryFormat(fmt))
 
 
+# The length of the client meta message, which is sent before the message
+CLIENT_META_PREFIX = struct.Struct("<H")
+
+# The maximum number of strings (formats and model names) that a KeyCodec
+# remembers, the others are sent inline
+MAX_KEY_TABLE_SIZE = 1024
+
+# String tags in the encoded key
+_STR_INLINE = 0
+_STR_NEW = 1
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    assert value >= 0, f"Cannot encode negative value {value}"
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    """
+    Returns the decoded value and the position after it
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _write_bytes(out: bytearray, data: bytes) -> None:
+    _write_varint(out, len(data))
+    out.extend(data)
+
+
+def _read_bytes(buf: bytes, pos: int) -> Tuple[bytes, int]:
+    length, pos = _read_varint(buf, pos)
+    if pos + length > len(buf):
+        raise ValueError("Truncated client meta message")
+    return bytes(buf[pos:pos + length]), pos + length
+
+
+def _encode_chunk_hash(out: bytearray, chunk_hash: str) -> None:
+    """
+    A hex digest is sent as raw bytes, which halves its size. The lowest
+    bit of the length tells whether the hash was hex-encoded.
+    """
+    raw: Optional[bytes] = None
+    try:
+        raw = bytes.fromhex(chunk_hash)
+    except ValueError:
+        pass
+    if raw is not None and raw.hex() != chunk_hash:
+        # e.g., upper case or whitespaces
+        raw = None
+    if raw is not None:
+        _write_varint(out, (len(raw) << 1) | 1)
+        out.extend(raw)
+    else:
+        data = chunk_hash.encode()
+        _write_varint(out, len(data) << 1)
+        out.extend(data)
+
+
+def _decode_chunk_hash(buf: bytes, pos: int) -> Tuple[str, int]:
+    tag, pos = _read_varint(buf, pos)
+    length = tag >> 1
+    if pos + length > len(buf):
+        raise ValueError("Truncated client meta message")
+    data = bytes(buf[pos:pos + length])
+    if tag & 1:
+        return data.hex(), pos + length
+    return data.decode(), pos + length
+
+
+class KeyCodec:
+    """
+    Encodes CacheEngineKey into a compact binary form.
+
+    The format and model name of a key are sent in full the first time
+    and get an id in a per-connection table, so the following keys only
+    carry the id. The chunk hash is sent as raw bytes if it is a hex
+    digest.
+
+    Each connection should have one codec on each end, and the messages
+    must be decoded in the order they are encoded.
+    """
+
+    def __init__(self):
+        self.encode_table: Dict[str, int] = {}
+        self.decode_table: List[str] = []
+
+    def _encode_str(self, out: bytearray, s: str) -> None:
+        idx = self.encode_table.get(s, None)
+        if idx is not None:
+            _write_varint(out, idx + 2)
+            return
+        if len(self.encode_table) < MAX_KEY_TABLE_SIZE:
+            self.encode_table[s] = len(self.encode_table)
+            _write_varint(out, _STR_NEW)
+        else:
+            _write_varint(out, _STR_INLINE)
+        _write_bytes(out, s.encode())
+
+    def _decode_str(self, buf: bytes, pos: int) -> Tuple[str, int]:
+        tag, pos = _read_varint(buf, pos)
+        if tag >= 2:
+            return self.decode_table[tag - 2], pos
+        data, pos = _read_bytes(buf, pos)
+        s = data.decode()
+        if tag == _STR_NEW:
+            self.decode_table.append(s)
+        return s, pos
+
+    def encode(self, out: bytearray, key: CacheEngineKey) -> None:
+        self._encode_str(out, key.fmt)
+        self._encode_str(out, key.model_name)
+        _write_varint(out, key.world_size)
+        _write_varint(out, key.worker_id)
+        _encode_chunk_hash(out, key.chunk_hash)
+
+    def decode(self, buf: bytes, pos: int) -> Tuple[CacheEngineKey, int]:
+        fmt, pos = self._decode_str(buf, pos)
+        model_name, pos = self._decode_str(buf, pos)
+        world_size, pos = _read_varint(buf, pos)
+        worker_id, pos = _read_varint(buf, pos)
+        chunk_hash, pos = _decode_chunk_hash(buf, pos)
+        return CacheEngineKey(fmt, model_name, world_size, worker_id,
+                              chunk_hash), pos
+
+
+class _StatelessKeyCodec(KeyCodec):
+    """
+    Sends all strings inline, for messages that are stored rather than
+    sent over a connection
+    """
+
+    def _encode_str(self, out: bytearray, s: str) -> None:
+        _write_varint(out, _STR_INLINE)
+        _write_bytes(out, s.encode())
+
+
 @dataclass
 class ClientMetaMessage:
     """
     Control message from LMCServerConnector to LMCacheServer
+
+    It is sent as a CLIENT_META_PREFIX with the length of the message,
+    followed by the varint-encoded fields and the key encoded by the
+    connection's KeyCodec.
     """
 
     command: int
@@ -94,43 +268,66 @@ class ClientMetaMessage:
     dtype: Optional[torch.dtype]
     shape: torch.Size
 
-    def serialize(self) -> bytes:
-        key_str = self.key.to_string()
-        assert (
-            len(key_str) <= MAX_KEY_LENGTH
-        ), f"Key length {len(key_str)} exceeds maximum {MAX_KEY_LENGTH}"
-
+    def serialize(self, codec: Optional[KeyCodec] = None) -> bytes:
+        """
+        Serialize the message with the length prefix. Without a codec,
+        the key is self-contained.
+        """
         # NOTE(Jiayi): 4 is the maximum dimension of memory object.
         # Pass in shape [x, 0, 0, 0] if it is a bytes memory object
         assert (len(self.shape) == 4), "Shape dimension should be 4"
 
-        packed_bytes = struct.pack(
-            f"iiiiiiii{MAX_KEY_LENGTH}s",
-            self.command,
-            self.length,
-            int(self.fmt.value),
-            DTYPE_TO_INT[self.dtype],
-            self.shape[0],
-            self.shape[1],
-            self.shape[2],
-            self.shape[3],
-            key_str.encode().ljust(MAX_KEY_LENGTH),
-        )
-        return packed_bytes
+        if codec is None:
+            codec = _StatelessKeyCodec()
+
+        out = bytearray(CLIENT_META_PREFIX.size)
+        _write_varint(out, self.command)
+        _write_varint(out, self.length)
+        _write_varint(out, int(self.fmt.value))
+        _write_varint(out, DTYPE_TO_INT[self.dtype])
+        for dim in self.shape:
+            _write_varint(out, dim)
+        codec.encode(out, self.key)
+
+        body_length = len(out) - CLIENT_META_PREFIX.size
+        assert body_length <= MAX_CLIENT_META_LENGTH, \
+            f"Client meta message of {body_length} bytes is too long"
+        CLIENT_META_PREFIX.pack_into(out, 0, body_length)
+        return bytes(out)
 
     @staticmethod
-    def deserialize(s: bytes) -> "ClientMetaMessage":
-        command, length, fmt, dtype, shape0, shape1, shape2, shape3, key = \
-            struct.unpack(f"iiiiiiii{MAX_KEY_LENGTH}s", s)
-        return ClientMetaMessage(
-            command, CacheEngineKey.from_string(key.decode().strip()), length,
-            MemoryFormat(fmt), INT_TO_DTYPE[dtype],
-            torch.Size([shape0, shape1, shape2, shape3]))
+    def deserialize(s: bytes,
+                    codec: Optional[KeyCodec] = None) -> "ClientMetaMessage":
+        """
+        Deserialize the message without the length prefix
+        """
+        if codec is None:
+            codec = _StatelessKeyCodec()
+        try:
+            command, pos = _read_varint(s, 0)
+            length, pos = _read_varint(s, pos)
+            fmt, pos = _read_varint(s, pos)
+            dtype, pos = _read_varint(s, pos)
+            shape = []
+            for _ in range(4):
+                dim, pos = _read_varint(s, pos)
+                shape.append(dim)
+            key, pos = codec.decode(s, pos)
+        except IndexError as e:
+            raise ValueError("Truncated client meta message") from e
+        return ClientMetaMessage(command, key, length, MemoryFormat(fmt),
+                                 INT_TO_DTYPE[dtype], torch.Size(shape))
 
     @staticmethod
-    def packlength() -> int:
-        # NOTE: 8 is the number of integers
-        return 4 * 8 + MAX_KEY_LENGTH
+    def prefixlength() -> int:
+        return CLIENT_META_PREFIX.size
+
+    @staticmethod
+    def bodylength(prefix: bytes) -> int:
+        """
+        Get the length of the message that follows the prefix
+        """
+        return CLIENT_META_PREFIX.unpack(prefix)[0]
 
 
 @dataclass
@@ -1,104 +1,418 @@
+import argparse
+import json
+import multiprocessing
+import os
 import socket
 import threading
 import time
+from typing import Any, Dict, List, Optional
 
 import torch
 
-from lmcache.experimental.memory_management import MemoryFormat
-from lmcache.experimental.protocol import (ClientMetaMessage, Constants,
+from lmcache.experimental.memory_management import MemoryFormat, MemoryObj
+from lmcache.experimental.protocol import (SHM_OFFSET, ClientMetaMessage,
+                                           Constants, KeyCodec,
                                            ServerMetaMessage)
-from lmcache.experimental.server.storage_backend import CreateStorageBackend
+from lmcache.experimental.server.replication import LMSReplicator
+from lmcache.experimental.server.storage_backend import (CreateStorageBackend,
+                                                         LMSBackendInterface)
+from lmcache.experimental.server.utils import (GetMemoryView, LMSMemoryObj,
+                                               LMSStatsMonitor)
+from lmcache.logging import init_logger
+from lmcache.socket_utils import (MSG_MORE, configure_socket, recv_exactly,
+                                  recv_exactly_into, send_vectored)
+from lmcache.utils import CacheEngineKey
+
+logger = init_logger(__name__)
+
+# How long the admin requests wait for the replicas to be removed, in
+# seconds
+REPLICA_REMOVAL_TIMEOUT = 30.0
+
+# The names of the commands in the request statistics
+COMMAND_NAMES = {
+    Constants.CLIENT_PUT: "put",
+    Constants.CLIENT_GET: "get",
+    Constants.CLIENT_EXIST: "exist",
+    Constants.CLIENT_LIST: "list",
+    Constants.CLIENT_SHM_HANDSHAKE: "shm_handshake",
+    Constants.CLIENT_SHM_GET: "shm_get",
+    Constants.CLIENT_SHM_RELEASE: "shm_release",
+    Constants.CLIENT_SHM_ALLOC: "shm_alloc",
+    Constants.CLIENT_SHM_COMMIT: "shm_commit",
+    Constants.CLIENT_STATS: "stats",
+    Constants.CLIENT_DELETE: "delete",
+    Constants.CLIENT_FLUSH: "flush",
+    Constants.CLIENT_INVALIDATE: "invalidate",
+}
 
 
 class LMCacheServer:
 
-    def __init__(self, host, port, device):
+    def __init__(self,
+                 host,
+                 port,
+                 device,
+                 max_size: float = 10.0,
+                 evictor: str = "lru",
+                 max_disk_size: float = 100.0,
+                 shm_path: Optional[str] = None,
+                 data_store: Optional[LMSBackendInterface] = None,
+                 reuse_port: bool = False,
+                 replication_args: Optional[Dict[str, Any]] = None):
         self.host = host
         self.port = port
         # self.data_store = {}
-        self.data_store = CreateStorageBackend(device)
+        if data_store is None:
+            data_store = CreateStorageBackend(device, max_size, evictor,
+                                              max_disk_size, shm_path)
+        self.data_store = data_store
+        self.stats_monitor = LMSStatsMonitor()
+        self.replicator: Optional[LMSReplicator] = None
+        if replication_args is not None:
+            self.replicator = LMSReplicator(data_store=data_store,
+                                            **replication_args)
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        configure_socket(self.server_socket)
+        if reuse_port:
+            # The workers accept on the same port and the kernel balances
+            # the connections among them
+            self.server_socket.setsockopt(socket.SOL_SOCKET,
+                                          socket.SO_REUSEPORT, 1)
         self.server_socket.bind((host, port))
         self.server_socket.listen()
 
+    def allocate(self, meta: ClientMetaMessage) -> Optional[MemoryObj]:
+        """
+        Allocate the memory to receive a chunk. The chunk it overwrites is
+        dropped, and its replicas are removed as they are stale.
+        """
+        overwrite = self.replicator is not None and \
+            self.data_store.contains(meta.key)
+        memory_obj = self.data_store.allocate(meta)
+        if overwrite:
+            self.remove_replicas([meta.key], wait=False)
+        return memory_obj
+
+    def invalidate(self,
+                   model_name: Optional[str] = None,
+                   world_size: Optional[int] = None) -> int:
+        """
+        Remove the chunks of a model, or all of them, with their replicas
+        """
+        keys = []
+        if self.replicator is not None:
+            keys = [
+                key for key in self.data_store.list_keys()
+                if (model_name is None or key.model_name == model_name) and (
+                    world_size is None or key.world_size == world_size)
+            ]
+        num_removed = self.data_store.invalidate(model_name, world_size)
+        self.remove_replicas(keys)
+        return num_removed
+
+    def remove_replicas(self,
+                        keys: List[CacheEngineKey],
+                        wait: bool = True) -> None:
+        """
+        Remove the copies of the removed keys from the replicas, so that
+        the clients stop reading them there. Must be called after the keys
+        are removed here, so that they are not replicated again.
+        """
+        if self.replicator is None or not keys:
+            return
+        done = self.replicator.on_remove(keys)
+        if wait and not done.wait(REPLICA_REMOVAL_TIMEOUT):
+            logger.warning("Timed out removing the replicas of "
+                           f"{len(keys)} keys")
+
     def receive_all(self, client_socket, n):
-        data = bytearray()
-        while len(data) < n:
-            packet = client_socket.recv(n - len(data))
-            if not packet:
-                return None
-            data.extend(packet)
-        return data
+        return recv_exactly(client_socket, n)
+
+    def receive_into(self, client_socket, buffer: memoryview) -> bool:
+        """
+        Receive exactly `len(buffer)` bytes into the buffer.
+        Returns False if the connection is closed in the middle.
+        """
+        return recv_exactly_into(client_socket, buffer)
+
+    def discard(self, client_socket, n: int) -> bool:
+        """
+        Drain `n` bytes from the socket, e.g. the payload of a rejected put.
+        """
+        scratch = memoryview(bytearray(min(n, 1 << 20)))
+        while n > 0:
+            received = client_socket.recv_into(scratch[:min(n, len(scratch))])
+            if received == 0:
+                return False
+            n -= received
+        return True
+
+    def send_file(self, client_socket, header: bytes,
+                  lms_memory_obj: LMSMemoryObj):
+        """
+        Send the header and then the chunk on disk with `os.sendfile`,
+        so that the payload is copied from the page cache to the socket
+        without passing through userspace.
+        """
+        assert lms_memory_obj.file is not None
+        # MSG_MORE lets the kernel send the header in the same segment
+        # as the beginning of the payload
+        view = memoryview(header)
+        while len(view) > 0:
+            sent = client_socket.sendmsg([view], [], MSG_MORE)
+            view = view[sent:]
+
+        offset = lms_memory_obj.offset
+        remaining = lms_memory_obj.length
+        in_fd = lms_memory_obj.file.fileno()
+        while remaining > 0:
+            sent = os.sendfile(client_socket.fileno(), in_fd, offset,
+                               remaining)
+            if sent == 0:
+                raise ConnectionError("Failed to send the cache file")
+            offset += sent
+            remaining -= sent
+
+    def fail_message(self) -> bytes:
+        return ServerMetaMessage(Constants.SERVER_FAIL, 0,
+                                 MemoryFormat(1), torch.float16,
+                                 torch.Size((0, 0, 0, 0))).serialize()
+
+    def send_json(self, client_socket, obj: Any) -> None:
+        """
+        Reply to an admin command with a JSON payload
+        """
+        data = json.dumps(obj).encode()
+        header = ServerMetaMessage(Constants.SERVER_SUCCESS, len(data),
+                                   MemoryFormat(1), torch.uint8,
+                                   torch.Size((len(data), 0, 0, 0)))
+        send_vectored(client_socket, [header.serialize(), data])
+
+    def handle_command(self, client_socket, meta: ClientMetaMessage,
+                       leases: Dict[int, List[LMSMemoryObj]],
+                       pending_puts: Dict[int, MemoryObj]) -> Optional[bool]:
+        """
+        Serve a request of the client.
+
+        Returns whether a lookup found the key, or None if the command is
+        not a lookup.
+
+        Throws:
+            ConnectionError if the client disconnects in the middle
+        """
+        match meta.command:
+            case Constants.CLIENT_PUT:
+                t0 = time.perf_counter()
+                memory_obj = self.allocate(meta)
+                if memory_obj is None:
+                    # Not enough space, drop the chunk
+                    logger.debug(f"Dropping put of {meta.key}, "
+                                 f"stats: {self.data_store.get_stats()}")
+                    if not self.discard(client_socket, meta.length):
+                        raise ConnectionError(
+                            "Connection closed by the client")
+                    return None
+                t1 = time.perf_counter()
+                if not self.receive_into(
+                        client_socket,
+                        GetMemoryView(memory_obj)[:meta.length]):
+                    self.data_store.free(memory_obj)
+                    raise ConnectionError("Connection closed by the client")
+                t2 = time.perf_counter()
+                self.data_store.put(meta, memory_obj)
+                t3 = time.perf_counter()
+                logger.debug(f"Time to allocate: {t1 - t0}, time to receive "
+                             f"data: {t2 - t1}, time to store data: "
+                             f"{t3 - t2}")
+
+            case Constants.CLIENT_GET:
+                t0 = time.perf_counter()
+                lms_memory_obj = self.data_store.get(meta.key)
+                t1 = time.perf_counter()
+                if lms_memory_obj is not None:
+                    code = Constants.SERVER_SUCCESS
+                    if self.replicator is not None and \
+                            self.replicator.on_get(meta.key):
+                        code = Constants.SERVER_SUCCESS_REPLICATED
+                    header = ServerMetaMessage(
+                        code,
+                        lms_memory_obj.length,
+                        lms_memory_obj.fmt,
+                        lms_memory_obj.dtype,
+                        lms_memory_obj.shape,
+                    ).serialize()
+                    try:
+                        if lms_memory_obj.file is not None:
+                            self.send_file(client_socket, header,
+                                           lms_memory_obj)
+                        else:
+                            send_vectored(client_socket,
+                                          [header, lms_memory_obj.buffer])
+                    finally:
+                        self.data_store.release(lms_memory_obj)
+                    t2 = time.perf_counter()
+                    logger.debug(f"Time to get data: {t1 - t0}, time to "
+                                 f"send data: {t2 - t1}")
+                    return True
+                client_socket.sendall(self.fail_message())
+                return False
+
+            case Constants.CLIENT_EXIST:
+
+                code = (Constants.SERVER_SUCCESS if self.data_store.contains(
+                    meta.key) else Constants.SERVER_FAIL)
+                client_socket.sendall(
+                    ServerMetaMessage(code, 0, MemoryFormat(1), torch.float16,
+                                      torch.Size((0, 0, 0, 0))).serialize())
+                return code == Constants.SERVER_SUCCESS
+
+            case Constants.CLIENT_SHM_HANDSHAKE:
+                shm_path = self.data_store.get_shm_path()
+                if shm_path is None:
+                    client_socket.sendall(self.fail_message())
+                    return None
+                path = shm_path.encode()
+                client_socket.sendall(
+                    ServerMetaMessage(Constants.SERVER_SUCCESS, len(path),
+                                      MemoryFormat(1), torch.uint8,
+                                      torch.Size((len(path), 0, 0,
+                                                  0))).serialize() + path)
+
+            case Constants.CLIENT_SHM_GET:
+                lms_memory_obj = self.data_store.get(meta.key)
+                if lms_memory_obj is None:
+                    client_socket.sendall(self.fail_message())
+                    return False
+                header = ServerMetaMessage(
+                    Constants.SERVER_SUCCESS,
+                    lms_memory_obj.length,
+                    lms_memory_obj.fmt,
+                    lms_memory_obj.dtype,
+                    lms_memory_obj.shape,
+                ).serialize()
+                if lms_memory_obj.data is None:
+                    # On disk, the payload follows in the socket
+                    try:
+                        self.send_file(client_socket,
+                                       header + SHM_OFFSET.pack(-1),
+                                       lms_memory_obj)
+                    finally:
+                        self.data_store.release(lms_memory_obj)
+                    return True
+                # The chunk stays pinned until the client has
+                # copied it and sends CLIENT_SHM_RELEASE
+                offset = lms_memory_obj.data.metadata.address
+                leases.setdefault(offset, []).append(lms_memory_obj)
+                client_socket.sendall(header + SHM_OFFSET.pack(offset))
+                return True
+
+            case Constants.CLIENT_SHM_RELEASE:
+                data = self.receive_all(client_socket, SHM_OFFSET.size)
+                if not data:
+                    raise ConnectionError("Connection closed by the client")
+                offset = SHM_OFFSET.unpack(data)[0]
+                objs = leases.get(offset)
+                if not objs:
+                    logger.warning(f"Releasing an unknown offset {offset}")
+                    return None
+                self.data_store.release(objs.pop())
+                if not objs:
+                    del leases[offset]
+
+            case Constants.CLIENT_SHM_ALLOC:
+                memory_obj = self.allocate(meta)
+                if memory_obj is None:
+                    client_socket.sendall(self.fail_message())
+                    return None
+                offset = memory_obj.metadata.address
+                pending_puts[offset] = memory_obj
+                client_socket.sendall(
+                    ServerMetaMessage(Constants.SERVER_SUCCESS, meta.length,
+                                      meta.fmt, meta.dtype,
+                                      meta.shape).serialize() +
+                    SHM_OFFSET.pack(offset))
+
+            case Constants.CLIENT_SHM_COMMIT:
+                data = self.receive_all(client_socket, SHM_OFFSET.size)
+                if not data:
+                    raise ConnectionError("Connection closed by the client")
+                offset = SHM_OFFSET.unpack(data)[0]
+                memory_obj = pending_puts.pop(offset, None)
+                if memory_obj is None:
+                    logger.warning(f"Committing an unknown offset {offset}")
+                    return None
+                self.data_store.put(meta, memory_obj)
+
+            case Constants.CLIENT_STATS:
+                stats: Dict[str, Any] = dict(self.data_store.get_stats())
+                stats["pid"] = os.getpid()
+                stats["requests"] = self.stats_monitor.get_stats()
+                if self.replicator is not None:
+                    stats["replication"] = self.replicator.get_stats()
+                self.send_json(client_socket, stats)
+
+            case Constants.CLIENT_DELETE:
+                num_removed = 0
+                if self.data_store.contains(meta.key):
+                    self.data_store.remove(meta.key)
+                    num_removed = 1
+                self.remove_replicas([meta.key])
+                self.send_json(client_socket, {"num_removed": num_removed})
+
+            case Constants.CLIENT_FLUSH:
+                num_removed = self.invalidate()
+                self.send_json(client_socket, {"num_removed": num_removed})
+
+            case Constants.CLIENT_INVALIDATE:
+                num_removed = self.invalidate(meta.key.model_name or None,
+                                              meta.key.world_size or None)
+                self.send_json(client_socket, {"num_removed": num_removed})
+
+            # TODO(Jiayi): Implement List
+            # case Constants.CLIENT_LIST:
+            #     keys = list(self.data_store.list_keys())
+            #     data = "\n".join(keys).encode()
+            #     client_socket.sendall(
+            #         ServerMetaMessage(Constants.SERVER_SUCCESS,
+            #                           len(data)).serialize())
+            #     client_socket.sendall(data)
+        return None
 
     def handle_client(self, client_socket):
+        # The chunks pinned or allocated by the shared-memory clients,
+        # indexed by their offsets in the arena. They are released if
+        # the client disconnects.
+        leases: Dict[int, List[LMSMemoryObj]] = {}
+        pending_puts: Dict[int, MemoryObj] = {}
+        key_codec = KeyCodec()
         try:
             while True:
+                prefix = self.receive_all(client_socket,
+                                          ClientMetaMessage.prefixlength())
+                if not prefix:
+                    break
                 header = self.receive_all(client_socket,
-                                          ClientMetaMessage.packlength())
+                                          ClientMetaMessage.bodylength(prefix))
                 if not header:
                     break
-                meta = ClientMetaMessage.deserialize(header)
-
-                match meta.command:
-                    case Constants.CLIENT_PUT:
-                        t0 = time.perf_counter()
-                        s = self.receive_all(client_socket, meta.length)
-                        t1 = time.perf_counter()
-                        self.data_store.put(meta, s)
-                        t2 = time.perf_counter()
-                        print(
-                            f"Time to receive data: {t1 - t0}, time to store "
-                            f"data: {t2 - t1}")
-
-                    case Constants.CLIENT_GET:
-                        t0 = time.perf_counter()
-                        lms_memory_obj = self.data_store.get(meta.key)
-                        t1 = time.perf_counter()
-                        if lms_memory_obj is not None:
-                            client_socket.sendall(
-                                ServerMetaMessage(
-                                    Constants.SERVER_SUCCESS,
-                                    lms_memory_obj.length,
-                                    lms_memory_obj.fmt,
-                                    lms_memory_obj.dtype,
-                                    lms_memory_obj.shape,
-                                ).serialize())
-                            t2 = time.perf_counter()
-                            client_socket.sendall(lms_memory_obj.data)
-                            t3 = time.perf_counter()
-                            print(
-                                f"Time to get data: {t1 - t0}, time to send "
-                                f"meta: {t2 - t1}, time to send data: {t3 - t2}"
-                            )
-                        else:
-                            client_socket.sendall(
-                                ServerMetaMessage(Constants.SERVER_FAIL, 0,
-                                                  MemoryFormat(1),
-                                                  torch.float16,
-                                                  torch.Size((0, 0, 0,
-                                                              0))).serialize())
-
-                    case Constants.CLIENT_EXIST:
-
-                        code = (Constants.SERVER_SUCCESS
-                                if meta.key in self.data_store.list_keys() else
-                                Constants.SERVER_FAIL)
-                        client_socket.sendall(
-                            ServerMetaMessage(code, 0, MemoryFormat(1),
-                                              torch.float16,
-                                              torch.Size(
-                                                  (0, 0, 0, 0))).serialize())
-
-                    # TODO(Jiayi): Implement List
-                    # case Constants.CLIENT_LIST:
-                    #     keys = list(self.data_store.list_keys())
-                    #     data = "\n".join(keys).encode()
-                    #     client_socket.sendall(
-                    #         ServerMetaMessage(Constants.SERVER_SUCCESS,
-                    #                           len(data)).serialize())
-                    #     client_socket.sendall(data)
+                meta = ClientMetaMessage.deserialize(header, key_codec)
 
+                start = time.perf_counter()
+                try:
+                    hit = self.handle_command(client_socket, meta, leases,
+                                              pending_puts)
+                except ConnectionError:
+                    break
+                self.stats_monitor.on_request(
+                    COMMAND_NAMES.get(meta.command, str(meta.command)),
+                    time.perf_counter() - start, hit)
         finally:
+            for objs in leases.values():
+                for lms_memory_obj in objs:
+                    self.data_store.release(lms_memory_obj)
+            for memory_obj in pending_puts.values():
+                self.data_store.free(memory_obj)
             client_socket.close()
 
     def run(self):
@@ -106,28 +420,156 @@ class LMCacheServer:
         try:
             while True:
                 client_socket, addr = self.server_socket.accept()
+                configure_socket(client_socket)
                 print(f"Connected by {addr}")
                 threading.Thread(target=self.handle_client,
                                  args=(client_socket, )).start()
         finally:
             self.server_socket.close()
+            if self.replicator is not None:
+                self.replicator.close()
 
 
-def main():
-    import sys
+def parse_args():
+    parser = argparse.ArgumentParser(description="LMCache server")
+    parser.add_argument("host", type=str)
+    parser.add_argument("port", type=int)
+    parser.add_argument("device",
+                        type=str,
+                        nargs="?",
+                        default="cpu",
+                        help="cpu, or a directory to spill the evicted "
+                        "chunks to (default: cpu)")
+    parser.add_argument("--max-size",
+                        type=float,
+                        default=10.0,
+                        help="The capacity of the memory arena in GB")
+    parser.add_argument("--evictor",
+                        type=str,
+                        default="lru",
+                        choices=["lru", "lfu", "size"],
+                        help="The eviction policy when the server is full")
+    parser.add_argument("--max-disk-size",
+                        type=float,
+                        default=100.0,
+                        help="The capacity of the disk tier in GB")
+    parser.add_argument("--shm",
+                        action="store_true",
+                        help="Put the memory arena in /dev/shm so that "
+                        "the clients on the same host can use lm+shm://")
+    parser.add_argument("--workers",
+                        type=int,
+                        default=1,
+                        help="The number of server processes that share the "
+                        "memory arena (default: 1)")
+    parser.add_argument("--cluster",
+                        type=str,
+                        default=None,
+                        help="All the lm servers as host1:port1,host2:port2,"
+                        "..., in the same order as in the clients' "
+                        "remote_url. Enables the replication of hot keys")
+    parser.add_argument("--cluster-index",
+                        type=int,
+                        default=None,
+                        help="The position of this server in --cluster "
+                        "(default: the only entry with this port)")
+    parser.add_argument("--replicas",
+                        type=int,
+                        default=2,
+                        help="The number of other servers a hot key is "
+                        "copied to (default: 2)")
+    parser.add_argument("--hot-threshold",
+                        type=int,
+                        default=64,
+                        help="The number of hits within --hot-window that "
+                        "makes a key hot (default: 64)")
+    parser.add_argument("--hot-window",
+                        type=float,
+                        default=1.0,
+                        help="The window of the hit counters in seconds "
+                        "(default: 1)")
+    return parser.parse_args()
+
+
+def get_replication_args(args) -> Optional[Dict[str, Any]]:
+    if args.cluster is None:
+        return None
+    cluster = []
+    for body in args.cluster.split(","):
+        host, port = body.rsplit(":", 1)
+        cluster.append((host, int(port)))
+
+    index = args.cluster_index
+    if index is None:
+        matches = [
+            idx for idx, (_, port) in enumerate(cluster) if port == args.port
+        ]
+        if len(matches) != 1:
+            raise ValueError("Cannot find this server in --cluster, please "
+                             "set --cluster-index")
+        index = matches[0]
+    return {
+        "cluster": cluster,
+        "index": index,
+        "num_replicas": args.replicas,
+        "hot_threshold": args.hot_threshold,
+        "hot_window": args.hot_window,
+    }
+
 
-    if len(sys.argv) not in [3, 4]:
-        print(f"Usage: {sys.argv[0]} <host> <port> <storage>(default:cpu)")
-        exit(1)
+def run_workers(args, shm_path: Optional[str],
+                replication_args: Optional[Dict[str, Any]]):
+    """
+    Fork the worker processes after creating the shared storage, each of
+    them accepts connections on the same port
+    """
+    data_store = CreateStorageBackend(args.device, args.max_size, args.evictor,
+                                      args.max_disk_size, shm_path,
+                                      args.workers)
+
+    def worker():
+        # NOTE: each worker counts the hits it serves, so a key becomes hot
+        # once one of the workers sees enough hits
+        server = LMCacheServer(args.host,
+                               args.port,
+                               args.device,
+                               data_store=data_store,
+                               reuse_port=True,
+                               replication_args=replication_args)
+        server.run()
+
+    ctx = multiprocessing.get_context("fork")
+    workers = [
+        ctx.Process(target=worker, daemon=True) for _ in range(args.workers)
+    ]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    finally:
+        for process in workers:
+            process.terminate()
+        data_store.close()
+
+
+def main():
+    args = parse_args()
 
-    host = sys.argv[1]
-    port = int(sys.argv[2])
-    if len(sys.argv) == 4:
-        device = sys.argv[3]
-    else:
-        device = "cpu"
+    shm_path = f"/dev/shm/lmcache_{args.port}" if args.shm else None
+    replication_args = get_replication_args(args)
+    if args.workers > 1:
+        run_workers(args, shm_path, replication_args)
+        return
 
-    server = LMCacheServer(host, port, device)
+    server = LMCacheServer(args.host,
+                           args.port,
+                           args.device,
+                           args.max_size,
+                           args.evictor,
+                           args.max_disk_size,
+                           shm_path,
+                           replication_args=replication_args)
     server.run()
 
 
@@ -0,0 +1,105 @@
+import argparse
+import json
+import socket
+from typing import Any, Dict, Optional
+
+import torch
+
+from lmcache.experimental.memory_management import MemoryFormat
+from lmcache.experimental.protocol import (ClientMetaMessage, Constants,
+                                           KeyCodec, ServerMetaMessage)
+from lmcache.socket_utils import configure_socket, recv_exactly
+from lmcache.utils import CacheEngineKey
+
+
+class LMSAdminClient:
+    """
+    Sends the admin commands to an lm server.
+
+    NOTE: with `--workers`, each connection is served by one of the
+    workers. The request statistics are those of that worker, while the
+    chunks are shared by all of them.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        configure_socket(self.client_socket)
+        self.client_socket.connect((host, port))
+        self.key_codec = KeyCodec()
+
+    def request(self,
+                command: int,
+                key: Optional[CacheEngineKey] = None) -> Dict[str, Any]:
+        if key is None:
+            key = CacheEngineKey("", "", 0, 0, "")
+        self.client_socket.sendall(
+            ClientMetaMessage(command, key, 0, MemoryFormat(1), torch.float16,
+                              torch.Size([0, 0, 0,
+                                          0])).serialize(self.key_codec))
+        data = recv_exactly(self.client_socket, ServerMetaMessage.packlength())
+        if data is None:
+            raise ConnectionError("Connection closed by the lm server")
+        meta = ServerMetaMessage.deserialize(data)
+        if meta.code != Constants.SERVER_SUCCESS:
+            raise RuntimeError(f"The lm server failed with code {meta.code}")
+        payload = recv_exactly(self.client_socket, meta.length)
+        if payload is None:
+            raise ConnectionError("Connection closed by the lm server")
+        return json.loads(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.request(Constants.CLIENT_STATS)
+
+    def delete(self, key: CacheEngineKey) -> int:
+        return self.request(Constants.CLIENT_DELETE, key)["num_removed"]
+
+    def flush(self) -> int:
+        return self.request(Constants.CLIENT_FLUSH)["num_removed"]
+
+    def invalidate(self,
+                   model_name: str,
+                   world_size: Optional[int] = None) -> int:
+        key = CacheEngineKey("", model_name, world_size or 0, 0, "")
+        return self.request(Constants.CLIENT_INVALIDATE, key)["num_removed"]
+
+    def close(self):
+        self.client_socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Inspect and manage a running lm server")
+    parser.add_argument("host", type=str, help="Host of the lm server")
+    parser.add_argument("port", type=int, help="Port of the lm server")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Print the cache and request stats")
+    delete_parser = subparsers.add_parser("delete", help="Remove a chunk")
+    delete_parser.add_argument(
+        "key", type=str, help="The key, as fmt@model@world_size@worker@hash")
+    subparsers.add_parser("flush", help="Remove all the chunks")
+    invalidate_parser = subparsers.add_parser(
+        "invalidate", help="Remove the chunks of a model")
+    invalidate_parser.add_argument("--model", type=str, required=True)
+    invalidate_parser.add_argument("--world-size", type=int, default=None)
+    args = parser.parse_args()
+
+    client = LMSAdminClient(args.host, args.port)
+    try:
+        match args.command:
+            case "stats":
+                print(json.dumps(client.stats(), indent=2))
+            case "delete":
+                num_removed = client.delete(
+                    CacheEngineKey.from_string(args.key))
+                print(f"Removed {num_removed} chunk(s)")
+            case "flush":
+                print(f"Removed {client.flush()} chunk(s)")
+            case "invalidate":
+                num_removed = client.invalidate(args.model, args.world_size)
+                print(f"Removed {num_removed} chunk(s)")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
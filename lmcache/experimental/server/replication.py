@@ -0,0 +1,333 @@
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import torch
+
+from lmcache.experimental.memory_management import MemoryFormat
+from lmcache.experimental.protocol import (ClientMetaMessage, Constants,
+                                           KeyCodec, ServerMetaMessage)
+from lmcache.experimental.server.storage_backend import LMSBackendInterface
+from lmcache.experimental.server.utils import LMSMemoryObj
+from lmcache.experimental.storage_backend.connector.sharded_connector import \
+    ConsistentHashRing
+from lmcache.logging import init_logger
+from lmcache.socket_utils import configure_socket, recv_exactly, send_vectored
+from lmcache.utils import CacheEngineKey
+
+logger = init_logger(__name__)
+
+# The tasks of the replication thread
+_REPLICATE = 0
+_REMOVE = 1
+_DONE = 2
+
+
+class HotKeyTracker:
+    """
+    Counts the hits of each key in fixed time windows. A key is hot once
+    it is hit `threshold` times within a window. A replicated key stays
+    replicated for `ttl` seconds, after which it is copied again if it is
+    still hot, since the replicas may have been evicted meanwhile.
+    """
+
+    def __init__(self, threshold: int, window: float, ttl: float):
+        self.threshold = threshold
+        self.window = window
+        self.ttl = ttl
+
+        self.lock = threading.Lock()
+        self.counts: Dict[CacheEngineKey, int] = {}
+        self.window_start = time.monotonic()
+        # The keys being replicated
+        self.pending: Set[CacheEngineKey] = set()
+        # The expiration time of the replicated keys
+        self.replicated: Dict[CacheEngineKey, float] = {}
+
+    def _roll_window(self, now: float) -> None:
+        """
+        Should be called with the lock held.
+        """
+        if now - self.window_start < self.window:
+            return
+        self.window_start = now
+        self.counts.clear()
+        self.replicated = {
+            key: expiry
+            for key, expiry in self.replicated.items() if expiry > now
+        }
+
+    def on_access(self, key: CacheEngineKey) -> bool:
+        """
+        Record a hit of the key.
+
+        Returns:
+            True if the key has just become hot and should be replicated.
+            The caller should then call `on_replicated`.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self._roll_window(now)
+            count = self.counts.get(key, 0) + 1
+            self.counts[key] = count
+            if count < self.threshold or key in self.pending:
+                return False
+            if self.replicated.get(key, 0.0) > now:
+                return False
+            self.pending.add(key)
+            return True
+
+    def on_replicated(self, key: CacheEngineKey, success: bool) -> None:
+        with self.lock:
+            if key not in self.pending:
+                # Removed while it was being replicated
+                return
+            self.pending.discard(key)
+            if success:
+                self.replicated[key] = time.monotonic() + self.ttl
+
+    def forget(self, key: CacheEngineKey) -> None:
+        """
+        Drop the key once it is removed, so that the clients stop reading
+        it from the replicas
+        """
+        with self.lock:
+            self.counts.pop(key, None)
+            self.pending.discard(key)
+            self.replicated.pop(key, None)
+
+    def is_replicated(self, key: CacheEngineKey) -> bool:
+        with self.lock:
+            return self.replicated.get(key, 0.0) > time.monotonic()
+
+    def num_replicated(self) -> int:
+        now = time.monotonic()
+        with self.lock:
+            return sum(1 for expiry in self.replicated.values()
+                       if expiry > now)
+
+
+class _Peer:
+    """
+    A connection to another lm server of the cluster, only used by the
+    replication thread
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.sock: Optional[socket.socket] = None
+        self.key_codec = KeyCodec()
+
+    def __str__(self):
+        return f"{self.host}:{self.port}"
+
+    def _connect(self) -> socket.socket:
+        if self.sock is None:
+            self.sock = socket.create_connection((self.host, self.port))
+            configure_socket(self.sock)
+            # The interned keys of the previous connection are gone
+            self.key_codec = KeyCodec()
+        return self.sock
+
+    def put(self, meta: ClientMetaMessage, payload: memoryview) -> bool:
+        try:
+            sock = self._connect()
+            send_vectored(sock, [meta.serialize(self.key_codec), payload])
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to replicate to {self}: {e}")
+            self.close()
+            return False
+
+    def delete(self, key: CacheEngineKey) -> bool:
+        meta = ClientMetaMessage(Constants.CLIENT_DELETE, key, 0,
+                                 MemoryFormat(1), torch.float16,
+                                 torch.Size([0, 0, 0, 0]))
+        try:
+            sock = self._connect()
+            sock.sendall(meta.serialize(self.key_codec))
+            # Unlike the puts, the deletes are answered with the number of
+            # removed chunks
+            data = recv_exactly(sock, ServerMetaMessage.packlength())
+            if data is None:
+                raise ConnectionError("Connection closed by the lm server")
+            reply = ServerMetaMessage.deserialize(data)
+            if recv_exactly(sock, reply.length) is None:
+                raise ConnectionError("Connection closed by the lm server")
+            return True
+        except OSError as e:
+            logger.warning(f"Failed to remove {key} from {self}: {e}")
+            self.close()
+            return False
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class LMSReplicator:
+    """
+    Copies the hot keys of this server to the next `num_replicas` servers
+    on the hash ring of the cluster, so that the reads of a hot key are
+    not limited by the bandwidth of a single server.
+
+    The cluster is listed in the same order as in the clients'
+    `lm://host1:port1,host2:port2,...` url, so that the servers and the
+    clients agree on the primary server and the replicas of each key.
+    Only the primary server of a key replicates it.
+
+    The keys removed from this server are also removed from the replicas,
+    after any copy of them that is in flight. The clients then read them
+    from the primary server again.
+    """
+
+    def __init__(self,
+                 cluster: List[Tuple[str, int]],
+                 index: int,
+                 data_store: LMSBackendInterface,
+                 num_replicas: int = 2,
+                 hot_threshold: int = 64,
+                 hot_window: float = 1.0,
+                 replication_ttl: float = 60.0,
+                 num_virtual_nodes: int = 128):
+        assert 0 <= index < len(cluster), "The server is not in the cluster"
+        self.index = index
+        self.data_store = data_store
+        self.ring = ConsistentHashRing(
+            [f"{host}:{port}" for host, port in cluster], num_virtual_nodes)
+        self.peers = [_Peer(host, port) for host, port in cluster]
+        self.num_replicas = min(num_replicas, len(cluster) - 1)
+        self.tracker = HotKeyTracker(hot_threshold, hot_window,
+                                     replication_ttl)
+
+        self.num_replicated_bytes = 0
+        self.num_failed_replications = 0
+        self.num_failed_removals = 0
+
+        # (REPLICATE, key), (REMOVE, key), (DONE, event) or None to stop
+        self.queue: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self._replicate_loop,
+                                       daemon=True)
+        self.thread.start()
+
+    def on_get(self, key: CacheEngineKey) -> bool:
+        """
+        Record a hit of the key.
+
+        Returns:
+            True if the key is replicated, i.e., the client may read it
+            from the replicas
+        """
+        if self.num_replicas <= 0 or \
+                self.ring.get_shard(key.to_string()) != self.index:
+            return False
+        if self.tracker.on_access(key):
+            self.queue.put((_REPLICATE, key))
+        return self.tracker.is_replicated(key)
+
+    def on_remove(self, keys: List[CacheEngineKey]) -> threading.Event:
+        """
+        Remove the copies of keys that are deleted, invalidated or
+        overwritten on this server from the replicas.
+
+        Returns:
+            An event that is set once the copies are removed
+        """
+        for key in keys:
+            if self.num_replicas <= 0 or \
+                    self.ring.get_shard(key.to_string()) != self.index:
+                continue
+            self.tracker.forget(key)
+            # NOTE: the keys are removed even if this worker did not
+            # replicate them, as they may be replicated by other workers
+            # sharing the same data store
+            self.queue.put((_REMOVE, key))
+        done = threading.Event()
+        self.queue.put((_DONE, done))
+        return done
+
+    def _read_payload(
+            self,
+            key: CacheEngineKey) -> Optional[Tuple[LMSMemoryObj, memoryview]]:
+        """
+        Returns the pinned chunk and its payload, or None if it is gone
+        """
+        lms_memory_obj = self.data_store.get(key)
+        if lms_memory_obj is None:
+            return None
+        if lms_memory_obj.data is not None:
+            return lms_memory_obj, lms_memory_obj.buffer
+        assert lms_memory_obj.file is not None
+        payload = os.pread(lms_memory_obj.file.fileno(), lms_memory_obj.length,
+                           lms_memory_obj.offset)
+        return lms_memory_obj, memoryview(payload)
+
+    def _replicate(self, key: CacheEngineKey) -> bool:
+        item = self._read_payload(key)
+        if item is None:
+            return False
+        lms_memory_obj, payload = item
+        meta = ClientMetaMessage(Constants.CLIENT_PUT, key,
+                                 lms_memory_obj.length, lms_memory_obj.fmt,
+                                 lms_memory_obj.dtype, lms_memory_obj.shape)
+        try:
+            replicas = self.ring.get_shards(key.to_string(),
+                                            self.num_replicas + 1)[1:]
+            # NOTE: all the replicas are tried even if one of them fails
+            success = all(
+                [self.peers[idx].put(meta, payload) for idx in replicas])
+        finally:
+            self.data_store.release(lms_memory_obj)
+        if success:
+            self.num_replicated_bytes += lms_memory_obj.length * len(replicas)
+        else:
+            self.num_failed_replications += 1
+        return success
+
+    def _remove(self, key: CacheEngineKey) -> None:
+        replicas = self.ring.get_shards(key.to_string(),
+                                        self.num_replicas + 1)[1:]
+        if not all([self.peers[idx].delete(key) for idx in replicas]):
+            self.num_failed_removals += 1
+
+    def _replicate_loop(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                break
+            action, arg = task
+            if action == _DONE:
+                arg.set()
+                continue
+            if action == _REMOVE:
+                try:
+                    self._remove(arg)
+                except Exception as e:
+                    logger.error(f"Failed to remove the replicas of {arg}: "
+                                 f"{e}")
+                continue
+            success = False
+            try:
+                success = self._replicate(arg)
+            except Exception as e:
+                logger.error(f"Failed to replicate {arg}: {e}")
+            self.tracker.on_replicated(arg, success)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "num_replicated_keys": self.tracker.num_replicated(),
+            "num_replicated_bytes": self.num_replicated_bytes,
+            "num_failed_replications": self.num_failed_replications,
+            "num_failed_removals": self.num_failed_removals,
+        }
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        for peer in self.peers:
+            peer.close()
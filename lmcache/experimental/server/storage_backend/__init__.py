@@ -1,21 +1,44 @@
+from typing import Optional
+
 from lmcache.experimental.server.storage_backend.abstract_backend import \
     LMSBackendInterface
 from lmcache.experimental.server.storage_backend.local_backend import \
     LMSLocalBackend
+from lmcache.experimental.server.storage_backend.local_disk_backend import \
+    LMSLocalDiskBackend
+from lmcache.experimental.server.storage_backend.shared_backend import \
+    LMSSharedBackend
 from lmcache.logging import init_logger
 
 logger = init_logger(__name__)
 
 
-def CreateStorageBackend(device: str) -> LMSBackendInterface:
+def CreateStorageBackend(device: str,
+                         max_size: float = 10.0,
+                         evictor: str = "lru",
+                         max_disk_size: float = 100.0,
+                         shm_path: Optional[str] = None,
+                         num_workers: int = 1) -> LMSBackendInterface:
+    if num_workers > 1:
+        if device != "cpu":
+            raise ValueError("Multiple workers only support the cpu device")
+        if evictor != "lru":
+            logger.warning(f"The {evictor} eviction is not supported with "
+                           "multiple workers, the oldest chunks are evicted")
+        logger.info(f"Initializing cache server with {max_size} GB shared "
+                    f"memory for {num_workers} workers, FIFO eviction")
+        return LMSSharedBackend(max_size, shm_path=shm_path)
+
     match device:
         case "cpu":
             # cpu only
-            logger.info("Initializing cpu-only cache server")
-            return LMSLocalBackend()
+            logger.info("Initializing cpu-only cache server with "
+                        f"{max_size} GB memory and {evictor} eviction")
+            return LMSLocalBackend(max_size, evictor, shm_path=shm_path)
         case _:
-            raise ValueError(f"Unsupported device: {device}")
-        # TODO(Jiayi): please implement hierarchical remote storage
-        #case _:
-        #    logger.info("Initializing disk-only cache server")
-        #    return LMSLocalDiskBackend(path=device)
+            # cpu memory with a disk tier at the given path
+            logger.info("Initializing cache server with "
+                        f"{max_size} GB memory and {max_disk_size} GB disk "
+                        f"at {device}, {evictor} eviction")
+            disk_backend = LMSLocalDiskBackend(device, max_disk_size, evictor)
+            return LMSLocalBackend(max_size, evictor, disk_backend, shm_path)
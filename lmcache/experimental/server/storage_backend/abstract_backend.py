@@ -1,6 +1,7 @@
 import abc
-from typing import List, Optional
+from typing import Dict, List, Optional
 
+from lmcache.experimental.memory_management import MemoryObj
 from lmcache.experimental.protocol import ClientMetaMessage
 from lmcache.experimental.server.utils import LMSMemoryObj
 from lmcache.logging import init_logger
@@ -11,25 +12,54 @@ logger = init_logger(__name__)
 
 class LMSBackendInterface(metaclass=abc.ABCMeta):
 
+    @abc.abstractmethod
+    def allocate(
+        self,
+        client_meta: ClientMetaMessage,
+    ) -> Optional[MemoryObj]:
+        """
+        Reserve space in the cache server for an incoming KV cache chunk.
+        Other chunks may be evicted to make room for it.
+
+        Args:
+            client_meta: metadata sent by the client
+
+        Returns:
+            A MemoryObj of at least `client_meta.length` bytes, or None
+            if the chunk cannot fit in the cache server
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def put(
         self,
         client_meta: ClientMetaMessage,
-        kv_chunk_bytes: bytearray,
+        memory_obj: MemoryObj,
     ) -> None:
         """
         Store the KV cache of the tokens into the cache server.
 
         Args:
-            key: the key of the token chunk, in the format of CacheEngineKey
-            client_meta: metadata sent by the client 
-            kv_chunk_bytes: the kv cache (bytearray) of the token chunk
+            client_meta: metadata sent by the client
+            memory_obj: the MemoryObj returned by `allocate`, filled with
+            the kv cache bytes of the token chunk
 
         Returns:
             None
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def free(
+        self,
+        memory_obj: MemoryObj,
+    ) -> None:
+        """
+        Give back a MemoryObj returned by `allocate` that will not be
+        `put`, e.g., when the client disconnects in the middle of a put.
+        """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def contains(
         self,
@@ -54,9 +84,74 @@ class LMSBackendInterface(metaclass=abc.ABCMeta):
         Output:
             An LMSMemoryObj object that contains the KV cache bytearray
             with the some metadata
+
+        Note:
+            The returned object is pinned so that it will not be reused
+            while being sent. The caller should call `release` after use.
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def release(
+        self,
+        lms_memory_obj: LMSMemoryObj,
+    ) -> None:
+        """
+        Unpin an LMSMemoryObj returned by `get`
+        """
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get the usage and eviction counters of the cache server
+        Children classes should override this method if necessary
+        """
+        return {}
+
+    def get_shm_path(self) -> Optional[str]:
+        """
+        Get the path of the shared memory arena, where the address of
+        each MemoryObj is its offset.
+        Returns None if the memory is not shared.
+        """
+        return None
+
+    @abc.abstractmethod
+    def remove(
+        self,
+        key: CacheEngineKey,
+    ) -> None:
+        """
+        Remove the KV cache chunk by the given key, if it exists
+        """
+        raise NotImplementedError
+
+    def invalidate(
+        self,
+        model_name: Optional[str] = None,
+        world_size: Optional[int] = None,
+    ) -> int:
+        """
+        Remove the KV cache chunks of a model, e.g., after it is updated.
+        Everything is removed if no filter is given.
+
+        Args:
+            model_name: only remove the chunks of this model
+            world_size: only remove the chunks of this world size
+
+        Returns:
+            The number of removed chunks
+        """
+        num_removed = 0
+        for key in self.list_keys():
+            if model_name is not None and key.model_name != model_name:
+                continue
+            if world_size is not None and key.world_size != world_size:
+                continue
+            self.remove(key)
+            num_removed += 1
+        return num_removed
+
     @abc.abstractmethod
     def list_keys(self, ) -> List[CacheEngineKey]:
         """
@@ -1,30 +1,91 @@
+import queue
 import threading
 from collections import OrderedDict
-from typing import List, Optional
+from typing import Dict, List, Optional
 
+import torch
+
+from lmcache.experimental.memory_management import (HostMemoryAllocator,
+                                                    MemoryObj,
+                                                    SharedMemoryAllocator,
+                                                    TensorMemoryAllocator)
 from lmcache.experimental.protocol import ClientMetaMessage
 from lmcache.experimental.server.storage_backend.abstract_backend import \
     LMSBackendInterface
+from lmcache.experimental.server.storage_backend.local_disk_backend import \
+    LMSLocalDiskBackend
 from lmcache.experimental.server.utils import LMSMemoryObj
+from lmcache.experimental.storage_backend.evictor import (CreateEvictor,
+                                                          PutStatus)
 from lmcache.logging import init_logger
 from lmcache.utils import CacheEngineKey, _lmcache_nvtx_annotate
 
 logger = init_logger(__name__)
 
+# The maximum time (in seconds) that a put waits for the spilled chunks
+# to release their memory
+SPILL_WAIT_TIMEOUT = 5.0
+
 
 class LMSLocalBackend(LMSBackendInterface):
+    """
+    Stores the KV cache in a preallocated memory arena with a fixed
+    capacity. Chunks are evicted by the given policy when it is full.
+    If a disk backend is given, the evicted chunks are spilled to disk
+    in the background instead of being dropped.
+    """
 
-    def __init__(self, ):
+    def __init__(
+        self,
+        max_size: float = 10.0,
+        evictor: str = "lru",
+        disk_backend: Optional[LMSLocalDiskBackend] = None,
+        shm_path: Optional[str] = None,
+    ):
+        """
+        :param float max_size: The capacity of the memory arena in GB.
+        :param str evictor: The eviction policy, one of "lru", "lfu"
+            and "size".
+        :param disk_backend: The optional disk tier.
+        :param shm_path: If given, the memory arena is a shared memory
+            file at this path that the clients on the same host can map.
+        """
         self.dict: OrderedDict[CacheEngineKey, LMSMemoryObj] = OrderedDict()
 
         self.lock = threading.Lock()
 
-        # TODO(Jiayi): please add evictor
+        self.shm_path = shm_path
+        self.allocator: HostMemoryAllocator
+        if shm_path is not None:
+            self.allocator = SharedMemoryAllocator(shm_path,
+                                                   int(max_size * 1024**3))
+        else:
+            self.allocator = HostMemoryAllocator(int(max_size * 1024**3))
+        self.evictor = CreateEvictor(evictor, max_size)
+
+        self.num_evictions = 0
+        self.evicted_bytes = 0
+        self.num_rejected_puts = 0
+
+        # The evicted chunks that are being written to disk
+        self.disk_backend = disk_backend
+        self.spilling: Dict[CacheEngineKey, LMSMemoryObj] = {}
+        self.spill_queue: queue.Queue = queue.Queue()
+        self.spill_done = threading.Condition(self.lock)
+        if self.disk_backend is not None:
+            self.spill_thread = threading.Thread(target=self._spill_loop,
+                                                 daemon=True)
+            self.spill_thread.start()
 
-    # TODO
     def list_keys(self) -> List[CacheEngineKey]:
         with self.lock:
-            return list(self.dict.keys())
+            keys = list(self.dict.keys())
+            keys.extend(key for key in self.spilling if key not in self.dict)
+        if self.disk_backend is not None:
+            in_memory = set(keys)
+            keys.extend(key for key in self.disk_backend.list_keys()
+                        if key not in in_memory)
+        return keys
 
     def contains(
         self,
@@ -32,31 +93,168 @@ class LMSLocalBackend(LMSBackendInterface):
     ) -> bool:
 
         with self.lock:
-            return key in self.dict
+            if key in self.dict or key in self.spilling:
+                return True
+        if self.disk_backend is not None:
+            return self.disk_backend.contains(key)
+        return False
+
+    def _unref(self, lms_memory_obj: LMSMemoryObj) -> None:
+        assert lms_memory_obj.data is not None
+        self.allocator.ref_count_down(lms_memory_obj.data)
+
+    def _spill_loop(self):
+        assert self.disk_backend is not None
+        while True:
+            item = self.spill_queue.get()
+            if item is None:
+                break
+            key, lms_memory_obj = item
+            self.disk_backend.put(key, lms_memory_obj)
+            with self.lock:
+                if self.spilling.get(key) is lms_memory_obj:
+                    self.spilling.pop(key)
+                else:
+                    # Removed or overwritten while being written
+                    self.disk_backend.remove(key)
+                self._unref(lms_memory_obj)
+                self.spill_done.notify_all()
+
+    def _evict(
+        self,
+        key: CacheEngineKey,
+    ) -> None:
+        """
+        Drop a chunk chosen by the evictor. Should be called with the
+        lock held.
+        """
+        lms_memory_obj = self.dict.pop(key)
+        self.num_evictions += 1
+        self.evicted_bytes += lms_memory_obj.size
+        if self.disk_backend is not None:
+            # NOTE: the spill thread takes over the reference
+            self.spilling[key] = lms_memory_obj
+            self.spill_queue.put((key, lms_memory_obj))
+            return
+        # NOTE: the memory is not reused until all the ongoing `get`s
+        # release it
+        self._unref(lms_memory_obj)
 
-    # TODO
     def remove(
         self,
         key: CacheEngineKey,
     ) -> None:
 
         with self.lock:
-            self.dict.pop(key)
+            self.spilling.pop(key, None)
+            if key in self.dict:
+                self.evictor.update_on_remove(key, self.dict)
+                lms_memory_obj = self.dict.pop(key)
+                self._unref(lms_memory_obj)
+        if self.disk_backend is not None:
+            self.disk_backend.remove(key)
+
+    def allocate(
+        self,
+        client_meta: ClientMetaMessage,
+    ) -> Optional[MemoryObj]:
+
+        aligned_size = TensorMemoryAllocator._Compute_aligned_size(
+            client_meta.length)
+        with self.lock:
+            # The chunk will be overwritten, so don't count it twice
+            if client_meta.key in self.dict:
+                self.evictor.update_on_remove(client_meta.key, self.dict)
+                self._unref(self.dict.pop(client_meta.key))
+
+            evict_keys, put_status = self.evictor.update_on_put(
+                self.dict, aligned_size)
+
+            if put_status == PutStatus.ILLEGAL:
+                self.num_rejected_puts += 1
+                return None
+
+            for evict_key in evict_keys:
+                self._evict(evict_key)
+
+            memory_obj = self._try_allocate(client_meta)
+
+            # The arena can still be too fragmented (or pinned by
+            # ongoing `get`s), so keep evicting until the chunk fits
+            if memory_obj is None:
+                for evict_key in list(self.evictor.eviction_order(self.dict)):
+                    self.evictor.update_on_remove(evict_key, self.dict)
+                    self._evict(evict_key)
+                    memory_obj = self._try_allocate(client_meta)
+                    if memory_obj is not None:
+                        break
+
+            if memory_obj is None:
+                logger.warning("Failed to allocate memory for "
+                               f"{client_meta.length} bytes")
+                self._cancel_reservation(aligned_size)
+                self.num_rejected_puts += 1
+
+            return memory_obj
+
+    def _try_allocate(
+        self,
+        client_meta: ClientMetaMessage,
+    ) -> Optional[MemoryObj]:
+        """
+        Should be called with the lock held.
+        """
+        memory_obj = self.allocator.allocate(torch.Size([client_meta.length]),
+                                             torch.uint8, client_meta.fmt)
+        if memory_obj is None and len(self.spilling) > 0:
+            # The evicted chunks hold their memory until they are on disk
+            self.spill_done.wait_for(lambda: len(self.spilling) == 0,
+                                     timeout=SPILL_WAIT_TIMEOUT)
+            memory_obj = self.allocator.allocate(
+                torch.Size([client_meta.length]), torch.uint8, client_meta.fmt)
+        return memory_obj
+
+    def _cancel_reservation(self, size: int) -> None:
+        """
+        Undo the `update_on_put` of a chunk that is never stored.
+        Should be called with the lock held.
+        """
+        self.evictor.current_cache_size = max(
+            0.0, self.evictor.current_cache_size - size)
 
     def put(
         self,
         client_meta: ClientMetaMessage,
-        kv_chunk_bytes: bytearray,
+        memory_obj: MemoryObj,
     ) -> None:
 
         with self.lock:
+            # Another put of the same key may have finished in the meantime
+            if client_meta.key in self.dict:
+                self.evictor.update_on_remove(client_meta.key, self.dict)
+                self._unref(self.dict.pop(client_meta.key))
+
             self.dict[client_meta.key] = LMSMemoryObj(
-                kv_chunk_bytes,
+                memory_obj,
                 client_meta.length,
                 client_meta.fmt,
                 client_meta.dtype,
                 client_meta.shape,
             )
+            self.spilling.pop(client_meta.key, None)
+
+        # Drop the stale copy on disk
+        if self.disk_backend is not None:
+            self.disk_backend.remove(client_meta.key)
+
+    def free(
+        self,
+        memory_obj: MemoryObj,
+    ) -> None:
+
+        with self.lock:
+            self._cancel_reservation(memory_obj.get_physical_size())
+            self.allocator.ref_count_down(memory_obj)
 
     @_lmcache_nvtx_annotate
     def get(
@@ -65,12 +263,53 @@ class LMSLocalBackend(LMSBackendInterface):
     ) -> Optional[LMSMemoryObj]:
 
         with self.lock:
-            return self.dict.get(key, None)
+            lms_memory_obj = self.dict.get(key, None)
+            if lms_memory_obj is not None:
+                self.evictor.update_on_hit(key, self.dict)
+            else:
+                lms_memory_obj = self.spilling.get(key, None)
+            if lms_memory_obj is not None:
+                assert lms_memory_obj.data is not None
+                self.allocator.ref_count_up(lms_memory_obj.data)
+                return lms_memory_obj
 
-    def close(self):
-        pass
+        if self.disk_backend is not None:
+            return self.disk_backend.get(key)
+        return None
+
+    def release(
+        self,
+        lms_memory_obj: LMSMemoryObj,
+    ) -> None:
+        if lms_memory_obj.file is not None:
+            assert self.disk_backend is not None
+            self.disk_backend.release(lms_memory_obj)
+            return
+        self._unref(lms_memory_obj)
 
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            stats = {
+                "num_keys": len(self.dict),
+                "used_bytes": int(self.evictor.current_cache_size),
+                "capacity_bytes": self.evictor.MAX_CACHE_SIZE,
+                "num_evictions": self.num_evictions,
+                "evicted_bytes": self.evicted_bytes,
+                "num_rejected_puts": self.num_rejected_puts,
+            }
+            if self.disk_backend is not None:
+                stats["num_spilling"] = len(self.spilling)
+        if self.disk_backend is not None:
+            stats.update(self.disk_backend.get_stats())
+        return stats
 
-# TODO(Jiayi): please implement the remote disk backend
-#class LMSLocalDiskBackend(LMSBackendInterface):
-#    pass
+    def get_shm_path(self) -> Optional[str]:
+        return self.shm_path
+
+    def close(self):
+        if isinstance(self.allocator, SharedMemoryAllocator):
+            self.allocator.close()
+        if self.disk_backend is not None:
+            self.spill_queue.put(None)
+            self.spill_thread.join()
+            self.disk_backend.close()
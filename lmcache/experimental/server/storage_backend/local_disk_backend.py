@@ -0,0 +1,282 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+from lmcache.experimental.protocol import ClientMetaMessage, Constants
+from lmcache.experimental.server.utils import LMSMemoryObj
+from lmcache.experimental.storage_backend.evictor import (CreateEvictor,
+                                                          PutStatus)
+from lmcache.logging import init_logger
+from lmcache.utils import CacheEngineKey
+
+logger = init_logger(__name__)
+
+DISK_MAGIC = b"LMSD"
+# The payload starts at a page boundary so that it can be sent with
+# `os.sendfile` straight from the page cache
+DISK_HEADER_SIZE = 4096
+DISK_FILE_SUFFIX = ".lms"
+
+
+class LMSLocalDiskBackend:
+    """
+    The disk tier of the cache server.
+
+    Each chunk is stored in its own file, which starts with a header that
+    describes the chunk (key, length, format, dtype and shape). The index
+    is rebuilt from the headers when the server restarts.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: float = 100.0,
+        evictor: str = "lru",
+    ):
+        """
+        :param str path: The directory to store the KV cache.
+        :param float max_size: The capacity of the disk tier in GB.
+        :param str evictor: The eviction policy, one of "lru", "lfu"
+            and "size".
+        """
+        self.path = path
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        self.dict: OrderedDict[CacheEngineKey, LMSMemoryObj] = OrderedDict()
+
+        self.lock = threading.Lock()
+
+        self.evictor = CreateEvictor(evictor, max_size)
+
+        self.num_evictions = 0
+        self.evicted_bytes = 0
+
+        self._load_index()
+
+    def _key_to_path(
+        self,
+        key: CacheEngineKey,
+    ) -> str:
+        return os.path.join(
+            self.path,
+            key.to_string().replace("/", "-") + DISK_FILE_SUFFIX)
+
+    def _read_header(
+            self, path: str) -> Optional[Tuple[CacheEngineKey, LMSMemoryObj]]:
+        """
+        Parse the header of a chunk file. Returns None if the file is
+        corrupted or incomplete.
+        """
+        try:
+            with open(path, "rb") as f:
+                header = f.read(DISK_HEADER_SIZE)
+            file_size = os.path.getsize(path)
+        except OSError:
+            return None
+
+        start = len(DISK_MAGIC) + ClientMetaMessage.prefixlength()
+        if len(header) < start or not header.startswith(DISK_MAGIC):
+            return None
+        try:
+            end = start + ClientMetaMessage.bodylength(
+                header[len(DISK_MAGIC):start])
+            if end > len(header):
+                return None
+            meta = ClientMetaMessage.deserialize(header[start:end])
+        except Exception:
+            return None
+
+        if file_size != DISK_HEADER_SIZE + meta.length:
+            return None
+
+        return meta.key, LMSMemoryObj(None,
+                                      meta.length,
+                                      meta.fmt,
+                                      meta.dtype,
+                                      meta.shape,
+                                      path=path,
+                                      offset=DISK_HEADER_SIZE)
+
+    def _load_index(self) -> None:
+        """
+        Rebuild the index from the chunk files in the directory
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if not name.endswith(DISK_FILE_SUFFIX):
+                # Leftovers of an interrupted write
+                if DISK_FILE_SUFFIX + ".tmp" in name:
+                    os.remove(path)
+                continue
+            key_and_entry = self._read_header(path)
+            if key_and_entry is None:
+                logger.warning(f"Removing corrupted cache file {path}")
+                os.remove(path)
+                continue
+            entries.append((os.path.getmtime(path), *key_and_entry))
+
+        # Oldest first, so that the LRU order survives the restart
+        entries.sort(key=lambda x: x[0])
+        for _, key, entry in entries:
+            assert entry.path is not None
+            evict_keys, put_status = self.evictor.update_on_put(
+                self.dict, entry.size)
+            if put_status == PutStatus.ILLEGAL:
+                os.remove(entry.path)
+                continue
+            for evict_key in evict_keys:
+                self._evict(evict_key)
+            self.dict[key] = entry
+
+        logger.info(f"Loaded {len(self.dict)} chunks from {self.path}")
+
+    def _delete(
+        self,
+        key: CacheEngineKey,
+    ) -> LMSMemoryObj:
+        """
+        Should be called with the lock held.
+        Files that are still being sent are unlinked but stay readable.
+        """
+        entry = self.dict.pop(key)
+        assert entry.path is not None
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        return entry
+
+    def _evict(
+        self,
+        key: CacheEngineKey,
+    ) -> None:
+        entry = self._delete(key)
+        self.num_evictions += 1
+        self.evicted_bytes += entry.size
+
+    def list_keys(self) -> List[CacheEngineKey]:
+        with self.lock:
+            return list(self.dict.keys())
+
+    def contains(
+        self,
+        key: CacheEngineKey,
+    ) -> bool:
+        with self.lock:
+            return key in self.dict
+
+    def remove(
+        self,
+        key: CacheEngineKey,
+    ) -> None:
+        with self.lock:
+            if key not in self.dict:
+                return
+            self.evictor.update_on_remove(key, self.dict)
+            self._delete(key)
+
+    def put(
+        self,
+        key: CacheEngineKey,
+        lms_memory_obj: LMSMemoryObj,
+    ) -> None:
+        """
+        Write an in-memory chunk to disk, evicting other chunks on disk
+        if necessary.
+        """
+        path = self._key_to_path(key)
+        size = DISK_HEADER_SIZE + lms_memory_obj.length
+        header = DISK_MAGIC + ClientMetaMessage(
+            Constants.CLIENT_PUT,
+            key,
+            lms_memory_obj.length,
+            lms_memory_obj.fmt,
+            lms_memory_obj.dtype,
+            lms_memory_obj.shape,
+        ).serialize()
+        if len(header) > DISK_HEADER_SIZE:
+            logger.warning(f"The key {key} is too long to be stored on disk")
+            return
+
+        with self.lock:
+            if key in self.dict:
+                self.evictor.update_on_remove(key, self.dict)
+                self.dict.pop(key)
+            evict_keys, put_status = self.evictor.update_on_put(
+                self.dict, size)
+            if put_status == PutStatus.ILLEGAL:
+                return
+            for evict_key in evict_keys:
+                self._evict(evict_key)
+
+        # Write to a temporary file first so that a crash never leaves a
+        # partially written chunk behind
+        tmp_path = f"{path}.tmp{threading.get_ident()}"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(header.ljust(DISK_HEADER_SIZE, b"\0"))
+                f.write(lms_memory_obj.buffer)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write {path}: {e}")
+            with self.lock:
+                self.evictor.current_cache_size = max(
+                    0.0, self.evictor.current_cache_size - size)
+            return
+
+        with self.lock:
+            self.dict[key] = LMSMemoryObj(None,
+                                          lms_memory_obj.length,
+                                          lms_memory_obj.fmt,
+                                          lms_memory_obj.dtype,
+                                          lms_memory_obj.shape,
+                                          path=path,
+                                          offset=DISK_HEADER_SIZE)
+
+    def get(
+        self,
+        key: CacheEngineKey,
+    ) -> Optional[LMSMemoryObj]:
+        """
+        Returns an LMSMemoryObj with an opened `file`, which should be
+        closed by `release`
+        """
+        with self.lock:
+            entry = self.dict.get(key, None)
+            if entry is None:
+                return None
+            assert entry.path is not None
+            try:
+                # NOTE: the file stays readable even if it gets evicted
+                # while being sent
+                f = open(entry.path, "rb")
+            except FileNotFoundError:
+                self.evictor.update_on_remove(key, self.dict)
+                self.dict.pop(key)
+                return None
+            self.evictor.update_on_hit(key, self.dict)
+            return replace(entry, file=f)
+
+    def release(
+        self,
+        lms_memory_obj: LMSMemoryObj,
+    ) -> None:
+        if lms_memory_obj.file is not None:
+            lms_memory_obj.file.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "disk_num_keys": len(self.dict),
+                "disk_used_bytes": int(self.evictor.current_cache_size),
+                "disk_capacity_bytes": self.evictor.MAX_CACHE_SIZE,
+                "disk_num_evictions": self.num_evictions,
+                "disk_evicted_bytes": self.evicted_bytes,
+            }
+
+    def close(self):
+        pass
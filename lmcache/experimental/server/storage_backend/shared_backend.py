@@ -0,0 +1,480 @@
+import hashlib
+import mmap
+import multiprocessing
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+from lmcache.experimental.memory_management import (MemoryFormat, MemoryObj,
+                                                    MemoryObjMetadata,
+                                                    TensorMemoryObj)
+from lmcache.experimental.protocol import (DTYPE_TO_INT, INT_TO_DTYPE,
+                                           ClientMetaMessage)
+from lmcache.experimental.server.storage_backend.abstract_backend import \
+    LMSBackendInterface
+from lmcache.experimental.server.utils import LMSMemoryObj
+from lmcache.logging import init_logger
+from lmcache.utils import CacheEngineKey, _lmcache_nvtx_annotate
+
+logger = init_logger(__name__)
+
+# The records in the rings are aligned to the record header size, so that
+# the gap at the end of a ring always has room for a padding record
+ALIGNMENT = 128
+
+# head, tail and used bytes of the ring, followed by the counters:
+# num_keys, num_evictions, evicted_bytes and num_rejected_puts
+STRIPE_HEADER = struct.Struct("<QQQQQQQ")
+STRIPE_HEADER_SIZE = 64
+
+# state, key hash and record offset of an index slot
+INDEX_SLOT = struct.Struct("<QQQ")
+
+# record size, state, pins, key hash, key length, payload length, format,
+# dtype and shape of a record in the ring. The payload follows the
+# header and the key follows the payload.
+RECORD_HEADER = struct.Struct("<QIIQQQii4q")
+RECORD_HEADER_SIZE = 128
+
+SLOT_EMPTY = 0
+SLOT_USED = 1
+
+# A record is PENDING between `allocate` and `put`, VALID while it is in
+# the index and DEAD once it is removed or overwritten. PADDING fills the
+# end of the ring when a record does not fit there.
+RECORD_PENDING = 1
+RECORD_VALID = 2
+RECORD_DEAD = 3
+RECORD_PADDING = 4
+
+
+def _align(n: int) -> int:
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _key_hash(key_bytes: bytes) -> int:
+    # NOTE: the built-in hash() is randomized per process
+    return int.from_bytes(
+        hashlib.blake2b(key_bytes, digest_size=8).digest(), "little")
+
+
+class LMSSharedBackend(LMSBackendInterface):
+    """
+    A storage backend that lives entirely in shared memory, so that it can
+    be used by several forked server processes at the same time.
+
+    The arena is split into stripes by the hash of the key. Each stripe
+    has its own lock, an open-addressing hash table and a ring buffer for
+    the records, so the workers only contend when they touch the same
+    stripe. A stripe evicts its oldest records (FIFO) when its ring is
+    full. The records pinned by ongoing gets are never overwritten; the
+    put is rejected instead.
+
+    NOTE: the backend must be created before the worker processes are
+    forked.
+    """
+
+    def __init__(
+        self,
+        max_size: float = 10.0,
+        num_stripes: int = 16,
+        shm_path: Optional[str] = None,
+    ):
+        """
+        :param float max_size: The capacity of the arena in GB, which is
+            split evenly among the stripes.
+        :param int num_stripes: The number of independently locked stripes.
+        :param shm_path: If given, the arena is a shared memory file at
+            this path that the clients on the same host can map.
+        """
+        self.num_stripes = num_stripes
+        self.ring_size = int(max_size * 1024**3) // num_stripes \
+            // ALIGNMENT * ALIGNMENT
+        # Leave room for small chunks, the average chunk is much larger
+        self.num_slots = max(1024, self.ring_size // (32 * 1024))
+
+        self.header_base = 0
+        self.index_base = _align(num_stripes * STRIPE_HEADER_SIZE)
+        self.data_base = _align(self.index_base +
+                                num_stripes * self.num_slots * INDEX_SLOT.size)
+        size = self.data_base + num_stripes * self.ring_size
+
+        self.shm_path = shm_path
+        if shm_path is not None:
+            fd = os.open(shm_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                os.ftruncate(fd, size)
+                self.mmap = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+        else:
+            # Anonymous shared memory is inherited by the forked workers
+            self.mmap = mmap.mmap(-1, size)
+        self.buf = memoryview(self.mmap)
+        self.buffer = torch.frombuffer(self.mmap, dtype=torch.uint8)
+
+        # NOTE: multiprocessing locks work across threads and processes
+        self.locks = [multiprocessing.Lock() for _ in range(num_stripes)]
+
+        logger.info(f"Created a shared arena of {size / 1024**3:.2f} GB with "
+                    f"{num_stripes} stripes")
+
+    # Layout helpers
+    def _stripe_of(self, key_hash: int) -> int:
+        return key_hash % self.num_stripes
+
+    def _read_header(self, stripe: int) -> List[int]:
+        return list(
+            STRIPE_HEADER.unpack_from(
+                self.buf, self.header_base + stripe * STRIPE_HEADER_SIZE))
+
+    def _write_header(self, stripe: int, header: List[int]) -> None:
+        STRIPE_HEADER.pack_into(self.buf,
+                                self.header_base + stripe * STRIPE_HEADER_SIZE,
+                                *header)
+
+    def _slot_offset(self, stripe: int, slot: int) -> int:
+        return self.index_base + (stripe * self.num_slots +
+                                  slot) * INDEX_SLOT.size
+
+    def _read_slot(self, stripe: int, slot: int) -> Tuple[int, int, int]:
+        return INDEX_SLOT.unpack_from(self.buf,
+                                      self._slot_offset(stripe, slot))
+
+    def _write_slot(self, stripe: int, slot: int, state: int, key_hash: int,
+                    record: int) -> None:
+        INDEX_SLOT.pack_into(self.buf, self._slot_offset(stripe, slot), state,
+                             key_hash, record)
+
+    def _ring_base(self, stripe: int) -> int:
+        return self.data_base + stripe * self.ring_size
+
+    def _read_record(self, record: int) -> List[int]:
+        return list(RECORD_HEADER.unpack_from(self.buf, record))
+
+    def _write_record(self, record: int, fields: List[int]) -> None:
+        RECORD_HEADER.pack_into(self.buf, record, *fields)
+
+    def _set_record_state(self, record: int, state: int) -> None:
+        fields = self._read_record(record)
+        fields[1] = state
+        self._write_record(record, fields)
+
+    def _add_pins(self, record: int, delta: int) -> None:
+        fields = self._read_record(record)
+        fields[2] += delta
+        self._write_record(record, fields)
+
+    def _record_key(self, record: int, fields: List[int]) -> bytes:
+        start = record + RECORD_HEADER_SIZE + fields[5]
+        return bytes(self.buf[start:start + fields[4]])
+
+    # Hash table, should be called with the stripe lock held
+    def _home_slot(self, key_hash: int) -> int:
+        return (key_hash // self.num_stripes) % self.num_slots
+
+    def _find_slot(self, stripe: int, key_hash: int,
+                   key_bytes: bytes) -> Tuple[int, Optional[int]]:
+        """
+        Returns the slot of the key (or the empty slot where it would be
+        inserted) and the record offset, which is None if not found
+        """
+        slot = self._home_slot(key_hash)
+        for _ in range(self.num_slots):
+            state, slot_hash, record = self._read_slot(stripe, slot)
+            if state == SLOT_EMPTY:
+                return slot, None
+            if slot_hash == key_hash and self._record_key(
+                    record, self._read_record(record)) == key_bytes:
+                return slot, record
+            slot = (slot + 1) % self.num_slots
+        return -1, None
+
+    def _find_slot_by_record(self, stripe: int, key_hash: int,
+                             record: int) -> Optional[int]:
+        slot = self._home_slot(key_hash)
+        for _ in range(self.num_slots):
+            state, slot_hash, slot_record = self._read_slot(stripe, slot)
+            if state == SLOT_EMPTY:
+                return None
+            if slot_record == record:
+                return slot
+            slot = (slot + 1) % self.num_slots
+        return None
+
+    def _delete_slot(self, stripe: int, slot: int) -> None:
+        """
+        Backward-shift deletion, which keeps the probe sequences intact
+        without tombstones
+        """
+        hole = slot
+        nxt = slot
+        while True:
+            nxt = (nxt + 1) % self.num_slots
+            state, key_hash, record = self._read_slot(stripe, nxt)
+            if state == SLOT_EMPTY:
+                break
+            home = self._home_slot(key_hash)
+            # Keep the entry if its home is cyclically in (hole, nxt]
+            if hole <= nxt:
+                stays = hole < home <= nxt
+            else:
+                stays = home > hole or home <= nxt
+            if stays:
+                continue
+            self._write_slot(stripe, hole, SLOT_USED, key_hash, record)
+            hole = nxt
+        self._write_slot(stripe, hole, SLOT_EMPTY, 0, 0)
+
+    # Ring buffer, should be called with the stripe lock held
+    def _evict_tail(self, stripe: int, header: List[int]) -> bool:
+        """
+        Drop the oldest record of the stripe. Returns False if it is still
+        in use.
+        """
+        head, tail, used = header[0], header[1], header[2]
+        record = self._ring_base(stripe) + tail
+        fields = self._read_record(record)
+        record_size, state, pins, key_hash = fields[:4]
+        if state == RECORD_PENDING or pins > 0:
+            return False
+        if state == RECORD_VALID:
+            slot = self._find_slot_by_record(stripe, key_hash, record)
+            if slot is not None:
+                self._delete_slot(stripe, slot)
+            header[3] -= 1
+            header[4] += 1
+            header[5] += fields[5]
+        tail += record_size
+        used -= record_size
+        if tail == self.ring_size:
+            tail = 0
+        if used == 0:
+            head = tail = 0
+        header[0], header[1], header[2] = head, tail, used
+        return True
+
+    def _reserve(self, stripe: int, header: List[int],
+                 record_size: int) -> Optional[int]:
+        """
+        Make room for a record at the head of the ring by evicting the
+        oldest records. Returns the offset of the record in the ring.
+        """
+        if record_size > self.ring_size:
+            return None
+        while True:
+            head, tail, used = header[0], header[1], header[2]
+            if used == 0:
+                header[0] = header[1] = 0
+                return 0
+            if head < tail:
+                available = tail - head
+            elif head == tail:
+                available = 0
+            else:
+                available = self.ring_size - head
+            if available >= record_size:
+                return head
+
+            if head > tail:
+                # Not enough room before the end, skip to the beginning
+                padding = self.ring_size - head
+                self._write_record(
+                    self._ring_base(stripe) + head,
+                    [padding, RECORD_PADDING, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+                header[0] = 0
+                header[2] = used + padding
+                continue
+
+            if not self._evict_tail(stripe, header):
+                return None
+
+    # Interface
+    def allocate(
+        self,
+        client_meta: ClientMetaMessage,
+    ) -> Optional[MemoryObj]:
+
+        key_bytes = client_meta.key.to_string().encode()
+        key_hash = _key_hash(key_bytes)
+        stripe = self._stripe_of(key_hash)
+        record_size = _align(RECORD_HEADER_SIZE + client_meta.length +
+                             len(key_bytes))
+
+        with self.locks[stripe]:
+            header = self._read_header(stripe)
+            ring_offset = self._reserve(stripe, header, record_size)
+            if ring_offset is None:
+                header[6] += 1
+                self._write_header(stripe, header)
+                logger.debug(f"Failed to allocate {client_meta.length} "
+                             f"bytes in stripe {stripe}")
+                return None
+
+            record = self._ring_base(stripe) + ring_offset
+            self._write_record(record, [
+                record_size, RECORD_PENDING, 0, key_hash,
+                len(key_bytes), client_meta.length,
+                int(client_meta.fmt.value), DTYPE_TO_INT[client_meta.dtype],
+                *client_meta.shape
+            ])
+            key_start = record + RECORD_HEADER_SIZE + client_meta.length
+            self.buf[key_start:key_start + len(key_bytes)] = key_bytes
+            header[0] = ring_offset + record_size
+            header[2] += record_size
+            if header[0] == self.ring_size:
+                header[0] = 0
+            self._write_header(stripe, header)
+
+        return self._make_memory_obj(record, client_meta.length,
+                                     client_meta.fmt)
+
+    def _make_memory_obj(self, record: int, length: int,
+                         fmt: MemoryFormat) -> TensorMemoryObj:
+        address = record + RECORD_HEADER_SIZE
+        return TensorMemoryObj(raw_data=self.buffer[address:address + length],
+                               metadata=MemoryObjMetadata(
+                                   torch.Size([length]), torch.uint8, address,
+                                   length, 1, fmt))
+
+    def put(
+        self,
+        client_meta: ClientMetaMessage,
+        memory_obj: MemoryObj,
+    ) -> None:
+
+        record = memory_obj.metadata.address - RECORD_HEADER_SIZE
+        key_bytes = client_meta.key.to_string().encode()
+        key_hash = _key_hash(key_bytes)
+        stripe = self._stripe_of(key_hash)
+        with self.locks[stripe]:
+            header = self._read_header(stripe)
+            slot, old_record = self._find_slot(stripe, key_hash, key_bytes)
+            if slot < 0:
+                # The index is full
+                self._set_record_state(record, RECORD_DEAD)
+                header[6] += 1
+                self._write_header(stripe, header)
+                return
+            if old_record is not None:
+                self._set_record_state(old_record, RECORD_DEAD)
+            else:
+                header[3] += 1
+            self._write_slot(stripe, slot, SLOT_USED, key_hash, record)
+            self._set_record_state(record, RECORD_VALID)
+            self._write_header(stripe, header)
+
+    def free(
+        self,
+        memory_obj: MemoryObj,
+    ) -> None:
+
+        record = memory_obj.metadata.address - RECORD_HEADER_SIZE
+        stripe = (record - self.data_base) // self.ring_size
+        with self.locks[stripe]:
+            self._set_record_state(record, RECORD_DEAD)
+
+    def contains(
+        self,
+        key: CacheEngineKey,
+    ) -> bool:
+
+        key_bytes = key.to_string().encode()
+        key_hash = _key_hash(key_bytes)
+        stripe = self._stripe_of(key_hash)
+        with self.locks[stripe]:
+            _, record = self._find_slot(stripe, key_hash, key_bytes)
+            return record is not None
+
+    def remove(
+        self,
+        key: CacheEngineKey,
+    ) -> None:
+
+        key_bytes = key.to_string().encode()
+        key_hash = _key_hash(key_bytes)
+        stripe = self._stripe_of(key_hash)
+        with self.locks[stripe]:
+            slot, record = self._find_slot(stripe, key_hash, key_bytes)
+            if record is None:
+                return
+            self._set_record_state(record, RECORD_DEAD)
+            self._delete_slot(stripe, slot)
+            header = self._read_header(stripe)
+            header[3] -= 1
+            self._write_header(stripe, header)
+
+    @_lmcache_nvtx_annotate
+    def get(
+        self,
+        key: CacheEngineKey,
+    ) -> Optional[LMSMemoryObj]:
+
+        key_bytes = key.to_string().encode()
+        key_hash = _key_hash(key_bytes)
+        stripe = self._stripe_of(key_hash)
+        with self.locks[stripe]:
+            _, record = self._find_slot(stripe, key_hash, key_bytes)
+            if record is None:
+                return None
+            fields = self._read_record(record)
+            # Pinned until `release`, so that it is not overwritten
+            fields[2] += 1
+            self._write_record(record, fields)
+
+        length, fmt, dtype = fields[5], MemoryFormat(fields[6]), \
+            INT_TO_DTYPE[fields[7]]
+        return LMSMemoryObj(self._make_memory_obj(record, length, fmt), length,
+                            fmt, dtype, torch.Size(fields[8:12]))
+
+    def release(
+        self,
+        lms_memory_obj: LMSMemoryObj,
+    ) -> None:
+
+        assert lms_memory_obj.data is not None
+        record = lms_memory_obj.data.metadata.address - RECORD_HEADER_SIZE
+        stripe = (record - self.data_base) // self.ring_size
+        with self.locks[stripe]:
+            self._add_pins(record, -1)
+
+    def list_keys(self) -> List[CacheEngineKey]:
+        keys = []
+        for stripe in range(self.num_stripes):
+            with self.locks[stripe]:
+                for slot in range(self.num_slots):
+                    state, _, record = self._read_slot(stripe, slot)
+                    if state == SLOT_USED:
+                        key_bytes = self._record_key(record,
+                                                     self._read_record(record))
+                        keys.append(
+                            CacheEngineKey.from_string(key_bytes.decode()))
+        return keys
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = {
+            "num_keys": 0,
+            "used_bytes": 0,
+            "capacity_bytes": self.num_stripes * self.ring_size,
+            "num_evictions": 0,
+            "evicted_bytes": 0,
+            "num_rejected_puts": 0,
+        }
+        for stripe in range(self.num_stripes):
+            with self.locks[stripe]:
+                header = self._read_header(stripe)
+            stats["used_bytes"] += header[2]
+            stats["num_keys"] += header[3]
+            stats["num_evictions"] += header[4]
+            stats["evicted_bytes"] += header[5]
+            stats["num_rejected_puts"] += header[6]
+        return stats
+
+    def get_shm_path(self) -> Optional[str]:
+        return self.shm_path
+
+    def close(self):
+        if self.shm_path is not None and os.path.exists(self.shm_path):
+            os.unlink(self.shm_path)
@@ -1,17 +1,119 @@
+import bisect
+import threading
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, BinaryIO, Dict, List, Optional
 
 import torch
 
-from lmcache.experimental.memory_management import MemoryFormat
+from lmcache.experimental.memory_management import MemoryFormat, MemoryObj
 
 
 # TODO(Jiayi): Maybe move the memory management in remote
 # cache server to `memory_management.py` as well.
 @dataclass
 class LMSMemoryObj:
-    data: bytearray
+    # The raw bytes of the KV cache, allocated in the server's memory arena.
+    # None if the KV cache is on disk.
+    data: Optional[MemoryObj]
     length: int
     fmt: MemoryFormat
     dtype: Optional[torch.dtype]
     shape: torch.Size
+
+    # The file that stores the KV cache at `offset`, if it is on disk
+    path: Optional[str] = None
+    offset: int = 0
+
+    # The opened file when it is returned by the disk backend's `get`
+    file: Optional[BinaryIO] = None
+
+    @property
+    def size(self) -> int:
+        """
+        The number of bytes it occupies in the memory arena or on disk
+        """
+        if self.data is None:
+            return self.offset + self.length
+        return self.data.get_physical_size()
+
+    @property
+    def buffer(self) -> memoryview:
+        """
+        A writable zero-copy view of the first `length` bytes
+        """
+        assert self.data is not None
+        return GetMemoryView(self.data)[:self.length]
+
+
+def GetMemoryView(memory_obj: MemoryObj) -> memoryview:
+    """
+    Get a writable zero-copy view of the raw bytes of an arena object,
+    which can be passed to `socket.recv_into` and `socket.sendall`
+    """
+    tensor = memory_obj.tensor
+    assert tensor is not None
+    return tensor.numpy().data.cast("B")
+
+
+# The upper bounds (in milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = [
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500
+]
+
+
+class LMSStatsMonitor:
+    """
+    Counts the requests, hits and misses of each command of the cache
+    server, with a latency histogram per command
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.latency_sums: Dict[str, float] = {}
+        self.histograms: Dict[str, List[int]] = {}
+
+    def on_request(self,
+                   command: str,
+                   latency: float,
+                   hit: Optional[bool] = None) -> None:
+        """
+        :param str command: The name of the command.
+        :param float latency: The time to serve the request in seconds.
+        :param hit: Whether a lookup found the key, None if the command
+            is not a lookup.
+        """
+        latency_ms = latency * 1000
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+        with self.lock:
+            self.counts[command] = self.counts.get(command, 0) + 1
+            self.latency_sums[command] = \
+                self.latency_sums.get(command, 0.0) + latency_ms
+            histogram = self.histograms.setdefault(
+                command, [0] * (len(LATENCY_BUCKETS_MS) + 1))
+            histogram[bucket] += 1
+            if hit is True:
+                self.hits[command] = self.hits.get(command, 0) + 1
+            elif hit is False:
+                self.misses[command] = self.misses.get(command, 0) + 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            commands = {}
+            for command, count in self.counts.items():
+                histogram = self.histograms[command]
+                buckets = {
+                    f"{bound}ms": histogram[i]
+                    for i, bound in enumerate(LATENCY_BUCKETS_MS)
+                }
+                buckets["inf"] = histogram[-1]
+                commands[command] = {
+                    "count": count,
+                    "hits": self.hits.get(command, 0),
+                    "misses": self.misses.get(command, 0),
+                    "avg_latency_ms": self.latency_sums[command] / count,
+                    "latency_histogram": buckets,
+                }
+            return {"commands": commands}
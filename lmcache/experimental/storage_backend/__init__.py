@@ -33,7 +33,7 @@ def CreateStorageBackends(
     # TODO(Jiayi): The hierarchy is fixed for now
     if config.local_disk and config.max_local_disk_size > 0:
         local_disk_backend = LocalDiskBackend(config, loop, memory_allocator,
-                                              dst_device)
+                                              dst_device, metadata)
         backend_name = str(local_disk_backend)
         storage_backends[backend_name] = local_disk_backend
 
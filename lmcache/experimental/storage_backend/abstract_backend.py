@@ -5,11 +5,16 @@ from typing import Optional
 import torch
 
 from lmcache.experimental.memory_management import MemoryObj
+from lmcache.experimental.storage_backend.naive_serde import EncodedPayload
 from lmcache.utils import CacheEngineKey
 
 
 class StorageBackendInterface(metaclass=abc.ABCMeta):
 
+    # The serde of the data stored in the backend. The storage manager
+    # shares the encoded chunks between the backends with the same serde
+    serde_type: str = "naive"
+
     def __init__(
         self,
         dst_device: str = "cuda",
@@ -44,13 +49,18 @@ class StorageBackendInterface(metaclass=abc.ABCMeta):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def submit_put_task(self, key: CacheEngineKey,
-                        obj: MemoryObj) -> Optional[Future]:
+    def submit_put_task(
+            self,
+            key: CacheEngineKey,
+            obj: MemoryObj,
+            payload: Optional[EncodedPayload] = None) -> Optional[Future]:
         """
         An async function to put the MemoryObj into the storage backend.
 
         :param CacheEngineKey key: The key of the MemoryObj.
         :param MemoryObj obj: The MemoryObj to be stored.
+        :param Optional[EncodedPayload] payload: The chunk encoded with
+            the serde of the backend, shared with the other backends.
         
         :return: a future object
         """
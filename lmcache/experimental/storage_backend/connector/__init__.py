@@ -10,6 +10,10 @@ from lmcache.experimental.storage_backend.connector.lm_connector import \
     LMCServerConnector
 from lmcache.experimental.storage_backend.connector.redis_connector import (
     RedisConnector, RedisSentinelConnector)
+from lmcache.experimental.storage_backend.connector.sharded_connector import \
+    ShardedConnector
+from lmcache.experimental.storage_backend.connector.shm_connector import \
+    ShmLMCServerConnector
 from lmcache.logging import init_logger
 
 logger = init_logger(__name__)
@@ -98,10 +102,22 @@ def CreateConnector(
                 host, port = parsed_url.hosts[0], parsed_url.ports[0]
                 connector = LMCServerConnector(host, port, loop,
                                                memory_allocator)
+            else:
+                connector = ShardedConnector(
+                    list(zip(parsed_url.hosts, parsed_url.ports)),
+                    loop,
+                    memory_allocator,
+                )
+
+        case "lm+shm":
+            if num_hosts == 1:
+                host, port = parsed_url.hosts[0], parsed_url.ports[0]
+                connector = ShmLMCServerConnector(host, port, loop,
+                                                  memory_allocator)
             else:
                 raise ValueError(
-                    f"LM connector only supports a single host, but got url:"
-                    f" {url}")
+                    f"lm+shm connector only supports a single host, but got "
+                    f"url: {url}")
 
         case _:
             raise ValueError(
@@ -53,6 +53,52 @@ class RemoteConnector(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    async def batched_exists(self, keys: List[CacheEngineKey]) -> List[bool]:
+        """
+        Check if the remote server contains each of the keys.
+        Children classes should override this method if they can do it
+        in parallel.
+
+        Input:
+            keys: a list of keys
+
+        Returns:
+            A list of booleans in the same order as the keys
+        """
+        return [await self.exists(key) for key in keys]
+
+    async def batched_get(
+            self, keys: List[CacheEngineKey]) -> List[Optional[MemoryObj]]:
+        """
+        Get the memory_objs of the corresponding keys.
+        Children classes should override this method if they can do it
+        in parallel.
+
+        Input:
+            keys: a list of keys
+
+        Returns:
+            A list of memory_objs in the same order as the keys, with None
+            for the keys that do not exist
+        """
+        return [await self.get(key) for key in keys]
+
+    async def batched_put(self, keys: List[CacheEngineKey],
+                          memory_objs: List[MemoryObj]):
+        """
+        Send the memory_objs with the corresponding keys to the remote
+        server. Will decrease the ref count of each memory_obj after its
+        send finishes.
+        Children classes should override this method if they can do it
+        in parallel.
+
+        Input:
+            keys: a list of keys
+            memory_objs: the memory_objs of the corresponding keys
+        """
+        for key, memory_obj in zip(keys, memory_objs):
+            await self.put(key, memory_obj)
+
     @abc.abstractmethod
     async def list(self) -> List[str]:
         """
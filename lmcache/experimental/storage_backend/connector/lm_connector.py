@@ -7,10 +7,12 @@ import torch
 from lmcache.experimental.memory_management import (MemoryAllocatorInterface,
                                                     MemoryFormat, MemoryObj)
 from lmcache.experimental.protocol import (ClientMetaMessage, Constants,
-                                           ServerMetaMessage)
+                                           KeyCodec, ServerMetaMessage)
 from lmcache.experimental.storage_backend.connector.base_connector import \
     RemoteConnector
 from lmcache.logging import init_logger
+from lmcache.socket_utils import (MSG_MORE, configure_socket,
+                                  recv_exactly_into, send_vectored)
 from lmcache.utils import CacheEngineKey, _lmcache_nvtx_annotate
 
 logger = init_logger(__name__)
@@ -20,8 +22,12 @@ logger = init_logger(__name__)
 # for communication + deserialization
 class LMCServerConnector(RemoteConnector):
 
-    def __init__(self, host: str, port: int, loop: asyncio.AbstractEventLoop,
-                 memory_allocator: MemoryAllocatorInterface):
+    def __init__(self,
+                 host: str,
+                 port: int,
+                 loop: asyncio.AbstractEventLoop,
+                 memory_allocator: MemoryAllocatorInterface,
+                 timeout: Optional[float] = None):
         # NOTE(Jiayi): According to Python documentation:
         # https://docs.python.org/3/library/asyncio-eventloop.html
         # In general, protocol implementations that use transport-based APIs
@@ -31,9 +37,16 @@ class LMCServerConnector(RemoteConnector):
         # to reduce memory copy.
 
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if timeout is not None:
+            self.client_socket.settimeout(timeout)
+        configure_socket(self.client_socket)
         self.client_socket.connect((host, port))
         #loop.sock_recv_into(sock, buf)
 
+        # The keys are compressed against the previous keys sent on this
+        # connection
+        self.key_codec = KeyCodec()
+
         self.memory_allocator = memory_allocator
         self.loop = loop
         self.async_socket_lock = asyncio.Lock()
@@ -57,29 +70,108 @@ class LMCServerConnector(RemoteConnector):
         buffer = memory_obj.byte_array
         view = memoryview(buffer)
 
-        while received < n:
+        try:
+            while received < n:
+
+                num_bytes = self.client_socket.recv_into(
+                    view[received:], n - received)
+                if num_bytes == 0:
+                    self.memory_allocator.ref_count_down(memory_obj)
+                    return None
+                received += num_bytes
+        except Exception:
+            self.memory_allocator.ref_count_down(memory_obj)
+            raise
 
-            num_bytes = self.client_socket.recv_into(view[received:],
-                                                     n - received)
+        return memory_obj
+
+    def receive_into(self, view: memoryview):
+        """
+        Receive exactly `len(view)` bytes into the given buffer
+        """
+        if not recv_exactly_into(self.client_socket, view):
+            raise ConnectionError("Connection closed by the lm server")
+
+    def discard(self, n: int):
+        """
+        Receive and drop `n` bytes, e.g. the payload that cannot be stored
+        """
+        scratch = memoryview(bytearray(min(n, 1 << 20)))
+        while n > 0:
+            num_bytes = self.client_socket.recv_into(scratch,
+                                                     min(n, len(scratch)))
             if num_bytes == 0:
-                return None
-            received += num_bytes
+                raise ConnectionError("Connection closed by the lm server")
+            n -= num_bytes
+
+    def receive_meta(self) -> ServerMetaMessage:
+        data = bytearray(ServerMetaMessage.packlength())
+        self.receive_into(memoryview(data))
+        return ServerMetaMessage.deserialize(data)
+
+    def encode_request(self, command: int, key: CacheEngineKey) -> bytes:
+        """
+        Encode a request without payload. The encoded requests should be
+        sent in the same order as they are encoded.
+        """
+        return ClientMetaMessage(command, key, 0,
+                                 MemoryFormat(1), torch.float16,
+                                 torch.Size([0, 0, 0,
+                                             0])).serialize(self.key_codec)
+
+    # NOTE: The following blocking functions do not take the lock, the
+    # caller should have exclusive access to this connection
+    def exists_blocking(self, key: CacheEngineKey) -> bool:
+        self.client_socket.sendall(
+            self.encode_request(Constants.CLIENT_EXIST, key))
+        return self.receive_meta().code == Constants.SERVER_SUCCESS
+
+    def get_meta_blocking(self,
+                          key: CacheEngineKey) -> Optional[ServerMetaMessage]:
+        """
+        Send a get request and receive the metadata of the response.
+        If it is not None, the caller should then receive exactly
+        `meta.length` bytes of payload.
+        """
+        self.client_socket.sendall(
+            self.encode_request(Constants.CLIENT_GET, key))
+        meta = self.receive_meta()
+        if meta.code not in (Constants.SERVER_SUCCESS,
+                             Constants.SERVER_SUCCESS_REPLICATED):
+            return None
+        return meta
 
+    def get_blocking(self, key: CacheEngineKey) -> Optional[MemoryObj]:
+        meta = self.get_meta_blocking(key)
+        if meta is None:
+            return None
+        memory_obj = self.receive_all(meta)
+        if memory_obj is None:
+            raise ConnectionError("Failed to receive from the lm server")
         return memory_obj
 
+    def put_blocking(self, key: CacheEngineKey, memory_obj: MemoryObj):
+        """
+        Unlike `put`, the ref count of memory_obj is not changed
+        """
+        self.put_buffer_blocking(key, memoryview(memory_obj.byte_array),
+                                 memory_obj.get_memory_format(),
+                                 memory_obj.get_dtype(),
+                                 memory_obj.get_shape())
+
+    def put_buffer_blocking(self, key: CacheEngineKey, buffer: memoryview,
+                            fmt: MemoryFormat, dtype: Optional[torch.dtype],
+                            shape: torch.Size):
+        send_vectored(self.client_socket, [
+            ClientMetaMessage(Constants.CLIENT_PUT, key, len(buffer), fmt,
+                              dtype, shape).serialize(self.key_codec), buffer
+        ])
+
     async def exists(self, key: CacheEngineKey) -> bool:
         #logger.debug("Call to exists()!")
 
         async with self.async_socket_lock:
-            self.client_socket.sendall(
-                ClientMetaMessage(Constants.CLIENT_EXIST, key, 0,
-                                  MemoryFormat(1), torch.float16,
-                                  torch.Size([0, 0, 0, 0])).serialize())
-
-            response = self.client_socket.recv(ServerMetaMessage.packlength())
-
-        return (ServerMetaMessage.deserialize(response).code ==
-                Constants.SERVER_SUCCESS)
+            return self.exists_blocking(key)
 
     async def put(
         self,
@@ -95,11 +187,13 @@ class LMCServerConnector(RemoteConnector):
         memory_format = memory_obj.get_memory_format()
 
         async with self.async_socket_lock:
-            await self.loop.sock_sendall(
-                self.client_socket,
+            # The header is small enough to be sent right away. MSG_MORE
+            # keeps it in the same segment as the beginning of the payload.
+            self.client_socket.sendall(
                 ClientMetaMessage(Constants.CLIENT_PUT, key, len(kv_bytes),
                                   memory_format, kv_dtype,
-                                  kv_shape).serialize())
+                                  kv_shape).serialize(self.key_codec),
+                MSG_MORE)
 
             await self.loop.sock_sendall(self.client_socket, kv_bytes)
 
@@ -112,19 +206,17 @@ class LMCServerConnector(RemoteConnector):
         # we don't want to yield control to other tasks which could
         # sacrifice the performance loading to trade the performance of
         # saving
+        # NOTE: the lock is held until the payload is received, otherwise
+        # another request could be sent in between
         async with self.async_socket_lock:
             self.client_socket.sendall(
-                ClientMetaMessage(Constants.CLIENT_GET, key, 0,
-                                  MemoryFormat(1), torch.float16,
-                                  torch.Size([0, 0, 0, 0])).serialize())
+                self.encode_request(Constants.CLIENT_GET, key))
 
-            data = self.client_socket.recv(ServerMetaMessage.packlength())
-
-        meta = ServerMetaMessage.deserialize(data)
-        if meta.code != Constants.SERVER_SUCCESS:
-            return None
+            meta = self.receive_meta()
+            if meta.code not in (Constants.SERVER_SUCCESS,
+                                 Constants.SERVER_SUCCESS_REPLICATED):
+                return None
 
-        async with self.async_socket_lock:
             memory_obj = self.receive_all(meta)
 
         return memory_obj
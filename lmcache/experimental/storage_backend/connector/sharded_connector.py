@@ -0,0 +1,640 @@
+import asyncio
+import bisect
+import hashlib
+import os
+import queue
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (Callable, Dict, List, Optional, Tuple, TypeVar, Union,
+                    cast, no_type_check)
+
+import torch
+
+from lmcache.experimental.memory_management import (MemoryAllocatorInterface,
+                                                    MemoryFormat, MemoryObj)
+from lmcache.experimental.protocol import DTYPE_TO_INT, INT_TO_DTYPE, Constants
+from lmcache.experimental.storage_backend.connector.base_connector import \
+    RemoteConnector
+from lmcache.experimental.storage_backend.connector.lm_connector import \
+    LMCServerConnector
+from lmcache.logging import init_logger
+from lmcache.utils import CacheEngineKey
+
+logger = init_logger(__name__)
+
+T = TypeVar("T")
+
+STRIPE_MAGIC = b"LMSTRIPE"
+# Manifests are small, larger binary chunks are never parsed as manifests
+MAX_MANIFEST_SIZE = 64 * 1024
+# The maximum number of replicated keys remembered by a client
+MAX_HOT_KEYS = 65536
+
+
+@dataclass
+class StripeManifest:
+    """
+    Stored under the key of a striped chunk on its primary server.
+    Stripe i is stored under `stripe_key(key, i)` on the shard
+    `(primary + i) % num_shards`, i.e., stripe 0 is on the primary server
+    and the next ones on the following shards in the order of the url.
+
+    NOTE: the stripes are placed by the shard index, not on the hash ring,
+    so adding or removing a server relocates all the stripes (and turns
+    the stored striped chunks into misses).
+    """
+
+    length: int
+    fmt: MemoryFormat
+    dtype: Optional[torch.dtype]
+    shape: torch.Size
+    stripe_size: int
+    checksums: List[int]
+
+    HEADER = struct.Struct("<8siiiiiiqqi")
+
+    @property
+    def num_stripes(self) -> int:
+        return len(self.checksums)
+
+    def stripe_range(self, idx: int) -> Tuple[int, int]:
+        start = idx * self.stripe_size
+        return start, min(start + self.stripe_size, self.length)
+
+    def serialize(self) -> bytes:
+        assert len(self.shape) == 4, "Shape dimension should be 4"
+        return self.HEADER.pack(
+            STRIPE_MAGIC,
+            int(self.fmt.value),
+            DTYPE_TO_INT[self.dtype],
+            *self.shape,
+            self.length,
+            self.stripe_size,
+            self.num_stripes,
+        ) + struct.pack(f"<{self.num_stripes}I", *self.checksums)
+
+    @staticmethod
+    def deserialize(s: bytes) -> Optional["StripeManifest"]:
+        """
+        Returns None if s is not a manifest
+        """
+        header_size = StripeManifest.HEADER.size
+        if len(s) < header_size or not s.startswith(STRIPE_MAGIC):
+            return None
+        (_, fmt, dtype, shape0, shape1, shape2, shape3, length, stripe_size,
+         num_stripes) = StripeManifest.HEADER.unpack(s[:header_size])
+        if len(s) != header_size + 4 * num_stripes:
+            return None
+        checksums = list(struct.unpack(f"<{num_stripes}I", s[header_size:]))
+        return StripeManifest(length, MemoryFormat(fmt), INT_TO_DTYPE[dtype],
+                              torch.Size([shape0, shape1, shape2, shape3]),
+                              stripe_size, checksums)
+
+
+def stripe_key(key: CacheEngineKey, idx: int) -> CacheEngineKey:
+    return CacheEngineKey(key.fmt, key.model_name, key.world_size,
+                          key.worker_id, f"{key.chunk_hash}#{idx}")
+
+
+def _hash(s: str) -> int:
+    return int.from_bytes(hashlib.md5(s.encode()).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """
+    Maps keys to shards with consistent hashing. Each shard is placed on
+    the ring `num_virtual_nodes` times, so that the keys are spread evenly
+    and only ~1/N of them move when a shard is added or removed.
+    """
+
+    def __init__(self, shards: List[str], num_virtual_nodes: int):
+        ring: List[Tuple[int, int]] = []
+        for shard_id, shard in enumerate(shards):
+            for i in range(num_virtual_nodes):
+                ring.append((_hash(f"{shard}#{i}"), shard_id))
+        ring.sort()
+        self.positions = [pos for pos, _ in ring]
+        self.shard_ids = [shard_id for _, shard_id in ring]
+
+    def get_shard(self, key: str) -> int:
+        idx = bisect.bisect(self.positions, _hash(key))
+        if idx == len(self.positions):
+            idx = 0
+        return self.shard_ids[idx]
+
+    def get_shards(self, key: str, n: int) -> List[int]:
+        """
+        Get up to n distinct shards of the key by walking the ring
+        clockwise, the first one is `get_shard(key)`. These are the
+        servers that hold the replicas of a hot key.
+        """
+        start = bisect.bisect(self.positions, _hash(key))
+        shards: List[int] = []
+        for i in range(len(self.positions)):
+            shard_id = self.shard_ids[(start + i) % len(self.positions)]
+            if shard_id not in shards:
+                shards.append(shard_id)
+                if len(shards) == n:
+                    break
+        return shards
+
+
+class _Shard:
+    """
+    A lm server with a pool of connections. A connection is used by one
+    request at a time.
+    """
+
+    def __init__(self, host: str, port: int, pool_size: int, timeout: float,
+                 retry_interval: float, loop: asyncio.AbstractEventLoop,
+                 memory_allocator: MemoryAllocatorInterface):
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.loop = loop
+        self.memory_allocator = memory_allocator
+
+        self.idle_connections: queue.Queue = queue.Queue()
+        self.semaphore = threading.Semaphore(pool_size)
+
+        # The shard is skipped until this time after a failure
+        self.down_until = 0.0
+
+    def __str__(self):
+        return f"{self.host}:{self.port}"
+
+    def is_available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def acquire(self) -> LMCServerConnector:
+        """
+        Get an idle connection or create a new one. Blocks if all the
+        connections are in use.
+        """
+        self.semaphore.acquire()
+        try:
+            return self.idle_connections.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            return LMCServerConnector(self.host, self.port, self.loop,
+                                      self.memory_allocator, self.timeout)
+        except Exception:
+            self.semaphore.release()
+            raise
+
+    def release(self, connection: LMCServerConnector):
+        self.idle_connections.put(connection)
+        self.semaphore.release()
+
+    def discard(self, connection: LMCServerConnector):
+        connection.client_socket.close()
+        self.semaphore.release()
+
+    def mark_down(self, e: Exception):
+        logger.warning(f"lm server {self} failed ({e}), skipping it for "
+                       f"{self.retry_interval} seconds")
+        self.down_until = time.monotonic() + self.retry_interval
+        # Drop the idle connections, they are likely broken as well
+        self.close()
+
+    def close(self):
+        while True:
+            try:
+                connection = self.idle_connections.get_nowait()
+            except queue.Empty:
+                break
+            connection.client_socket.close()
+
+
+class ShardedConnector(RemoteConnector):
+    """
+    Shards the keys across multiple lm servers with consistent hashing.
+    The hosts are specified in the config file, started with "lm://"
+    and separated by commas.
+
+    Example:
+        remote_url: "lm://host1:65432,host2:65432,host3:65432"
+
+    Requests to different servers run in parallel. When a server fails, it
+    is skipped for a while and its keys are treated as cache misses, so
+    that the KV cache will be recomputed instead.
+
+    Optionally, chunks larger than the stripe size are split into stripes
+    that are stored on different servers and transferred in parallel, so
+    that a single chunk is not limited by the bandwidth of one server.
+    Each stripe is verified with its crc32 checksum.
+
+    The servers started with `--cluster` copy their hot keys to the next
+    servers on the ring and mark them as replicated in the responses. The
+    reads of such keys are then spread over the primary server and the
+    replicas, and fall back to the primary server if a replica misses.
+
+    Extra environment variables:
+    - LMCACHE_SHARD_VIRTUAL_NODES (optional) -- number of virtual nodes per
+      server on the hash ring, default is 128
+    - LMCACHE_SHARD_POOL_SIZE (optional) -- number of connections per
+      server, default is 2
+    - LMCACHE_SHARD_TIMEOUT (optional) -- socket timeout in seconds,
+      default is 5
+    - LMCACHE_SHARD_RETRY_INTERVAL (optional) -- time in seconds before
+      retrying a failed server, default is 10
+    - LMCACHE_SHARD_STRIPE_SIZE (optional) -- stripe size in bytes, default
+      is 0, which disables striping
+    - LMCACHE_SHARD_REPLICAS (optional) -- the `--replicas` of the servers,
+      default is 2
+    - LMCACHE_SHARD_REPLICA_TTL (optional) -- time in seconds to keep
+      reading a key from the replicas after the primary server reported
+      it as replicated, default is 10
+    """
+
+    ENV_SHARD_VIRTUAL_NODES = "LMCACHE_SHARD_VIRTUAL_NODES"
+    ENV_SHARD_POOL_SIZE = "LMCACHE_SHARD_POOL_SIZE"
+    ENV_SHARD_TIMEOUT = "LMCACHE_SHARD_TIMEOUT"
+    ENV_SHARD_RETRY_INTERVAL = "LMCACHE_SHARD_RETRY_INTERVAL"
+    ENV_SHARD_STRIPE_SIZE = "LMCACHE_SHARD_STRIPE_SIZE"
+    ENV_SHARD_REPLICAS = "LMCACHE_SHARD_REPLICAS"
+    ENV_SHARD_REPLICA_TTL = "LMCACHE_SHARD_REPLICA_TTL"
+
+    def __init__(self, hosts_and_ports: List[Tuple[str, int]],
+                 loop: asyncio.AbstractEventLoop,
+                 memory_allocator: MemoryAllocatorInterface):
+        num_virtual_nodes = int(
+            os.environ.get(self.ENV_SHARD_VIRTUAL_NODES, 128))
+        pool_size = int(os.environ.get(self.ENV_SHARD_POOL_SIZE, 2))
+        timeout = float(os.environ.get(self.ENV_SHARD_TIMEOUT, 5))
+        retry_interval = float(
+            os.environ.get(self.ENV_SHARD_RETRY_INTERVAL, 10))
+        self.stripe_size = int(os.environ.get(self.ENV_SHARD_STRIPE_SIZE, 0))
+        self.num_replicas = int(os.environ.get(self.ENV_SHARD_REPLICAS, 2))
+        self.replica_ttl = float(os.environ.get(self.ENV_SHARD_REPLICA_TTL,
+                                                10))
+
+        logger.info(f"Sharding across lm servers: {hosts_and_ports}")
+        self.shards = [
+            _Shard(host, port, pool_size, timeout, retry_interval, loop,
+                   memory_allocator) for host, port in hosts_and_ports
+        ]
+        self.ring = ConsistentHashRing([str(shard) for shard in self.shards],
+                                       num_virtual_nodes)
+
+        self.memory_allocator = memory_allocator
+        self.loop = loop
+
+        # The keys replicated by their primary servers, with the time until
+        # which they are read from the replicas
+        self.hot_keys: OrderedDict[str, float] = OrderedDict()
+        self.hot_keys_lock = threading.Lock()
+
+        # The blocking socket operations run in these threads, so that
+        # different servers are accessed in parallel
+        self.executor = ThreadPoolExecutor(max_workers=len(self.shards) *
+                                           pool_size,
+                                           thread_name_prefix="lmcache-shard")
+
+    def _get_shard(self, key: CacheEngineKey) -> _Shard:
+        return self.shards[self.ring.get_shard(key.to_string())]
+
+    def _run_on_shard(self, shard: _Shard, func: Callable[[LMCServerConnector],
+                                                          T], default: T) -> T:
+        """
+        Run func with a connection to the shard. Returns default if the
+        shard is down or fails.
+        """
+        if not shard.is_available():
+            return default
+        try:
+            connection = shard.acquire()
+        except Exception as e:
+            shard.mark_down(e)
+            return default
+
+        try:
+            ret = func(connection)
+        except Exception as e:
+            # The connection may be in the middle of a message
+            shard.discard(connection)
+            shard.mark_down(e)
+            return default
+
+        shard.release(connection)
+        return ret
+
+    def _group_by_shard(self,
+                        keys: List[CacheEngineKey],
+                        for_read: bool = False) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for idx, key in enumerate(keys):
+            if for_read:
+                shard_id = self._get_read_shard(key)
+            else:
+                shard_id = self.ring.get_shard(key.to_string())
+            groups.setdefault(shard_id, []).append(idx)
+        return groups
+
+    def _mark_hot(self, key: CacheEngineKey, hot: bool):
+        key_str = key.to_string()
+        with self.hot_keys_lock:
+            if not hot:
+                self.hot_keys.pop(key_str, None)
+                return
+            self.hot_keys[key_str] = time.monotonic() + self.replica_ttl
+            self.hot_keys.move_to_end(key_str)
+            if len(self.hot_keys) > MAX_HOT_KEYS:
+                self.hot_keys.popitem(last=False)
+
+    def _get_read_shard(self, key: CacheEngineKey) -> int:
+        """
+        Pick the server to read the key from, a random replica if the key
+        is replicated, otherwise the primary server
+        """
+        key_str = key.to_string()
+        with self.hot_keys_lock:
+            expiry = self.hot_keys.get(key_str)
+        if expiry is None or expiry < time.monotonic():
+            return self.ring.get_shard(key_str)
+        candidates = [
+            shard_id
+            for shard_id in self.ring.get_shards(key_str, self.num_replicas +
+                                                 1)
+            if self.shards[shard_id].is_available()
+        ]
+        if not candidates:
+            return self.ring.get_shard(key_str)
+        return random.choice(candidates)
+
+    def _get_primary_blocking(
+            self, conn: LMCServerConnector,
+            key: CacheEngineKey) -> Union[MemoryObj, StripeManifest, None]:
+        """
+        Get the chunk, or its manifest if it is striped
+        """
+        meta = conn.get_meta_blocking(key)
+        if meta is None:
+            return None
+        if meta.code == Constants.SERVER_SUCCESS_REPLICATED:
+            self._mark_hot(key, True)
+
+        if meta.fmt == MemoryFormat.BINARY_BUFFER and \
+                meta.length <= MAX_MANIFEST_SIZE:
+            data = bytearray(meta.length)
+            conn.receive_into(memoryview(data))
+            manifest = StripeManifest.deserialize(data)
+            if manifest is not None:
+                return manifest
+            memory_obj = self.memory_allocator.allocate(
+                meta.shape, meta.dtype, meta.fmt)
+            if memory_obj is None:
+                logger.warning("Failed to allocate memory during remote "
+                               "receive")
+                return None
+            memoryview(memory_obj.byte_array).cast("B")[:meta.length] = data
+            return memory_obj
+
+        memory_obj = self.memory_allocator.allocate(meta.shape, meta.dtype,
+                                                    meta.fmt)
+        if memory_obj is None:
+            logger.warning("Failed to allocate memory during remote receive")
+            conn.discard(meta.length)
+            return None
+        try:
+            conn.receive_into(memoryview(memory_obj.byte_array)[:meta.length])
+        except Exception:
+            self.memory_allocator.ref_count_down(memory_obj)
+            raise
+        return memory_obj
+
+    async def _get_stripes(self, key: CacheEngineKey,
+                           manifest: StripeManifest) -> Optional[MemoryObj]:
+        """
+        Fetch the stripes in parallel straight into the destination
+        """
+        memory_obj = self.memory_allocator.allocate(manifest.shape,
+                                                    manifest.dtype,
+                                                    manifest.fmt)
+        if memory_obj is None:
+            logger.warning("Failed to allocate memory during remote receive")
+            return None
+        view = memoryview(memory_obj.byte_array)
+        primary = self.ring.get_shard(key.to_string())
+
+        def fetch_stripe(conn: LMCServerConnector, idx: int) -> bool:
+            start, end = manifest.stripe_range(idx)
+            meta = conn.get_meta_blocking(stripe_key(key, idx))
+            if meta is None:
+                return False
+            if meta.length != end - start:
+                conn.discard(meta.length)
+                return False
+            conn.receive_into(view[start:end])
+            return zlib.crc32(view[start:end]) == manifest.checksums[idx]
+
+        oks = await asyncio.gather(*[
+            self.loop.run_in_executor(
+                self.executor,
+                self._run_on_shard,
+                self.shards[(primary + idx) % len(self.shards)],
+                lambda conn, idx=idx: fetch_stripe(conn, idx),
+                False) for idx in range(manifest.num_stripes)
+        ])
+        if not all(oks):
+            logger.warning(f"Missing or corrupted stripes of {key}")
+            self.memory_allocator.ref_count_down(memory_obj)
+            return None
+        return memory_obj
+
+    async def _resolve(
+            self, key: CacheEngineKey,
+            result: Union[MemoryObj, StripeManifest,
+                          None]) -> Optional[MemoryObj]:
+        if isinstance(result, StripeManifest):
+            return await self._get_stripes(key, result)
+        return result
+
+    async def _put_stripes(self, key: CacheEngineKey, memory_obj: MemoryObj):
+        view = memoryview(memory_obj.byte_array)
+        length = len(view)
+        num_stripes = (length + self.stripe_size - 1) // self.stripe_size
+        primary = self.ring.get_shard(key.to_string())
+
+        def put_stripe(conn: LMCServerConnector, idx: int) -> Optional[int]:
+            start = idx * self.stripe_size
+            stripe = view[start:min(start + self.stripe_size, length)]
+            conn.put_buffer_blocking(stripe_key(key, idx), stripe,
+                                     MemoryFormat.BINARY_BUFFER, None,
+                                     torch.Size([len(stripe), 0, 0, 0]))
+            return zlib.crc32(stripe)
+
+        checksums = await asyncio.gather(*[
+            self.loop.run_in_executor(
+                self.executor,
+                self._run_on_shard,
+                self.shards[(primary + idx) % len(self.shards)],
+                lambda conn, idx=idx: put_stripe(conn, idx),
+                None) for idx in range(num_stripes)
+        ])
+        if any(checksum is None for checksum in checksums):
+            # Don't publish the manifest of an incomplete chunk
+            return
+
+        manifest = StripeManifest(length, memory_obj.get_memory_format(),
+                                  memory_obj.get_dtype(),
+                                  memory_obj.get_shape(), self.stripe_size,
+                                  cast(List[int], checksums)).serialize()
+        await self.loop.run_in_executor(
+            self.executor, self._run_on_shard, self.shards[primary],
+            lambda conn: conn.put_buffer_blocking(
+                key, memoryview(manifest), MemoryFormat.BINARY_BUFFER, None,
+                torch.Size([len(manifest), 0, 0, 0])), None)
+
+    def _should_stripe(self, memory_obj: MemoryObj) -> bool:
+        return self.stripe_size > 0 and \
+            len(memoryview(memory_obj.byte_array)) > self.stripe_size
+
+    async def exists(self, key: CacheEngineKey) -> bool:
+        shard = self._get_shard(key)
+        return await self.loop.run_in_executor(
+            self.executor, self._run_on_shard, shard,
+            lambda conn: conn.exists_blocking(key), False)
+
+    async def get(self, key: CacheEngineKey) -> Optional[MemoryObj]:
+        shard_id = self._get_read_shard(key)
+        if shard_id != self.ring.get_shard(key.to_string()):
+            result = await self.loop.run_in_executor(
+                self.executor, self._run_on_shard, self.shards[shard_id],
+                lambda conn: self._get_primary_blocking(conn, key), None)
+            if result is not None:
+                return await self._resolve(key, result)
+            # The replica is evicted or down
+            self._mark_hot(key, False)
+
+        shard = self._get_shard(key)
+        result = await self.loop.run_in_executor(
+            self.executor, self._run_on_shard, shard,
+            lambda conn: self._get_primary_blocking(conn, key), None)
+        return await self._resolve(key, result)
+
+    def _put_blocking(self, shard: _Shard, key: CacheEngineKey,
+                      memory_obj: MemoryObj):
+        self._run_on_shard(shard,
+                           lambda conn: conn.put_blocking(key, memory_obj),
+                           None)
+        self.memory_allocator.ref_count_down(memory_obj)
+
+    async def put(self, key: CacheEngineKey, memory_obj: MemoryObj):
+        if self._should_stripe(memory_obj):
+            try:
+                await self._put_stripes(key, memory_obj)
+            finally:
+                self.memory_allocator.ref_count_down(memory_obj)
+            return
+
+        shard = self._get_shard(key)
+        await self.loop.run_in_executor(self.executor, self._put_blocking,
+                                        shard, key, memory_obj)
+
+    async def batched_exists(self, keys: List[CacheEngineKey]) -> List[bool]:
+        results = [False] * len(keys)
+
+        def exists_many(conn: LMCServerConnector, idxs: List[int]):
+            for idx in idxs:
+                results[idx] = conn.exists_blocking(keys[idx])
+
+        await asyncio.gather(*[
+            self.loop.run_in_executor(
+                self.executor,
+                self._run_on_shard,
+                self.shards[shard_id],
+                lambda conn, idxs=idxs: exists_many(conn, idxs),
+                None) for shard_id, idxs in self._group_by_shard(keys).items()
+        ])
+        return results
+
+    async def batched_get(
+            self, keys: List[CacheEngineKey]) -> List[Optional[MemoryObj]]:
+        results: List[Union[MemoryObj, StripeManifest,
+                            None]] = [None] * len(keys)
+
+        def get_many(conn: LMCServerConnector, idxs: List[int]):
+            for idx in idxs:
+                results[idx] = self._get_primary_blocking(conn, keys[idx])
+
+        groups = self._group_by_shard(keys, for_read=True)
+        await asyncio.gather(*[
+            self.loop.run_in_executor(
+                self.executor,
+                self._run_on_shard,
+                self.shards[shard_id],
+                lambda conn, idxs=idxs: get_many(conn, idxs),
+                None) for shard_id, idxs in groups.items()
+        ])
+
+        # Retry the misses of the replicas on the primary servers
+        retries = [
+            idx for shard_id, idxs in groups.items() for idx in idxs
+            if results[idx] is None
+            and shard_id != self.ring.get_shard(keys[idx].to_string())
+        ]
+        if retries:
+            for idx in retries:
+                self._mark_hot(keys[idx], False)
+            retry_groups: Dict[int, List[int]] = {}
+            for idx in retries:
+                retry_groups.setdefault(
+                    self.ring.get_shard(keys[idx].to_string()), []).append(idx)
+            await asyncio.gather(*[
+                self.loop.run_in_executor(
+                    self.executor,
+                    self._run_on_shard,
+                    self.shards[shard_id],
+                    lambda conn, idxs=idxs: get_many(conn, idxs),
+                    None) for shard_id, idxs in retry_groups.items()
+            ])
+        return list(await asyncio.gather(
+            *
+            [self._resolve(key, result)
+             for key, result in zip(keys, results)]))
+
+    async def batched_put(self, keys: List[CacheEngineKey],
+                          memory_objs: List[MemoryObj]):
+        if self.stripe_size > 0:
+            await asyncio.gather(*[
+                self.put(key, memory_obj)
+                for key, memory_obj in zip(keys, memory_objs)
+            ])
+            return
+
+        def put_many(conn: LMCServerConnector, idxs: List[int]):
+            for idx in idxs:
+                conn.put_blocking(keys[idx], memory_objs[idx])
+
+        await asyncio.gather(*[
+            self.loop.run_in_executor(
+                self.executor,
+                self._run_on_shard,
+                self.shards[shard_id],
+                lambda conn, idxs=idxs: put_many(conn, idxs),
+                None) for shard_id, idxs in self._group_by_shard(keys).items()
+        ])
+        for memory_obj in memory_objs:
+            self.memory_allocator.ref_count_down(memory_obj)
+
+    # TODO
+    @no_type_check
+    async def list(self) -> List[str]:
+        pass
+
+    async def close(self):
+        self.executor.shutdown(wait=True)
+        for shard in self.shards:
+            shard.close()
+        logger.info("Closed the sharded lmserver connections")
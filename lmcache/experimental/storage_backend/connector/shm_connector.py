@@ -0,0 +1,130 @@
+import asyncio
+import mmap
+import os
+from typing import Optional
+
+from lmcache.experimental.memory_management import (MemoryAllocatorInterface,
+                                                    MemoryObj)
+from lmcache.experimental.protocol import (SHM_OFFSET, ClientMetaMessage,
+                                           Constants, ServerMetaMessage)
+from lmcache.experimental.storage_backend.connector.lm_connector import \
+    LMCServerConnector
+from lmcache.logging import init_logger
+from lmcache.utils import CacheEngineKey, _lmcache_nvtx_annotate
+
+logger = init_logger(__name__)
+
+
+class ShmLMCServerConnector(LMCServerConnector):
+    """
+    Connects to an lm server on the same host that was started with
+    `--shm`. The server's memory arena is mapped into this process, so
+    the payload is copied straight from/into the arena and only the
+    small control messages go through the socket.
+    """
+
+    def __init__(self, host: str, port: int, loop: asyncio.AbstractEventLoop,
+                 memory_allocator: MemoryAllocatorInterface):
+        super().__init__(host, port, loop, memory_allocator)
+
+        # The key is not used by the handshake
+        self.client_socket.sendall(
+            self.encode_request(Constants.CLIENT_SHM_HANDSHAKE,
+                                CacheEngineKey("", "", 0, 0, "")))
+        meta = self.receive_meta()
+        if meta.code != Constants.SERVER_SUCCESS:
+            self.client_socket.close()
+            raise ValueError(f"The lm server at {host}:{port} does not "
+                             f"share its memory, start it with --shm")
+        path = bytearray(meta.length)
+        self.receive_into(memoryview(path))
+
+        fd = os.open(path.decode(), os.O_RDWR)
+        try:
+            self.shm = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        self.shm_view = memoryview(self.shm)
+        logger.info(f"Mapped the shared memory of the lm server at "
+                    f"{path.decode()}")
+
+    def receive_offset(self) -> int:
+        data = bytearray(SHM_OFFSET.size)
+        self.receive_into(memoryview(data))
+        return SHM_OFFSET.unpack(data)[0]
+
+    def send_offset(self, command: int, key: CacheEngineKey,
+                    meta: ServerMetaMessage, offset: int):
+        self.client_socket.sendall(
+            ClientMetaMessage(command, key, meta.length, meta.fmt, meta.dtype,
+                              meta.shape).serialize(self.key_codec) +
+            SHM_OFFSET.pack(offset))
+
+    def get_blocking(self, key: CacheEngineKey) -> Optional[MemoryObj]:
+        self.client_socket.sendall(
+            self.encode_request(Constants.CLIENT_SHM_GET, key))
+        meta = self.receive_meta()
+        if meta.code != Constants.SERVER_SUCCESS:
+            return None
+
+        offset = self.receive_offset()
+        if offset < 0:
+            # The chunk is on the server's disk, it is sent in the socket
+            memory_obj = self.receive_all(meta)
+            if memory_obj is None:
+                raise ConnectionError("Failed to receive from the lm server")
+            return memory_obj
+
+        memory_obj = self.memory_allocator.allocate(meta.shape, meta.dtype,
+                                                    meta.fmt)
+        try:
+            if memory_obj is not None:
+                memoryview(memory_obj.byte_array).cast("B")[:meta.length] = \
+                    self.shm_view[offset:offset + meta.length]
+            else:
+                logger.warning("Failed to allocate memory during remote "
+                               "receive")
+        finally:
+            # Unpin the chunk in the server
+            self.send_offset(Constants.CLIENT_SHM_RELEASE, key, meta, offset)
+        return memory_obj
+
+    def put_blocking(self, key: CacheEngineKey, memory_obj: MemoryObj):
+        """
+        Unlike `put`, the ref count of memory_obj is not changed
+        """
+        buffer = memoryview(memory_obj.byte_array).cast("B")
+        self.client_socket.sendall(
+            ClientMetaMessage(
+                Constants.CLIENT_SHM_ALLOC, key, len(buffer),
+                memory_obj.get_memory_format(), memory_obj.get_dtype(),
+                memory_obj.get_shape()).serialize(self.key_codec))
+        meta = self.receive_meta()
+        if meta.code != Constants.SERVER_SUCCESS:
+            # The server is full
+            logger.debug(f"The lm server rejected the put of {key}")
+            return
+        offset = self.receive_offset()
+        self.shm_view[offset:offset + len(buffer)] = buffer
+        self.send_offset(Constants.CLIENT_SHM_COMMIT, key, meta, offset)
+
+    async def put(
+        self,
+        key: CacheEngineKey,
+        memory_obj: MemoryObj,
+    ):
+        async with self.async_socket_lock:
+            self.put_blocking(key, memory_obj)
+        self.memory_allocator.ref_count_down(memory_obj)
+
+    @_lmcache_nvtx_annotate
+    async def get(self, key: CacheEngineKey) -> Optional[MemoryObj]:
+        async with self.async_socket_lock:
+            return self.get_blocking(key)
+
+    async def close(self):
+        async with self.async_socket_lock:
+            self.client_socket.close()
+            self.shm_view.release()
+            self.shm.close()
+        logger.info("Closed the lmserver connection")
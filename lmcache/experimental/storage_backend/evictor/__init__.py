@@ -1,4 +1,35 @@
-from lmcache.experimental.storage_backend.evictor.base_evictor import PutStatus
+from lmcache.experimental.storage_backend.evictor.base_evictor import (
+    BaseEvictor, PutStatus)
+from lmcache.experimental.storage_backend.evictor.lfu_evictor import LFUEvictor
 from lmcache.experimental.storage_backend.evictor.lru_evictor import LRUEvictor
+from lmcache.experimental.storage_backend.evictor.size_aware_evictor import \
+    SizeAwareEvictor
 
-__all__ = ["LRUEvictor", "PutStatus"]
+
+def CreateEvictor(policy: str, max_cache_size: float) -> LRUEvictor:
+    """
+    Create an evictor by its policy name
+
+    Input:
+        policy: one of "lru", "lfu" and "size"
+        max_cache_size: the storage size limit (in GB)
+    """
+    match policy:
+        case "lru":
+            return LRUEvictor(max_cache_size)
+        case "lfu":
+            return LFUEvictor(max_cache_size)
+        case "size":
+            return SizeAwareEvictor(max_cache_size)
+        case _:
+            raise ValueError(f"Unsupported eviction policy: {policy}")
+
+
+__all__ = [
+    "BaseEvictor",
+    "LRUEvictor",
+    "LFUEvictor",
+    "SizeAwareEvictor",
+    "PutStatus",
+    "CreateEvictor",
+]
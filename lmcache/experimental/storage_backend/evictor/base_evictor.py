@@ -1,7 +1,7 @@
 import abc
 from collections import OrderedDict
 from enum import Enum
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
 
 from lmcache.logging import init_logger
 from lmcache.utils import CacheEngineKey
@@ -41,9 +41,34 @@ class BaseEvictor(metaclass=abc.ABCMeta):
         Input:
             cache_dict: a dict consists of current cache
             kv_obj: the new kv cache to be injected
-        
+
         Return:
             return a list of keys to be evicted and a PutStatus
             to indicate whether the put is allowed
         """
         raise NotImplementedError
+
+    @abc.abstractmethod
+    def update_on_remove(self, key: CacheEngineKey,
+                         cache_dict: OrderedDict) -> None:
+        """
+        Update the evictor's bookkeeping when a cache is removed by the
+        caller instead of being chosen by `update_on_put`.
+        Should be called before the key is popped from `cache_dict`.
+
+        Input:
+            key: a CacheEngineKey
+            cache_dict: a dict consists of current cache
+        """
+        raise NotImplementedError
+
+    def eviction_order(self,
+                       cache_dict: OrderedDict) -> Iterable[CacheEngineKey]:
+        """
+        Iterate over the keys of `cache_dict` from the best to the worst
+        eviction candidate. The default is the insertion order of the dict.
+
+        Input:
+            cache_dict: a dict consists of current cache
+        """
+        return iter(cache_dict)
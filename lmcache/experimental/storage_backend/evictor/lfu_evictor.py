@@ -0,0 +1,50 @@
+import heapq
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Tuple, Union
+
+from lmcache.experimental.storage_backend.evictor.base_evictor import PutStatus
+from lmcache.experimental.storage_backend.evictor.lru_evictor import LRUEvictor
+from lmcache.logging import init_logger
+from lmcache.utils import CacheEngineKey
+
+logger = init_logger(__name__)
+
+
+class LFUEvictor(LRUEvictor):
+    """
+    LFU cache evictor. Ties between equally frequent chunks are broken
+    by recency, i.e., the least recently used one is evicted first.
+    """
+
+    def __init__(self, max_cache_size: float = 10.0):
+        super().__init__(max_cache_size)
+        self.frequency: Dict[Union[CacheEngineKey, str], int] = {}
+
+    def update_on_hit(self, key: Union[CacheEngineKey, str],
+                      cache_dict: OrderedDict) -> None:
+        super().update_on_hit(key, cache_dict)
+        self.frequency[key] = self.frequency.get(key, 0) + 1
+
+    def update_on_remove(self, key: Union[CacheEngineKey, str],
+                         cache_dict: OrderedDict) -> None:
+        super().update_on_remove(key, cache_dict)
+        self.frequency.pop(key, None)
+
+    def update_on_put(
+            self, cache_dict: OrderedDict,
+            cache_size: int) -> Tuple[List[CacheEngineKey], PutStatus]:
+        evict_keys, put_status = super().update_on_put(cache_dict, cache_size)
+        for key in evict_keys:
+            self.frequency.pop(key, None)
+        return evict_keys, put_status
+
+    def eviction_order(self,
+                       cache_dict: OrderedDict) -> Iterator[CacheEngineKey]:
+        # NOTE: the heap is consumed lazily, so only the evicted chunks
+        # pay the O(log n) cost
+        heap = [(self.frequency.get(key, 0), idx, key)
+                for idx, key in enumerate(cache_dict)]
+        heapq.heapify(heap)
+        while heap:
+            _, _, key = heapq.heappop(heap)
+            yield key
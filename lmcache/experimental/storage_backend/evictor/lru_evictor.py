@@ -26,11 +26,18 @@ class LRUEvictor(BaseEvictor):
                       cache_dict: OrderedDict) -> None:
         cache_dict.move_to_end(key)
 
+    def update_on_remove(self, key: Union[CacheEngineKey, str],
+                         cache_dict: OrderedDict) -> None:
+        if key not in cache_dict:
+            return
+        self.current_cache_size = max(
+            0.0, self.current_cache_size - cache_dict[key].size)
+
     def update_on_put(
             self, cache_dict: OrderedDict,
             cache_size: int) -> Tuple[List[CacheEngineKey], PutStatus]:
         evict_keys = []
-        iter_cache_dict = iter(cache_dict)
+        iter_cache_dict = iter(self.eviction_order(cache_dict))
 
         if cache_size > self.MAX_CACHE_SIZE:
             logger.warning("Put failed due to limited cache storage")
@@ -39,7 +46,11 @@ class LRUEvictor(BaseEvictor):
         # evict cache until there's enough space
         while cache_size + self.current_cache_size > \
             self.MAX_CACHE_SIZE:
-            evict_key = next(iter_cache_dict)
+            evict_key = next(iter_cache_dict, None)
+            if evict_key is None:
+                # The bookkeeping is out of sync with the cache_dict
+                # (e.g., objects that are still being written)
+                break
             evict_cache_size = cache_dict[evict_key].size
             self.current_cache_size -= evict_cache_size
             evict_keys.append(evict_key)
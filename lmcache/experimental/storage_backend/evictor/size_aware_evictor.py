@@ -0,0 +1,62 @@
+import heapq
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Tuple, Union
+
+from lmcache.experimental.storage_backend.evictor.base_evictor import PutStatus
+from lmcache.experimental.storage_backend.evictor.lru_evictor import LRUEvictor
+from lmcache.logging import init_logger
+from lmcache.utils import CacheEngineKey
+
+logger = init_logger(__name__)
+
+
+class SizeAwareEvictor(LRUEvictor):
+    """
+    Size-aware cache evictor (GreedyDual-Size-Frequency).
+
+    Each chunk gets a priority of `L + frequency / size`, where `L` is
+    an aging value that is raised to the priority of the last evicted
+    chunk. Large and rarely used chunks are evicted first, while the
+    aging value prevents once-popular chunks from staying forever.
+    """
+
+    def __init__(self, max_cache_size: float = 10.0):
+        super().__init__(max_cache_size)
+        self.frequency: Dict[Union[CacheEngineKey, str], int] = {}
+        self.inflation = 0.0
+
+    def _priority(self, key: Union[CacheEngineKey, str],
+                  cache_dict: OrderedDict) -> float:
+        size = max(cache_dict[key].size, 1)
+        return self.inflation + (1 + self.frequency.get(key, 0)) / size
+
+    def update_on_hit(self, key: Union[CacheEngineKey, str],
+                      cache_dict: OrderedDict) -> None:
+        super().update_on_hit(key, cache_dict)
+        self.frequency[key] = self.frequency.get(key, 0) + 1
+
+    def update_on_remove(self, key: Union[CacheEngineKey, str],
+                         cache_dict: OrderedDict) -> None:
+        super().update_on_remove(key, cache_dict)
+        self.frequency.pop(key, None)
+
+    def update_on_put(
+            self, cache_dict: OrderedDict,
+            cache_size: int) -> Tuple[List[CacheEngineKey], PutStatus]:
+        evict_keys, put_status = super().update_on_put(cache_dict, cache_size)
+        if len(evict_keys) > 0:
+            # Age the remaining chunks by the priority of the evicted ones
+            self.inflation = max(
+                self._priority(key, cache_dict) for key in evict_keys)
+        for key in evict_keys:
+            self.frequency.pop(key, None)
+        return evict_keys, put_status
+
+    def eviction_order(self,
+                       cache_dict: OrderedDict) -> Iterator[CacheEngineKey]:
+        heap = [(self._priority(key, cache_dict), idx, key)
+                for idx, key in enumerate(cache_dict)]
+        heapq.heapify(heap)
+        while heap:
+            _, _, key = heapq.heappop(heap)
+            yield key
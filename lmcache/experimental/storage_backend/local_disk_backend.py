@@ -8,12 +8,18 @@ from typing import List, Optional
 import aiofiles
 import torch
 
+from lmcache.config import LMCacheEngineMetadata
 from lmcache.experimental.config import LMCacheEngineConfig
-from lmcache.experimental.memory_management import (MemoryAllocatorInterface,
+from lmcache.experimental.memory_management import (BytesBufferMemoryObj,
+                                                    MemoryAllocatorInterface,
                                                     MemoryObj)
 from lmcache.experimental.storage_backend.abstract_backend import \
     StorageBackendInterface
 from lmcache.experimental.storage_backend.evictor import LRUEvictor, PutStatus
+from lmcache.experimental.storage_backend.naive_serde import (CreateSerde,
+                                                              Deserializer,
+                                                              EncodedPayload,
+                                                              Serializer)
 from lmcache.logging import init_logger
 from lmcache.utils import (CacheEngineKey, DiskCacheMetadata,
                            _lmcache_nvtx_annotate)
@@ -27,7 +33,8 @@ class LocalDiskBackend(StorageBackendInterface):
                  config: LMCacheEngineConfig,
                  loop: asyncio.AbstractEventLoop,
                  memory_allocator: MemoryAllocatorInterface,
-                 dst_device: str = "cuda"):
+                 dst_device: str = "cuda",
+                 metadata: Optional[LMCacheEngineMetadata] = None):
         self.dict: OrderedDict[CacheEngineKey,
                                DiskCacheMetadata] = OrderedDict()
         self.dst_device = dst_device
@@ -47,6 +54,17 @@ class LocalDiskBackend(StorageBackendInterface):
 
         self.memory_allocator = memory_allocator
 
+        # The chunks are written as raw bytes ("naive") or encoded with the
+        # serde, e.g., "zstd"
+        self.serde_type = config.local_disk_serde
+        self.serializer: Optional[Serializer] = None
+        self.deserializer: Optional[Deserializer] = None
+        if self.serde_type != "naive":
+            assert metadata is not None, \
+                f"Need the metadata for the {self.serde_type} disk serde"
+            self.serializer, self.deserializer = CreateSerde(
+                self.serde_type, memory_allocator, metadata, config)
+
     def __str__(self):
         return self.__class__.__name__
 
@@ -77,8 +95,9 @@ class LocalDiskBackend(StorageBackendInterface):
     def insert_key(self, key: CacheEngineKey, memory_obj: MemoryObj) -> None:
         path = self._key_to_path(key)
         size = memory_obj.get_size()
-        shape = memory_obj.metadata.shape
-        dtype = memory_obj.metadata.dtype
+        # The shape of an encoded chunk is its size in bytes
+        shape = memory_obj.get_shape()
+        dtype = memory_obj.get_dtype()
         with self.disk_lock:
             # Need to do reinsert to update cache recency
             if key in self.dict:
@@ -90,18 +109,12 @@ class LocalDiskBackend(StorageBackendInterface):
         self,
         key: CacheEngineKey,
         memory_obj: MemoryObj,
+        payload: Optional[EncodedPayload] = None,
     ) -> Optional[Future]:
         assert memory_obj.tensor is not None
 
-        # Update cache recency
-        evict_keys, put_status = self.evictor.update_on_put(
-            self.dict, memory_obj.get_physical_size())
-        if put_status == PutStatus.ILLEGAL:
-            return None
-        # evict caches
-        for evict_key in evict_keys:
-            self.remove(evict_key)
-
+        # Released once the chunk is written, or encoded if it is written
+        # with a serde
         self.memory_allocator.ref_count_up(memory_obj)
 
         self.disk_lock.acquire()
@@ -110,7 +123,7 @@ class LocalDiskBackend(StorageBackendInterface):
 
         #kv_chunk = memory_obj.tensor
         future = asyncio.run_coroutine_threadsafe(
-            self.async_save_bytes_to_disk(key, memory_obj), self.loop)
+            self.async_save_bytes_to_disk(key, memory_obj, payload), self.loop)
         return future
 
     def submit_prefetch_task(
@@ -126,11 +139,16 @@ class LocalDiskBackend(StorageBackendInterface):
         self.evictor.update_on_hit(key, self.dict)
 
         path = self.dict[key].path
+        size = self.dict[key].size
         dtype = self.dict[key].dtype
         shape = self.dict[key].shape
         self.disk_lock.release()
         logger.info(f"Prefetching {key} from disk.")
 
+        if self.deserializer is not None:
+            return asyncio.run_coroutine_threadsafe(
+                self.async_load_encoded_from_disk(path, size), self.loop)
+
         assert dtype is not None
         assert shape is not None
         future = asyncio.run_coroutine_threadsafe(
@@ -153,26 +171,79 @@ class LocalDiskBackend(StorageBackendInterface):
         self.evictor.update_on_hit(key, self.dict)
 
         path = self.dict[key].path
+        size = self.dict[key].size
         dtype = self.dict[key].dtype
         shape = self.dict[key].shape
-        assert dtype is not None
-        assert shape is not None
-        memory_obj = self.load_bytes_from_disk(path, dtype=dtype, shape=shape)
+        memory_obj: Optional[MemoryObj]
+        if self.deserializer is not None:
+            memory_obj = self.load_encoded_from_disk(path, size)
+        else:
+            assert dtype is not None
+            assert shape is not None
+            memory_obj = self.load_bytes_from_disk(path,
+                                                   dtype=dtype,
+                                                   shape=shape)
         self.disk_lock.release()
         return memory_obj
 
+    def _encode(self, memory_obj: MemoryObj,
+                payload: Optional[EncodedPayload]) -> MemoryObj:
+        """
+        Encode the chunk, or reuse the payload encoded by another backend.
+        The encoded buffer is not reference counted.
+        """
+        assert self.serializer is not None
+        if payload is not None:
+            return payload.encode(self.serializer)
+        return self.serializer.serialize(memory_obj)
+
     @_lmcache_nvtx_annotate
     @torch.inference_mode()
     async def async_save_bytes_to_disk(
         self,
         key: CacheEngineKey,
         memory_obj: MemoryObj,
+        payload: Optional[EncodedPayload] = None,
     ) -> None:
         """
         Convert KV to bytes and async store bytes to disk.
         """
-        kv_chunk = memory_obj.tensor
-        assert kv_chunk is not None
+        try:
+            if self.serializer is not None:
+                # Encode in the default executor, off the thread that
+                # stores the KV cache and off the event loop
+                try:
+                    encoded = await self.loop.run_in_executor(
+                        None, self._encode, memory_obj, payload)
+                finally:
+                    self.memory_allocator.ref_count_down(memory_obj)
+                await self._save_to_disk(key, encoded, encoded.get_size())
+            else:
+                try:
+                    await self._save_to_disk(key, memory_obj,
+                                             memory_obj.get_physical_size())
+                finally:
+                    self.memory_allocator.ref_count_down(memory_obj)
+        finally:
+            self.disk_lock.acquire()
+            self.put_tasks.remove(key)
+            self.disk_lock.release()
+
+    async def _save_to_disk(self, key: CacheEngineKey, memory_obj: MemoryObj,
+                            size: int) -> None:
+        """
+        Make room for `size` bytes and write the chunk to disk
+        """
+        # NOTE: locked, as the gets update the recency on other threads
+        with self.disk_lock:
+            evict_keys, put_status = self.evictor.update_on_put(
+                self.dict, size)
+        if put_status == PutStatus.ILLEGAL:
+            return
+        # evict caches
+        for evict_key in evict_keys:
+            self.remove(evict_key)
+
         byte_array = memory_obj.byte_array
         path = self._key_to_path(key)
 
@@ -180,11 +251,6 @@ class LocalDiskBackend(StorageBackendInterface):
             await f.write(byte_array)
 
         self.insert_key(key, memory_obj)
-        self.memory_allocator.ref_count_down(memory_obj)
-
-        self.disk_lock.acquire()
-        self.put_tasks.remove(key)
-        self.disk_lock.release()
 
     # TODO(Jiayi): use `bytes_read = await f.readinto(buffer)`
     # for better performance (i.e., fewer copy)
@@ -227,6 +293,38 @@ class LocalDiskBackend(StorageBackendInterface):
             f.readinto(buffer)
         return memory_obj
 
+    async def async_load_encoded_from_disk(
+        self,
+        path: str,
+        size: int,
+    ) -> Optional[MemoryObj]:
+        """
+        Async load an encoded chunk from disk and decode it.
+        """
+        assert self.deserializer is not None
+        buffer = bytearray(size)
+        async with aiofiles.open(path, 'rb') as f:
+            await f.readinto(buffer)
+        # Decode in the default executor so that the event loop keeps
+        # serving the other requests meanwhile
+        return await self.loop.run_in_executor(None,
+                                               self.deserializer.deserialize,
+                                               BytesBufferMemoryObj(buffer))
+
+    def load_encoded_from_disk(
+        self,
+        path: str,
+        size: int,
+    ) -> Optional[MemoryObj]:
+        """
+        Load an encoded chunk from disk and decode it.
+        """
+        assert self.deserializer is not None
+        buffer = bytearray(size)
+        with open(path, 'rb') as f:
+            f.readinto(buffer)
+        return self.deserializer.deserialize(BytesBufferMemoryObj(buffer))
+
     @_lmcache_nvtx_annotate
     @torch.inference_mode()
     def load_disk(
@@ -9,10 +9,12 @@ from lmcache.experimental.storage_backend.naive_serde.cachegen_encoder import \
     CacheGenSerializer
 from lmcache.experimental.storage_backend.naive_serde.kivi_serde import (
     KIVIDeserializer, KIVISerializer)
+from lmcache.experimental.storage_backend.naive_serde.lossless_serde import (
+    LosslessDeserializer, LosslessSerializer)
 from lmcache.experimental.storage_backend.naive_serde.naive_serde import (
     NaiveDeserializer, NaiveSerializer)
 from lmcache.experimental.storage_backend.naive_serde.serde import (
-    Deserializer, Serializer)
+    Deserializer, EncodedPayload, Serializer)
 
 
 def CreateSerde(
@@ -27,13 +29,19 @@ def CreateSerde(
     if serde_type == "naive":
         s, d = NaiveSerializer(), NaiveDeserializer()
     elif serde_type == "kivi":
-        s, d = KIVISerializer(memory_allocator), \
+        s, d = KIVISerializer(
+                memory_allocator, config.kivi_bits, config.kivi_bits,
+                config.kivi_group_size), \
             KIVIDeserializer(memory_allocator)
     elif serde_type == "cachegen":
         s, d = CacheGenSerializer(
                 config, metadata, memory_allocator), \
             CacheGenDeserializer(
                 config, metadata, memory_allocator)
+    elif serde_type in ["zstd", "lz4"]:
+        s, d = LosslessSerializer(
+                memory_allocator, serde_type, config.compression_level), \
+            LosslessDeserializer(memory_allocator, serde_type)
     else:
         raise ValueError(f"Invalid type: {serde_type}")
 
@@ -43,7 +51,10 @@ def CreateSerde(
 __all__ = [
     "Serializer",
     "Deserializer",
+    "EncodedPayload",
     "KIVISerializer",
     "KIVIDeserializer",
+    "LosslessSerializer",
+    "LosslessDeserializer",
     "CreateSerde",
 ]
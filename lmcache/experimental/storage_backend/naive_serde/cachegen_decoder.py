@@ -13,8 +13,8 @@ from lmcache.experimental.storage_backend.naive_serde.cachegen_basics import \
     CacheGenConfig
 from lmcache.experimental.storage_backend.naive_serde.serde import Deserializer
 from lmcache.logging import init_logger
-from lmcache.storage_backend.serde.cachegen_basics import \
-    CacheGenGPUEncoderOutput
+from lmcache.storage_backend.serde.cachegen_basics import (
+    CacheGenGPUEncoderOutput, get_codec_device)
 from lmcache.storage_backend.serde.cachegen_decoder import (
     decode_function_gpu, do_dequantize)
 from lmcache.utils import _lmcache_nvtx_annotate
@@ -28,11 +28,14 @@ class CacheGenDeserializer(Deserializer):
                  metadata: LMCacheEngineMetadata,
                  memory_allocator: MemoryAllocatorInterface):
         self.dtype = metadata.kv_dtype
-        self.cachegen_config = CacheGenConfig.from_model_name(
-            metadata.model_name)
+        self.cachegen_config = CacheGenConfig.load(metadata.model_name,
+                                                   config.cachegen_profile,
+                                                   metadata.kv_shape[0])
         self.chunk_size = config.chunk_size
         self.output_buffer: Optional[torch.Tensor] = None
         self.fmt = metadata.fmt
+        # The device to decode on, "cuda" or "cpu"
+        self.device = get_codec_device()
         self.key_bins = self.make_key_bins(self.cachegen_config)
         self.value_bins = self.make_value_bins(self.cachegen_config)
 
@@ -42,20 +45,21 @@ class CacheGenDeserializer(Deserializer):
         ret = torch.zeros(config.nlayers)
         for spec in config.kspecs:
             ret[spec.start_layer:spec.end_layer] = spec.bins
-        return ret.cuda()
+        return ret.to(self.device)
 
     def make_value_bins(self, config: CacheGenConfig) -> torch.Tensor:
         ret = torch.zeros(config.nlayers)
         for spec in config.vspecs:
             ret[spec.start_layer:spec.end_layer] = spec.bins
-        return ret.cuda()
+        return ret.to(self.device)
 
     def get_output_buffer(self, nlayers: int, nchannels: int, ntokens: int):
         if (self.output_buffer is None
                 or self.output_buffer.shape[1] != 2 * nlayers * nchannels):
             self.output_buffer = torch.zeros(
                 (self.chunk_size, 2 * nlayers * nchannels),
-                dtype=torch.uint8).cuda()
+                dtype=torch.uint8,
+                device=self.device)
         return self.output_buffer[:ntokens, :]
 
     # TODO(Jiayi): A lot of memory copies can be avoided in this function.
@@ -63,12 +67,10 @@ class CacheGenDeserializer(Deserializer):
     def deserialize(
             self,
             buffer_memory_obj: BytesBufferMemoryObj) -> Optional[MemoryObj]:
+        # The container is unpacked as CPU views, and copied to the GPU
+        # once per tensor
         encoder_output = CacheGenGPUEncoderOutput.from_bytes(
-            buffer_memory_obj.byte_array)
-
-        encoder_output.max_tensors_key = encoder_output.max_tensors_key.cuda()
-        encoder_output.max_tensors_value = (
-            encoder_output.max_tensors_value.cuda())
+            buffer_memory_obj.byte_array).to(self.device)
 
         ntokens = encoder_output.max_tensors_key.shape[1]
         layers_in_key = encoder_output.max_tensors_key.shape[0]
@@ -96,7 +98,7 @@ class CacheGenDeserializer(Deserializer):
             self.key_bins = self.key_bins.to(key.device)
 
         if self.value_bins.device != value.device:
-            self.value_bins = self.value_bins.cuda()
+            self.value_bins = self.value_bins.to(value.device)
 
         key = do_dequantize(key, self.key_bins, encoder_output.max_tensors_key)
         value = do_dequantize(value, self.value_bins,
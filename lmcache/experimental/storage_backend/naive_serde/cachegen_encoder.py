@@ -9,6 +9,7 @@ from lmcache.experimental.storage_backend.naive_serde.cachegen_basics import \
     CacheGenConfig
 from lmcache.experimental.storage_backend.naive_serde.serde import Serializer
 from lmcache.logging import init_logger
+from lmcache.storage_backend.serde.cachegen_basics import get_codec_device
 from lmcache.storage_backend.serde.cachegen_encoder import encode_function
 from lmcache.utils import _lmcache_nvtx_annotate
 
@@ -20,10 +21,13 @@ class CacheGenSerializer(Serializer):
     def __init__(self, config: LMCacheEngineConfig,
                  metadata: LMCacheEngineMetadata,
                  memory_allocator: MemoryAllocatorInterface):
-        self.cachegen_config = CacheGenConfig.from_model_name(
-            metadata.model_name)
+        self.cachegen_config = CacheGenConfig.load(metadata.model_name,
+                                                   config.cachegen_profile,
+                                                   metadata.kv_shape[0])
         self.chunk_size = config.chunk_size
         self.fmt = metadata.fmt
+        # The device to encode on, "cuda" or "cpu"
+        self.device = get_codec_device()
         self.key_bins = self.make_key_bins(self.cachegen_config)
         self.value_bins = self.make_value_bins(self.cachegen_config)
 
@@ -35,13 +39,13 @@ class CacheGenSerializer(Serializer):
         ret = torch.zeros(config.nlayers)
         for spec in config.kspecs:
             ret[spec.start_layer:spec.end_layer] = spec.bins
-        return ret.cuda()
+        return ret.to(self.device)
 
     def make_value_bins(self, config: CacheGenConfig) -> torch.Tensor:
         ret = torch.zeros(config.nlayers)
         for spec in config.vspecs:
             ret[spec.start_layer:spec.end_layer] = spec.bins
-        return ret.cuda()
+        return ret.to(self.device)
 
     # TODO(Jiayi): A lot of memory copies can be avoided in this function.
     @_lmcache_nvtx_annotate
@@ -59,12 +63,12 @@ class CacheGenSerializer(Serializer):
         # TODO(Jiayi): please avoid this copy by directly performing
         # serialization inside gpu connector.
         assert memory_obj.tensor is not None
-        tensor = memory_obj.tensor.cuda()
+        tensor = memory_obj.tensor.to(self.device)
 
         # Temporary fix for issue #83: encoder will have the default device 0
         # on all the ray workers. Need to set it to the correct device.
         # Also need to figure out why this happens.
-        if torch.cuda.current_device != tensor.device:
+        if tensor.is_cuda and torch.cuda.current_device != tensor.device:
             torch.cuda.set_device(tensor.device)
         if tensor.device != self.key_bins.device:
             self.key_bins = self.key_bins.to(tensor.device)
@@ -1,17 +1,182 @@
-from lmcache.experimental.memory_management import (MemoryAllocatorInterface,
+import struct
+from typing import List, Optional, Tuple
+
+import torch
+
+from lmcache.experimental.memory_management import (BytesBufferMemoryObj,
+                                                    MemoryAllocatorInterface,
                                                     MemoryObj)
 from lmcache.experimental.storage_backend.naive_serde.serde import (
     Deserializer, Serializer)
+from lmcache.logging import init_logger
+from lmcache.storage_backend.serde.fast_serde import (CODE_TO_DTYPE,
+                                                      DTYPE_TO_CODE)
+from lmcache.utils import _lmcache_nvtx_annotate
+
+logger = init_logger(__name__)
+
+# The KIVI format (little endian):
+#   header: magic "KIVI" (4s) | version (B) | key bits (B) |
+#           value bits (B) | dtype (B) | group size (I) |
+#           shape of the KV chunk [2, num_layers, num_tokens, hidden] (4I)
+#   payload: the packed keys, the key scales, the key minimums, then the
+#            same for the values. The scales and the minimums are float16.
+# Keys are quantized per channel, in groups of `group size` tokens, and
+# values per token, in groups of `group size` channels. The last group
+# is padded by repeating the last element.
+KIVI_MAGIC = b"KIVI"
+KIVI_VERSION = 1
+KIVI_HEADER = struct.Struct("<4sBBBBI4I")
+KIVI_SUPPORTED_BITS = [2, 4, 8]
+
+
+def _num_groups(n: int, group_size: int) -> int:
+    return (n + group_size - 1) // group_size
+
+
+def _pack(q: torch.Tensor, bits: int) -> torch.Tensor:
+    """
+    Pack the uint8 values of `bits` bits, 8 // bits values per byte
+    """
+    q = q.reshape(-1, 8 // bits)
+    packed = q[:, 0].clone()
+    for i in range(1, q.shape[1]):
+        packed |= q[:, i] << (bits * i)
+    return packed
+
+
+def _unpack(packed: torch.Tensor, bits: int) -> torch.Tensor:
+    shifts = torch.arange(0, 8, bits, dtype=torch.uint8, device=packed.device)
+    mask = (1 << bits) - 1
+    return ((packed[:, None] >> shifts) & mask).reshape(-1)
+
+
+@_lmcache_nvtx_annotate
+def quantize(
+    x: torch.Tensor,
+    bits: int,
+    group_size: int,
+    dim: int,
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    Asymmetric group-wise quantization of a 3-D tensor, each group being
+    `group_size` consecutive elements along `dim`.
+
+    Returns:
+        The packed values, and the float16 scales and minimums of the groups
+    """
+    x = x.float().transpose(dim, -1)
+    n = x.shape[-1]
+    padded = _num_groups(n, group_size) * group_size
+    if padded != n:
+        x = torch.cat([x, x[..., -1:].expand(*x.shape[:-1], padded - n)],
+                      dim=-1)
+    groups = x.reshape(*x.shape[:-1], padded // group_size, group_size)
+
+    qmax = (1 << bits) - 1
+    mn = groups.amin(dim=-1, keepdim=True).half()
+    mx = groups.amax(dim=-1, keepdim=True)
+    # Quantize with the float16 scales and minimums that are stored
+    scale = ((mx - mn.float()) /
+             qmax).half().clamp_(min=torch.finfo(torch.float16).tiny)
+    q = ((groups - mn.float()) / scale.float()).round_().clamp_(0, qmax)
+    return _pack(q.to(torch.uint8), bits), scale, mn
+
+
+@_lmcache_nvtx_annotate
+def dequantize(
+    packed: torch.Tensor,
+    scale: torch.Tensor,
+    mn: torch.Tensor,
+    bits: int,
+    group_size: int,
+    dim: int,
+    shape: Tuple[int, int, int],
+    dtype: torch.dtype,
+) -> torch.Tensor:
+    """
+    The inverse of `quantize`, `shape` being the shape of the input of
+    `quantize`
+    """
+    transposed = list(shape)
+    transposed[dim], transposed[-1] = transposed[-1], transposed[dim]
+    n = transposed[-1]
+    num_groups = _num_groups(n, group_size)
+    q = _unpack(packed, bits).reshape(*transposed[:-1], num_groups, group_size)
+    x = q.float() * scale.reshape(*transposed[:-1], num_groups, 1).float() \
+        + mn.reshape(*transposed[:-1], num_groups, 1).float()
+    x = x.reshape(*transposed[:-1], num_groups * group_size)[..., :n]
+    return x.transpose(dim, -1).to(dtype)
+
+
+def _section_sizes(shape: Tuple[int, int, int], bits: int, group_size: int,
+                   dim: int) -> Tuple[int, int]:
+    """
+    The number of bytes of the packed values and of the scales (or the
+    minimums) of a quantized tensor
+    """
+    num_groups = shape[0] * shape[1] * shape[2] // shape[dim] * \
+        _num_groups(shape[dim], group_size)
+    return num_groups * group_size * bits // 8, num_groups * 2
 
 
 class KIVISerializer(Serializer):
+    """
+    KIVI quantization of the KV cache: the keys are quantized per channel
+    and the values per token, with asymmetric `bits`-bit group-wise
+    quantization.
+    """
 
-    def __init__(self, memory_allocator: MemoryAllocatorInterface):
+    def __init__(self,
+                 memory_allocator: MemoryAllocatorInterface,
+                 key_bits: int = 4,
+                 value_bits: int = 4,
+                 group_size: int = 64):
+        for bits in [key_bits, value_bits]:
+            if bits not in KIVI_SUPPORTED_BITS:
+                raise ValueError(f"Unsupported KIVI bits: {bits}")
+        # Keeps each section of the payload 2-byte aligned
+        if group_size <= 0 or group_size % 8 != 0:
+            raise ValueError("KIVI group size must be a positive multiple "
+                             f"of 8, got {group_size}")
         self.memory_allocator = memory_allocator
+        self.key_bits = key_bits
+        self.value_bits = value_bits
+        self.group_size = group_size
 
+    @_lmcache_nvtx_annotate
     def serialize(self, memory_obj: MemoryObj) -> MemoryObj:
-        # TODO(Yuhan)
-        return memory_obj
+        """
+        Serialize a KV_BLOB MemoryObj of shape
+        [2, num_layers, num_tokens, hidden] to a BytesBufferMemoryObj
+        """
+        assert memory_obj.tensor is not None
+        kv = memory_obj.tensor
+        dtype = kv.dtype
+        if dtype not in DTYPE_TO_CODE or kv.dim() != 4 or kv.shape[0] != 2:
+            raise ValueError(f"Unsupported KV chunk: {dtype}, {kv.shape}")
+
+        # Keys per channel, in groups of tokens
+        key_sections = quantize(kv[0], self.key_bits, self.group_size, 1)
+        # Values per token, in groups of channels
+        value_sections = quantize(kv[1], self.value_bits, self.group_size, 2)
+        sections: List[torch.Tensor] = [*key_sections, *value_sections]
+
+        buffer = bytearray(KIVI_HEADER.size + sum(t.numel() * t.element_size()
+                                                  for t in sections))
+        KIVI_HEADER.pack_into(buffer, 0, KIVI_MAGIC, KIVI_VERSION,
+                              self.key_bits, self.value_bits,
+                              DTYPE_TO_CODE[dtype], self.group_size, *kv.shape)
+        offset = KIVI_HEADER.size
+        for section in sections:
+            nbytes = section.numel() * section.element_size()
+            torch.frombuffer(buffer,
+                             dtype=torch.uint8,
+                             count=nbytes,
+                             offset=offset).copy_(
+                                 section.reshape(-1).view(torch.uint8))
+            offset += nbytes
+        return BytesBufferMemoryObj(buffer)
 
 
 class KIVIDeserializer(Deserializer):
@@ -19,6 +184,44 @@ class KIVIDeserializer(Deserializer):
     def __init__(self, memory_allocator: MemoryAllocatorInterface):
         self.memory_allocator = memory_allocator
 
-    def deserialize(self, memory_obj: MemoryObj) -> MemoryObj:
-        # TODO(Yuhan)
-        return memory_obj
+    @_lmcache_nvtx_annotate
+    def deserialize(self, memory_obj: MemoryObj) -> Optional[MemoryObj]:
+        buffer = memory_obj.byte_array
+        magic, version, key_bits, value_bits, dtype_code, group_size, \
+            *shape = KIVI_HEADER.unpack_from(buffer, 0)
+        if magic != KIVI_MAGIC or version != KIVI_VERSION:
+            raise ValueError(f"Invalid KIVI header: {magic!r}, {version}")
+        dtype = CODE_TO_DTYPE[dtype_code]
+        kv_shape = (shape[1], shape[2], shape[3])
+
+        offset = KIVI_HEADER.size
+        parts = []
+        for bits, dim in [(key_bits, 1), (value_bits, 2)]:
+            packed_size, scale_size = _section_sizes(kv_shape, bits,
+                                                     group_size, dim)
+            packed = torch.frombuffer(buffer,
+                                      dtype=torch.uint8,
+                                      count=packed_size,
+                                      offset=offset)
+            offset += packed_size
+            scale, mn = [
+                torch.frombuffer(buffer,
+                                 dtype=torch.float16,
+                                 count=scale_size // 2,
+                                 offset=offset + i * scale_size)
+                for i in range(2)
+            ]
+            offset += 2 * scale_size
+            parts.append(
+                dequantize(packed, scale, mn, bits, group_size, dim, kv_shape,
+                           dtype))
+
+        kv_memory_obj = self.memory_allocator.allocate(torch.Size(shape),
+                                                       dtype)
+        if kv_memory_obj is None:
+            logger.warning("Memory allocation failed in KIVI deserializer")
+            return None
+        assert kv_memory_obj.tensor is not None
+        kv_memory_obj.tensor[0].copy_(parts[0])
+        kv_memory_obj.tensor[1].copy_(parts[1])
+        return kv_memory_obj
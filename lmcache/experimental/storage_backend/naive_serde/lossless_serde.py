@@ -0,0 +1,52 @@
+from typing import Optional
+
+from lmcache.experimental.memory_management import (BytesBufferMemoryObj,
+                                                    MemoryAllocatorInterface,
+                                                    MemoryObj)
+from lmcache.experimental.storage_backend.naive_serde.serde import (
+    Deserializer, Serializer)
+from lmcache.logging import init_logger
+from lmcache.storage_backend.serde.lossless_serde import LosslessCodec
+from lmcache.utils import _lmcache_nvtx_annotate
+
+logger = init_logger(__name__)
+
+
+class LosslessSerializer(Serializer):
+    """
+    Byte-shuffles the KV chunk and compresses it with zstd or lz4, see
+    lmcache.storage_backend.serde.lossless_serde for the format.
+    """
+
+    def __init__(self,
+                 memory_allocator: MemoryAllocatorInterface,
+                 algorithm: str,
+                 level: int = 3):
+        self.memory_allocator = memory_allocator
+        self.codec = LosslessCodec(algorithm, level)
+
+    @_lmcache_nvtx_annotate
+    def serialize(self, memory_obj: MemoryObj) -> MemoryObj:
+        assert memory_obj.tensor is not None
+        return BytesBufferMemoryObj(self.codec.compress(memory_obj.tensor))
+
+
+class LosslessDeserializer(Deserializer):
+
+    def __init__(self, memory_allocator: MemoryAllocatorInterface,
+                 algorithm: str):
+        self.memory_allocator = memory_allocator
+        self.codec = LosslessCodec(algorithm)
+
+    @_lmcache_nvtx_annotate
+    def deserialize(self, memory_obj: MemoryObj) -> Optional[MemoryObj]:
+        buffer = memory_obj.byte_array
+        dtype, shape = self.codec.read_header(buffer)
+        kv_memory_obj = self.memory_allocator.allocate(shape, dtype)
+        if kv_memory_obj is None:
+            logger.warning("Memory allocation failed in lossless deserializer")
+            return None
+        assert kv_memory_obj.tensor is not None
+        # The blocks are decompressed straight into the allocated buffer
+        self.codec.decompress_into(buffer, kv_memory_obj.tensor)
+        return kv_memory_obj
@@ -1,4 +1,5 @@
 import abc
+import threading
 from typing import Optional
 
 from lmcache.experimental.memory_management import MemoryObj
@@ -35,3 +36,34 @@ class Deserializer(metaclass=abc.ABCMeta):
             None: if the memory allocation fails.
         """
         raise NotImplementedError
+
+
+class EncodedPayload:
+    """
+    A chunk that is stored by several storage backends with the same serde.
+    It is encoded once, by the first backend that stores it (on the thread
+    of that backend), and the other backends reuse the encoded payload.
+
+    Only the serdes that encode into new buffers (i.e., not "naive") are
+    shared, so the encoded payload needs no reference counting.
+    """
+
+    def __init__(self, serde_type: str, memory_obj: MemoryObj):
+        self.serde_type = serde_type
+        self.memory_obj = memory_obj
+        self.encoded: Optional[MemoryObj] = None
+        self.lock = threading.Lock()
+
+    def encode(self, serializer: Serializer) -> MemoryObj:
+        """
+        Encode the chunk with the serializer of the calling backend, or
+        return the payload encoded by another backend.
+
+        Note:
+            The caller must hold a reference to the memory object until
+            this returns.
+        """
+        with self.lock:
+            if self.encoded is None:
+                self.encoded = serializer.serialize(self.memory_obj)
+            return self.encoded
@@ -2,7 +2,7 @@ import asyncio
 import threading
 import time
 from concurrent.futures import Future
-from typing import List, Optional
+from typing import Awaitable, List, Optional
 
 from lmcache.config import LMCacheEngineMetadata
 from lmcache.experimental.config import LMCacheEngineConfig
@@ -11,8 +11,12 @@ from lmcache.experimental.memory_management import (MemoryAllocatorInterface,
 from lmcache.experimental.storage_backend.abstract_backend import \
     StorageBackendInterface
 from lmcache.experimental.storage_backend.connector import CreateConnector
-from lmcache.experimental.storage_backend.naive_serde import CreateSerde
+from lmcache.experimental.storage_backend.naive_serde import (CreateSerde,
+                                                              EncodedPayload,
+                                                              Serializer)
 from lmcache.logging import init_logger
+from lmcache.request_scheduler import AsyncRequestScheduler, Priority
+from lmcache.storage_backend.serde_executor import CreateSerdeExecutor
 from lmcache.utils import CacheEngineKey, _lmcache_nvtx_annotate
 
 logger = init_logger(__name__)
@@ -42,18 +46,45 @@ class RemoteBackend(StorageBackendInterface):
         self.loop = loop
 
         assert config.remote_serde is not None
+        self.serde_type = config.remote_serde
         self.serializer, self.deserializer = CreateSerde(
             config.remote_serde, memory_allocator, metadata, config)
 
+        # The gets go before the background puts on the connection, and
+        # the puts are throttled to the configured bandwidth
+        self.scheduler = AsyncRequestScheduler(config.remote_put_bandwidth *
+                                               1e6)
+        self.max_queued_puts = config.max_queued_remote_puts
+        self.num_dropped_puts = 0
+
+        # The puts are serialized by the serde threads if there are any,
+        # otherwise by the thread that submits them. Each thread has its
+        # own serializer, as they keep state such as buffers
+        remote_serde = config.remote_serde
+        self.serde_executor = CreateSerdeExecutor(
+            "remote", config, lambda: CreateSerde(
+                remote_serde, memory_allocator, metadata, config)[0])
+
         # TODO(Jiayi): If we want to have cache admission policies,
         # we must make decision (whether to send or not) at the local side
 
     def __str__(self):
         return self.__class__.__name__
 
+    async def _exists(self, key: CacheEngineKey) -> bool:
+        async with self.scheduler.request(Priority.GET):
+            return await self.connection.exists(key)
+
+    async def _get(self, key: CacheEngineKey) -> Optional[MemoryObj]:
+        async with self.scheduler.request(Priority.GET):
+            return await self.connection.get(key)
+
+    async def _put(self, key: CacheEngineKey, memory_obj: MemoryObj):
+        async with self.scheduler.request(Priority.PUT, memory_obj.get_size()):
+            await self.connection.put(key, memory_obj)
+
     def contains(self, key: CacheEngineKey) -> bool:
-        future = asyncio.run_coroutine_threadsafe(self.connection.exists(key),
-                                                  self.loop)
+        future = asyncio.run_coroutine_threadsafe(self._exists(key), self.loop)
         return future.result()
 
     def exists_in_put_tasks(self, key: CacheEngineKey) -> bool:
@@ -72,18 +103,34 @@ class RemoteBackend(StorageBackendInterface):
         self,
         key: CacheEngineKey,
         memory_obj: MemoryObj,
+        payload: Optional[EncodedPayload] = None,
     ) -> Optional[Future]:
 
-        self.memory_allocator.ref_count_up(memory_obj)
-
-        self.put_tasks_lock.acquire()
-        self.put_tasks.append(key)
-        self.put_tasks_lock.release()
+        with self.put_tasks_lock:
+            if 0 < self.max_queued_puts <= len(self.put_tasks):
+                # The remote cannot keep up, drop the chunk rather than
+                # holding more KV cache in memory
+                self.num_dropped_puts += 1
+                logger.debug(f"Dropping the put of {key}, "
+                             f"{self.num_dropped_puts} puts dropped so far")
+                return None
+            self.put_tasks.append(key)
 
-        compressed_memory_obj = self.serializer.serialize(memory_obj)
+        self.memory_allocator.ref_count_up(memory_obj)
 
-        future = asyncio.run_coroutine_threadsafe(
-            self.connection.put(key, compressed_memory_obj), self.loop)
+        future: Future
+        if self.serde_executor is None:
+            future = self._serialize_and_put(self.serializer, key, memory_obj,
+                                             payload)
+        else:
+            # Blocks when the serde threads are behind
+            done: Future = Future()
+            serialized = self.serde_executor.submit(key,
+                                                    self._serialize_and_put,
+                                                    key, memory_obj, payload)
+            serialized.add_done_callback(
+                lambda f: self._chain_put_future(f, done))
+            future = done
 
         lambda_callback = lambda f: \
                 self.put_callback(f, key)
@@ -91,11 +138,91 @@ class RemoteBackend(StorageBackendInterface):
 
         return future
 
+    def _serialize_and_put(self, serializer: Serializer, key: CacheEngineKey,
+                           memory_obj: MemoryObj,
+                           payload: Optional[EncodedPayload]) -> Future:
+        try:
+            if payload is not None:
+                compressed_memory_obj = payload.encode(serializer)
+            else:
+                compressed_memory_obj = serializer.serialize(memory_obj)
+        except Exception:
+            self.memory_allocator.ref_count_down(memory_obj)
+            raise
+        if compressed_memory_obj is not memory_obj:
+            # The connector only releases the object it sends
+            self.memory_allocator.ref_count_down(memory_obj)
+
+        return asyncio.run_coroutine_threadsafe(
+            self._put(key, compressed_memory_obj), self.loop)
+
+    @staticmethod
+    def _chain_put_future(serialized: Future, done: Future) -> None:
+        """
+        Complete `done` with the put that `serialized` resolves to, or
+        with the error of the serialization
+        """
+        error = serialized.exception()
+        if error is not None:
+            done.set_exception(error)
+            return
+
+        def copy_state(put: Future) -> None:
+            if put.cancelled():
+                done.cancel()
+            elif put.exception() is not None:
+                done.set_exception(put.exception())
+            else:
+                done.set_result(put.result())
+
+        serialized.result().add_done_callback(copy_state)
+
+    async def _finish_on_cancel(
+            self,
+            awaitable: Awaitable[Optional[MemoryObj]]) -> Optional[MemoryObj]:
+        """
+        Await a step of a prefetch that should not be interrupted. If the
+        prefetch is cancelled meanwhile, the step still finishes, so that
+        the response is read to the end and the connection stays in sync,
+        then its memory object is freed and the cancellation is raised.
+        """
+        task = asyncio.ensure_future(awaitable)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            memory_obj = await task
+            if memory_obj is not None:
+                self.memory_allocator.ref_count_down(memory_obj)
+            raise
+
+    async def _prefetch(self, key: CacheEngineKey) -> Optional[MemoryObj]:
+        # A cancelled prefetch that is still waiting behind the gets is
+        # dropped without being sent
+        async with self.scheduler.request(Priority.PREFETCH):
+            memory_obj = await self._finish_on_cancel(self.connection.get(key))
+        if memory_obj is None:
+            return None
+
+        # Deserialize in the default executor so that the event loop keeps
+        # serving the other requests meanwhile
+        decompressed_memory_obj = await self._finish_on_cancel(
+            self.loop.run_in_executor(None, self.deserializer.deserialize,
+                                      memory_obj))
+        if decompressed_memory_obj is not memory_obj:
+            self.memory_allocator.ref_count_down(memory_obj)
+        return decompressed_memory_obj
+
     def submit_prefetch_task(
         self,
         key: CacheEngineKey,
     ) -> Optional[Future]:
-        pass
+        """
+        Start loading the key from the remote into the local memory. The
+        future resolves to None if the key does not exist in the remote,
+        and cancelling it cancels the prefetch.
+        """
+        logger.debug(f"Prefetching {key} from {self.remote_url}.")
+        return asyncio.run_coroutine_threadsafe(self._prefetch(key), self.loop)
 
     @_lmcache_nvtx_annotate
     def get_blocking(
@@ -106,8 +233,7 @@ class RemoteBackend(StorageBackendInterface):
         Blocking get function.
         """
         t1 = time.perf_counter()
-        future = asyncio.run_coroutine_threadsafe(self.connection.get(key),
-                                                  self.loop)
+        future = asyncio.run_coroutine_threadsafe(self._get(key), self.loop)
         memory_obj = future.result()
 
         t2 = time.perf_counter()
@@ -115,6 +241,8 @@ class RemoteBackend(StorageBackendInterface):
             return None
         obj_size = memory_obj.get_size()
         decompressed_memory_obj = self.deserializer.deserialize(memory_obj)
+        if decompressed_memory_obj is not memory_obj:
+            self.memory_allocator.ref_count_down(memory_obj)
         t3 = time.perf_counter()
         logger.debug(f"Get takes {(t2 - t1) * 1000:.6f} msec, "
                      f"Bytes loaded: {obj_size / 1e6:.4f} MBytes, "
@@ -122,6 +250,8 @@ class RemoteBackend(StorageBackendInterface):
         return decompressed_memory_obj
 
     def close(self):
+        if self.serde_executor is not None:
+            self.serde_executor.close()
         future = asyncio.run_coroutine_threadsafe(self.connection.close(),
                                                   self.loop)
         future.result()
@@ -2,6 +2,7 @@ import asyncio
 import threading
 from collections import OrderedDict
 from concurrent.futures import Future
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 
 import torch
@@ -14,12 +15,23 @@ from lmcache.experimental.memory_management import (MemoryAllocatorInterface,
 from lmcache.experimental.storage_backend import CreateStorageBackends
 from lmcache.experimental.storage_backend.abstract_backend import \
     StorageBackendInterface
+from lmcache.experimental.storage_backend.naive_serde import EncodedPayload
 from lmcache.logging import init_logger
 from lmcache.utils import CacheEngineKey, _lmcache_nvtx_annotate
 
 logger = init_logger(__name__)
 
 
+@dataclass
+class _InflightGet:
+    """
+    A get that is fetching a key from the storage backends. The other gets
+    of the same key wait for its result instead of fetching it again.
+    """
+    future: Future = field(default_factory=Future)
+    num_waiters: int = 0
+
+
 # TODO: extend this class to implement caching policies and eviction policies
 class StorageManager:
     """
@@ -43,6 +55,7 @@ class StorageManager:
             CreateStorageBackends(
                 config, metadata, self.loop, allocator, dst_device)
         self.prefetch_tasks: Dict[CacheEngineKey, Future] = {}
+        self.inflight_gets: Dict[CacheEngineKey, _InflightGet] = {}
         self.put_tasks: Dict[str, Dict[CacheEngineKey, Tuple[Future,
                                                              MemoryObj]]] = {}
 
@@ -129,9 +142,18 @@ class StorageManager:
                 return
         self.manager_lock.release()
 
-        #ever_put = False
+        # The backends with the same serde share the encoded chunk, so
+        # that it is encoded once
+        payloads: Dict[str, EncodedPayload] = {}
         for backend_name, backend in self.storage_backends.items():
-            put_task = backend.submit_put_task(key, memory_obj)
+            serde_type = backend.serde_type
+            payload = None
+            if serde_type != "naive":
+                if serde_type not in payloads:
+                    payloads[serde_type] = EncodedPayload(
+                        serde_type, memory_obj)
+                payload = payloads[serde_type]
+            put_task = backend.submit_put_task(key, memory_obj, payload)
 
             if put_task is None:
                 continue
@@ -205,7 +227,12 @@ class StorageManager:
             # Calling result() twice (already once in callback) will have
             # no effect
             # Tune the timeout for better performance
-            prefetch_task.result(timeout=1)
+            try:
+                prefetch_task.result(timeout=1)
+            except Exception as e:
+                # Cancelled, failed or too slow, fall back to the blocking
+                # get. The hot cache keeps the first of the two results.
+                logger.debug(f"Prefetch of {key} did not finish: {e!r}")
 
         # Search in hot_cache
         self.manager_lock.acquire()
@@ -216,9 +243,41 @@ class StorageManager:
             self.manager_lock.release()
             return memory_obj
 
+        inflight = self.inflight_gets.get(key, None)
+        if inflight is not None:
+            # Share the memory object of the ongoing get, which takes a
+            # reference for each waiter before publishing it
+            inflight.num_waiters += 1
+            self.manager_lock.release()
+            return inflight.future.result()
+
+        inflight = _InflightGet()
+        self.inflight_gets[key] = inflight
         self.manager_lock.release()
 
-        # Search all backends for blocking get
+        try:
+            memory_obj = self._get_from_backends(key)
+        except Exception as e:
+            with self.manager_lock:
+                self.inflight_gets.pop(key)
+            inflight.future.set_exception(e)
+            raise
+
+        with self.manager_lock:
+            self.inflight_gets.pop(key)
+            if memory_obj is not None:
+                for _ in range(inflight.num_waiters):
+                    self.memory_allocator.ref_count_up(memory_obj)
+        if inflight.num_waiters > 0:
+            logger.debug(f"Shared the get of {key} with "
+                         f"{inflight.num_waiters} concurrent gets")
+        inflight.future.set_result(memory_obj)
+        return memory_obj
+
+    def _get_from_backends(self, key: CacheEngineKey) -> Optional[MemoryObj]:
+        """
+        Search all backends for blocking get
+        """
         for backend_name, backend in self.storage_backends.items():
             # Avoid read-write contention
             #if key in self.put_tasks[backend_name]:
@@ -233,43 +292,45 @@ class StorageManager:
         return None
 
     # TODO(Jiayi): we need to consider eviction in prefetch
-    def prefetch_callback(self, future, key):
+    def prefetch_callback(self, future: Future, key: CacheEngineKey,
+                          done: Future):
         """
-        Update metadata after prefetch.
+        Update metadata after prefetch, then complete `done` that the gets
+        of the key wait for.
         """
         self.manager_lock.acquire()
-        prefetch_task = self.prefetch_tasks.pop(key)
+        if self.prefetch_tasks.get(key) is done:
+            self.prefetch_tasks.pop(key)
         self.manager_lock.release()
+
+        if future.cancelled():
+            done.cancel()
+            return
+        if not done.set_running_or_notify_cancel():
+            # Cancelled while finishing, drop the result
+            if future.exception() is None and future.result() is not None:
+                self.memory_allocator.ref_count_down(future.result())
+            return
         try:
-            buffer_memory_obj = prefetch_task.result()
+            buffer_memory_obj = future.result()
         except Exception as e:
             logger.error(
                 f"Exception captured from future in prefetch_callback: {e}")
-            raise e
-        kv_chunk = buffer_memory_obj.tensor
-        kv_shape = kv_chunk.shape
-        kv_dtype = kv_chunk.dtype
-        memory_obj = self.memory_allocator.allocate(kv_shape, kv_dtype)
-        if memory_obj is None:
-            logger.warning("Memory allocation failed in prefetch_callback")
+            done.set_exception(e)
             return
 
-        assert memory_obj.tensor is not None, "Encounter invalid tensor"
-
-        # TODO(Jiayi): this part should be done in another process if
-        # the cpu->pinned cpu copy is blocking.
-        prefetch_stream = torch.cuda.Stream()
-        with torch.cuda.stream(prefetch_stream):
-            memory_obj.tensor.copy_(kv_chunk, non_blocking=True)
-        prefetch_stream.synchronize()
-        # TODO(Jiayi): please remove this hardcode
-        memory_obj.metadata.fmt = MemoryFormat.KV_BLOB
+        if buffer_memory_obj is not None:
+            # TODO(Jiayi): please remove this hardcode
+            buffer_memory_obj.metadata.fmt = MemoryFormat.KV_BLOB
 
-        # NOTE: no need to ref_count_up here because
-        # the memory_obj's ref_count is already 1
-        self.manager_lock.acquire()
-        self.hot_cache[key] = memory_obj
-        self.manager_lock.release()
+            # The buffer was allocated by the backend for this prefetch, so
+            # the hot cache takes it over (or a copy of it if it is on the
+            # GPU) instead of copying it into another pinned buffer
+            self._update_hot_cache(key, buffer_memory_obj)
+            self.manager_lock.acquire()
+            self.memory_allocator.ref_count_down(buffer_memory_obj)
+            self.manager_lock.release()
+        done.set_result(None)
 
     def prefetch(self, key: CacheEngineKey) -> None:
         """Launch a prefetch request in the storage backend. Non-blocking
@@ -289,15 +350,40 @@ class StorageManager:
             prefetch_task = backend.submit_prefetch_task(key)
             if prefetch_task is None:
                 continue
-            lambda_callback = lambda f: \
-                self.prefetch_callback(f, key)
+
+            # Cancelling the prefetch cancels the task in the backend
+            done: Future = Future()
+
+            def cancel_task(f: Future,
+                            task: Optional[Future] = prefetch_task) -> None:
+                if f.cancelled() and task is not None:
+                    task.cancel()
+
+            done.add_done_callback(cancel_task)
+            lambda_callback = lambda f, done=done: \
+                self.prefetch_callback(f, key, done)
 
             self.manager_lock.acquire()
-            self.prefetch_tasks[key] = prefetch_task
-            prefetch_task.add_done_callback(lambda_callback)
+            self.prefetch_tasks[key] = done
             self.manager_lock.release()
+            # NOTE: the callback runs right away if the task is already
+            # done, so it must be added without holding the lock
+            prefetch_task.add_done_callback(lambda_callback)
             break
 
+    def cancel_prefetch(self, key: CacheEngineKey) -> bool:
+        """Cancel the prefetch of the key, e.g., when its request is
+        aborted. A prefetch that has not been sent to the backend yet is
+        dropped, and the result of an ongoing one is freed.
+
+        :return: True if a prefetch of the key was cancelled.
+        """
+        with self.manager_lock:
+            prefetch_task = self.prefetch_tasks.pop(key, None)
+        if prefetch_task is None:
+            return False
+        return prefetch_task.cancel()
+
     # TODO(Jiayi): Currently, search_range is only used for testing.
     def contains(
         self,
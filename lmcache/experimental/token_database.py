@@ -49,9 +49,16 @@ class ChunkedTokenDatabase(TokenDatabase):
                  metadata: LMCacheEngineMetadata):
         self.chunk_size = config.chunk_size
         self.metadata = metadata
+        self.fmt = metadata.fmt
+        if config.fp8_format is not None:
+            # The fp8 chunks are keyed apart from those in the model dtype
+            # and those of the other fp8 modes, so that the engines sharing
+            # a remote server or a disk never load each other's chunks
+            self.fmt = f"{metadata.fmt}-fp8_{config.fp8_format}" \
+                f"_{config.fp8_scale_granularity}"
 
     def _make_key_by_hash(self, chunk_hash: str):
-        return CacheEngineKey(self.metadata.fmt, self.metadata.model_name,
+        return CacheEngineKey(self.fmt, self.metadata.model_name,
                               self.metadata.world_size,
                               self.metadata.worker_id, chunk_hash)
 
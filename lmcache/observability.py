@@ -26,12 +26,15 @@ class LMCacheStats:
 
     local_cache_usage_bytes: int  # Size of the used local cache in bytes
     remote_cache_usage_bytes: int  # Size of the used remote cache in bytes
+    put_queue_depth: int  # Number of queued non-blocking puts
+    num_dropped_puts: int  # Number of puts dropped since the last log
 
     # Distribution measurements
     time_to_retrieve: List[float]
     time_to_store: List[float]
     retrieve_speed: List[float]  # Tokens per second
     store_speed: List[float]  # Tokens per second
+    put_queue_wait_time: List[float]  # Seconds in the put queue
 
 
 @dataclass
@@ -88,6 +91,12 @@ class LMCStatsMonitor:
         self.local_cache_usage_bytes = 0
         self.remote_cache_usage_bytes = 0
 
+        # The depth of the put queue of each backend
+        self.put_queue_depths: Dict[str, int] = {}
+        self.num_dropped_puts = 0
+        self.interval_dropped_puts = 0
+        self.put_queue_wait_times: List[float] = []
+
         self.retrieve_requests: Dict[int, RetrieveRequestStats] = {}
         self.store_requests: Dict[int, StoreRequestStats] = {}
 
@@ -152,6 +161,19 @@ class LMCStatsMonitor:
     def update_remote_cache_usage(self, usage: int):
         self.remote_cache_usage_bytes = usage
 
+    @thread_safe
+    def update_put_queue_depth(self, name: str, depth: int):
+        self.put_queue_depths[name] = depth
+
+    @thread_safe
+    def on_put_dequeued(self, wait_time: float):
+        self.put_queue_wait_times.append(wait_time)
+
+    @thread_safe
+    def on_put_dropped(self):
+        self.num_dropped_puts += 1
+        self.interval_dropped_puts += 1
+
     @thread_safe
     def _clear(self):
         """
@@ -159,6 +181,8 @@ class LMCStatsMonitor:
         """
         self.interval_requested_tokens = 0
         self.interval_hit_tokens = 0
+        self.interval_dropped_puts = 0
+        self.put_queue_wait_times = []
 
         new_retrieve_requests = {}
         for request_id, retrieve_stats in self.retrieve_requests.items():
@@ -210,10 +234,13 @@ class LMCStatsMonitor:
             cache_hit_rate=cache_hit_rate,
             local_cache_usage_bytes=self.local_cache_usage_bytes,
             remote_cache_usage_bytes=self.remote_cache_usage_bytes,
+            put_queue_depth=sum(self.put_queue_depths.values()),
+            num_dropped_puts=self.interval_dropped_puts,
             time_to_retrieve=time_to_retrieve,
             time_to_store=time_to_store,
             retrieve_speed=retrieve_speed,
             store_speed=store_speed,
+            put_queue_wait_time=self.put_queue_wait_times,
         )
         self._clear()
         return ret
@@ -284,6 +311,19 @@ class PrometheusLogger:
             labelnames=labelnames,
             multiprocess_mode="sum")
 
+        self.gauge_put_queue_depth = self._gauge_cls(
+            name="lmcache:put_queue_depth",
+            documentation="Number of queued non-blocking puts of lmcache",
+            labelnames=labelnames,
+            multiprocess_mode="sum")
+
+        self.counter_num_dropped_puts = self._counter_cls(
+            name="lmcache:num_dropped_puts",
+            documentation="Total number of puts dropped because the put "
+            "queue is full",
+            labelnames=labelnames,
+        )
+
         time_to_retrieve_buckets = [
             0.001, 0.005, 0.01, 0.02, 0.04, 0.06, 0.08, 0.1, 0.25, 0.5, 0.75,
             1.0, 2.5, 5.0, 7.5, 10.0
@@ -328,6 +368,17 @@ class PrometheusLogger:
             buckets=store_speed_buckets,
         )
 
+        put_queue_wait_time_buckets = [
+            0.001, 0.005, 0.01, 0.02, 0.04, 0.06, 0.08, 0.1, 0.25, 0.5, 0.75,
+            1.0, 2.5, 5.0, 7.5, 10.0
+        ]
+        self.histogram_put_queue_wait_time = self._histogram_cls(
+            name="lmcache:put_queue_wait_time",
+            documentation="Time the chunks wait in the put queue (seconds)",
+            labelnames=labelnames,
+            buckets=put_queue_wait_time_buckets,
+        )
+
     def _log_gauge(self, gauge, data: Union[int, float]) -> None:
         # Convenience function for logging to gauge.
         gauge.labels(**self.labels).set(data)
@@ -373,6 +424,12 @@ class PrometheusLogger:
 
         self._log_histogram(self.histogram_store_speed, stats.store_speed)
 
+        self._log_gauge(self.gauge_put_queue_depth, stats.put_queue_depth)
+        self._log_counter(self.counter_num_dropped_puts,
+                          stats.num_dropped_puts)
+        self._log_histogram(self.histogram_put_queue_wait_time,
+                            stats.put_queue_wait_time)
+
     @staticmethod
     def _metadata_to_labels(metadata: LMCacheEngineMetadata):
         return {
@@ -0,0 +1,157 @@
+import asyncio
+import enum
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, List
+
+from lmcache.logging import init_logger
+
+logger = init_logger(__name__)
+
+
+class Priority(enum.IntEnum):
+    """
+    The priority of a request to a remote backend, lower is served first
+    """
+    GET = 0
+    PREFETCH = 1
+    PUT = 2
+
+
+class TokenBucket:
+    """
+    Limits the rate of the puts to `rate` bytes per second, allowing
+    bursts of up to `burst` bytes. A rate of 0 means unlimited.
+
+    NOTE: a request larger than the bucket is allowed once the bucket is
+    full, and the bucket then goes into debt, so that large chunks are
+    not blocked forever.
+    """
+
+    def __init__(self, rate: float, burst: float = 0.0):
+        self.rate = rate
+        # One second of traffic by default
+        self.burst = burst if burst > 0 else rate
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, nbytes: int) -> float:
+        """
+        Take `nbytes` tokens from the bucket.
+
+        Returns:
+            The time in seconds to wait before sending the request
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            # Wait until the bucket is full for the oversized requests
+            needed = min(nbytes, self.burst)
+            delay = max(0.0, (needed - self.tokens) / self.rate)
+            self.tokens -= nbytes
+            return delay
+
+
+class _SchedulerState:
+    """
+    Gets are served right away, prefetches wait for the ongoing gets, and
+    puts wait for the ongoing and waiting gets and prefetches. At most
+    `max_inflight_puts` puts are sent at the same time, so that a get
+    only waits behind a few puts on a shared connection instead of the
+    whole backlog.
+    """
+
+    def __init__(self, put_bandwidth: float, max_inflight_puts: int):
+        self.bucket = TokenBucket(put_bandwidth)
+        self.max_inflight_puts = max_inflight_puts
+        self.active: List[int] = [0] * len(Priority)
+        self.waiting: List[int] = [0] * len(Priority)
+
+    def can_start(self, priority: Priority) -> bool:
+        match priority:
+            case Priority.GET:
+                return True
+            case Priority.PREFETCH:
+                return self.active[Priority.GET] == 0
+            case Priority.PUT:
+                busy = (self.active[Priority.GET] +
+                        self.active[Priority.PREFETCH] +
+                        self.waiting[Priority.PREFETCH])
+                return busy == 0 and \
+                    self.active[Priority.PUT] < self.max_inflight_puts
+        return True
+
+
+class RequestScheduler(_SchedulerState):
+    """
+    Schedules the requests of the threads that share a remote connection.
+
+    Example:
+        with scheduler.request(Priority.PUT, len(data)):
+            connection.set(key, data)
+    """
+
+    def __init__(self, put_bandwidth: float = 0.0, max_inflight_puts: int = 1):
+        super().__init__(put_bandwidth, max_inflight_puts)
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def request(self, priority: Priority, nbytes: int = 0) -> Iterator[None]:
+        with self.cond:
+            self.waiting[priority] += 1
+            self.cond.wait_for(lambda: self.can_start(priority))
+            self.waiting[priority] -= 1
+            self.active[priority] += 1
+        try:
+            if priority == Priority.PUT:
+                delay = self.bucket.reserve(nbytes)
+                if delay > 0:
+                    time.sleep(delay)
+            yield
+        finally:
+            with self.cond:
+                self.active[priority] -= 1
+                self.cond.notify_all()
+
+
+class AsyncRequestScheduler(_SchedulerState):
+    """
+    Schedules the coroutines that share a remote connection on one event
+    loop. It should only be used in that event loop.
+
+    Example:
+        async with scheduler.request(Priority.GET):
+            memory_obj = await connection.get(key)
+    """
+
+    def __init__(self, put_bandwidth: float = 0.0, max_inflight_puts: int = 1):
+        super().__init__(put_bandwidth, max_inflight_puts)
+        self.cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def request(self,
+                      priority: Priority,
+                      nbytes: int = 0) -> AsyncIterator[None]:
+        async with self.cond:
+            self.waiting[priority] += 1
+            try:
+                await self.cond.wait_for(lambda: self.can_start(priority))
+            finally:
+                self.waiting[priority] -= 1
+            self.active[priority] += 1
+        try:
+            if priority == Priority.PUT:
+                delay = self.bucket.reserve(nbytes)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield
+        finally:
+            async with self.cond:
+                self.active[priority] -= 1
+                self.cond.notify_all()
@@ -1,30 +1,63 @@
+import argparse
+import signal
 import socket
+import sys
 import threading
 import time
+from typing import Optional
 
+from lmcache.logging import init_logger
 from lmcache.protocol import ClientMetaMessage, Constants, ServerMetaMessage
 from lmcache.server.server_storage_backend import CreateStorageBackend
+from lmcache.socket_utils import configure_socket, recv_exactly, send_vectored
+
+logger = init_logger(__name__)
 
 
 class LMCacheServer:
 
-    def __init__(self, host, port, device):
+    def __init__(self,
+                 host,
+                 port,
+                 device,
+                 max_size: float = 10.0,
+                 snapshot_path: Optional[str] = None,
+                 snapshot_interval: float = 0.0):
         self.host = host
         self.port = port
         # self.data_store = {}
-        self.data_store = CreateStorageBackend(device)
+        self.data_store = CreateStorageBackend(device, max_size, snapshot_path)
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        configure_socket(self.server_socket)
         self.server_socket.bind((host, port))
         self.server_socket.listen()
 
+        self.snapshot_path = snapshot_path
+        self.snapshot_event = threading.Event()
+        if snapshot_path is not None:
+            # `kill -USR1` takes a snapshot on demand, and SIGTERM takes
+            # one before exiting
+            signal.signal(signal.SIGUSR1,
+                          lambda signum, frame: self.snapshot_event.set())
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            threading.Thread(target=self.snapshot_loop,
+                             args=(snapshot_interval, ),
+                             daemon=True).start()
+
+    def snapshot_loop(self, interval: float):
+        """
+        Take a snapshot every `interval` seconds (0 means only on demand)
+        """
+        while True:
+            self.snapshot_event.wait(interval if interval > 0 else None)
+            self.snapshot_event.clear()
+            try:
+                self.data_store.snapshot()
+            except Exception as e:
+                logger.error(f"Failed to take a snapshot: {e}")
+
     def receive_all(self, client_socket, n):
-        data = bytearray()
-        while len(data) < n:
-            packet = client_socket.recv(n - len(data))
-            if not packet:
-                return None
-            data.extend(packet)
-        return data
+        return recv_exactly(client_socket, n)
 
     def handle_client(self, client_socket):
         try:
@@ -46,7 +79,7 @@ class LMCacheServer:
                         # client_socket.sendall(ServerMetaMessage(
                         # Constants.SERVER_SUCCESS, 0).serialize())
                         # t3 = time.perf_counter()
-                        print(
+                        logger.debug(
                             f"Time to receive data: {t1 - t0}, time to store "
                             f"data: {t2 - t1}")
 
@@ -56,17 +89,15 @@ class LMCacheServer:
                         data_string = self.data_store.get(meta.key)
                         t1 = time.perf_counter()
                         if data_string is not None:
-                            client_socket.sendall(
+                            send_vectored(client_socket, [
                                 ServerMetaMessage(
                                     Constants.SERVER_SUCCESS,
-                                    len(data_string)).serialize())
+                                    len(data_string)).serialize(), data_string
+                            ])
                             t2 = time.perf_counter()
-                            client_socket.sendall(data_string)
-                            t3 = time.perf_counter()
-                            print(
-                                f"Time to get data: {t1 - t0}, time to send "
-                                f"meta: {t2 - t1}, time to send data: {t3 - t2}"
-                            )
+                            logger.debug(
+                                f"Time to get data: {t1 - t0}, time to "
+                                f"send data: {t2 - t1}")
                         else:
                             client_socket.sendall(
                                 ServerMetaMessage(Constants.SERVER_FAIL,
@@ -84,10 +115,10 @@ class LMCacheServer:
                     case Constants.CLIENT_LIST:
                         keys = list(self.data_store.list_keys())
                         data = "\n".join(keys).encode()
-                        client_socket.sendall(
+                        send_vectored(client_socket, [
                             ServerMetaMessage(Constants.SERVER_SUCCESS,
-                                              len(data)).serialize())
-                        client_socket.sendall(data)
+                                              len(data)).serialize(), data
+                        ])
 
         finally:
             client_socket.close()
@@ -97,28 +128,50 @@ class LMCacheServer:
         try:
             while True:
                 client_socket, addr = self.server_socket.accept()
+                configure_socket(client_socket)
                 print(f"Connected by {addr}")
                 threading.Thread(target=self.handle_client,
-                                 args=(client_socket, )).start()
+                                 args=(client_socket, ),
+                                 daemon=True).start()
         finally:
             self.server_socket.close()
+            if self.snapshot_path is not None:
+                self.data_store.snapshot()
+            self.data_store.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="LMCache server")
+    parser.add_argument("host", type=str)
+    parser.add_argument("port", type=int)
+    parser.add_argument("device",
+                        type=str,
+                        nargs="?",
+                        default="cpu",
+                        help="The storage device (default: cpu)")
+    parser.add_argument("--max-size",
+                        type=float,
+                        default=10.0,
+                        help="The capacity of the cache server in GB")
+    parser.add_argument("--snapshot",
+                        type=str,
+                        default=None,
+                        help="The file to save the cache to on shutdown, "
+                        "periodically and on SIGUSR1. The cache is restored "
+                        "from it on startup.")
+    parser.add_argument("--snapshot-interval",
+                        type=float,
+                        default=0.0,
+                        help="Seconds between the periodic snapshots, 0 to "
+                        "disable (default: 0)")
+    return parser.parse_args()
 
 
 def main():
-    import sys
-
-    if len(sys.argv) not in [3, 4]:
-        print(f"Usage: {sys.argv[0]} <host> <port> <storage>(default:cpu)")
-        exit(1)
-
-    host = sys.argv[1]
-    port = int(sys.argv[2])
-    if len(sys.argv) == 4:
-        device = sys.argv[3]
-    else:
-        device = "cpu"
+    args = parse_args()
 
-    server = LMCacheServer(host, port, device)
+    server = LMCacheServer(args.host, args.port, args.device, args.max_size,
+                           args.snapshot, args.snapshot_interval)
     server.run()
 
 
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from lmcache.logging import init_logger
 from lmcache.server.server_storage_backend.abstract_backend import \
     LMSBackendInterface
@@ -7,14 +9,20 @@ from lmcache.server.server_storage_backend.local_backend import (
 logger = init_logger(__name__)
 
 
-def CreateStorageBackend(device: str) -> LMSBackendInterface:
+def CreateStorageBackend(
+        device: str,
+        max_size: float = 10.0,
+        snapshot_path: Optional[str] = None) -> LMSBackendInterface:
     match device:
         case "cpu":
             # cpu only
             logger.info("Initializing cpu-only cache server")
-            return LMSLocalBackend()
+            return LMSLocalBackend(max_size, snapshot_path)
 
         case _:
             # cpu only
             logger.info("Initializing disk-only cache server")
-            return LMSLocalDiskBackend(path=device)
+            if snapshot_path is not None:
+                logger.warning("Snapshots are not needed for the disk-only "
+                               "cache server and are ignored")
+            return LMSLocalDiskBackend(path=device, max_size=max_size)
@@ -1,8 +1,6 @@
 import abc
 from typing import List, Optional
 
-import torch
-
 from lmcache.logging import init_logger
 
 logger = init_logger(__name__)
@@ -49,7 +47,7 @@ class LMSBackendInterface(metaclass=abc.ABCMeta):
     def get(
         self,
         key: str,
-    ) -> Optional[torch.Tensor]:
+    ) -> Optional[bytes]:
         """
         Retrieve the KV cache chunk by the given key
 
@@ -57,7 +55,7 @@ class LMSBackendInterface(metaclass=abc.ABCMeta):
             key: the key of the token chunk, including prefix hash and format
 
         Output:
-            the kv cache of the token chunk, in the format of a big tensor
+            the serialized bytes of the token chunk, as they were put
             None if the key is not found
         """
         raise NotImplementedError
@@ -76,6 +74,14 @@ class LMSBackendInterface(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    def snapshot(self) -> None:
+        """
+        Save the cache to persistent storage so that it can be restored
+        after a restart.
+        Children classes should override this method if necessary
+        """
+        return
+
     @abc.abstractmethod
     def close(self):
         """
@@ -1,12 +1,17 @@
 import os
 import threading
+import time
 from collections import OrderedDict
-from typing import List, Optional
+from functools import partial
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 
 from lmcache.logging import init_logger
 from lmcache.server.server_storage_backend.abstract_backend import \
     LMSBackendInterface
-from lmcache.storage_backend.evictor import DummyEvictor
+from lmcache.server.server_storage_backend.snapshot import (ReadSnapshotIndex,
+                                                            SnapshotPayload,
+                                                            WriteSnapshot)
+from lmcache.storage_backend.evictor import LRUEvictor
 from lmcache.storage_backend.evictor.base_evictor import PutStatus
 from lmcache.utils import DiskCacheMetadata, _lmcache_nvtx_annotate
 
@@ -19,19 +24,157 @@ class LMSLocalBackend(LMSBackendInterface):
     memory.
     """
 
-    def __init__(self, ):
+    def __init__(self,
+                 max_size: float = 10.0,
+                 snapshot_path: Optional[str] = None):
         """
+        Input:
+            max_size: the capacity of the cache server in GB
+            snapshot_path: the file to save the snapshots to. If it
+                exists, the cache is restored from it.
+
         Throws:
             RuntimeError if the loaded configuration does not match the current 
             configuration
         """
         super().__init__()
 
-        self.dict: OrderedDict[str, bytearray] = OrderedDict()
+        # The chunks restored from a snapshot are DiskCacheMetadata until
+        # they are read into memory
+        self.dict: OrderedDict[str, Union[bytearray, DiskCacheMetadata]] = \
+            OrderedDict()
 
         self.update_lock = threading.Lock()
 
-        self.evictor = DummyEvictor()
+        self.evictor = LRUEvictor(max_size)
+
+        self.num_evictions = 0
+        self.evicted_bytes = 0
+
+        self.snapshot_path = snapshot_path
+        self.snapshot_lock = threading.Lock()
+        # The snapshot that the cache was restored from, and the offsets of
+        # the chunks that have not been read yet
+        self.snapshot_file: Optional[BinaryIO] = None
+        self.snapshot_offsets: Dict[str, int] = {}
+        self.loader_thread: Optional[threading.Thread] = None
+        self.closing = False
+
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            self._restore(snapshot_path)
+
+    def _restore(self, path: str) -> None:
+        """
+        Load the index of the snapshot. The chunks are read on demand or
+        by a background thread, so the server starts serving right away.
+        """
+        f = open(path, "rb")
+        try:
+            entries = ReadSnapshotIndex(f)
+        except ValueError as e:
+            logger.error(f"Failed to restore from {path}: {e}")
+            f.close()
+            return
+
+        self.snapshot_file = f
+        with self.update_lock:
+            for key, offset, length in entries:
+                entry = DiskCacheMetadata(path, length)
+                evict_keys, put_status = self.evictor.update_on_put(
+                    self.dict, self._entry_size(entry))
+                if put_status == PutStatus.ILLEGAL:
+                    continue
+                for evict_key in evict_keys:
+                    self.remove(evict_key)
+                self.dict[key] = entry
+                self.snapshot_offsets[key] = offset
+        logger.info(f"Restored the index of {len(self.dict)} chunks "
+                    f"from {path}")
+
+        self.loader_thread = threading.Thread(target=self._load_snapshot,
+                                              daemon=True)
+        self.loader_thread.start()
+
+    def _entry_size(self, entry: Union[bytearray, DiskCacheMetadata]) -> int:
+        """
+        The size of a chunk in bytes, whether it is in memory or still in
+        the snapshot
+        """
+        if isinstance(entry, DiskCacheMetadata):
+            return entry.size
+        return self.evictor.get_size(entry)
+
+    def _read_snapshot_chunk(self, offset: int, length: int) -> bytearray:
+        assert self.snapshot_file is not None
+        buffer = bytearray(length)
+        # pread does not move the file position, so it is thread-safe
+        num_bytes = os.preadv(self.snapshot_file.fileno(), [buffer], offset)
+        if num_bytes != length:
+            raise IOError(f"Snapshot chunk at {offset} is truncated")
+        return buffer
+
+    def _page_in(self, key: str) -> Optional[bytearray]:
+        """
+        Read a restored chunk into memory.
+        Should be called without the lock held.
+        """
+        with self.update_lock:
+            entry = self.dict.get(key, None)
+            if not isinstance(entry, DiskCacheMetadata):
+                return entry
+            offset = self.snapshot_offsets[key]
+
+        kv_chunk = self._read_snapshot_chunk(offset, entry.size)
+
+        with self.update_lock:
+            # The chunk may have been evicted or read by another thread
+            if self.dict.get(key, None) is entry:
+                # NOTE: assigning to an existing key keeps the LRU order
+                self.dict[key] = kv_chunk
+                self.snapshot_offsets.pop(key, None)
+        return kv_chunk
+
+    def _load_snapshot(self) -> None:
+        """
+        Read the remaining restored chunks in the background
+        """
+        start = time.perf_counter()
+        with self.update_lock:
+            keys = list(self.snapshot_offsets.keys())
+        for key in keys:
+            if self.closing:
+                return
+            self._page_in(key)
+        logger.info(f"Loaded {len(keys)} chunks from the snapshot in "
+                    f"{time.perf_counter() - start:.2f} seconds")
+
+    def snapshot(self) -> None:
+        """
+        Save all the chunks to the snapshot file. The chunks are written
+        without holding the lock, so the server keeps serving meanwhile.
+        """
+        if self.snapshot_path is None:
+            logger.warning("No snapshot path is configured")
+            return
+
+        with self.snapshot_lock:
+            start = time.perf_counter()
+            # NOTE: the chunks are never modified in place, so a shallow
+            # copy is a consistent view of the cache
+            with self.update_lock:
+                items: List[Tuple[str, SnapshotPayload]] = []
+                for key, value in self.dict.items():
+                    if isinstance(value, DiskCacheMetadata):
+                        items.append(
+                            (key,
+                             partial(self._read_snapshot_chunk,
+                                     self.snapshot_offsets[key], value.size)))
+                    else:
+                        items.append((key, value))
+
+            num_chunks = WriteSnapshot(self.snapshot_path, items)
+            logger.info(f"Saved {num_chunks} chunks to {self.snapshot_path} "
+                        f"in {time.perf_counter() - start:.2f} seconds")
 
     def list_keys(self) -> List[str]:
 
@@ -64,6 +207,7 @@ class LMSLocalBackend(LMSBackendInterface):
 
         """
         self.dict.pop(key)
+        self.snapshot_offsets.pop(key, None)
 
     def put(
         self,
@@ -88,23 +232,30 @@ class LMSLocalBackend(LMSBackendInterface):
         if not blocking:
             logger.warn("Non-blocking is not implemented for local backend")
 
-        self.update_lock.acquire()
-        # Obtain keys to evict
-        evict_keys, put_status = self.evictor.update_on_put(
-            self.dict, self.evictor.get_size(kv_chunk_bytes))
+        with self.update_lock:
+            # The chunk being overwritten no longer takes space, and should
+            # not be evicted (nor counted as an eviction) in its own place
+            old_entry = self.dict.pop(key, None)
+            if old_entry is not None:
+                self.snapshot_offsets.pop(key, None)
+                self.evictor.current_cache_size -= self._entry_size(old_entry)
 
-        # Abort put if cache too big
-        if put_status == PutStatus.ILLEGAL:
-            self.update_lock.release()
-            return
+            # Obtain keys to evict
+            evict_keys, put_status = self.evictor.update_on_put(
+                self.dict, self.evictor.get_size(kv_chunk_bytes))
 
-        # Evict caches
-        for evict_key in evict_keys:
-            self.remove(evict_key)
+            # Abort put if cache too big
+            if put_status == PutStatus.ILLEGAL:
+                return
 
-        # Store new chunk
-        self.dict[key] = kv_chunk_bytes
-        self.update_lock.release()
+            # Evict caches
+            for evict_key in evict_keys:
+                self.num_evictions += 1
+                self.evicted_bytes += self._entry_size(self.dict[evict_key])
+                self.remove(evict_key)
+
+            # Store new chunk
+            self.dict[key] = kv_chunk_bytes
 
     @_lmcache_nvtx_annotate
     def get(
@@ -121,18 +272,35 @@ class LMSLocalBackend(LMSBackendInterface):
             the kv cache of the token chunk, in the format of nested tuples
             None if the key is not found
         """
-        self.update_lock.acquire()
-        kv_chunk = self.dict.get(key, None)
+        with self.update_lock:
+            kv_chunk = self.dict.get(key, None)
 
-        # Update cache recency
-        if kv_chunk is not None:
-            self.evictor.update_on_get(key, self.dict)
+            # Update cache recency
+            if kv_chunk is not None:
+                self.evictor.update_on_get(key, self.dict)
 
-        self.update_lock.release()
+        if isinstance(kv_chunk, DiskCacheMetadata):
+            # Restored from the snapshot but not read yet
+            return self._page_in(key)
         return kv_chunk
 
+    def get_stats(self) -> Dict[str, int]:
+        with self.update_lock:
+            return {
+                "num_keys": len(self.dict),
+                "used_bytes": int(self.evictor.current_cache_size),
+                "capacity_bytes": self.evictor.MAX_CACHE_SIZE,
+                "num_evictions": self.num_evictions,
+                "evicted_bytes": self.evicted_bytes,
+                "num_unloaded_keys": len(self.snapshot_offsets),
+            }
+
     def close(self):
-        pass
+        self.closing = True
+        if self.loader_thread is not None:
+            self.loader_thread.join()
+        if self.snapshot_file is not None:
+            self.snapshot_file.close()
 
 
 # TODO(Jiayi): need to optimize disk loading
@@ -146,8 +314,13 @@ class LMSLocalDiskBackend(LMSBackendInterface):
     def __init__(
         self,
         path: str,
+        max_size: float = 10.0,
     ):
         """
+        Input:
+            path: the directory to store the KV cache
+            max_size: the capacity of the cache server in GB
+
         Throws:
             RuntimeError if the loaded configuration does not match the current
             configuration
@@ -161,7 +334,10 @@ class LMSLocalDiskBackend(LMSBackendInterface):
 
         self.update_lock = threading.Lock()
 
-        self.evictor = DummyEvictor()
+        self.evictor = LRUEvictor(max_size)
+
+        self.num_evictions = 0
+        self.evicted_bytes = 0
 
     def list_keys(self) -> List[str]:
 
@@ -249,6 +425,8 @@ class LMSLocalDiskBackend(LMSBackendInterface):
 
         # evict caches
         for evict_key in evict_keys:
+            self.num_evictions += 1
+            self.evicted_bytes += self.dict[evict_key].size
             self.remove(evict_key)
 
         logger.info(f"Saving cache to {path}")
@@ -290,5 +468,15 @@ class LMSLocalDiskBackend(LMSBackendInterface):
 
         # return torch.load(self._key_to_path(key))
 
+    def get_stats(self) -> Dict[str, int]:
+        with self.update_lock:
+            return {
+                "num_keys": len(self.dict),
+                "used_bytes": int(self.evictor.current_cache_size),
+                "capacity_bytes": self.evictor.MAX_CACHE_SIZE,
+                "num_evictions": self.num_evictions,
+                "evicted_bytes": self.evicted_bytes,
+            }
+
     def close(self):
         pass
@@ -0,0 +1,99 @@
+import os
+import struct
+from typing import BinaryIO, Callable, Iterable, List, Tuple, Union
+
+from lmcache.logging import init_logger
+
+logger = init_logger(__name__)
+
+# A snapshot file is laid out as:
+#   SNAPSHOT_MAGIC
+#   payload 0, payload 1, ...
+#   index: (key length, key, payload offset, payload length) per chunk
+#   footer: (index offset, number of chunks, SNAPSHOT_MAGIC)
+# The index is written last so that the payloads can be streamed, and it
+# can be read without touching the payloads.
+SNAPSHOT_MAGIC = b"LMSNAP01"
+SNAPSHOT_INDEX_ENTRY = struct.Struct("<QQ")
+SNAPSHOT_KEY_LENGTH = struct.Struct("<I")
+SNAPSHOT_FOOTER = struct.Struct("<QQ8s")
+
+# A chunk is either in memory or a callable that reads it, e.g. from the
+# previous snapshot
+SnapshotPayload = Union[bytes, bytearray, Callable[[], bytes]]
+
+
+def WriteSnapshot(path: str, items: Iterable[Tuple[str,
+                                                   SnapshotPayload]]) -> int:
+    """
+    Write the chunks to a snapshot file. The file is replaced atomically
+    once it is complete, so a crash never leaves a partial snapshot.
+
+    Input:
+        path: the path of the snapshot file
+        items: the keys and chunks, from the least recently used one
+
+    Returns:
+        the number of chunks written
+    """
+    index: List[Tuple[bytes, int, int]] = []
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        offset = len(SNAPSHOT_MAGIC)
+        for key, payload in items:
+            data = payload() if callable(payload) else payload
+            f.write(data)
+            index.append((key.encode(), offset, len(data)))
+            offset += len(data)
+
+        for key_bytes, chunk_offset, length in index:
+            f.write(SNAPSHOT_KEY_LENGTH.pack(len(key_bytes)))
+            f.write(key_bytes)
+            f.write(SNAPSHOT_INDEX_ENTRY.pack(chunk_offset, length))
+        f.write(SNAPSHOT_FOOTER.pack(offset, len(index), SNAPSHOT_MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(index)
+
+
+def ReadSnapshotIndex(f: BinaryIO) -> List[Tuple[str, int, int]]:
+    """
+    Read the index of a snapshot file without reading the payloads.
+
+    Returns:
+        (key, offset, length) of the chunks, in the order they were written
+
+    Throws:
+        ValueError if the file is not a complete snapshot
+    """
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    if file_size < len(SNAPSHOT_MAGIC) + SNAPSHOT_FOOTER.size:
+        raise ValueError("Snapshot file is too small")
+
+    f.seek(0)
+    if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+        raise ValueError("Not a snapshot file")
+    f.seek(file_size - SNAPSHOT_FOOTER.size)
+    index_offset, count, magic = SNAPSHOT_FOOTER.unpack(
+        f.read(SNAPSHOT_FOOTER.size))
+    if magic != SNAPSHOT_MAGIC or index_offset > file_size:
+        raise ValueError("Snapshot file is incomplete")
+
+    f.seek(index_offset)
+    index = f.read(file_size - SNAPSHOT_FOOTER.size - index_offset)
+    entries = []
+    pos = 0
+    for _ in range(count):
+        (key_length, ) = SNAPSHOT_KEY_LENGTH.unpack_from(index, pos)
+        pos += SNAPSHOT_KEY_LENGTH.size
+        key = index[pos:pos + key_length].decode()
+        pos += key_length
+        offset, length = SNAPSHOT_INDEX_ENTRY.unpack_from(index, pos)
+        pos += SNAPSHOT_INDEX_ENTRY.size
+        if offset + length > index_offset:
+            raise ValueError(f"Corrupted snapshot entry {key}")
+        entries.append((key, offset, length))
+    return entries
@@ -0,0 +1,82 @@
+import os
+import socket
+from typing import List, Optional, Sequence, Union
+
+from lmcache.logging import init_logger
+
+logger = init_logger(__name__)
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# The kernel send/receive buffer size of the lm server connections. Large
+# buffers let a whole KV chunk be in flight without waiting for the peer.
+SOCKET_BUFFER_SIZE = int(
+    os.getenv("LMCACHE_SOCKET_BUFFER_SIZE", str(4 * 1024 * 1024)))
+
+# Tells the kernel that more data follows, so that a small header is sent
+# in the same segment as the payload. Only available on Linux.
+MSG_MORE = getattr(socket, "MSG_MORE", 0)
+
+
+def configure_socket(sock: socket.socket) -> None:
+    """
+    Disable Nagle's algorithm, so that small requests and responses are
+    not delayed, and enlarge the kernel buffers.
+
+    NOTE: the buffer sizes of a listening socket should be set before
+    `listen()` so that the accepted connections inherit them.
+    """
+    if sock.family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    for option in (socket.SO_SNDBUF, socket.SO_RCVBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER_SIZE)
+        except OSError as e:
+            logger.warning(f"Failed to set the socket buffer size: {e}")
+
+
+def send_vectored(sock: socket.socket, buffers: Sequence[BytesLike]) -> None:
+    """
+    Send the buffers (e.g., a header and the payload) back to back with
+    scatter-gather `sendmsg`, without concatenating them first. Usually
+    this is a single syscall.
+    """
+    views: List[memoryview] = [
+        memoryview(buffer).cast("B") for buffer in buffers if len(buffer) > 0
+    ]
+    while views:
+        sent = sock.sendmsg(views)
+        if sent == 0:
+            raise ConnectionError("Connection closed by the peer")
+        # Skip the buffers that have been sent completely
+        while sent > 0 and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if sent > 0:
+            views[0] = views[0][sent:]
+
+
+def recv_exactly_into(sock: socket.socket, view: memoryview) -> bool:
+    """
+    Receive exactly `len(view)` bytes into the buffer.
+    Returns False if the connection is closed in the middle.
+    """
+    received = 0
+    n = len(view)
+    while received < n:
+        num_bytes = sock.recv_into(view[received:], n - received)
+        if num_bytes == 0:
+            return False
+        received += num_bytes
+    return True
+
+
+def recv_exactly(sock: socket.socket, n: int) -> Optional[bytearray]:
+    """
+    Receive exactly `n` bytes into a preallocated buffer.
+    Returns None if the connection is closed in the middle.
+    """
+    buffer = bytearray(n)
+    if not recv_exactly_into(sock, memoryview(buffer)):
+        return None
+    return buffer
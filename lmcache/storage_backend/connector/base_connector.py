@@ -107,7 +107,7 @@ class RemoteConnectorDebugWrapper(RemoteConnector):
             return None
 
         if check_connector_type(self.connector) == ConnectorType.BYTES:
-            assert isinstance(ret, bytes)
+            assert isinstance(ret, (bytes, bytearray))
             logger.debug(
                 "Get %.2f MBytes data from the remote backend takes %.2f ms",
                 len(ret) / 1e6,
@@ -129,7 +129,7 @@ class RemoteConnectorDebugWrapper(RemoteConnector):
         end = time.perf_counter()
 
         if isinstance(self.connector, RemoteBytesConnector):
-            assert isinstance(obj, bytes)
+            assert isinstance(obj, (bytes, bytearray))
             logger.debug(
                 "Put %.2f MBytes data to the remote backend takes %.2f ms",
                 len(obj) / 1e6,
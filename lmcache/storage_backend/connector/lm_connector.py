@@ -4,6 +4,7 @@ from typing import List, Optional
 
 from lmcache.logging import init_logger
 from lmcache.protocol import ClientMetaMessage, Constants, ServerMetaMessage
+from lmcache.socket_utils import configure_socket, recv_exactly, send_vectored
 from lmcache.storage_backend.connector.base_connector import \
     RemoteBytesConnector
 from lmcache.utils import _lmcache_nvtx_annotate
@@ -17,22 +18,18 @@ class LMCServerConnector(RemoteBytesConnector):
 
     def __init__(self, host, port):
         self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        configure_socket(self.client_socket)
         self.client_socket.connect((host, port))
         self.socket_lock = threading.Lock()
 
     def receive_all(self, n):
-        received = 0
-        buffer = bytearray(n)
-        view = memoryview(buffer)
+        return recv_exactly(self.client_socket, n)
 
-        while received < n:
-            num_bytes = self.client_socket.recv_into(view[received:],
-                                                     n - received)
-            if num_bytes == 0:
-                return None
-            received += num_bytes
-
-        return buffer
+    def receive_meta(self) -> ServerMetaMessage:
+        data = self.receive_all(ServerMetaMessage.packlength())
+        if data is None:
+            raise ConnectionError("Connection closed by the lm server")
+        return ServerMetaMessage.deserialize(data)
 
     def send_all(self, data):
         """
@@ -41,19 +38,25 @@ class LMCServerConnector(RemoteBytesConnector):
         with self.socket_lock:
             self.client_socket.sendall(data)
 
+    def send_vectored(self, *buffers):
+        """
+        Thread-safe function to send the header and the payload with a
+        single scatter-gather call
+        """
+        with self.socket_lock:
+            send_vectored(self.client_socket, buffers)
+
     def exists(self, key: str) -> bool:
         logger.debug("Call to exists()!")
         self.send_all(
             ClientMetaMessage(Constants.CLIENT_EXIST, key, 0).serialize())
-        response = self.client_socket.recv(ServerMetaMessage.packlength())
-        return (ServerMetaMessage.deserialize(response).code ==
-                Constants.SERVER_SUCCESS)
+        return self.receive_meta().code == Constants.SERVER_SUCCESS
 
     def set(self, key: str, obj: bytes):  # type: ignore[override]
         logger.debug("Call to set()!")
-        self.send_all(
-            ClientMetaMessage(Constants.CLIENT_PUT, key, len(obj)).serialize())
-        self.send_all(obj)
+        self.send_vectored(
+            ClientMetaMessage(Constants.CLIENT_PUT, key, len(obj)).serialize(),
+            obj)
         # response = self.client_socket.recv(ServerMetaMessage.packlength())
         # if ServerMetaMessage.deserialize(response).code
         #   != Constants.SERVER_SUCCESS:
@@ -62,21 +65,22 @@ class LMCServerConnector(RemoteBytesConnector):
 
     @_lmcache_nvtx_annotate
     def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the received buffer itself (a bytearray) instead of a copy,
+        so that the deserializers can view it without copying
+        """
         self.send_all(
             ClientMetaMessage(Constants.CLIENT_GET, key, 0).serialize())
-        data = self.client_socket.recv(ServerMetaMessage.packlength())
-        meta = ServerMetaMessage.deserialize(data)
+        meta = self.receive_meta()
         if meta.code != Constants.SERVER_SUCCESS:
             return None
         length = meta.length
-        data = self.receive_all(length)
-        return data if data is None else bytes(data)
+        return self.receive_all(length)
 
     def list(self) -> List[str]:
         self.send_all(
             ClientMetaMessage(Constants.CLIENT_LIST, "", 0).serialize())
-        data = self.client_socket.recv(ServerMetaMessage.packlength())
-        meta = ServerMetaMessage.deserialize(data)
+        meta = self.receive_meta()
         if meta.code != Constants.SERVER_SUCCESS:
             logger.error(
                 "LMCServerConnector: Cannot list keys from the remote server!")
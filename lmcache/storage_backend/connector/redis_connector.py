@@ -31,7 +31,8 @@ class RedisConnector(RemoteBytesConnector):
         return result if result is None else bytes(result)
 
     def set(self, key: str, obj: bytes) -> None:  # type: ignore[override]
-        self.connection.set(key, obj)
+        # redis only takes bytes-like objects as bytes or memoryview
+        self.connection.set(key, memoryview(obj))
 
     def list(self):
         cursor = 0
@@ -101,7 +102,7 @@ class RedisSentinelConnector(RemoteBytesConnector):
         return self.slave.get(key)
 
     def set(self, key: str, obj: bytes) -> None:  # type: ignore[override]
-        self.master.set(key, obj)
+        self.master.set(key, memoryview(obj))
 
     def list(self):
         cursor = 0
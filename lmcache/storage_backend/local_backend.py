@@ -1,10 +1,9 @@
 import os
-import queue
 import threading
 import time
 from collections import OrderedDict
 from concurrent.futures import Future, ThreadPoolExecutor
-from typing import Dict, Optional, Tuple, Union
+from typing import Dict, Optional, Tuple
 
 import torch
 from safetensors import safe_open
@@ -18,16 +17,13 @@ from lmcache.storage_backend.evictor.base_evictor import PutStatus
 from lmcache.storage_backend.mem_pool import (KVObj, LocalCPUBufferPool,
                                               LocalCPUPool, LocalGPUPool,
                                               LocalPool)
+from lmcache.storage_backend.put_queue import BoundedPutQueue, CreatePutQueue
 from lmcache.utils import (CacheEngineKey, DiskCacheMetadata, KVCache,
                            _lmcache_nvtx_annotate)
 
 logger = init_logger(__name__)
 
 
-class LocalBackendEndSignal:
-    pass
-
-
 class LMCLocalBackend(LMCBackendInterface):
     """
     Cache engine for storing the KV cache of the tokens in the local cpu/gpu
@@ -50,9 +46,8 @@ class LMCLocalBackend(LMCBackendInterface):
         self.dict: OrderedDict[CacheEngineKey, KVObj] = OrderedDict()
         self.device = config.local_device
 
-        self.put_queue: queue.Queue[
-            Union[Tuple[CacheEngineKey, torch.Tensor],
-                  LocalBackendEndSignal]] = queue.Queue()
+        self.put_queue: BoundedPutQueue[torch.Tensor] = CreatePutQueue(
+            "local", config)
         self.put_thread = threading.Thread(target=self.put_worker, args=())
         self.put_thread.start()
         self.update_lock = threading.Lock()
@@ -103,7 +98,7 @@ class LMCLocalBackend(LMCBackendInterface):
     def put_worker(self, ):
         while True:
             item = self.put_queue.get()
-            if isinstance(item, LocalBackendEndSignal):
+            if item is None:
                 break
             key, value = item
             self.put_nonblocking(key, value)
@@ -202,7 +197,7 @@ class LMCLocalBackend(LMCBackendInterface):
         if blocking:
             self.put_blocking(key, kv_chunk)
         else:
-            self.put_queue.put((key, kv_chunk))
+            self.put_queue.put(key, kv_chunk)
 
     @_lmcache_nvtx_annotate
     def get(
@@ -234,7 +229,7 @@ class LMCLocalBackend(LMCBackendInterface):
 
     def close(self):
         if self.put_thread is not None and self.put_thread.is_alive():
-            self.put_queue.put(LocalBackendEndSignal())
+            self.put_queue.close()
             self.put_thread.join()
             logger.info("Closed the put worker in local backend")
 
@@ -286,9 +281,8 @@ class LMCLocalDiskBackend(LMCBackendInterface):
 
         self.update_lock = threading.Lock()
 
-        self.put_queue: queue.Queue[
-            Union[Tuple[CacheEngineKey, torch.Tensor],
-                  LocalBackendEndSignal]] = queue.Queue()
+        self.put_queue: BoundedPutQueue[torch.Tensor] = CreatePutQueue(
+            "local_disk", config)
         self.put_thread = threading.Thread(target=self.put_worker, args=())
         self.put_thread.start()
 
@@ -359,7 +353,7 @@ class LMCLocalDiskBackend(LMCBackendInterface):
     def put_worker(self, ):
         while True:
             item = self.put_queue.get()
-            if isinstance(item, LocalBackendEndSignal):
+            if item is None:
                 break
             key, value = item
             self.put_nonblocking(key, value)
@@ -503,7 +497,7 @@ class LMCLocalDiskBackend(LMCBackendInterface):
         if blocking:
             self.put_blocking(key, kv_chunk)
         else:
-            self.put_queue.put((key, kv_chunk))
+            self.put_queue.put(key, kv_chunk)
 
     @_lmcache_nvtx_annotate
     def get(
@@ -549,7 +543,7 @@ class LMCLocalDiskBackend(LMCBackendInterface):
 
     def close(self):
         if self.put_thread is not None and self.put_thread.is_alive():
-            self.put_queue.put(LocalBackendEndSignal())
+            self.put_queue.close()
             self.put_thread.join()
 
         if self.sweeper_thread is not None and self.sweeper_thread.is_alive():
@@ -3,7 +3,9 @@ from lmcache.storage_backend.mem_pool.local_pool import (LocalCPUBufferPool,
                                                          LocalCPUPool,
                                                          LocalGPUPool,
                                                          LocalPool)
+from lmcache.storage_backend.mem_pool.staging_pool import PinnedStagingPool
 
 __all__ = [
-    "LocalPool", "LocalCPUPool", "LocalGPUPool", "LocalCPUBufferPool", "KVObj"
+    "LocalPool", "LocalCPUPool", "LocalGPUPool", "LocalCPUBufferPool",
+    "PinnedStagingPool", "KVObj"
 ]
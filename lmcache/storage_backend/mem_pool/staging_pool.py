@@ -0,0 +1,83 @@
+import threading
+from collections import deque
+from math import prod
+from typing import Deque, List, Optional, Tuple
+
+import torch
+
+from lmcache.logging import init_logger
+from lmcache.storage_backend.mem_pool.base_pool import KVObj
+
+logger = init_logger(__name__)
+
+
+class PinnedStagingPool:
+    """
+    A fixed set of flat pinned CPU buffers, each large enough for a full KV
+    chunk, that the retrieved chunks are decoded into before they are
+    copied to the GPU. The buffers are recycled across the retrieves, so
+    the retrieves do not allocate (and pin) memory for every chunk.
+
+    A buffer is freed with the CUDA event of the copy out of it, and it is
+    only handed out again once that copy is done, so the copy of a chunk
+    can overlap with the decoding of the next ones.
+    """
+
+    def __init__(self,
+                 kv_shape: Tuple[int, ...],
+                 kv_dtype: torch.dtype,
+                 num_buffers: int = 4):
+        assert num_buffers > 0
+        self.size_per_chunk = prod(kv_shape) * kv_dtype.itemsize
+        use_pinned_memory = torch.cuda.is_available()
+
+        logger.info(f"Initializing {num_buffers} staging buffers, "
+                    f"is_pinned: {use_pinned_memory}")
+        # NOTE: not inference tensors, as the buffers are written in place
+        # outside of inference mode
+        self.mem_pool = [
+            torch.empty(prod(kv_shape),
+                        dtype=kv_dtype,
+                        device='cpu',
+                        pin_memory=use_pinned_memory)
+            for i in range(num_buffers)
+        ]
+
+        self.free_pool: Deque[int] = deque(range(num_buffers))
+        # The event of the last copy out of each buffer
+        self.events: List[Optional[torch.cuda.Event]] = [None] * num_buffers
+        self.cond = threading.Condition()
+
+    def allocate(self) -> KVObj:
+        """
+        Take a free buffer, blocks until one is free and its last copy is
+        done.
+
+        Returns:
+            KVObj whose data is the flat buffer
+        """
+        with self.cond:
+            while not self.free_pool:
+                self.cond.wait()
+            chunk_idx = self.free_pool.popleft()
+        event = self.events[chunk_idx]
+        if event is not None:
+            event.synchronize()
+            self.events[chunk_idx] = None
+        return KVObj(chunk_idx, self.size_per_chunk, self.mem_pool[chunk_idx])
+
+    def free(self,
+             kv_obj: KVObj,
+             event: Optional[torch.cuda.Event] = None) -> None:
+        """
+        Return a buffer to the pool
+
+        Input:
+            kv_obj: the KVObj to be freed
+            event: the event of the pending copy out of the buffer, the
+                buffer is not reused before it is done
+        """
+        self.events[kv_obj.chunk_idx] = event
+        with self.cond:
+            self.free_pool.append(kv_obj.chunk_idx)
+            self.cond.notify()
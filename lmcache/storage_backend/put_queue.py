@@ -0,0 +1,166 @@
+import enum
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Generic, Optional, Tuple, TypeVar
+
+from lmcache.config import LMCacheEngineConfig
+from lmcache.logging import init_logger
+from lmcache.observability import LMCStatsMonitor
+from lmcache.utils import CacheEngineKey
+
+logger = init_logger(__name__)
+
+T = TypeVar("T")
+
+
+class PutQueuePolicy(enum.Enum):
+    """
+    What to do with a non-blocking put when the put queue is full
+    """
+    # Wait until the put worker catches up
+    BLOCK = "block"
+    # Drop the new chunk
+    DROP_NEWEST = "drop_newest"
+    # Drop the oldest queued chunk to make room for the new one
+    DROP_OLDEST = "drop_oldest"
+    # A chunk whose key is already queued replaces the queued one in place,
+    # otherwise the same as BLOCK
+    COALESCE = "coalesce"
+
+
+class _PutEntry(Generic[T]):
+    __slots__ = ["key", "value", "enqueue_time"]
+
+    def __init__(self, key: CacheEngineKey, value: T):
+        self.key = key
+        self.value = value
+        self.enqueue_time = time.perf_counter()
+
+
+class BoundedPutQueue(Generic[T]):
+    """
+    The queue of the non-blocking puts of a storage backend. Each queued
+    chunk holds a reference to its KV cache, so the queue is bounded to
+    `max_size` chunks to bound the memory when the backend is slower than
+    the puts. A `max_size` of 0 means unbounded.
+
+    The queue depth, the time the chunks wait in the queue and the number
+    of dropped chunks are reported to LMCStatsMonitor.
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_size: int = 0,
+                 policy: PutQueuePolicy = PutQueuePolicy.BLOCK):
+        self.name = name
+        self.max_size = max_size
+        self.policy = policy
+
+        self.cond = threading.Condition()
+        self.entries: Deque[_PutEntry[T]] = deque()
+        # The queued entries by key, only for COALESCE
+        self.pending: Dict[CacheEngineKey, _PutEntry[T]] = {}
+        self.closed = False
+
+        self.num_dropped = 0
+        self.num_coalesced = 0
+        self.stats_monitor = LMCStatsMonitor.GetOrCreate()
+
+    def _is_full(self) -> bool:
+        return 0 < self.max_size <= len(self.entries)
+
+    def _on_dropped(self, key: CacheEngineKey) -> None:
+        self.num_dropped += 1
+        self.stats_monitor.on_put_dropped()
+        logger.debug(f"{self.name} put queue is full, dropped {key}, "
+                     f"{self.num_dropped} chunks dropped so far")
+
+    def put(self, key: CacheEngineKey, value: T) -> bool:
+        """
+        Queue a chunk, following the policy if the queue is full.
+
+        Returns:
+            False if the new chunk is dropped
+        """
+        with self.cond:
+            if self.closed:
+                return False
+            if self.policy == PutQueuePolicy.COALESCE:
+                entry = self.pending.get(key)
+                if entry is not None:
+                    # Keep the position in the queue, the newer value wins
+                    entry.value = value
+                    self.num_coalesced += 1
+                    return True
+
+            if self._is_full():
+                match self.policy:
+                    case PutQueuePolicy.DROP_NEWEST:
+                        self._on_dropped(key)
+                        return False
+                    case PutQueuePolicy.DROP_OLDEST:
+                        oldest = self.entries.popleft()
+                        self._on_dropped(oldest.key)
+                    case _:
+                        self.cond.wait_for(
+                            lambda: not self._is_full() or self.closed)
+                        if self.closed:
+                            return False
+
+            new_entry = _PutEntry(key, value)
+            self.entries.append(new_entry)
+            if self.policy == PutQueuePolicy.COALESCE:
+                self.pending[key] = new_entry
+            self.stats_monitor.update_put_queue_depth(self.name,
+                                                      len(self.entries))
+            self.cond.notify_all()
+            return True
+
+    def get(self) -> Optional[Tuple[CacheEngineKey, T]]:
+        """
+        Wait for the next chunk.
+
+        Returns:
+            The key and the value, or None once the queue is closed and
+            drained
+        """
+        with self.cond:
+            self.cond.wait_for(lambda: len(self.entries) > 0 or self.closed)
+            if len(self.entries) == 0:
+                return None
+            entry = self.entries.popleft()
+            if self.policy == PutQueuePolicy.COALESCE:
+                del self.pending[entry.key]
+            self.stats_monitor.update_put_queue_depth(self.name,
+                                                      len(self.entries))
+            self.cond.notify_all()
+        self.stats_monitor.on_put_dequeued(time.perf_counter() -
+                                           entry.enqueue_time)
+        return entry.key, entry.value
+
+    def qsize(self) -> int:
+        with self.cond:
+            return len(self.entries)
+
+    def close(self) -> None:
+        """
+        Stop accepting new chunks. The put worker finishes the queued
+        chunks before `get` returns None.
+        """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+def CreatePutQueue(name: str, config: LMCacheEngineConfig) -> BoundedPutQueue:
+    """
+    Create the put queue of a backend from `put_queue_size` and
+    `put_queue_policy` in the config
+    """
+    try:
+        policy = PutQueuePolicy(config.put_queue_policy)
+    except ValueError:
+        raise ValueError(
+            f"Invalid put_queue_policy: {config.put_queue_policy}") from None
+    return BoundedPutQueue(name, config.put_queue_size, policy)
@@ -1,16 +1,24 @@
 import queue
 import threading
+from concurrent.futures import Future
+from functools import partial
 from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
 import torch
 
 from lmcache.config import LMCacheEngineConfig, LMCacheEngineMetadata
 from lmcache.logging import init_logger
+from lmcache.request_scheduler import Priority, RequestScheduler
 from lmcache.storage_backend.abstract_backend import LMCBackendInterface
 from lmcache.storage_backend.connector import CreateConnector
 from lmcache.storage_backend.connector.base_connector import (
     ConnectorType, check_connector_type)
-from lmcache.storage_backend.serde import CreateSerde, Deserializer
+from lmcache.storage_backend.mem_pool import PinnedStagingPool
+from lmcache.storage_backend.put_queue import (BoundedPutQueue, CreatePutQueue,
+                                               PutQueuePolicy)
+from lmcache.storage_backend.serde import CreateSerde, Deserializer, Serializer
+from lmcache.storage_backend.serde_executor import (CreateSerdeExecutor,
+                                                    SerdeExecutor)
 from lmcache.utils import CacheEngineKey, _lmcache_nvtx_annotate
 
 logger = init_logger(__name__)
@@ -23,6 +31,17 @@ class RemoteBackendEndSignal:
     pass
 
 
+# NOTE: the serde workers can be processes, so their initializer and tasks
+# are module level functions
+def _create_serializer(serde_type: str, config: LMCacheEngineConfig,
+                       metadata: LMCacheEngineMetadata) -> Serializer:
+    return CreateSerde(serde_type, config, metadata)[0]
+
+
+def _serialize(serializer: Serializer, kv_chunk: torch.Tensor) -> bytes:
+    return serializer.to_bytes(kv_chunk)
+
+
 class LMCRemoteBackend(LMCBackendInterface):
     """
     Cache engine for storing the KV cache of the tokens in the remote server.
@@ -62,10 +81,39 @@ class LMCRemoteBackend(LMCBackendInterface):
 
         self.serializer = s
         self.deserializer = d
+
+        # The chunks decoded on the CPU are decoded into recycled pinned
+        # buffers on their way to the GPU
+        self.staging_pool: Optional[PinnedStagingPool] = None
+        if (self.deserializer is not None and self.deserializer.device == "cpu"
+                and dst_device != "cpu" and metadata.kv_shape is not None
+                and config.remote_staging_buffers > 0):
+            self.staging_pool = PinnedStagingPool(
+                metadata.kv_shape, metadata.kv_dtype,
+                config.remote_staging_buffers)
+
+        # The gets go before the background puts on the shared connection,
+        # and the puts are throttled to the configured bandwidth
+        self.scheduler = RequestScheduler(config.remote_put_bandwidth * 1e6)
+
+        # The non-blocking puts are serialized by the serde workers if
+        # there are any, otherwise by the put thread
+        self.serde_executor: Optional[SerdeExecutor] = None
+        if self.serializer is not None:
+            assert config.remote_serde is not None
+            self.serde_executor = CreateSerdeExecutor(
+                "remote", config,
+                partial(_create_serializer, config.remote_serde, config,
+                        metadata))
+
         # For async put
-        self.put_queue: queue.Queue[
-            Union[Tuple[CacheEngineKey, torch.Tensor],
-                  RemoteBackendEndSignal]] = queue.Queue()
+        self.put_queue: BoundedPutQueue[torch.Tensor]
+        if config.max_queued_remote_puts > 0:
+            self.put_queue = BoundedPutQueue("remote",
+                                             config.max_queued_remote_puts,
+                                             PutQueuePolicy.DROP_NEWEST)
+        else:
+            self.put_queue = CreatePutQueue("remote", config)
         self.put_thread = threading.Thread(target=self.put_worker, args=())
         self.put_thread.start()
 
@@ -74,12 +122,40 @@ class LMCRemoteBackend(LMCBackendInterface):
         # put_stream = torch.cuda.Stream()
         while True:
             item = self.put_queue.get()
-            if isinstance(item, RemoteBackendEndSignal):
+            if item is None:
                 break
             key, value = item
+            if self.serde_executor is not None:
+                try:
+                    # Blocks when the serde workers are behind
+                    future = self.serde_executor.submit(key, _serialize, value)
+                except RuntimeError as e:
+                    # e.g., the serde worker process died, so serialize it
+                    # here rather than stopping the put thread
+                    logger.warning(f"Failed to submit {key} to the serde "
+                                   f"workers: {e}")
+                    self.put_blocking(key, value)
+                    continue
+                future.add_done_callback(
+                    partial(self._put_serialized_callback, key))
+                continue
             # with torch.cuda.stream(put_stream):
             self.put_blocking(key, value)
 
+    def _put_serialized_callback(self, key: CacheEngineKey,
+                                 future: Future) -> None:
+        """
+        Send a chunk serialized by the serde workers. This runs on the
+        serde worker (or its collector thread), so the chunks of a key are
+        sent in order.
+        """
+        try:
+            obj = future.result()
+            with self.scheduler.request(Priority.PUT, len(obj)):
+                self.connection.set(self._combine_key(key), obj)
+        except Exception as e:
+            logger.error(f"Failed to put {key}: {e}")
+
     def _combine_key(
         self,
         key: CacheEngineKey,
@@ -137,9 +213,12 @@ class LMCRemoteBackend(LMCBackendInterface):
         if check_connector_type(self.connection) == ConnectorType.BYTES:
             assert self.serializer is not None
             obj = self.serializer.to_bytes(kv_chunk)
+            nbytes = len(obj)
         else:
             obj = kv_chunk
-        self.connection.set(self._combine_key(key), obj)
+            nbytes = obj.element_size() * obj.numel()
+        with self.scheduler.request(Priority.PUT, nbytes):
+            self.connection.set(self._combine_key(key), obj)
         #self.existing_keys.add(key)
 
     def put(
@@ -165,7 +244,34 @@ class LMCRemoteBackend(LMCBackendInterface):
         if blocking:
             self.put_blocking(key, kv_chunk)
         else:
-            self.put_queue.put((key, kv_chunk))
+            self.put_queue.put(key, kv_chunk)
+
+    def _deserialize(self, data: Union[bytes, bytearray]) -> torch.Tensor:
+        """
+        Deserialize a retrieved chunk to dst_device, through a staging
+        buffer if there is a staging pool
+        """
+        assert self.deserializer is not None, (
+            f"Need to provide deserializer for {self.remote_url}")
+        if self.staging_pool is None:
+            return self.deserializer.from_bytes(data).to(self.dst_device)
+
+        kv_obj = self.staging_pool.allocate()
+        event = None
+        try:
+            staged = self.deserializer.from_bytes_into(data, kv_obj.data)
+        except ValueError:
+            # E.g., the chunk does not fit in the buffer
+            self.staging_pool.free(kv_obj)
+            return self.deserializer.from_bytes(data).to(self.dst_device)
+        try:
+            result = staged.to(self.dst_device, non_blocking=True)
+            if result.is_cuda:
+                event = torch.cuda.Event()
+                event.record()
+        finally:
+            self.staging_pool.free(kv_obj, event)
+        return result
 
     @_lmcache_nvtx_annotate
     def get(
@@ -175,29 +281,30 @@ class LMCRemoteBackend(LMCBackendInterface):
         """
         Retrieve the KV cache chunk (in a single big tensor) by the given key
         """
-        if not self.contains(key):
-            return None
-
-        obj = self.connection.get(self._combine_key(key))
+        with self.scheduler.request(Priority.GET):
+            if not self.contains(key):
+                return None
+            obj = self.connection.get(self._combine_key(key))
         if obj is None:
             return None
 
-        if isinstance(obj, bytes):
+        if isinstance(obj, (bytes, bytearray)):
             if len(obj) == 0:
                 return None
-            assert self.deserializer is not None, (
-                f"Need to provide deserializer for {self.remote_url}")
-            return self.deserializer.from_bytes(obj).to(self.dst_device)
+            return self._deserialize(obj)
         else:
             assert isinstance(obj, torch.Tensor)
             return obj.to(self.dst_device)
 
     def close(self):
         if self.put_thread is not None and self.put_thread.is_alive():
-            self.put_queue.put(RemoteBackendEndSignal())
+            self.put_queue.close()
             self.put_thread.join()
             logger.info("Closed the put worker")
 
+        if self.serde_executor is not None:
+            self.serde_executor.close()
+
         if self.connection is not None:
             self.connection.close()
 
@@ -255,9 +362,11 @@ class LMCPipelinedRemoteBackend(LMCRemoteBackend):
                 break
 
             idx, key = item
-            if self.contains(key):
-                data = self.connection.get(self._combine_key(key))
-                assert isinstance(data, bytes)
+            with self.scheduler.request(Priority.GET):
+                data = self.connection.get(self._combine_key(key)) \
+                    if self.contains(key) else None
+            if data is not None:
+                assert isinstance(data, (bytes, bytearray))
                 self.deserialize_queue.put_nowait((idx, data))
 
             self.network_queue.task_done()
@@ -271,8 +380,8 @@ class LMCPipelinedRemoteBackend(LMCRemoteBackend):
 
             idx, data = item
             if data is not None:
-                assert isinstance(data, bytes)
-                result = self.deserializer.from_bytes(data).to(self.dst_device)
+                assert isinstance(data, (bytes, bytearray))
+                result = self._deserialize(data)
             else:
                 result = None
             self.result_list.append(result)
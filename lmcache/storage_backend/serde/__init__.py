@@ -6,6 +6,8 @@ from lmcache.storage_backend.serde.cachegen_decoder import CacheGenDeserializer
 from lmcache.storage_backend.serde.cachegen_encoder import CacheGenSerializer
 from lmcache.storage_backend.serde.fast_serde import (FastDeserializer,
                                                       FastSerializer)
+from lmcache.storage_backend.serde.lossless_serde import (LosslessDeserializer,
+                                                          LosslessSerializer)
 from lmcache.storage_backend.serde.safe_serde import (SafeDeserializer,
                                                       SafeSerializer)
 from lmcache.storage_backend.serde.serde import (Deserializer,
@@ -32,7 +34,11 @@ def CreateSerde(
         s, d = CacheGenSerializer(config, metadata), CacheGenDeserializer(
             config, metadata, metadata.kv_dtype)
     elif serde_type == "fast":
-        s, d = FastSerializer(), FastDeserializer(metadata.kv_dtype)
+        s, d = FastSerializer(config.remote_serde_checksum), \
+            FastDeserializer(metadata.kv_dtype)
+    elif serde_type in ["zstd", "lz4"]:
+        s, d = LosslessSerializer(serde_type, config.compression_level), \
+            LosslessDeserializer(metadata.kv_dtype, serde_type)
     else:
         raise ValueError(f"Invalid serde type: {serde_type}")
 
@@ -47,6 +53,10 @@ __all__ = [
     "Deserializer",
     "TorchSerializer",
     "TorchDeserializer",
+    "FastSerializer",
+    "FastDeserializer",
+    "LosslessSerializer",
+    "LosslessDeserializer",
     "CacheGenDeserializer",
     "CacheGenSerializer",
     "CreateSerde",
@@ -1,17 +1,35 @@
-import io
-import pickle
-from dataclasses import dataclass
-from typing import List
+import enum
+import importlib.util
+import struct
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple, Type, TypeVar, Union
 
 import torch
+import yaml
 from transformers import AutoConfig
 
 from lmcache.logging import init_logger
+from lmcache.storage_backend.serde.fast_serde import (CODE_TO_DTYPE,
+                                                      DTYPE_TO_CODE, BytesLike)
 from lmcache.utils import _lmcache_nvtx_annotate
 
 logger = init_logger(__name__)
 
 CACHEGEN_GPU_MAX_TOKENS_PER_CHUNK = 256
+# The quantized symbols are in [0, bins - 2] and stored in int8
+CACHEGEN_MIN_BINS = 4
+CACHEGEN_MAX_BINS = 128
+
+
+def get_codec_device() -> str:
+    """
+    The device of the CacheGen codec: "cuda" when the kernels of
+    torchac_cuda can be used, "cpu" (see cachegen_cpu) otherwise
+    """
+    if torch.cuda.is_available() and \
+            importlib.util.find_spec("torchac_cuda") is not None:
+        return "cuda"
+    return "cpu"
 
 
 @dataclass
@@ -24,6 +42,9 @@ class QuantizationSpec:
         return getattr(self, key)
 
 
+T = TypeVar("T", bound="CacheGenConfig")
+
+
 @dataclass
 class CacheGenConfig:
     # TODO: move this class to another file like "cachegen_basics.py"
@@ -34,8 +55,8 @@ class CacheGenConfig:
     def __getitem__(self, key: str) -> int:
         return getattr(self, key)
 
-    @staticmethod
-    def from_model_name(model_name: str) -> "CacheGenConfig":
+    @classmethod
+    def from_model_name(cls: Type[T], model_name: str) -> T:
         family_7b = [
             "mistralai/Mistral-7B-Instruct-v0.2", "lmsys/longchat-7b-16k",
             "Qwen/Qwen-7B"
@@ -43,7 +64,7 @@ class CacheGenConfig:
         family_8b = ["meta-llama/Llama-3.1-8B-Instruct"]
         family_9b = ["THUDM/glm-4-9b-chat"]
         if model_name in family_7b:
-            return CacheGenConfig(
+            return cls(
                 nlayers=32,
                 kspecs=[
                     QuantizationSpec(start_layer=0, end_layer=10, bins=32),
@@ -55,7 +76,7 @@ class CacheGenConfig:
                 ],
             )
         elif model_name in family_8b:
-            return CacheGenConfig(
+            return cls(
                 nlayers=32,
                 kspecs=[
                     QuantizationSpec(start_layer=0, end_layer=10, bins=32),
@@ -68,7 +89,7 @@ class CacheGenConfig:
             )
         # TODO(Jiayi): needs tuning for better quality
         elif model_name in family_9b:
-            return CacheGenConfig(
+            return cls(
                 nlayers=40,
                 kspecs=[
                     QuantizationSpec(start_layer=0, end_layer=10, bins=32),
@@ -86,49 +107,126 @@ class CacheGenConfig:
                 if config.num_hidden_layers is None:
                     raise ValueError(
                         f"num_hidden_layers is None for model {model_name}")
-                if config.num_hidden_layers < 10:
-                    return CacheGenConfig(
-                        nlayers=config.num_hidden_layers,
-                        kspecs=[
-                            QuantizationSpec(
-                                start_layer=0,
-                                end_layer=config.num_hidden_layers,
-                                bins=32),
-                        ],
-                        vspecs=[
-                            QuantizationSpec(
-                                start_layer=0,
-                                end_layer=config.num_hidden_layers,
-                                bins=32),
-                        ],
-                    )
-                else:
-                    return CacheGenConfig(
-                        nlayers=config.num_hidden_layers,
-                        kspecs=[
-                            QuantizationSpec(start_layer=0,
-                                             end_layer=10,
-                                             bins=32),
-                            QuantizationSpec(
-                                start_layer=10,
-                                end_layer=config.num_hidden_layers,
-                                bins=16),
-                        ],
-                        vspecs=[
-                            QuantizationSpec(start_layer=0,
-                                             end_layer=2,
-                                             bins=32),
-                            QuantizationSpec(
-                                start_layer=2,
-                                end_layer=config.num_hidden_layers,
-                                bins=16),
-                        ],
-                    )
+                return cls.from_num_layers(config.num_hidden_layers)
             except Exception as e:
                 raise ValueError(
                     f"Model {model_name} not supported by CacheGenConfig"
                 ) from e
 
+    @classmethod
+    def from_num_layers(cls: Type[T], nlayers: int) -> T:
+        """
+        The default config of a model with `nlayers` layers: more bins for
+        the first layers, which are more sensitive to quantization
+        """
+        if nlayers < 10:
+            return cls(
+                nlayers=nlayers,
+                kspecs=[
+                    QuantizationSpec(start_layer=0, end_layer=nlayers,
+                                     bins=32),
+                ],
+                vspecs=[
+                    QuantizationSpec(start_layer=0, end_layer=nlayers,
+                                     bins=32),
+                ],
+            )
+        return cls(
+            nlayers=nlayers,
+            kspecs=[
+                QuantizationSpec(start_layer=0, end_layer=10, bins=32),
+                QuantizationSpec(start_layer=10, end_layer=nlayers, bins=16),
+            ],
+            vspecs=[
+                QuantizationSpec(start_layer=0, end_layer=2, bins=32),
+                QuantizationSpec(start_layer=2, end_layer=nlayers, bins=16),
+            ],
+        )
+
+    @classmethod
+    def from_file(cls: Type[T], path: str) -> T:
+        """
+        Load a quantization profile, e.g., one saved by
+        `lmcache.storage_backend.serde.cachegen_calibration`
+        """
+        with open(path, "r") as fin:
+            profile = yaml.safe_load(fin)
+        try:
+            config = cls(
+                nlayers=int(profile["nlayers"]),
+                kspecs=[
+                    QuantizationSpec(int(spec["start_layer"]),
+                                     int(spec["end_layer"]), int(spec["bins"]))
+                    for spec in profile["kspecs"]
+                ],
+                vspecs=[
+                    QuantizationSpec(int(spec["start_layer"]),
+                                     int(spec["end_layer"]), int(spec["bins"]))
+                    for spec in profile["vspecs"]
+                ],
+            )
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid CacheGen profile {path}") from e
+        config.validate()
+        return config
+
+    def to_file(self, path: str) -> None:
+        self.validate()
+        profile = {
+            "nlayers": self.nlayers,
+            "kspecs": [asdict(spec) for spec in self.kspecs],
+            "vspecs": [asdict(spec) for spec in self.vspecs],
+        }
+        with open(path, "w") as fout:
+            yaml.safe_dump(profile, fout, sort_keys=False)
+
+    @classmethod
+    def load(cls: Type[T],
+             model_name: str,
+             profile: Optional[str] = None,
+             nlayers: Optional[int] = None) -> T:
+        """
+        The config of the CacheGen serdes: the profile if it is given,
+        otherwise the built-in config of the model, or the default config
+        of `nlayers` layers if the model is not known.
+        """
+        if profile is not None:
+            config = cls.from_file(profile)
+            if nlayers is not None and config.nlayers != nlayers:
+                raise ValueError(f"CacheGen profile {profile} has "
+                                 f"{config.nlayers} layers, but the model "
+                                 f"{model_name} has {nlayers}")
+            return config
+        try:
+            return cls.from_model_name(model_name)
+        except ValueError:
+            if nlayers is None:
+                raise
+            logger.warning(f"No CacheGen config for model {model_name}, "
+                           f"using the default config of {nlayers} layers")
+            return cls.from_num_layers(nlayers)
+
+    def validate(self) -> None:
+        """
+        Check that the specs cover all the layers, and that the numbers of
+        bins fit in the int8 symbols of the codec
+        """
+        for name, specs in [("kspecs", self.kspecs), ("vspecs", self.vspecs)]:
+            end = 0
+            for spec in specs:
+                if spec.start_layer != end or spec.end_layer <= end:
+                    raise ValueError(
+                        f"{name} do not cover layers [0, {self.nlayers}) "
+                        f"contiguously")
+                if not CACHEGEN_MIN_BINS <= spec.bins <= CACHEGEN_MAX_BINS:
+                    raise ValueError(
+                        f"Invalid number of bins {spec.bins}, expected "
+                        f"[{CACHEGEN_MIN_BINS}, {CACHEGEN_MAX_BINS}]")
+                end = spec.end_layer
+            if end != self.nlayers:
+                raise ValueError(f"{name} do not cover layers "
+                                 f"[0, {self.nlayers}) contiguously")
+
 
 @dataclass
 class CacheGenEncoderOutput:
@@ -145,17 +243,104 @@ class CacheGenEncoderOutput:
     def __getitem__(self, key: str) -> int:
         return getattr(self, key)
 
-    def to_bytes(self) -> bytes:
-        """Save the output to a file"""
-        with io.BytesIO() as f:
-            # torch.save(self, f)
-            pickle.dump(self, f)
-            return f.getvalue()
 
-    @staticmethod
-    def from_bytes(bs: bytes) -> "CacheGenEncoderOutput":
-        with io.BytesIO(bs) as f:
-            return pickle.load(f)
+# The binary container of CacheGenGPUEncoderOutput (little endian):
+#
+#   header:  magic "CGEN" (4s) | version (B) | reserved (B) |
+#            num_entries (H) | num_heads (I) | head_size (I) |
+#            num_chunks (I)
+#   offset table, one entry per tensor:
+#            kind (B) | dtype (B) | ndim (B) | reserved (B) | chunk (I) |
+#            ntokens (I) | shape (4I) | offset (Q) | nbytes (Q) | padding
+#   payload: the tensors in row-major order, each at an offset aligned to
+#            CACHEGEN_ALIGNMENT bytes from the start of the container
+#
+# `chunk` and `ntokens` are the index and the number of tokens of the data
+# chunk of a bytestream (lengths) entry, and 0 for the other entries. The
+# dtype codes are the ones of the "fast" serde.
+CACHEGEN_MAGIC = b"CGEN"
+CACHEGEN_VERSION = 1
+CACHEGEN_ALIGNMENT = 64
+CACHEGEN_HEADER = struct.Struct("<4sBBHIII")
+CACHEGEN_ENTRY = struct.Struct("<BBBBII4IQQ4x")
+CACHEGEN_MAX_NDIM = 4
+
+
+class CacheGenEntryKind(enum.IntEnum):
+    CDF = 0
+    MAX_TENSORS_KEY = 1
+    MAX_TENSORS_VALUE = 2
+    BYTESTREAM = 3
+    BYTESTREAM_LENGTHS = 4
+
+
+@dataclass
+class CacheGenEntry:
+    """
+    An entry of the offset table, which locates a tensor in the container
+    """
+    kind: CacheGenEntryKind
+    dtype: torch.dtype
+    shape: torch.Size
+    chunk: int
+    ntokens: int
+    offset: int
+    nbytes: int
+
+
+def _align(offset: int) -> int:
+    return (offset + CACHEGEN_ALIGNMENT - 1) // CACHEGEN_ALIGNMENT * \
+        CACHEGEN_ALIGNMENT
+
+
+def read_cachegen_entries(
+        bs: BytesLike) -> Tuple[int, int, List[CacheGenEntry]]:
+    """
+    Parse and validate the header and the offset table of a container.
+    Only the first bytes of the container are needed, up to the end of the
+    offset table, so that a reader can fetch the tensors selectively.
+
+    Returns:
+        num_heads, head_size and the entries
+    """
+    if len(bs) < CACHEGEN_HEADER.size:
+        raise ValueError(f"CacheGen container too short: {len(bs)} bytes")
+    magic, version, _, num_entries, num_heads, head_size, _ = \
+        CACHEGEN_HEADER.unpack_from(bs, 0)
+    if magic != CACHEGEN_MAGIC:
+        raise ValueError(f"Invalid CacheGen container magic: {magic!r}")
+    if version != CACHEGEN_VERSION:
+        raise ValueError(f"Unsupported CacheGen container version: {version}")
+    table_end = CACHEGEN_HEADER.size + num_entries * CACHEGEN_ENTRY.size
+    if len(bs) < table_end:
+        raise ValueError("CacheGen container too short for its offset table")
+
+    entries = []
+    for i in range(num_entries):
+        (kind, dtype_code, ndim, _, chunk, ntokens, *shape, offset,
+         nbytes) = CACHEGEN_ENTRY.unpack_from(
+             bs, CACHEGEN_HEADER.size + i * CACHEGEN_ENTRY.size)
+        dtype = CODE_TO_DTYPE.get(dtype_code)
+        if dtype is None or ndim > CACHEGEN_MAX_NDIM:
+            raise ValueError(f"Invalid CacheGen container entry {i}")
+        entry = CacheGenEntry(CacheGenEntryKind(kind), dtype,
+                              torch.Size(shape[:ndim]), chunk, ntokens, offset,
+                              nbytes)
+        if entry.nbytes != entry.shape.numel() * dtype.itemsize:
+            raise ValueError(f"Invalid size of CacheGen container entry {i}")
+        entries.append(entry)
+    return num_heads, head_size, entries
+
+
+def _view_entry(bs: BytesLike, entry: CacheGenEntry) -> torch.Tensor:
+    if entry.offset + entry.nbytes > len(bs):
+        raise ValueError(f"CacheGen container truncated at {entry.kind.name}")
+    if entry.nbytes == 0:
+        return torch.empty(entry.shape, dtype=entry.dtype)
+    return torch.frombuffer(bs,
+                            dtype=entry.dtype,
+                            count=entry.shape.numel(),
+                            offset=entry.offset).view(entry.shape)
 
 
 @dataclass
@@ -167,6 +352,23 @@ class CacheGenGPUBytestream:
     def __getitem__(self, key: str) -> int:
         return getattr(self, key)
 
+    def select_layers(
+            self, ranges: List[Tuple[int, int]]) -> "CacheGenGPUBytestream":
+        """
+        Keep the bytestreams of the encoded layers in the given ranges
+        """
+        layer_ends = [0] + self.bytestream_lengths.sum(
+            dim=1, dtype=torch.int64).cumsum(0).tolist()
+        return CacheGenGPUBytestream(
+            bytestream=torch.cat([
+                self.bytestream[layer_ends[start]:layer_ends[end]]
+                for start, end in ranges
+            ]),
+            bytestream_lengths=torch.cat(
+                [self.bytestream_lengths[start:end] for start, end in ranges]),
+            ntokens=self.ntokens,
+        )
+
 
 @dataclass
 class CacheGenGPUEncoderOutput:
@@ -180,18 +382,151 @@ class CacheGenGPUEncoderOutput:
     def __getitem__(self, key: str) -> int:
         return getattr(self, key)
 
+    def _entries(
+            self) -> List[Tuple[CacheGenEntryKind, int, int, torch.Tensor]]:
+        entries = [
+            (CacheGenEntryKind.CDF, 0, 0, self.cdf),
+            (CacheGenEntryKind.MAX_TENSORS_KEY, 0, 0, self.max_tensors_key),
+            (CacheGenEntryKind.MAX_TENSORS_VALUE, 0, 0,
+             self.max_tensors_value),
+        ]
+        for idx, data_chunk in enumerate(self.data_chunks):
+            entries.append((CacheGenEntryKind.BYTESTREAM, idx,
+                            data_chunk.ntokens, data_chunk.bytestream))
+            entries.append((CacheGenEntryKind.BYTESTREAM_LENGTHS, idx,
+                            data_chunk.ntokens, data_chunk.bytestream_lengths))
+        return entries
+
     @_lmcache_nvtx_annotate
     def to_bytes(self) -> bytes:
-        """Save the output to a file"""
-        with io.BytesIO() as f:
-            pickle.dump(self, f)
-            return f.getvalue()
+        """
+        Pack the output into the binary container, see CACHEGEN_HEADER
+        """
+        entries = self._entries()
+        offsets = []
+        offset = _align(CACHEGEN_HEADER.size +
+                        len(entries) * CACHEGEN_ENTRY.size)
+        for _, _, _, tensor in entries:
+            if tensor.dim() > CACHEGEN_MAX_NDIM:
+                raise ValueError(f"Cannot pack a {tensor.dim()}-d tensor")
+            offsets.append(offset)
+            offset = _align(offset + tensor.numel() * tensor.element_size())
+
+        buffer = bytearray(offset)
+        CACHEGEN_HEADER.pack_into(buffer, 0,
+                                  CACHEGEN_MAGIC, CACHEGEN_VERSION, 0,
+                                  len(entries), self.num_heads, self.head_size,
+                                  len(self.data_chunks))
+        for i, ((kind, chunk, ntokens, tensor),
+                offset) in enumerate(zip(entries, offsets)):
+            nbytes = tensor.numel() * tensor.element_size()
+            shape = list(
+                tensor.shape) + [0] * (CACHEGEN_MAX_NDIM - tensor.dim())
+            CACHEGEN_ENTRY.pack_into(
+                buffer, CACHEGEN_HEADER.size + i * CACHEGEN_ENTRY.size, kind,
+                DTYPE_TO_CODE[tensor.dtype], tensor.dim(), 0, chunk, ntokens,
+                *shape, offset, nbytes)
+            if nbytes > 0:
+                torch.frombuffer(buffer,
+                                 dtype=torch.uint8,
+                                 count=nbytes,
+                                 offset=offset).copy_(
+                                     tensor.contiguous().reshape(-1).view(
+                                         torch.uint8))
+        return buffer
 
     @staticmethod
     @_lmcache_nvtx_annotate
-    def from_bytes(bs: bytes) -> "CacheGenGPUEncoderOutput":
-        with io.BytesIO(bs) as f:
-            return pickle.load(f)
+    def from_bytes(
+        bs: BytesLike,
+        layers: Optional[Tuple[int, int]] = None,
+    ) -> "CacheGenGPUEncoderOutput":
+        """
+        Unpack the binary container. The tensors are CPU views over `bs`
+        without copies, see `to` to move them to the GPU.
+
+        :param layers: only keep the model layers in [start, end), for both
+            the keys and the values.
+        """
+        num_heads, head_size, entries = read_cachegen_entries(bs)
+        tensors: Dict[CacheGenEntryKind, torch.Tensor] = {}
+        chunks: Dict[int, Dict[CacheGenEntryKind, torch.Tensor]] = {}
+        ntokens: Dict[int, int] = {}
+        for entry in entries:
+            tensor = _view_entry(bs, entry)
+            if entry.kind in [
+                    CacheGenEntryKind.BYTESTREAM,
+                    CacheGenEntryKind.BYTESTREAM_LENGTHS
+            ]:
+                chunks.setdefault(entry.chunk, {})[entry.kind] = tensor
+                ntokens[entry.chunk] = entry.ntokens
+            else:
+                tensors[entry.kind] = tensor
+
+        try:
+            output = CacheGenGPUEncoderOutput(
+                data_chunks=[
+                    CacheGenGPUBytestream(
+                        bytestream=chunks[idx][CacheGenEntryKind.BYTESTREAM],
+                        bytestream_lengths=chunks[idx][
+                            CacheGenEntryKind.BYTESTREAM_LENGTHS],
+                        ntokens=ntokens[idx],
+                    ) for idx in sorted(chunks)
+                ],
+                cdf=tensors[CacheGenEntryKind.CDF],
+                max_tensors_key=tensors[CacheGenEntryKind.MAX_TENSORS_KEY],
+                max_tensors_value=tensors[CacheGenEntryKind.MAX_TENSORS_VALUE],
+                num_heads=num_heads,
+                head_size=head_size,
+            )
+        except KeyError as e:
+            raise ValueError(f"CacheGen container misses {e}") from e
+
+        if layers is not None:
+            output = output.select_layers(*layers)
+        return output
+
+    def select_layers(self, start: int,
+                      end: int) -> "CacheGenGPUEncoderOutput":
+        """
+        Keep the model layers in [start, end), for both the keys and the
+        values
+        """
+        nlayers = self.max_tensors_key.shape[0]
+        if not 0 <= start < end <= nlayers:
+            raise ValueError(f"Invalid layer range [{start}, {end}) of "
+                             f"{nlayers} layers")
+        # The keys are encoded before the values
+        ranges = [(start, end), (nlayers + start, nlayers + end)]
+        return CacheGenGPUEncoderOutput(
+            data_chunks=[
+                data_chunk.select_layers(ranges)
+                for data_chunk in self.data_chunks
+            ],
+            cdf=torch.cat([self.cdf[s:e] for s, e in ranges]),
+            max_tensors_key=self.max_tensors_key[start:end],
+            max_tensors_value=self.max_tensors_value[start:end],
+            num_heads=self.num_heads,
+            head_size=self.head_size,
+        )
+
+    def to(self, device: Union[str, torch.device]) -> \
+            "CacheGenGPUEncoderOutput":
+        return CacheGenGPUEncoderOutput(
+            data_chunks=[
+                CacheGenGPUBytestream(
+                    bytestream=data_chunk.bytestream.to(device),
+                    bytestream_lengths=data_chunk.bytestream_lengths.to(
+                        device),
+                    ntokens=data_chunk.ntokens,
+                ) for data_chunk in self.data_chunks
+            ],
+            cdf=self.cdf.to(device),
+            max_tensors_key=self.max_tensors_key.to(device),
+            max_tensors_value=self.max_tensors_value.to(device),
+            num_heads=self.num_heads,
+            head_size=self.head_size,
+        )
 
     def debug_print_device(self):
         logger.debug(
@@ -0,0 +1,334 @@
+"""
+Derive the CacheGen quantization profile of a model from its KV cache.
+
+The calibration quantizes sample KV chunks with each candidate number of
+bins, and measures for every layer of K and V:
+    - the size of the encoded symbols, estimated by their per-channel
+      entropy, which is what the arithmetic coder achieves in practice
+    - the squared quantization error
+Then it greedily lowers the bins of the layer that adds the least error
+per saved byte, until the target compression ratio is reached or the
+error budget would be exceeded. The profile is saved to a yaml file that
+the `cachegen_profile` config refers to.
+
+Usage:
+    python -m lmcache.storage_backend.serde.cachegen_calibration \\
+        /path/to/local/disk/cache --model <model> --target-ratio 5 \\
+        --output profile.yaml
+"""
+import argparse
+import os
+import random
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import torch
+from transformers import AutoConfig
+
+from lmcache.logging import init_logger
+from lmcache.storage_backend.serde.cachegen_basics import (CACHEGEN_MAX_BINS,
+                                                           CACHEGEN_MIN_BINS,
+                                                           CacheGenConfig,
+                                                           QuantizationSpec)
+from lmcache.storage_backend.serde.cachegen_decoder import do_dequantize
+from lmcache.storage_backend.serde.cachegen_encoder import (
+    _split_kv, torch_quant_vectorized)
+
+logger = init_logger(__name__)
+
+DEFAULT_CANDIDATE_BINS = [8, 16, 32, 64]
+
+
+@dataclass
+class LayerStats:
+    """
+    The statistics of the candidate numbers of bins, summed over the
+    sample chunks
+    """
+    candidate_bins: List[int]
+    # [2 (K and V), nlayers, len(candidate_bins)], estimated encoded bytes
+    sizes: torch.Tensor
+    # [2 (K and V), nlayers, len(candidate_bins)], squared errors
+    errors: torch.Tensor
+    # The sum of the squares of the KV cache
+    energy: float
+    # The size of the original KV cache in bytes
+    raw_bytes: int
+    # The size of the max tensors in bytes
+    max_tensor_bytes: int
+    # The number of CDFs of K (and of V), which are int16 tensors of the
+    # largest bins of K (V) + 1 entries
+    num_cdfs: int
+
+    @property
+    def nlayers(self) -> int:
+        return self.sizes.shape[1]
+
+
+def load_kv_chunks(paths: Sequence[str],
+                   fmt: str = "vllm",
+                   max_chunks: Optional[int] = None,
+                   seed: int = 0) -> List[torch.Tensor]:
+    """
+    Load KV chunks saved by the local disk backend. `paths` can be files or
+    directories, and at most `max_chunks` random chunks are loaded.
+
+    Returns:
+        the KV chunks in shape [nlayers, 2, ntokens, num_heads, head_size]
+    """
+    from safetensors import safe_open
+
+    files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith((".pt", ".safetensors")))
+        else:
+            files.append(path)
+    if max_chunks is not None and len(files) > max_chunks:
+        files = random.Random(seed).sample(files, max_chunks)
+
+    chunks = []
+    for file in files:
+        with safe_open(file, framework="pt") as f:  # type: ignore
+            kv = f.get_tensor("kv_chunk")
+        match fmt:
+            case "vllm":
+                chunks.append(kv)
+            case "huggingface":
+                chunks.append(kv.permute(0, 1, 3, 2, 4))
+            case _:
+                raise ValueError(f"Unknown format {fmt}")
+    logger.info(f"Loaded {len(chunks)} KV chunks for calibration")
+    return chunks
+
+
+def _entropy_bytes(symbols: torch.Tensor, nsymbols: int) -> torch.Tensor:
+    """
+    The entropy-coded size of each layer of `symbols`, coded with one
+    distribution per channel
+
+    Input:
+        symbols: [nlayers, ntokens, nchannels], in [0, nsymbols)
+
+    Returns:
+        the size in bytes of each layer, shape [nlayers]
+    """
+    nlayers, ntokens, nchannels = symbols.shape
+    counts = torch.zeros(nlayers, nchannels, nsymbols, dtype=torch.float64)
+    counts.scatter_add_(
+        2,
+        symbols.permute(0, 2, 1).long(),
+        torch.ones(1, dtype=torch.float64).expand(nlayers, nchannels, ntokens))
+    probs = counts / ntokens
+    bits = -(counts * torch.log2(probs.clamp(min=1e-30))).sum(dim=(1, 2))
+    return bits / 8
+
+
+def measure_layers(
+        chunks: Sequence[torch.Tensor],
+        candidate_bins: Sequence[int] = DEFAULT_CANDIDATE_BINS) -> LayerStats:
+    """
+    Quantize the chunks with each candidate number of bins
+
+    Input:
+        chunks: the KV chunks in shape
+            [nlayers, 2, ntokens, num_heads, head_size]
+        candidate_bins: the numbers of bins to try, in ascending order
+    """
+    if not chunks:
+        raise ValueError("No KV chunks to calibrate on")
+    candidate_bins = sorted(candidate_bins)
+    for bins in candidate_bins:
+        if not CACHEGEN_MIN_BINS <= bins <= CACHEGEN_MAX_BINS:
+            raise ValueError(f"Invalid number of bins {bins}, expected "
+                             f"[{CACHEGEN_MIN_BINS}, {CACHEGEN_MAX_BINS}]")
+
+    nlayers = chunks[0].shape[0]
+    sizes = torch.zeros(2, nlayers, len(candidate_bins), dtype=torch.float64)
+    errors = torch.zeros(2, nlayers, len(candidate_bins), dtype=torch.float64)
+    energy = 0.0
+    raw_bytes = 0
+    max_tensor_bytes = 0
+    num_cdfs = 0
+    for chunk in chunks:
+        if chunk.shape[0] != nlayers:
+            raise ValueError("The KV chunks have different numbers of layers")
+        ntokens = chunk.shape[2]
+        raw_bytes += chunk.numel() * chunk.element_size()
+        max_tensor_bytes += 2 * nlayers * ntokens * chunk.element_size()
+        for kv_idx, x in enumerate(_split_kv(chunk)):
+            x = x.float()
+            energy += float((x.double()**2).sum())
+            num_cdfs += nlayers * x.shape[-1] if kv_idx == 0 else 0
+            for bins_idx, bins in enumerate(candidate_bins):
+                layer_bins = torch.full((nlayers, ), bins)
+                xq, max1 = torch_quant_vectorized(layer_bins, x)
+                # The tokens that are all zeros have no valid symbols,
+                # count them as the zero symbol
+                xq = xq.masked_fill((max1 == 0).expand_as(xq), bins // 2 - 1)
+                dequantized = do_dequantize(xq.float(), layer_bins, max1)
+                errors[kv_idx, :,
+                       bins_idx] += ((dequantized.double() -
+                                      x.double())**2).sum(dim=(1, 2))
+                sizes[kv_idx, :, bins_idx] += _entropy_bytes(xq, bins - 1)
+
+    return LayerStats(list(candidate_bins), sizes, errors, energy, raw_bytes,
+                      max_tensor_bytes, num_cdfs)
+
+
+def _to_specs(layer_bins: List[int]) -> List[QuantizationSpec]:
+    """
+    Merge the consecutive layers with the same number of bins
+    """
+    specs: List[QuantizationSpec] = []
+    for layer, bins in enumerate(layer_bins):
+        if specs and specs[-1].bins == bins:
+            specs[-1].end_layer = layer + 1
+        else:
+            specs.append(QuantizationSpec(layer, layer + 1, bins))
+    return specs
+
+
+def search_profile(stats: LayerStats,
+                   target_ratio: Optional[float] = None,
+                   error_budget: Optional[float] = None) -> CacheGenConfig:
+    """
+    Search the bins of each layer of K and V.
+
+    Input:
+        stats: the output of measure_layers
+        target_ratio: the compression ratio to reach, i.e., the size of
+            the original KV cache over the estimated encoded size
+        error_budget: the maximum relative squared error, i.e., the sum of
+            the squared errors over the sum of the squares of the KV cache
+
+    At least one of target_ratio and error_budget has to be given. When
+    both are, the bins are lowered until the ratio is reached, as long as
+    the error stays within the budget.
+    """
+    if target_ratio is None and error_budget is None:
+        raise ValueError("Either target_ratio or error_budget is needed")
+
+    # Start from the most bins, i.e., the least error
+    choice = torch.full((2, stats.nlayers),
+                        len(stats.candidate_bins) - 1,
+                        dtype=torch.long)
+
+    def total_size() -> float:
+        max_bins = [stats.candidate_bins[int(idx)] for idx in choice.amax(1)]
+        cdf_bytes = sum(stats.num_cdfs * (bins + 1) * 2 for bins in max_bins)
+        return float(stats.sizes.gather(2, choice[..., None]).sum()) + \
+            stats.max_tensor_bytes + cdf_bytes
+
+    def total_error() -> float:
+        return float(stats.errors.gather(2, choice[..., None]).sum()) / \
+            max(stats.energy, 1e-30)
+
+    def done() -> bool:
+        return target_ratio is not None and \
+            stats.raw_bytes / total_size() >= target_ratio
+
+    while not done():
+        lower = (choice - 1).clamp(min=0)
+        saved = (stats.sizes.gather(2, choice[..., None]) -
+                 stats.sizes.gather(2, lower[..., None])).squeeze(-1)
+        added = (stats.errors.gather(2, lower[..., None]) -
+                 stats.errors.gather(2, choice[..., None])).squeeze(-1)
+        added = added.clamp(min=0) / max(stats.energy, 1e-30)
+        cost = added / saved.clamp(min=1e-9)
+        cost[(choice == 0) | (saved <= 0)] = float("inf")
+        if error_budget is not None:
+            cost[total_error() + added > error_budget] = float("inf")
+        best = int(cost.argmin())
+        if cost.flatten()[best] == float("inf"):
+            break
+        choice.view(-1)[best] -= 1
+
+    ratio = stats.raw_bytes / total_size()
+    if target_ratio is not None and ratio < target_ratio:
+        logger.warning(f"Could not reach the compression ratio "
+                       f"{target_ratio:.2f}, got {ratio:.2f}")
+    if error_budget is not None and total_error() > error_budget:
+        logger.warning(f"The error {total_error():.2e} exceeds the budget "
+                       f"{error_budget:.2e} even with the most bins")
+    logger.info(f"Estimated compression ratio {ratio:.2f}, relative "
+                f"squared error {total_error():.2e}")
+
+    layer_bins = [[stats.candidate_bins[idx] for idx in row]
+                  for row in choice.tolist()]
+    return CacheGenConfig(nlayers=stats.nlayers,
+                          kspecs=_to_specs(layer_bins[0]),
+                          vspecs=_to_specs(layer_bins[1]))
+
+
+def calibrate(chunks: Sequence[torch.Tensor],
+              target_ratio: Optional[float] = None,
+              error_budget: Optional[float] = None,
+              candidate_bins: Sequence[int] = DEFAULT_CANDIDATE_BINS,
+              model_name: Optional[str] = None) -> CacheGenConfig:
+    """
+    Derive the CacheGen profile from sample KV chunks, see search_profile.
+    The number of layers is checked against the model config if
+    `model_name` is given.
+    """
+    if model_name is not None:
+        nlayers = AutoConfig.from_pretrained(model_name).num_hidden_layers
+        if chunks and chunks[0].shape[0] != nlayers:
+            raise ValueError(f"The KV chunks have {chunks[0].shape[0]} "
+                             f"layers, but {model_name} has {nlayers}")
+    stats = measure_layers(chunks, candidate_bins)
+    return search_profile(stats, target_ratio, error_budget)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Derive the CacheGen quantization profile of a model")
+    parser.add_argument("paths",
+                        type=str,
+                        nargs="+",
+                        help="KV chunk files or local disk cache directories")
+    parser.add_argument("--output",
+                        type=str,
+                        required=True,
+                        help="Path of the profile to write")
+    parser.add_argument("--model",
+                        type=str,
+                        default=None,
+                        help="Model name, to check the number of layers")
+    parser.add_argument("--fmt",
+                        type=str,
+                        default="vllm",
+                        help="The format of the chunks, vllm or huggingface")
+    parser.add_argument("--target-ratio",
+                        type=float,
+                        default=None,
+                        help="Target compression ratio")
+    parser.add_argument("--error-budget",
+                        type=float,
+                        default=None,
+                        help="Maximum relative squared error")
+    parser.add_argument("--bins",
+                        type=int,
+                        nargs="+",
+                        default=DEFAULT_CANDIDATE_BINS,
+                        help="Candidate numbers of bins")
+    parser.add_argument("--max-chunks",
+                        type=int,
+                        default=64,
+                        help="Maximum number of sample chunks")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    chunks = load_kv_chunks(args.paths, args.fmt, args.max_chunks)
+    config = calibrate(chunks, args.target_ratio, args.error_budget, args.bins,
+                       args.model)
+    config.to_file(args.output)
+    logger.info(f"Saved the CacheGen profile to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+from typing import Tuple
+
+import torch
+
+from lmcache.logging import init_logger
+from lmcache.utils import _lmcache_nvtx_annotate
+
+logger = init_logger(__name__)
+
+# CPU reference of the CacheGen codec of torchac_cuda.
+#
+# The KV cache is coded as one independent bitstream per (layer, channel),
+# holding the quantized symbols of all the tokens of that channel. Each
+# stream is coded with the same 32-bit arithmetic coder as torchac_cuda
+# (and torchac), with 16-bit CDFs, so the bitstreams of both
+# implementations can be decoded by the other one. The streams are
+# processed in lockstep: each step codes one token of all the streams with
+# vectorized torch ops.
+PRECISION = 16
+MASK32 = 0xFFFFFFFF
+HALF = 0x80000000
+QUARTER = 0x40000000
+THREE_QUARTERS = 0xC0000000
+
+
+def _convert_to_int_and_normalize(cdf_float, needs_normalization):
+    """
+    Convert floatingpoint CDF to integers. See README for more info.
+
+    The idea is the following:
+    When we get the cdf here, it is (assumed to be) between 0 and 1, i.e,
+      cdf in [0, 1)
+    (note that 1 should not be included.)
+    We now want to convert this to int16 but make sure we do not get
+    the same value twice, as this would break the arithmetic coder
+    (you need a strictly monotonically increasing function).
+    So, if needs_normalization==True, we multiply the input CDF
+    with 2**16 - (Lp - 1). This means that now,
+      cdf in [0, 2**16 - (Lp - 1)].
+    Then, in a final step, we add an arange(Lp), which is just a line with
+    slope one. This ensure that for sure, we will get unique, strictly
+    monotonically increasing CDFs, which are in [0, 2**16)
+    """
+    Lp = cdf_float.shape[-1]
+    factor = torch.tensor(2, dtype=torch.float32,
+                          device=cdf_float.device).pow_(PRECISION)
+    new_max_value = factor
+    if needs_normalization:
+        new_max_value = new_max_value - (Lp - 1)
+    cdf_float = cdf_float.mul(new_max_value)
+    cdf_float = cdf_float.round()
+    cdf = cdf_float.to(dtype=torch.int16, non_blocking=True)
+    if needs_normalization:
+        r = torch.arange(Lp, dtype=torch.int16, device=cdf.device)
+        cdf.add_(r)
+    return cdf
+
+
+@_lmcache_nvtx_annotate
+def calculate_cdf(input: torch.Tensor, max_bins: int) -> torch.Tensor:
+    """
+    Compute the CDF of the symbols of each channel
+
+    Input:
+        input: the quantized symbols, in shape [nlayers, ntokens, nchannels]
+        max_bins: the number of bins
+
+    Returns:
+        The int16 CDFs, in shape [nlayers, nchannels, max_bins + 1]
+    """
+    nlayers, ntokens, nchannels = input.shape
+    symbols = input.permute(0, 2, 1).long()
+    counts = torch.zeros((nlayers, nchannels, max_bins + 1),
+                         dtype=torch.float64,
+                         device=input.device)
+    counts.scatter_add_(2, symbols,
+                        torch.ones_like(symbols, dtype=torch.float64))
+    cdf_float = counts.cumsum(dim=-1).roll(1, dims=-1)
+    cdf_float[..., 0] = 0
+    return _convert_to_int_and_normalize(cdf_float / ntokens, True)
+
+
+def _stream_cdfs(cdf: torch.Tensor) -> torch.Tensor:
+    """
+    The int16 CDFs as int64, in shape [nstreams, Lp]. Only the first Lp - 1
+    symbols can be coded, and the upper bound of the last one is 2^16.
+    """
+    cdf = cdf.reshape(-1, cdf.shape[-1]).long() & 0xFFFF
+    cdf[:, -1] = 1 << PRECISION
+    return cdf
+
+
+def _narrow(low: torch.Tensor, high: torch.Tensor, c_low: torch.Tensor,
+            c_high: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Narrow the [low, high] ranges to the [c_low, c_high) ranges of the CDFs
+    """
+    span = high - low + 1
+    high = (low - 1 + ((span * c_high) >> PRECISION)) & MASK32
+    low = low + ((span * c_low) >> PRECISION)
+    return low, high
+
+
+def _bit_length(x: torch.Tensor) -> torch.Tensor:
+    """
+    The number of bits of non-negative integers below 2^53
+    """
+    return torch.frexp(x.double()).exponent.long()
+
+
+def _low_bits(n: torch.Tensor) -> torch.Tensor:
+    """
+    The masks of the n lowest bits
+    """
+    return (torch.ones_like(n) << n) - 1
+
+
+def _renormalize(
+    low: torch.Tensor, high: torch.Tensor
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+    """
+    The renormalization loop of the coder, in closed form. The coder first
+    shifts out the leading bits that low and high have in common, then
+    does an underflow step as long as low is 01... and high is 10...
+
+    Returns:
+        The number of shifted out bits, the number of underflow steps, and
+        the renormalized low and high
+    """
+    num_shifts = 32 - _bit_length(low ^ high)
+    low = (low << num_shifts) & MASK32
+    high = ((high << num_shifts) | _low_bits(num_shifts)) & MASK32
+    # After the shifts, the top bit of low is 0 and the one of high is 1
+    num_underflows = torch.minimum(31 - _bit_length(~low & 0x7FFFFFFF),
+                                   31 - _bit_length(high & 0x7FFFFFFF))
+    low = (low << num_underflows) & 0x7FFFFFFF
+    high = ((high << num_underflows) | _low_bits(num_underflows)
+            | HALF) & MASK32
+    return num_shifts, num_underflows, low, high
+
+
+class _BitWriter:
+    """
+    Appends bits to many bitstreams, MSB first. The bits of each stream
+    are accumulated in a 64-bit integer, and moved to a [nstreams, nwords]
+    table of 32-bit words once there are 32 of them.
+    """
+
+    def __init__(self, nstreams: int, nwords: int):
+        self.words = torch.zeros((nstreams, nwords), dtype=torch.int64)
+        self.num_words = torch.zeros(nstreams, dtype=torch.int64)
+        self.cache = torch.zeros(nstreams, dtype=torch.int64)
+        self.cache_bits = torch.zeros(nstreams, dtype=torch.int64)
+
+    def _flush(self):
+        full = self.cache_bits >= 32
+        if not full.any():
+            return
+        streams = full.nonzero().squeeze(1)
+        num_words = self.num_words[streams]
+        if int(num_words.max()) >= self.words.shape[1]:
+            self.words = torch.cat(
+                [self.words, torch.zeros_like(self.words)], dim=1)
+        cache_bits = self.cache_bits[streams] - 32
+        cache = self.cache[streams]
+        self.words[streams, num_words] = cache >> cache_bits
+        self.cache[streams] = cache & _low_bits(cache_bits)
+        self.cache_bits[streams] = cache_bits
+        self.num_words[streams] = num_words + 1
+
+    def write(self, values: torch.Tensor, nbits: torch.Tensor):
+        """
+        Append the nbits (at most 32) lowest bits of the values to each
+        stream
+        """
+        self.cache = (self.cache << nbits) | values
+        self.cache_bits += nbits
+        self._flush()
+
+    def write_run(self, bits: torch.Tensor, counts: torch.Tensor):
+        """
+        Append `counts` copies of a bit to each stream
+        """
+        while bool((counts > 0).any()):
+            nbits = counts.clamp(max=32)
+            self.write(_low_bits(nbits) * bits, nbits)
+            counts = counts - nbits
+
+    def getvalue(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        The bytes of the streams, padded with zero bits to whole bytes,
+        and their lengths
+        """
+        nbits = self.num_words * 32 + self.cache_bits
+        self.write(torch.zeros_like(self.cache), 32 - self.cache_bits)
+        nbytes = (nbits + 7) // 8
+        shifts = torch.tensor([24, 16, 8, 0])
+        data = ((self.words[:, :, None] >> shifts) & 0xFF).to(
+            torch.uint8).reshape(self.words.shape[0], -1)
+        valid = torch.arange(data.shape[1])[None, :] < nbytes[:, None]
+        return data[valid], nbytes
+
+
+class _BitReader:
+    """
+    Reads the bits of many bitstreams, MSB first, through a 64-bit
+    integer that always holds the next 32 bits of each stream at least
+    """
+
+    def __init__(self, bytestream: torch.Tensor, lengths: torch.Tensor):
+        nstreams = lengths.shape[0]
+        # The bits after the end of a stream are zeros
+        nwords = int(lengths.max()) // 4 + 2 if nstreams > 0 else 1
+        data = torch.zeros((nstreams, nwords * 4), dtype=torch.uint8)
+        valid = torch.arange(nwords * 4)[None, :] < lengths[:, None]
+        data[valid] = bytestream[:int(lengths.sum())]
+        shifts = torch.tensor([24, 16, 8, 0])
+        self.words = (data.reshape(nstreams, nwords, 4).long() << shifts).sum(
+            dim=-1)
+        self.words = torch.cat(
+            [self.words, torch.zeros_like(self.words[:, :1])], dim=1)
+        self.next_word = torch.zeros(nstreams, dtype=torch.int64)
+        self.cache = torch.zeros(nstreams, dtype=torch.int64)
+        self.cache_bits = torch.zeros(nstreams, dtype=torch.int64)
+        self._fill()
+
+    def _fill(self):
+        empty = self.cache_bits < 32
+        if not empty.any():
+            return
+        streams = empty.nonzero().squeeze(1)
+        next_word = self.next_word[streams]
+        word = self.words[streams,
+                          next_word.clamp(max=self.words.shape[1] - 1)]
+        self.cache[streams] = (self.cache[streams] << 32) | word
+        self.cache_bits[streams] += 32
+        self.next_word[streams] = next_word + 1
+
+    def read(self, nbits: torch.Tensor) -> torch.Tensor:
+        """
+        Read the next nbits (at most 32) bits of each stream
+        """
+        self.cache_bits -= nbits
+        bits = self.cache >> self.cache_bits
+        self.cache &= _low_bits(self.cache_bits)
+        self._fill()
+        return bits
+
+
+@_lmcache_nvtx_annotate
+def encode(cdf: torch.Tensor,
+           input: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Encode the symbols of each (layer, channel), like encode_fast_new of
+    torchac_cuda followed by collect_bytes
+
+    Input:
+        cdf: the int16 CDFs, in shape [nlayers, nchannels, Lp]
+        input: the symbols, in shape [nlayers, ntokens, nchannels]
+
+    Returns:
+        The uint8 bytestream, with the streams concatenated in (layer,
+        channel) order, and the int32 lengths of the streams in shape
+        [nlayers, nchannels]
+    """
+    nlayers, ntokens, nchannels = input.shape
+    cdf = _stream_cdfs(cdf.cpu())
+    nstreams = cdf.shape[0]
+    symbols = input.cpu().permute(0, 2, 1).reshape(nstreams, ntokens).long()
+    if symbols.numel() > 0 and (symbols.min() < 0
+                                or symbols.max() > cdf.shape[1] - 2):
+        raise ValueError("CacheGen symbols out of the range of the CDF")
+
+    # The CDF ranges of all the symbols
+    offsets = torch.arange(nstreams)[:, None] * cdf.shape[1] + symbols
+    c_lows, c_highs = cdf.take(offsets), cdf.take(offsets + 1)
+
+    low = torch.zeros(nstreams, dtype=torch.int64)
+    high = torch.full((nstreams, ), MASK32, dtype=torch.int64)
+    # The number of underflow bits, which are written after the next
+    # shifted out bit
+    pending = torch.zeros(nstreams, dtype=torch.int64)
+    writer = _BitWriter(nstreams, ntokens // 16 + 2)
+
+    for i in range(ntokens):
+        low, high = _narrow(low, high, c_lows[:, i], c_highs[:, i])
+        num_shifts, num_underflows, new_low, high = _renormalize(low, high)
+        # The shifted out bits, with the pending bits after the first one
+        shifted = num_shifts > 0
+        top_bit = (low >> 31) == 1
+        writer.write((top_bit & shifted).long(), shifted.long())
+        writer.write_run((~top_bit).long(), pending * shifted)
+        rest = (num_shifts - 1).clamp(min=0)
+        writer.write((low >> (32 - num_shifts)) & _low_bits(rest), rest)
+        pending = torch.where(shifted, num_underflows,
+                              pending + num_underflows)
+        low = new_low
+
+    final_bit = (low >= QUARTER).long()
+    writer.write(final_bit, torch.ones_like(pending))
+    writer.write_run(1 - final_bit, pending + 1)
+
+    bytestream, lengths = writer.getvalue()
+    return bytestream, lengths.to(torch.int32).reshape(nlayers, nchannels)
+
+
+@_lmcache_nvtx_annotate
+def decode_prefsum(cdf: torch.Tensor, bytestream: torch.Tensor,
+                   length_prefsum: torch.Tensor, output: torch.Tensor):
+    """
+    Decode the bitstreams of encode(), like decode_fast_prefsum of
+    torchac_cuda
+
+    Input:
+        cdf: the int16 CDFs, in shape [nlayers, nchannels, Lp]
+        bytestream: the uint8 bytestream
+        length_prefsum: the inclusive prefix sum of the lengths of the
+            streams, in shape [nlayers, nchannels]
+        output: the uint8 output buffer, in shape
+            [nlayers, ntokens, nchannels]
+    """
+    nlayers, ntokens, nchannels = output.shape
+    cdf = _stream_cdfs(cdf.cpu())
+    search_cdf = cdf[:, :-1].contiguous()
+    nstreams = cdf.shape[0]
+
+    ends = length_prefsum.cpu().reshape(-1).long()
+    lengths = ends - torch.cat([ends.new_zeros(1), ends[:-1]])
+    reader = _BitReader(bytestream.cpu(), lengths)
+
+    low = torch.zeros(nstreams, dtype=torch.int64)
+    high = torch.full((nstreams, ), MASK32, dtype=torch.int64)
+    value = reader.read(torch.full((nstreams, ), 32, dtype=torch.int64))
+
+    offsets = torch.arange(nstreams) * cdf.shape[1]
+    symbols = torch.empty((nstreams, ntokens), dtype=torch.uint8)
+    for i in range(ntokens):
+        span = high - low + 1
+        count = ((value - low + 1) * (1 << PRECISION) - 1) // span
+        sym = torch.searchsorted(search_cdf, count[:, None],
+                                 right=True).squeeze(1) - 1
+        symbols[:, i] = sym.to(torch.uint8)
+        low, high = _narrow(low, high, cdf.take(offsets + sym),
+                            cdf.take(offsets + sym + 1))
+
+        num_shifts, num_underflows, low, high = _renormalize(low, high)
+        value = ((value << num_shifts) & MASK32) | reader.read(num_shifts)
+        # An underflow step drops the second bit of value
+        value = (value & HALF) | ((value << num_underflows) & 0x7FFFFFFF) | \
+            reader.read(num_underflows)
+
+    output.copy_(symbols.reshape(nlayers, nchannels, ntokens).permute(0, 2, 1))
@@ -1,18 +1,25 @@
 from typing import List, Optional
 
 import torch
-import torchac_cuda  # type: ignore
 
 import lmcache.storage_backend.serde.cachegen_basics as CGBasics
+import lmcache.storage_backend.serde.cachegen_cpu as cachegen_cpu
 from lmcache.config import LMCacheEngineConfig, LMCacheEngineMetadata
 from lmcache.logging import init_logger
 from lmcache.storage_backend.serde.cachegen_basics import (
-    CacheGenConfig, CacheGenGPUBytestream, CacheGenGPUEncoderOutput)
-from lmcache.storage_backend.serde.serde import Deserializer
+    CacheGenConfig, CacheGenGPUBytestream, CacheGenGPUEncoderOutput,
+    get_codec_device)
+from lmcache.storage_backend.serde.serde import Deserializer, view_buffer
 from lmcache.utils import _lmcache_nvtx_annotate
 
 logger = init_logger(__name__)
 
+try:
+    import torchac_cuda  # type: ignore
+except ImportError:
+    # Only the CPU codec in cachegen_cpu can be used
+    torchac_cuda = None
+
 
 @_lmcache_nvtx_annotate
 def quant(bins: int, xq: torch.Tensor, max1: float):
@@ -62,8 +69,12 @@ def decode_chunk(
     length_prefsum = (
         data_chunk.bytestream_lengths.flatten().cumsum(0).reshape(
             data_chunk.bytestream_lengths.shape))
-    torchac_cuda.decode_fast_prefsum(cdf, bytes_tensor, length_prefsum,
-                                     target_buffer)
+    if cdf.is_cuda:
+        torchac_cuda.decode_fast_prefsum(cdf, bytes_tensor, length_prefsum,
+                                         target_buffer)
+    else:
+        cachegen_cpu.decode_prefsum(cdf, bytes_tensor, length_prefsum,
+                                    target_buffer)
 
 
 @_lmcache_nvtx_annotate
@@ -111,11 +122,14 @@ class CacheGenDeserializer(Deserializer):
     def __init__(self, config: LMCacheEngineConfig,
                  metadata: LMCacheEngineMetadata, dtype):
         self.dtype = dtype
-        self.cachegen_config = CacheGenConfig.from_model_name(
-            metadata.model_name)
+        self.cachegen_config = CacheGenConfig.load(
+            metadata.model_name, config.cachegen_profile,
+            metadata.kv_shape[0] if metadata.kv_shape is not None else None)
         self.chunk_size = config.chunk_size
         self.output_buffer: Optional[torch.Tensor] = None
         self.fmt = metadata.fmt
+        # The device to decode on, "cuda" or "cpu"
+        self.device = get_codec_device()
         self.key_bins = self.make_key_bins(self.cachegen_config)
         self.value_bins = self.make_value_bins(self.cachegen_config)
 
@@ -123,28 +137,31 @@ class CacheGenDeserializer(Deserializer):
         ret = torch.zeros(config.nlayers)
         for spec in config.kspecs:
             ret[spec.start_layer:spec.end_layer] = spec.bins
-        return ret.cuda()
+        return ret.to(self.device)
 
     def make_value_bins(self, config: CacheGenConfig) -> torch.Tensor:
         ret = torch.zeros(config.nlayers)
         for spec in config.vspecs:
             ret[spec.start_layer:spec.end_layer] = spec.bins
-        return ret.cuda()
+        return ret.to(self.device)
 
     def get_output_buffer(self, nlayers: int, nchannels: int, ntokens: int):
         if (self.output_buffer is None
                 or self.output_buffer.shape[1] != 2 * nlayers * nchannels):
             self.output_buffer = torch.zeros(
                 (self.chunk_size, 2 * nlayers * nchannels),
-                dtype=torch.uint8).cuda()
+                dtype=torch.uint8,
+                device=self.device)
         return self.output_buffer[:ntokens, :]
 
-    @_lmcache_nvtx_annotate
-    def from_bytes(self, bs: bytes) -> torch.Tensor:
-        encoder_output = CacheGenGPUEncoderOutput.from_bytes(bs)
-        encoder_output.max_tensors_key = encoder_output.max_tensors_key.cuda()
-        encoder_output.max_tensors_value = (
-            encoder_output.max_tensors_value.cuda())
+    def decode(self, bs: bytes) -> torch.Tensor:
+        """
+        Decode the KV cache in float32, on `self.device`
+        """
+        # The container is unpacked as CPU views, and copied to the GPU
+        # once per tensor
+        encoder_output = CacheGenGPUEncoderOutput.from_bytes(bs).to(
+            self.device)
 
         ntokens = encoder_output.max_tensors_key.shape[1]
         layers_in_key = encoder_output.max_tensors_key.shape[0]
@@ -172,7 +189,7 @@ class CacheGenDeserializer(Deserializer):
             self.key_bins = self.key_bins.to(key.device)
 
         if self.value_bins.device != value.device:
-            self.value_bins = self.value_bins.cuda()
+            self.value_bins = self.value_bins.to(value.device)
 
         key = do_dequantize(key, self.key_bins, encoder_output.max_tensors_key)
         value = do_dequantize(value, self.value_bins,
@@ -189,10 +206,22 @@ class CacheGenDeserializer(Deserializer):
         ))
         match self.fmt:
             case "vllm":
-                return blob.permute((1, 0, 2, 3, 4)).to(
-                    self.dtype)  # [nlayers, 2, ntokens, num_heads, head_size]
+                # [nlayers, 2, ntokens, num_heads, head_size]
+                return blob.permute((1, 0, 2, 3, 4))
             case "huggingface":
-                return blob.permute((1, 0, 3, 2, 4)).to(
-                    self.dtype)  # [nlayers, 2, num_heads, ntokens, head_size]
+                # [nlayers, 2, num_heads, ntokens, head_size]
+                return blob.permute((1, 0, 3, 2, 4))
             case _:
                 raise RuntimeError("Unknown format %s" % self.fmt)
+
+    @_lmcache_nvtx_annotate
+    def from_bytes(self, bs: bytes) -> torch.Tensor:
+        return self.decode(bs).to(self.dtype)
+
+    @_lmcache_nvtx_annotate
+    def from_bytes_into(self, bs: bytes, buffer: torch.Tensor) -> torch.Tensor:
+        # The permuted blob is cast and laid out straight into the buffer
+        blob = self.decode(bs)
+        out = view_buffer(buffer, blob.shape)
+        out.copy_(blob)
+        return out
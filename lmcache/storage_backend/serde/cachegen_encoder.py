@@ -1,18 +1,25 @@
 from typing import Dict, Tuple
 
 import torch
-import torchac_cuda  # type: ignore
 
 import lmcache.storage_backend.serde.cachegen_basics as CGBasics
+import lmcache.storage_backend.serde.cachegen_cpu as cachegen_cpu
 from lmcache.config import LMCacheEngineConfig, LMCacheEngineMetadata
 from lmcache.logging import init_logger
 from lmcache.storage_backend.serde.cachegen_basics import (
-    CacheGenConfig, CacheGenGPUBytestream, CacheGenGPUEncoderOutput)
+    CacheGenConfig, CacheGenGPUBytestream, CacheGenGPUEncoderOutput,
+    get_codec_device)
 from lmcache.storage_backend.serde.serde import Serializer
 from lmcache.utils import _lmcache_nvtx_annotate
 
 logger = init_logger(__name__)
 
+try:
+    import torchac_cuda  # type: ignore
+except ImportError:
+    # Only the CPU codec in cachegen_cpu can be used
+    torchac_cuda = None
+
 
 @_lmcache_nvtx_annotate
 def torch_quant(bins: int,
@@ -91,41 +98,6 @@ def _split_kv(tensor: torch.Tensor) -> Tuple[torch.Tensor, ...]:
                         dim=1)
 
 
-@_lmcache_nvtx_annotate
-def _convert_to_int_and_normalize(cdf_float, needs_normalization):
-    """
-    Convert floatingpoint CDF to integers. See README for more info.
-
-    The idea is the following:
-    When we get the cdf here, it is (assumed to be) between 0 and 1, i.e,
-      cdf in [0, 1)
-    (note that 1 should not be included.)
-    We now want to convert this to int16 but make sure we do not get
-    the same value twice, as this would break the arithmetic coder
-    (you need a strictly monotonically increasing function).
-    So, if needs_normalization==True, we multiply the input CDF
-    with 2**16 - (Lp - 1). This means that now,
-      cdf in [0, 2**16 - (Lp - 1)].
-    Then, in a final step, we add an arange(Lp), which is just a line with
-    slope one. This ensure that for sure, we will get unique, strictly
-    monotonically increasing CDFs, which are in [0, 2**16)
-    """
-    PRECISION = 16
-    Lp = cdf_float.shape[-1]
-    factor = torch.tensor(2, dtype=torch.float32,
-                          device=cdf_float.device).pow_(PRECISION)
-    new_max_value = factor
-    if needs_normalization:
-        new_max_value = new_max_value - (Lp - 1)
-    cdf_float = cdf_float.mul(new_max_value)
-    cdf_float = cdf_float.round()
-    cdf = cdf_float.to(dtype=torch.int16, non_blocking=True)
-    if needs_normalization:
-        r = torch.arange(Lp, dtype=torch.int16, device=cdf.device)
-        cdf.add_(r)
-    return cdf
-
-
 class CacheGenEncoderImpl:
 
     def __init__(self, **kwargs) -> None:
@@ -203,7 +175,7 @@ class CacheGenEncoderImpl:
             results = []
             for x in X:
                 """do permute here"""
-                batch_counts = process_batch(x.cuda().permute(1, 0), max_val)
+                batch_counts = process_batch(x.permute(1, 0), max_val)
                 results.append(batch_counts)
 
             final_counts = torch.cat(results, dim=0)
@@ -284,6 +256,12 @@ def encode_function(
     encode_input = torch.cat((new_key, new_value),
                              dim=0).reshape(nlayers, chunk_size, nchannels)
 
+    if not kv.is_cuda:
+        return _encode_function_cpu(encode_input, new_key, new_value,
+                                    max_tensors_key, max_tensors_value,
+                                    key_bins, value_bins, chunk_size,
+                                    num_heads, head_size)
+
     new_cdf_key = torchac_cuda.calculate_cdf(new_key, int(key_bins.max()))
     new_cdf_value = torchac_cuda.calculate_cdf(new_value,
                                                int(value_bins.max()))
@@ -325,14 +303,62 @@ def encode_function(
     )
 
 
+def _encode_function_cpu(
+    encode_input: torch.Tensor,
+    new_key: torch.Tensor,
+    new_value: torch.Tensor,
+    max_tensors_key: torch.Tensor,
+    max_tensors_value: torch.Tensor,
+    key_bins: torch.Tensor,
+    value_bins: torch.Tensor,
+    chunk_size: int,
+    num_heads: int,
+    head_size: int,
+) -> CacheGenGPUEncoderOutput:
+    """
+    The CPU counterpart of the torchac_cuda part of encode_function. The
+    bytestreams are the same as the ones of the CUDA codec, for the same
+    CDFs.
+    """
+    cdf_int = torch.cat([
+        cachegen_cpu.calculate_cdf(new_key, int(key_bins.max())),
+        cachegen_cpu.calculate_cdf(new_value, int(value_bins.max()))
+    ])
+
+    data_chunks = []
+    for i in range(0, chunk_size, CGBasics.CACHEGEN_GPU_MAX_TOKENS_PER_CHUNK):
+        start = i
+        end = min(i + CGBasics.CACHEGEN_GPU_MAX_TOKENS_PER_CHUNK, chunk_size)
+        bytestream, output_lengths = cachegen_cpu.encode(
+            cdf_int, encode_input[:, start:end, :])
+        data_chunks.append(
+            CacheGenGPUBytestream(
+                bytestream=bytestream,
+                bytestream_lengths=output_lengths,
+                ntokens=end - start,
+            ))
+
+    return CacheGenGPUEncoderOutput(
+        data_chunks,
+        cdf_int,
+        max_tensors_key=max_tensors_key,
+        max_tensors_value=max_tensors_value,
+        num_heads=num_heads,
+        head_size=head_size,
+    )
+
+
 class CacheGenSerializer(Serializer):
 
     def __init__(self, config: LMCacheEngineConfig,
                  metadata: LMCacheEngineMetadata):
-        self.cachegen_config = CacheGenConfig.from_model_name(
-            metadata.model_name)
+        self.cachegen_config = CacheGenConfig.load(
+            metadata.model_name, config.cachegen_profile,
+            metadata.kv_shape[0] if metadata.kv_shape is not None else None)
         self.chunk_size = config.chunk_size
         self.fmt = metadata.fmt
+        # The device to encode on, "cuda" or "cpu"
+        self.device = get_codec_device()
         self.key_bins = self.make_key_bins(self.cachegen_config)
         self.value_bins = self.make_value_bins(self.cachegen_config)
 
@@ -340,13 +366,13 @@ class CacheGenSerializer(Serializer):
         ret = torch.zeros(config.nlayers)
         for spec in config.kspecs:
             ret[spec.start_layer:spec.end_layer] = spec.bins
-        return ret.cuda()
+        return ret.to(self.device)
 
     def make_value_bins(self, config: CacheGenConfig) -> torch.Tensor:
         ret = torch.zeros(config.nlayers)
         for spec in config.vspecs:
             ret[spec.start_layer:spec.end_layer] = spec.bins
-        return ret.cuda()
+        return ret.to(self.device)
 
     @_lmcache_nvtx_annotate
     def to_bytes(self, tensor: torch.Tensor) -> bytes:
@@ -364,8 +390,12 @@ class CacheGenSerializer(Serializer):
         # Temporary fix for issue #83: encoder will have the default device 0
         # on all the ray workers. Need to set it to the correct device.
         # Also need to figure out why this happens.
-        if torch.cuda.current_device != tensor.device:
-            torch.cuda.set_device(tensor.device)
+        if self.device == "cuda":
+            tensor = tensor.cuda()
+            if torch.cuda.current_device != tensor.device:
+                torch.cuda.set_device(tensor.device)
+        else:
+            tensor = tensor.cpu()
         if tensor.device != self.key_bins.device:
             self.key_bins = self.key_bins.to(tensor.device)
         if tensor.device != self.value_bins.device:
@@ -379,7 +409,7 @@ class CacheGenSerializer(Serializer):
         [num_layers, 2, num_tokens, num_heads, head_size] """
         ntokens = tensor.shape[2]
         output_dict = encode_function(
-            tensor.cuda(),
+            tensor,
             self.cachegen_config,
             self.key_bins,
             self.value_bins,
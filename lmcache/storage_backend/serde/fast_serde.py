@@ -1,30 +1,185 @@
+import struct
+import zlib
+from typing import Dict, Tuple, Union
+
 import torch
 
 from lmcache.logging import init_logger
-from lmcache.storage_backend.serde.serde import Deserializer, Serializer
+from lmcache.storage_backend.serde.serde import (Deserializer, Serializer,
+                                                 view_buffer)
 
 logger = init_logger(__name__)
 
+BytesLike = Union[bytes, bytearray, memoryview]
+
+# Frame layout (little endian):
+#   magic (4s) | version (B) | flags (B) | dtype (B) | layout (B) |
+#   ndim (B) | padding (3x) | crc32 (I) | shape (ndim x Q) | padding |
+#   payload
+# The header is padded to FRAME_ALIGNMENT bytes so that the payload of the
+# received buffer can be viewed as a tensor of any dtype without a copy.
+FRAME_MAGIC = b"LMCF"
+FRAME_VERSION = 1
+FRAME_ALIGNMENT = 16
+FRAME_HEADER = struct.Struct("<4sBBBBB3xI")
+
+# The crc32 of the payload is valid
+FLAG_CHECKSUM = 0x1
+
+# The payload is the tensor in row-major (C contiguous) order
+LAYOUT_CONTIGUOUS = 0
+
+# NOTE: the codes are part of the format, only append to this table
+DTYPE_TO_CODE: Dict[torch.dtype, int] = {
+    torch.float32: 0,
+    torch.float16: 1,
+    torch.bfloat16: 2,
+    torch.float64: 3,
+    torch.uint8: 4,
+    torch.int8: 5,
+    torch.int16: 6,
+    torch.int32: 7,
+    torch.int64: 8,
+    torch.bool: 9,
+}
+for _code, _name in [(10, "float8_e4m3fn"), (11, "float8_e5m2")]:
+    if hasattr(torch, _name):
+        DTYPE_TO_CODE[getattr(torch, _name)] = _code
+CODE_TO_DTYPE: Dict[int, torch.dtype] = {
+    code: dtype
+    for dtype, code in DTYPE_TO_CODE.items()
+}
+
+
+def _header_size(ndim: int) -> int:
+    size = FRAME_HEADER.size + 8 * ndim
+    return (size + FRAME_ALIGNMENT - 1) // FRAME_ALIGNMENT * FRAME_ALIGNMENT
+
+
+def parse_frame_header(
+        b: BytesLike) -> Tuple[torch.dtype, torch.Size, int, int, int]:
+    """
+    Parse and validate the header of a frame.
+
+    Returns:
+        dtype, shape, the offset and the size of the payload, and the
+        expected crc32 of the payload (-1 if the frame has no checksum)
+    """
+    if len(b) < FRAME_HEADER.size:
+        raise ValueError(f"Frame too short: {len(b)} bytes")
+    magic, version, flags, dtype_code, layout, ndim, crc = \
+        FRAME_HEADER.unpack_from(b, 0)
+    if magic != FRAME_MAGIC:
+        raise ValueError(f"Invalid frame magic: {magic!r}")
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version: {version}")
+    if layout != LAYOUT_CONTIGUOUS:
+        raise ValueError(f"Unsupported frame layout: {layout}")
+    dtype = CODE_TO_DTYPE.get(dtype_code)
+    if dtype is None:
+        raise ValueError(f"Unsupported frame dtype code: {dtype_code}")
+
+    offset = _header_size(ndim)
+    if len(b) < offset:
+        raise ValueError(f"Frame too short: {len(b)} bytes, the header of "
+                         f"{ndim} dims is {offset} bytes")
+    shape = torch.Size(struct.unpack_from(f"<{ndim}Q", b, FRAME_HEADER.size))
+    nbytes = shape.numel() * dtype.itemsize
+    if len(b) != offset + nbytes:
+        raise ValueError(f"Frame size mismatch: expected {offset + nbytes} "
+                         f"bytes, got {len(b)}")
+    return dtype, shape, offset, nbytes, \
+        crc if flags & FLAG_CHECKSUM else -1
+
 
 class FastSerializer(Serializer):
+    """
+    Serializes a tensor into a self-describing frame: a small header with
+    the dtype, shape and layout of the tensor, followed by its raw bytes.
+    The tensor is copied once, straight into the output buffer.
+    """
 
-    def __init__(self):
+    def __init__(self, checksum: bool = False):
         super().__init__()
+        self.checksum = checksum
+
+    def serialized_size(self, t: torch.Tensor) -> int:
+        return _header_size(t.dim()) + t.numel() * t.element_size()
+
+    def serialize_into(self, t: torch.Tensor, buffer: BytesLike) -> int:
+        """
+        Serialize the tensor into a preallocated writable buffer of at least
+        `serialized_size(t)` bytes.
 
-    def to_bytes(self, t: torch.Tensor) -> bytes:
-        # make tensor into bit stream
-        buf = t.contiguous().cpu().view(torch.uint8).numpy().tobytes()
-        return buf
+        Returns:
+            The number of bytes written
+        """
+        if t.dtype not in DTYPE_TO_CODE:
+            raise ValueError(f"Unsupported dtype: {t.dtype}")
+        offset = _header_size(t.dim())
+        nbytes = t.numel() * t.element_size()
+        total = offset + nbytes
+        if len(buffer) < total:
+            raise ValueError(f"Buffer too small: {len(buffer)} < {total}")
+
+        view = memoryview(buffer).cast("B")
+        if nbytes > 0:
+            payload = torch.frombuffer(view,
+                                       dtype=torch.uint8,
+                                       count=nbytes,
+                                       offset=offset)
+            payload.copy_(t.contiguous().reshape(-1).view(torch.uint8))
+
+        flags = 0
+        crc = 0
+        if self.checksum:
+            flags |= FLAG_CHECKSUM
+            crc = zlib.crc32(view[offset:total])
+        FRAME_HEADER.pack_into(view, 0, FRAME_MAGIC, FRAME_VERSION, flags,
+                               DTYPE_TO_CODE[t.dtype], LAYOUT_CONTIGUOUS,
+                               t.dim(), crc)
+        struct.pack_into(f"<{t.dim()}Q", view, FRAME_HEADER.size, *t.shape)
+        view[FRAME_HEADER.size + 8 * t.dim():offset] = \
+            bytes(offset - FRAME_HEADER.size - 8 * t.dim())
+        return total
+
+    def to_bytes(self, t: torch.Tensor) -> bytearray:
+        buffer = bytearray(self.serialized_size(t))
+        self.serialize_into(t, buffer)
+        return buffer
 
 
 class FastDeserializer(Deserializer):
+    """
+    Deserializes the frames of FastSerializer. The returned tensor is a
+    view over the received buffer, so the buffer should not be reused
+    while the tensor is alive.
+    """
 
     def __init__(self, dtype):
         super().__init__(dtype)
 
-    def from_bytes_normal(self, b: bytes) -> torch.Tensor:
-        print(self.dtype)
-        return torch.frombuffer(b, dtype=self.dtype)
+    def from_bytes_normal(self, b: BytesLike) -> torch.Tensor:
+        dtype, shape, offset, nbytes, crc = parse_frame_header(b)
+        if crc >= 0:
+            actual_crc = zlib.crc32(memoryview(b)[offset:offset + nbytes])
+            if actual_crc != crc:
+                raise ValueError(f"Frame checksum mismatch: expected "
+                                 f"{crc:#010x}, got {actual_crc:#010x}")
+        if nbytes == 0:
+            return torch.empty(shape, dtype=dtype)
+        return torch.frombuffer(b,
+                                dtype=dtype,
+                                count=shape.numel(),
+                                offset=offset).view(shape)
+
+    def from_bytes(self, b: BytesLike) -> torch.Tensor:
+        return self.from_bytes_normal(b).to(dtype=self.dtype)
 
-    def from_bytes(self, b: bytes) -> torch.Tensor:
-        return self.from_bytes_normal(b)
+    def from_bytes_into(self, b: BytesLike,
+                        buffer: torch.Tensor) -> torch.Tensor:
+        # The payload is copied (and cast) straight from the received bytes
+        t = self.from_bytes_normal(b)
+        out = view_buffer(buffer, t.shape)
+        out.copy_(t)
+        return out
@@ -0,0 +1,233 @@
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import torch
+
+from lmcache.logging import init_logger
+from lmcache.storage_backend.serde.fast_serde import (CODE_TO_DTYPE,
+                                                      DTYPE_TO_CODE, BytesLike)
+from lmcache.storage_backend.serde.serde import (Deserializer, Serializer,
+                                                 view_buffer)
+
+logger = init_logger(__name__)
+
+# The lossless format (little endian):
+#   header: magic "LMCZ" (4s) | version (B) | algorithm (B) | dtype (B) |
+#           ndim (B) | num_blocks (I) | block_size (I) | shape (ndim x Q)
+#   block table: the compressed size of each block (num_blocks x I)
+#   blocks: the compressed blocks
+# The tensor is byte-shuffled before being compressed: the i-th bytes of
+# all the elements are stored together, so that the exponent bytes of the
+# float16/bfloat16 values, which are very redundant, end up next to each
+# other. The shuffled bytes are compressed in independent blocks of
+# `block_size` bytes, which are compressed and decompressed in parallel.
+LOSSLESS_MAGIC = b"LMCZ"
+LOSSLESS_VERSION = 1
+LOSSLESS_HEADER = struct.Struct("<4sBBBBII")
+LOSSLESS_ALGORITHMS = ["zstd", "lz4"]
+DEFAULT_BLOCK_SIZE = 1 << 20
+
+# The blocks of all the codecs are (de)compressed on one pool, as each
+# serde, and each serde worker, creates its own codecs
+_block_pool: Optional[ThreadPoolExecutor] = None
+_block_pool_lock = threading.Lock()
+
+
+def _get_block_pool() -> ThreadPoolExecutor:
+    global _block_pool
+    with _block_pool_lock:
+        if _block_pool is None:
+            num_threads = min(8, os.cpu_count() or 1)
+            _block_pool = ThreadPoolExecutor(max_workers=num_threads,
+                                             thread_name_prefix="lmc-codec")
+        return _block_pool
+
+
+def _load_codec(
+    algorithm: str, level: int
+) -> Tuple[Callable[[memoryview], bytes], Callable[[memoryview, int], bytes]]:
+    """
+    Returns the functions to compress a block and to decompress a block
+    of a known size
+    """
+    try:
+        match algorithm:
+            case "zstd":
+                import zstandard  # type: ignore
+
+                def zstd_compress(block: memoryview) -> bytes:
+                    # The compressors are not thread safe
+                    return zstandard.ZstdCompressor(
+                        level=level).compress(block)
+
+                def zstd_decompress(block: memoryview, size: int) -> bytes:
+                    return zstandard.ZstdDecompressor().decompress(
+                        block, max_output_size=size)
+
+                return zstd_compress, zstd_decompress
+            case "lz4":
+                import lz4.block  # type: ignore
+
+                def lz4_compress(block: memoryview) -> bytes:
+                    return lz4.block.compress(block, store_size=False)
+
+                def lz4_decompress(block: memoryview, size: int) -> bytes:
+                    return lz4.block.decompress(block, uncompressed_size=size)
+
+                return lz4_compress, lz4_decompress
+            case _:
+                raise ValueError(
+                    f"Invalid lossless compression algorithm: {algorithm}")
+    except ImportError as e:
+        package = "zstandard" if algorithm == "zstd" else "lz4"
+        raise ImportError(f"The {algorithm} serde needs the {package} "
+                          f"package, please `pip install {package}`") from e
+
+
+class LosslessCodec:
+    """
+    Byte-shuffles a tensor and compresses it in independent blocks with
+    zstd or lz4, see LOSSLESS_HEADER for the format.
+    """
+
+    def __init__(self,
+                 algorithm: str = "zstd",
+                 level: int = 3,
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+        self.compress_block, self.decompress_block = _load_codec(
+            algorithm, level)
+        self.algorithm = algorithm
+        self.algorithm_code = LOSSLESS_ALGORITHMS.index(algorithm)
+        self.block_size = block_size
+        self.executor = _get_block_pool()
+
+    def _block_ranges(self, nbytes: int,
+                      block_size: int) -> List[Tuple[int, int]]:
+        return [(start, min(start + block_size, nbytes))
+                for start in range(0, nbytes, block_size)]
+
+    def compress(self, t: torch.Tensor) -> bytearray:
+        if t.dtype not in DTYPE_TO_CODE:
+            raise ValueError(f"Unsupported dtype: {t.dtype}")
+        itemsize = t.element_size()
+        shuffled = t.detach().cpu().contiguous().reshape(-1).view(torch.uint8)
+        if itemsize > 1:
+            shuffled = shuffled.view(-1, itemsize).t().contiguous()
+        data = shuffled.numpy().data.cast("B")
+
+        ranges = self._block_ranges(len(data), self.block_size)
+        blocks = list(
+            self.executor.map(lambda r: self.compress_block(data[r[0]:r[1]]),
+                              ranges))
+
+        shape_format = f"<{t.dim()}Q"
+        table_format = f"<{len(blocks)}I"
+        offset = LOSSLESS_HEADER.size + struct.calcsize(shape_format) + \
+            struct.calcsize(table_format)
+        buffer = bytearray(offset + sum(len(block) for block in blocks))
+        LOSSLESS_HEADER.pack_into(buffer, 0, LOSSLESS_MAGIC, LOSSLESS_VERSION,
+                                  self.algorithm_code, DTYPE_TO_CODE[t.dtype],
+                                  t.dim(), len(blocks), self.block_size)
+        struct.pack_into(shape_format, buffer, LOSSLESS_HEADER.size, *t.shape)
+        struct.pack_into(table_format, buffer,
+                         LOSSLESS_HEADER.size + struct.calcsize(shape_format),
+                         *[len(block) for block in blocks])
+        for block in blocks:
+            buffer[offset:offset + len(block)] = block
+            offset += len(block)
+        return buffer
+
+    def read_header(self, b: BytesLike) -> Tuple[torch.dtype, torch.Size]:
+        magic, version, algorithm_code, dtype_code, ndim, _, _ = \
+            LOSSLESS_HEADER.unpack_from(b, 0)
+        if magic != LOSSLESS_MAGIC or version != LOSSLESS_VERSION:
+            raise ValueError(f"Invalid lossless header: {magic!r}, {version}")
+        if algorithm_code != self.algorithm_code:
+            raise ValueError(f"Expected {self.algorithm} data, got algorithm "
+                             f"{algorithm_code}")
+        shape = struct.unpack_from(f"<{ndim}Q", b, LOSSLESS_HEADER.size)
+        return CODE_TO_DTYPE[dtype_code], torch.Size(shape)
+
+    def decompress_into(self, b: BytesLike, out: torch.Tensor) -> None:
+        """
+        Decompress the data into `out`, a contiguous CPU tensor with the
+        dtype and the shape in the header
+        """
+        dtype, shape = self.read_header(b)
+        if out.dtype != dtype or out.shape != shape:
+            raise ValueError(f"Expected a {dtype} tensor of {shape}, got a "
+                             f"{out.dtype} tensor of {out.shape}")
+        if not out.is_contiguous() or out.device.type != "cpu":
+            raise ValueError("Expected a contiguous CPU tensor")
+        _, _, _, _, ndim, num_blocks, block_size = \
+            LOSSLESS_HEADER.unpack_from(b, 0)
+        table_offset = LOSSLESS_HEADER.size + 8 * ndim
+        sizes = struct.unpack_from(f"<{num_blocks}I", b, table_offset)
+
+        itemsize = out.element_size()
+        raw = out.reshape(-1).view(torch.uint8)
+        # Blocks are decompressed into a staging buffer when the bytes
+        # have to be unshuffled
+        staging = raw if itemsize == 1 else torch.empty_like(raw)
+        ranges = self._block_ranges(raw.numel(), block_size)
+        if len(ranges) != num_blocks:
+            raise ValueError("Lossless data has a wrong number of blocks")
+
+        data = memoryview(b).cast("B")
+        dst = staging.numpy().data.cast("B")
+        offsets = [table_offset + 4 * num_blocks]
+        for size in sizes:
+            offsets.append(offsets[-1] + size)
+
+        def decompress(idx: int) -> None:
+            start, end = ranges[idx]
+            block = self.decompress_block(data[offsets[idx]:offsets[idx + 1]],
+                                          end - start)
+            if len(block) != end - start:
+                raise ValueError(f"Corrupted lossless block {idx}")
+            dst[start:end] = block
+
+        # Raises the first error of the blocks
+        list(self.executor.map(decompress, range(num_blocks)))
+        if itemsize > 1:
+            raw.view(-1, itemsize).copy_(staging.view(itemsize, -1).t())
+
+    def decompress(self, b: BytesLike) -> torch.Tensor:
+        dtype, shape = self.read_header(b)
+        out = torch.empty(shape, dtype=dtype)
+        self.decompress_into(b, out)
+        return out
+
+
+class LosslessSerializer(Serializer):
+
+    def __init__(self, algorithm: str, level: int = 3):
+        super().__init__()
+        self.codec = LosslessCodec(algorithm, level)
+
+    def to_bytes(self, t: torch.Tensor) -> bytes:
+        return self.codec.compress(t)
+
+
+class LosslessDeserializer(Deserializer):
+
+    def __init__(self, dtype, algorithm: str):
+        super().__init__(dtype)
+        self.codec = LosslessCodec(algorithm)
+
+    def from_bytes(self, b: BytesLike) -> torch.Tensor:
+        return self.codec.decompress(b).to(dtype=self.dtype)
+
+    def from_bytes_into(self, b: BytesLike,
+                        buffer: torch.Tensor) -> torch.Tensor:
+        dtype, shape = self.codec.read_header(b)
+        out = view_buffer(buffer, shape)
+        if out.dtype == dtype and out.device.type == "cpu":
+            # The blocks are decompressed straight into the buffer
+            self.codec.decompress_into(b, out)
+        else:
+            out.copy_(self.codec.decompress(b))
+        return out
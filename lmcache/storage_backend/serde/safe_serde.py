@@ -1,14 +1,31 @@
-from typing import Union
+import json
+import struct
+from typing import Dict, Union
 
 import torch
 from safetensors.torch import load, save
 
 from lmcache.config import GlobalConfig
 from lmcache.logging import init_logger
-from lmcache.storage_backend.serde.serde import Deserializer, Serializer
+from lmcache.storage_backend.serde.serde import (Deserializer, Serializer,
+                                                 view_buffer)
 
 logger = init_logger(__name__)
 
+# The dtypes of the safetensors header
+SAFETENSORS_DTYPES: Dict[str, torch.dtype] = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
 
 class SafeSerializer(Serializer):
 
@@ -32,3 +49,25 @@ class SafeDeserializer(Deserializer):
     # bytearray from `receive_all()` in connector?
     def from_bytes(self, b: Union[bytearray, bytes]) -> torch.Tensor:
         return self.from_bytes_normal(b)
+
+    def from_bytes_into(self, b: Union[bytearray, bytes],
+                        buffer: torch.Tensor) -> torch.Tensor:
+        # The safetensors format is an 8-byte header size, a json header
+        # and the raw data, so the data is copied straight from the bytes
+        (header_size, ) = struct.unpack_from("<Q", b, 0)
+        header = json.loads(bytes(b[8:8 + header_size]))
+        info = header["tensor_bytes"]
+        dtype = SAFETENSORS_DTYPES.get(info["dtype"])
+        if dtype is None:
+            return super().from_bytes_into(b, buffer)
+        shape = torch.Size(info["shape"])
+        out = view_buffer(buffer, shape)
+        if shape.numel() == 0:
+            return out
+        begin, _ = info["data_offsets"]
+        out.copy_(
+            torch.frombuffer(b,
+                             dtype=dtype,
+                             count=shape.numel(),
+                             offset=8 + header_size + begin).view(shape))
+        return out
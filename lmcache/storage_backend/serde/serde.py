@@ -41,8 +41,27 @@ class SerializerDebugWrapper(Serializer):
         return bs
 
 
+def view_buffer(buffer: torch.Tensor, shape: torch.Size) -> torch.Tensor:
+    """
+    View the front of a flat buffer as a tensor of `shape`.
+
+    Throws:
+        ValueError if the buffer is not flat and contiguous, or too small
+    """
+    if buffer.dim() != 1 or not buffer.is_contiguous():
+        raise ValueError("Expected a flat contiguous buffer")
+    if shape.numel() > buffer.numel():
+        raise ValueError(f"Buffer too small: {buffer.numel()} < "
+                         f"{shape.numel()} elements")
+    return buffer[:shape.numel()].view(shape)
+
+
 class Deserializer(metaclass=abc.ABCMeta):
 
+    # The device that the tensors are decoded on. The tensors decoded on
+    # the CPU can be decoded into pinned buffers by from_bytes_into()
+    device: str = "cpu"
+
     def __init__(self, dtype):
         self.dtype = dtype
 
@@ -59,11 +78,38 @@ class Deserializer(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    def from_bytes_into(self, bs: bytes, buffer: torch.Tensor) -> torch.Tensor:
+        """
+        Deserialize a pytorch tensor from bytes into a preallocated buffer,
+        e.g., a pinned buffer that is reused across chunks.
+
+        Input:
+            bytes: a stream of bytes
+            buffer: a flat contiguous tensor of `self.dtype`, with at least
+                as many elements as the deserialized tensor
+
+        Output:
+            torch.Tensor: the deserialized pytorch tensor, a view of the
+                front of the buffer
+
+        Throws:
+            ValueError if the buffer is too small
+
+        Note:
+            The default implementation decodes into a new tensor and copies
+            it, the deserializers override it to decode in place.
+        """
+        t = self.from_bytes(bs)
+        out = view_buffer(buffer, t.shape)
+        out.copy_(t)
+        return out
+
 
 class DeserializerDebugWrapper(Deserializer):
 
     def __init__(self, d: Deserializer):
         self.d = d
+        self.device = d.device
 
     @_lmcache_nvtx_annotate
     def from_bytes(self, t: bytes) -> torch.Tensor:
@@ -73,3 +119,12 @@ class DeserializerDebugWrapper(Deserializer):
 
         logger.debug(f"Deserialization took {(end-start)*1000:.2f} ms")
         return ret
+
+    @_lmcache_nvtx_annotate
+    def from_bytes_into(self, t: bytes, buffer: torch.Tensor) -> torch.Tensor:
+        start = time.perf_counter()
+        ret = self.d.from_bytes_into(t, buffer)
+        end = time.perf_counter()
+
+        logger.debug(f"Deserialization took {(end-start)*1000:.2f} ms")
+        return ret
@@ -0,0 +1,270 @@
+import enum
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Hashable, List, Optional, Tuple
+
+import torch
+import torch.multiprocessing as mp
+
+from lmcache.logging import init_logger
+
+logger = init_logger(__name__)
+
+# The tasks are called as fn(state, *args), where state is what the
+# initializer returned in the worker, e.g., a serializer
+SerdeTask = Callable[..., Any]
+
+
+class SerdeWorkerType(enum.Enum):
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+def _run_task(state: Any, error: Optional[BaseException], fn: SerdeTask,
+              args: Tuple[Any, ...]) -> Any:
+    if error is not None:
+        raise RuntimeError("The serde worker failed to start") from error
+    return fn(state, *args)
+
+
+class _ThreadWorker:
+
+    def __init__(self, name: str, initializer: Callable[[], Any],
+                 queue_size: int):
+        self.initializer = initializer
+        # put() blocks when the worker is `queue_size` tasks behind
+        self.tasks: queue.Queue[Optional[Tuple[SerdeTask, Tuple[Any, ...],
+                                               Future]]] = queue.Queue(
+                                                   maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run,
+                                       name=name,
+                                       daemon=True)
+        self.thread.start()
+
+    def submit(self, fn: SerdeTask, args: Tuple[Any, ...],
+               future: Future) -> None:
+        self.tasks.put((fn, args, future))
+
+    def _run(self) -> None:
+        state, error = None, None
+        try:
+            state = self.initializer()
+        except Exception as e:
+            logger.error(f"Failed to initialize the serde worker: {e}")
+            error = e
+
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            fn, args, future = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(_run_task(state, error, fn, args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def close(self) -> None:
+        self.tasks.put(None)
+        self.thread.join()
+
+
+def _process_worker_main(initializer: Callable[[], Any], tasks: Any,
+                         results: Any) -> None:
+    state, error = None, None
+    try:
+        state = initializer()
+    except Exception as e:
+        error = e
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        fn, args = task
+        try:
+            results.put((True, _run_task(state, error, fn, args)))
+        except Exception as e:
+            results.put((False, e))
+
+
+def _to_shared(arg: Any) -> Any:
+    """
+    Copy a CPU tensor to shared memory, so that only its handle is sent to
+    the worker process. The copy is compact, so a view of a large buffer
+    does not drag the whole buffer along.
+    """
+    if isinstance(arg, torch.Tensor) and not arg.is_cuda and \
+            not arg.is_shared():
+        return arg.detach().clone().share_memory_()
+    return arg
+
+
+class _ProcessWorker:
+
+    def __init__(self, name: str, initializer: Callable[[], Any],
+                 queue_size: int):
+        ctx = mp.get_context("spawn")
+        # The tensors put in these queues are passed through shared memory
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.process = ctx.Process(target=_process_worker_main,
+                                   args=(initializer, self.tasks,
+                                         self.results),
+                                   name=name,
+                                   daemon=True)
+        self.process.start()
+
+        self.slots = threading.BoundedSemaphore(queue_size) \
+            if queue_size > 0 else None
+        # The results come back in the order of the tasks. The arguments
+        # are kept alive until then, as the worker may be using their
+        # shared memory
+        self.pending: Deque[Tuple[Future, Tuple[Any, ...]]] = deque()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.collector = threading.Thread(target=self._collect,
+                                          name=f"{name}-collector",
+                                          daemon=True)
+        self.collector.start()
+
+    def submit(self, fn: SerdeTask, args: Tuple[Any, ...],
+               future: Future) -> None:
+        if self.slots is not None:
+            # The permits are released by the results, so stop waiting if
+            # the worker dies meanwhile
+            while not self.slots.acquire(timeout=1):
+                if not self.process.is_alive():
+                    raise RuntimeError("The serde worker process is dead")
+        args = tuple(_to_shared(arg) for arg in args)
+        with self.lock:
+            if not self.process.is_alive():
+                if self.slots is not None:
+                    self.slots.release()
+                raise RuntimeError("The serde worker process is dead")
+            self.pending.append((future, args))
+            self.tasks.put((fn, args))
+
+    def _fail_pending(self, error: BaseException) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, deque()
+        for future, _ in pending:
+            # The failed tasks will never return their permits
+            if self.slots is not None:
+                self.slots.release()
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def _collect(self) -> None:
+        while True:
+            try:
+                item = self.results.get(timeout=1)
+            except queue.Empty:
+                if self.closed:
+                    break
+                if not self.process.is_alive():
+                    logger.error("The serde worker process died")
+                    self._fail_pending(
+                        RuntimeError("The serde worker process died"))
+                    break
+                continue
+
+            ok, value = item
+            with self.lock:
+                future, _ = self.pending.popleft()
+            if self.slots is not None:
+                self.slots.release()
+            if not future.set_running_or_notify_cancel():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def close(self) -> None:
+        if self.process.is_alive():
+            self.tasks.put(None)
+            self.process.join()
+        self.closed = True
+        self.collector.join()
+        self._fail_pending(RuntimeError("The serde executor is closed"))
+
+
+class SerdeExecutor:
+    """
+    Runs the serialization of KV chunks on a pool of worker threads or
+    processes, off the threads that submit them.
+
+    - The tasks of a key always run on the same worker, in the order they
+      are submitted, so the puts of a key cannot be reordered.
+    - Each worker holds at most `queue_size` pending tasks (0 means
+      unbounded), and submit() blocks when the worker of the key is full,
+      which slows down the producer rather than piling up KV cache.
+    - Each worker calls `initializer()` once, e.g., to create its own
+      serializer, and a task `fn` is called as `fn(state, *args)` with
+      what it returned.
+
+    Process workers are started with "spawn", so `initializer`, `fn`, the
+    arguments and the results have to be picklable (e.g., module level
+    functions). The tensor arguments are handed off through shared memory.
+    The results of a process worker are delivered by its collector thread.
+    """
+
+    def __init__(self,
+                 name: str,
+                 num_workers: int,
+                 initializer: Callable[[], Any],
+                 queue_size: int = 16,
+                 worker_type: SerdeWorkerType = SerdeWorkerType.THREAD):
+        if num_workers <= 0:
+            raise ValueError(f"Invalid number of serde workers: {num_workers}")
+        worker_cls = _ThreadWorker if worker_type == SerdeWorkerType.THREAD \
+            else _ProcessWorker
+        self.workers: List[Any] = [
+            worker_cls(f"lmc-serde-{name}-{idx}", initializer, queue_size)
+            for idx in range(num_workers)
+        ]
+        self.closed = False
+        logger.info(f"Started {num_workers} serde {worker_type.value} "
+                    f"workers for {name}")
+
+    def submit(self, key: Hashable, fn: SerdeTask, *args: Any) -> Future:
+        if self.closed:
+            raise RuntimeError("The serde executor is closed")
+        future: Future = Future()
+        worker = self.workers[hash(key) % len(self.workers)]
+        worker.submit(fn, args, future)
+        return future
+
+    def close(self) -> None:
+        """
+        Finish the submitted tasks and stop the workers
+        """
+        if self.closed:
+            return
+        self.closed = True
+        for worker in self.workers:
+            worker.close()
+
+
+def CreateSerdeExecutor(
+        name: str, config: Any,
+        initializer: Callable[[], Any]) -> Optional[SerdeExecutor]:
+    """
+    Create the serde executor of a backend from `serde_workers`,
+    `serde_queue_size` and `serde_worker_type` (threads if not in the
+    config) in the config. Returns None if `serde_workers` is 0.
+    """
+    if config.serde_workers <= 0:
+        return None
+    try:
+        worker_type = SerdeWorkerType(
+            getattr(config, "serde_worker_type", "thread"))
+    except ValueError:
+        raise ValueError(f"Invalid serde_worker_type: "
+                         f"{config.serde_worker_type}") from None
+    return SerdeExecutor(name, config.serde_workers, initializer,
+                         config.serde_queue_size, worker_type)
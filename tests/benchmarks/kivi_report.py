@@ -0,0 +1,70 @@
+"""
+Reports the compression ratio, the quality and the speed of the KIVI serde
+on a KV cache chunk of shape [2, num_layers, num_tokens, hidden].
+
+Usage:
+    python kivi_report.py [--kv-file kv.pt] [--bits 2 4] [--group-sizes 64]
+
+Without --kv-file, a random chunk is used, which is harder to quantize
+than a real KV cache.
+"""
+import argparse
+import time
+
+import torch
+
+from lmcache.experimental.memory_management import HostMemoryAllocator
+from lmcache.experimental.storage_backend.naive_serde.kivi_serde import (
+    KIVIDeserializer, KIVISerializer)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--kv-file", type=str, default=None)
+    parser.add_argument("--shape",
+                        type=int,
+                        nargs=4,
+                        default=[2, 32, 256, 1024])
+    parser.add_argument("--bits", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--group-sizes",
+                        type=int,
+                        nargs="+",
+                        default=[32, 64, 128])
+    args = parser.parse_args()
+
+    if args.kv_file is not None:
+        kv = torch.load(args.kv_file).to(torch.bfloat16)
+    else:
+        kv = torch.randn(args.shape, dtype=torch.bfloat16)
+
+    allocator = HostMemoryAllocator(8 * kv.numel() * kv.element_size())
+    memory_obj = allocator.allocate(kv.shape, kv.dtype)
+    memory_obj.tensor.copy_(kv)
+    deserializer = KIVIDeserializer(allocator)
+
+    print(f"KV chunk: {tuple(kv.shape)}, {kv.dtype}, "
+          f"{memory_obj.get_size() / 1e6:.2f} MB")
+    print(f"{'bits':>4} {'group':>5} {'ratio':>6} {'key cos':>8} "
+          f"{'val cos':>8} {'max err':>8} {'ser ms':>7} {'deser ms':>8}")
+    for bits in args.bits:
+        for group_size in args.group_sizes:
+            serializer = KIVISerializer(allocator, bits, bits, group_size)
+            start = time.perf_counter()
+            serialized = serializer.serialize(memory_obj)
+            mid = time.perf_counter()
+            deserialized = deserializer.deserialize(serialized)
+            end = time.perf_counter()
+            assert deserialized is not None
+
+            original = kv.float()
+            decoded = deserialized.tensor.float()
+            cos = [
+                torch.nn.functional.cosine_similarity(decoded[i].flatten(),
+                                                      original[i].flatten(),
+                                                      dim=0) for i in range(2)
+            ]
+            max_err = (decoded - original).abs().max()
+            print(f"{bits:>4} {group_size:>5} "
+                  f"{memory_obj.get_size() / serialized.get_size():>6.2f} "
+                  f"{cos[0]:>8.4f} {cos[1]:>8.4f} {max_err:>8.4f} "
+                  f"{(mid - start) * 1000:>7.1f} {(end - mid) * 1000:>8.1f}")
+            allocator.ref_count_down(deserialized)
@@ -66,6 +66,56 @@ def test_same_retrieve_store(autorelease_experimental):
     LMCacheEngineBuilder.destroy("test")
 
 
+@pytest.mark.parametrize("fp8_format", ["e4m3", "e5m2"])
+@pytest.mark.parametrize("granularity", ["token", "channel"])
+@pytest.mark.parametrize("backend", ["cpu", "local_disk"])
+def test_fp8_retrieve_store(fp8_format, granularity, backend,
+                            autorelease_experimental):
+    device = "cuda"
+    fmt = "vllm"
+    num_tokens = 2000
+    chunk_size = 256
+    kv_shape = (32, 2, chunk_size, 8, 128)
+
+    connector = create_gpu_connector(1024, 32)
+
+    tokens = generate_tokens(num_tokens, device)
+    kv_cache = generate_kv_cache(num_tokens, fmt, device)
+    retrieved_cache = generate_kv_cache(num_tokens, fmt, device)
+    """ initialize the engine """
+    cfg = LMCacheEngineConfig.from_legacy(chunk_size=chunk_size,
+                                          backend=backend)
+    cfg.fp8_format = fp8_format
+    cfg.fp8_scale_granularity = granularity
+
+    engine = autorelease_experimental(
+        LMCacheEngineBuilder.get_or_create("test", cfg,
+                                           dumb_metadata(fmt, kv_shape),
+                                           connector))
+    """ test store """
+    engine.store(tokens, kvcaches=kv_cache)
+    """ Store is async. Need to wait for the store to finish """
+    timeout = 1.5 if backend == "cpu" else 30
+    start_time = time.time()
+    while engine.lookup(tokens) < num_tokens:
+        if time.time() - start_time > timeout:
+            raise TimeoutError(f"Operation timed out after {timeout} seconds.")
+        time.sleep(0.01)
+    """ test retrieve """
+    ret_mask = engine.retrieve(tokens, kvcaches=retrieved_cache)
+    length = torch.sum(ret_mask)
+    assert length == num_tokens
+    # The values are in [0, 1), and are rounded to the fp8 mantissa
+    atol = 0.07 if fp8_format == "e4m3" else 0.13
+    for (left_k, left_v), (right_k, right_v) in zip(retrieved_cache, kv_cache):
+        assert torch.allclose(left_k.float(), right_k.float(), atol=atol)
+        assert torch.allclose(left_v.float(), right_v.float(), atol=atol)
+
+    if backend == "local_disk":
+        subprocess.run(shlex.split("rm -rf /local/disk_test/local_disk/"))
+    LMCacheEngineBuilder.destroy("test")
+
+
 @pytest.mark.parametrize("fmt", ["vllm"])
 @pytest.mark.parametrize("chunk_size", [128, 256])
 @pytest.mark.parametrize("backend",
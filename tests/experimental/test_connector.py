@@ -5,8 +5,12 @@ import torch
 from utils import (check_mem_obj_equal, close_asyncio_loop,
                    dumb_cache_engine_key, init_asyncio_loop)
 
-from lmcache.experimental.memory_management import PinMemoryAllocator
+from lmcache.experimental.memory_management import (MemoryFormat,
+                                                    PinMemoryAllocator)
 from lmcache.experimental.storage_backend.connector import CreateConnector
+from lmcache.experimental.storage_backend.connector.sharded_connector import (
+    ConsistentHashRing, ShardedConnector, StripeManifest)
+from lmcache.utils import CacheEngineKey
 
 
 @pytest.mark.parametrize("lmserver_experimental_process", ["cpu"],
@@ -57,3 +61,166 @@ def test_lm_connector(url, autorelease_experimental,
     )
 
     close_asyncio_loop(async_loop, async_thread)
+
+
+@pytest.mark.parametrize("lmserver_experimental_process", ["cpu --shm"],
+                         indirect=True)
+def test_shm_connector(autorelease_experimental,
+                       lmserver_experimental_process):
+    url = lmserver_experimental_process.server_url.replace(
+        "lm://", "lm+shm://")
+
+    async_loop, async_thread = init_asyncio_loop()
+    memory_allocator = PinMemoryAllocator(1024 * 1024 * 1024)
+    connector = autorelease_experimental(
+        CreateConnector(url, async_loop, memory_allocator))
+
+    random_key = dumb_cache_engine_key()
+    future = asyncio.run_coroutine_threadsafe(connector.get(random_key),
+                                              async_loop)
+    assert future.result() is None
+
+    memory_obj = memory_allocator.allocate([2, 32, 1000, 1024], torch.bfloat16)
+    memory_allocator.ref_count_up(memory_obj)
+    future = asyncio.run_coroutine_threadsafe(
+        connector.put(random_key, memory_obj), async_loop)
+    future.result()
+    assert memory_allocator.get_ref_count(memory_obj) == 1
+
+    future = asyncio.run_coroutine_threadsafe(connector.exists(random_key),
+                                              async_loop)
+    assert future.result()
+
+    # Get twice, the chunk is unpinned in the server after each copy
+    for _ in range(2):
+        future = asyncio.run_coroutine_threadsafe(connector.get(random_key),
+                                                  async_loop)
+        check_mem_obj_equal([future.result()], [memory_obj])
+
+    close_asyncio_loop(async_loop, async_thread)
+
+
+def test_consistent_hash_ring():
+    shards = [f"host{i}:65432" for i in range(4)]
+    ring = ConsistentHashRing(shards, 128)
+    keys = [f"vllm@model@1@0@hash{i}" for i in range(4000)]
+    assignment = [ring.get_shard(key) for key in keys]
+
+    # The keys are spread over all the shards
+    for shard_id in range(len(shards)):
+        assert assignment.count(shard_id) > 500
+
+    # Only the keys of the new shard move
+    new_ring = ConsistentHashRing(shards + ["host4:65432"], 128)
+    for key, shard_id in zip(keys, assignment):
+        new_shard_id = new_ring.get_shard(key)
+        assert new_shard_id in [shard_id, 4]
+
+
+def test_consistent_hash_ring_replicas():
+    shards = [f"host{i}:65432" for i in range(4)]
+    ring = ConsistentHashRing(shards, 128)
+    for i in range(100):
+        key = f"vllm@model@1@0@hash{i}"
+        replicas = ring.get_shards(key, 3)
+        assert replicas[0] == ring.get_shard(key)
+        assert len(set(replicas)) == 3
+    assert sorted(ring.get_shards("vllm@model@1@0@hash0", 10)) == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize("lmserver_experimental_process", ["cpu"],
+                         indirect=True)
+def test_sharded_connector(autorelease_experimental,
+                           lmserver_experimental_process):
+    # The second shard is down, so its keys should be misses
+    url = lmserver_experimental_process.server_url + ",localhost:1"
+
+    async_loop, async_thread = init_asyncio_loop()
+    memory_allocator = PinMemoryAllocator(1024 * 1024 * 1024)
+    connector = autorelease_experimental(
+        CreateConnector(url, async_loop, memory_allocator))
+    assert isinstance(connector, ShardedConnector)
+
+    keys = [
+        CacheEngineKey("vllm", "test_model", 3, 123, f"hash{i}")
+        for i in range(20)
+    ]
+    live_keys = [
+        key for key in keys if connector.ring.get_shard(key.to_string()) == 0
+    ]
+    assert 0 < len(live_keys) < len(keys)
+
+    memory_objs = []
+    for _ in keys:
+        memory_obj = memory_allocator.allocate([2, 32, 256, 1024],
+                                               torch.bfloat16)
+        memory_obj.tensor.fill_(len(memory_objs))
+        memory_allocator.ref_count_up(memory_obj)
+        memory_objs.append(memory_obj)
+
+    future = asyncio.run_coroutine_threadsafe(
+        connector.batched_put(keys, memory_objs), async_loop)
+    future.result()
+    for memory_obj in memory_objs:
+        assert memory_allocator.get_ref_count(memory_obj) == 1
+
+    future = asyncio.run_coroutine_threadsafe(connector.batched_exists(keys),
+                                              async_loop)
+    assert future.result() == [key in live_keys for key in keys]
+
+    future = asyncio.run_coroutine_threadsafe(connector.batched_get(keys),
+                                              async_loop)
+    for key, memory_obj, retrieved in zip(keys, memory_objs, future.result()):
+        if key in live_keys:
+            check_mem_obj_equal([retrieved], [memory_obj])
+        else:
+            assert retrieved is None
+
+    close_asyncio_loop(async_loop, async_thread)
+
+
+def test_stripe_manifest():
+    manifest = StripeManifest(10 * 1024 * 1024 + 5,
+                              MemoryFormat.KV_BLOB, torch.bfloat16,
+                              torch.Size([2, 32, 256,
+                                          1024]), 4 * 1024 * 1024, [1, 2, 3])
+    assert manifest.stripe_range(2) == (8 * 1024 * 1024, 10 * 1024 * 1024 + 5)
+    assert StripeManifest.deserialize(manifest.serialize()) == manifest
+    assert StripeManifest.deserialize(b"not a manifest") is None
+
+
+@pytest.mark.parametrize("lmserver_experimental_process", ["cpu"],
+                         indirect=True)
+def test_striped_connector(autorelease_experimental,
+                           lmserver_experimental_process, monkeypatch):
+    monkeypatch.setenv(ShardedConnector.ENV_SHARD_STRIPE_SIZE,
+                       str(1024 * 1024))
+    # Use the same server as two shards
+    server_url = lmserver_experimental_process.server_url
+    url = server_url + "," + server_url[len("lm://"):]
+
+    async_loop, async_thread = init_asyncio_loop()
+    memory_allocator = PinMemoryAllocator(1024 * 1024 * 1024)
+    connector = autorelease_experimental(
+        CreateConnector(url, async_loop, memory_allocator))
+
+    random_key = dumb_cache_engine_key()
+    # 2 * 32 * 100 * 1024 * 2 bytes = 12.5 stripes
+    memory_obj = memory_allocator.allocate([2, 32, 100, 1024], torch.bfloat16)
+    memory_obj.tensor.copy_(torch.rand(memory_obj.tensor.shape))
+    memory_allocator.ref_count_up(memory_obj)
+
+    future = asyncio.run_coroutine_threadsafe(
+        connector.put(random_key, memory_obj), async_loop)
+    future.result()
+    assert memory_allocator.get_ref_count(memory_obj) == 1
+
+    future = asyncio.run_coroutine_threadsafe(connector.exists(random_key),
+                                              async_loop)
+    assert future.result()
+
+    future = asyncio.run_coroutine_threadsafe(connector.get(random_key),
+                                              async_loop)
+    check_mem_obj_equal([future.result()], [memory_obj])
+
+    close_asyncio_loop(async_loop, async_thread)
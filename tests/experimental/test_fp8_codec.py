@@ -0,0 +1,113 @@
+import pytest
+import torch
+
+from lmcache.experimental.fp8_codec import (FP8_DTYPES, FP8KVCodec,
+                                            FP8ScaleGranularity,
+                                            dequantize_fp8, fp8_packed_shape,
+                                            fp8_unpacked_shape, quantize_fp8)
+from lmcache.experimental.gpu_connector import GPUConnectorInterface
+from lmcache.experimental.memory_management import (MemoryFormat,
+                                                    MemoryObjMetadata,
+                                                    TensorMemoryObj)
+
+# The half ulp of the fp8 mantissa, relative to the value
+REL_ERROR = {"e4m3": 2**-4, "e5m2": 2**-3}
+
+
+class TensorGPUConnector(GPUConnectorInterface):
+    """
+    Copies the tokens between a [2, num_layers, num_tokens, hidden_dim]
+    tensor and the memory objects
+    """
+
+    def __init__(self, kv: torch.Tensor):
+        self.kv = kv
+
+    def to_gpu(self, memory_obj, start, end, **kwargs):
+        self.kv[:, :, start:end].copy_(memory_obj.tensor)
+
+    def from_gpu(self, memory_obj, start, end, **kwargs):
+        memory_obj.tensor.copy_(self.kv[:, :, start:end])
+        memory_obj.metadata.fmt = MemoryFormat.KV_BLOB
+
+    def get_shape(self, num_tokens):
+        return torch.Size([*self.kv.shape[:2], num_tokens, self.kv.shape[3]])
+
+
+def make_memory_obj(shape, dtype):
+    raw_data = torch.empty(shape.numel(), dtype=dtype)
+    metadata = MemoryObjMetadata(shape, dtype, 0,
+                                 shape.numel() * dtype.itemsize, 1)
+    return TensorMemoryObj(raw_data, metadata)
+
+
+@pytest.mark.parametrize("fp8_format", ["e4m3", "e5m2"])
+@pytest.mark.parametrize("granularity", ["token", "channel"])
+def test_fp8_round_trip(fp8_format, granularity):
+    fp8_dtype = FP8_DTYPES[fp8_format]
+    granularity = FP8ScaleGranularity(granularity)
+    kv = torch.randn(2, 4, 256, 128, dtype=torch.bfloat16) * 10
+    # All-zero tokens and channels, and outliers
+    kv[:, :, 7] = 0
+    kv[..., 3] = 0
+    kv[0, 1, 100, 5] = 3000
+
+    packed = quantize_fp8(kv, fp8_dtype, granularity)
+    assert packed.dtype == torch.uint8
+    assert packed.shape == fp8_packed_shape(kv.shape, granularity)
+    assert fp8_unpacked_shape(packed.shape, granularity) == kv.shape
+    # Half the bytes of the bfloat16 chunk, plus the scales
+    assert packed.numel() < kv.numel() * kv.element_size() * 0.52
+
+    out = torch.empty_like(kv)
+    dequantize_fp8(packed, fp8_dtype, granularity, out)
+    assert not out.isnan().any()
+    dim = -1 if granularity == FP8ScaleGranularity.TOKEN else -2
+    # The error of a value is bounded by its rounding in fp8, or the
+    # subnormal step of its scale
+    amax = kv.float().abs().amax(dim=dim, keepdim=True)
+    bound = kv.float().abs() * REL_ERROR[fp8_format] + amax * 2**-7 + 1e-2
+    assert ((out.float() - kv.float()).abs() <= bound).all()
+    assert torch.equal(out[:, :, 7], kv[:, :, 7])
+    assert torch.equal(out[..., 3], kv[..., 3])
+
+
+@pytest.mark.parametrize("granularity", ["token", "channel"])
+def test_fp8_codec(granularity):
+    kv = torch.randn(2, 4, 512, 64, dtype=torch.bfloat16)
+    retrieved = torch.zeros_like(kv)
+    codec = FP8KVCodec("e4m3", granularity, torch.bfloat16, device="cpu")
+
+    memory_objs = []
+    for start in range(0, 512, 256):
+        kv_shape = torch.Size([2, 4, 256, 64])
+        memory_obj = make_memory_obj(codec.packed_shape(kv_shape), torch.uint8)
+        codec.from_gpu(TensorGPUConnector(kv), memory_obj, kv_shape, start,
+                       start + 256)
+        assert memory_obj.get_memory_format() == MemoryFormat.KV_BLOB
+        memory_objs.append(memory_obj)
+
+    # The last chunk is partial
+    kv_shape = torch.Size([2, 4, 100, 64])
+    memory_obj = make_memory_obj(codec.packed_shape(kv_shape), torch.uint8)
+    codec.from_gpu(TensorGPUConnector(kv), memory_obj, kv_shape, 256, 356)
+
+    for idx, chunk in enumerate(memory_objs):
+        codec.to_gpu(TensorGPUConnector(retrieved), chunk, idx * 256,
+                     idx * 256 + 256)
+    assert torch.allclose(retrieved.float(), kv.float(), rtol=0.07, atol=0.02)
+
+    retrieved.zero_()
+    codec.to_gpu(TensorGPUConnector(retrieved), memory_obj, 256, 356)
+    assert torch.allclose(retrieved[:, :, 256:356].float(),
+                          kv[:, :, 256:356].float(),
+                          rtol=0.07,
+                          atol=0.02)
+    assert not retrieved[:, :, 356:].any()
+
+
+def test_fp8_codec_invalid():
+    with pytest.raises(ValueError):
+        FP8KVCodec("e3m4", "token", torch.bfloat16)
+    with pytest.raises(ValueError):
+        FP8KVCodec("e4m3", "group", torch.bfloat16)
@@ -0,0 +1,51 @@
+import hashlib
+
+import torch
+
+from lmcache.experimental.memory_management import MemoryFormat
+from lmcache.experimental.protocol import (ClientMetaMessage, Constants,
+                                           KeyCodec)
+from lmcache.utils import CacheEngineKey
+
+
+def make_message(idx, model_name="test_model"):
+    chunk_hash = hashlib.sha256(str(idx).encode()).hexdigest()
+    key = CacheEngineKey("vllm", model_name, 4, idx, chunk_hash)
+    return ClientMetaMessage(Constants.CLIENT_PUT, key, 1 << 20,
+                             MemoryFormat.KV_BLOB, torch.bfloat16,
+                             torch.Size([2, 32, 256, 1024]))
+
+
+def parse(s, codec=None):
+    prefixlength = ClientMetaMessage.prefixlength()
+    assert ClientMetaMessage.bodylength(s[:prefixlength]) == \
+        len(s) - prefixlength
+    return ClientMetaMessage.deserialize(s[prefixlength:], codec)
+
+
+def test_client_meta_message():
+    msg = make_message(0)
+    assert parse(msg.serialize()) == msg
+
+    # Non-hex chunk hashes and long model names
+    msg.key.chunk_hash = "not-a-hex-digest#1"
+    assert parse(msg.serialize()) == msg
+    msg = make_message(1, "m" * 1000)
+    assert parse(msg.serialize()) == msg
+
+
+def test_key_codec():
+    encoder, decoder = KeyCodec(), KeyCodec()
+    sizes = []
+    for idx in range(10):
+        msg = make_message(idx, "a-rather-long-model-name" * 4)
+        s = msg.serialize(encoder)
+        sizes.append(len(s))
+        assert parse(s, decoder) == msg
+
+        # Messages without the codec can be mixed in
+        assert parse(msg.serialize(), decoder) == msg
+
+    # Only the first message carries the model name
+    assert sizes[1] < sizes[0] - 90
+    assert max(sizes[1:]) < 64
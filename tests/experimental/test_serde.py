@@ -0,0 +1,39 @@
+import pytest
+import torch
+
+from lmcache.experimental.memory_management import HostMemoryAllocator
+from lmcache.experimental.storage_backend.naive_serde.kivi_serde import (
+    KIVIDeserializer, KIVISerializer)
+
+
+@pytest.mark.parametrize("bits", [2, 4])
+def test_kivi_serde(bits):
+    allocator = HostMemoryAllocator(64 * 1024 * 1024)
+    serializer = KIVISerializer(allocator, bits, bits, group_size=32)
+    deserializer = KIVIDeserializer(allocator)
+
+    # The number of tokens is not a multiple of the group size
+    kv_shape = torch.Size([2, 4, 100, 256])
+    memory_obj = allocator.allocate(kv_shape, torch.bfloat16)
+    memory_obj.tensor.copy_(torch.randn(kv_shape))
+    kv = memory_obj.tensor.float()
+
+    serialized = serializer.serialize(memory_obj)
+    ratio = memory_obj.get_size() / serialized.get_size()
+    # float16 scales and minimums for every 32 elements, and the padding
+    # of the last group of tokens
+    assert ratio > 16 / (bits + 1) * 0.8
+
+    deserialized = deserializer.deserialize(serialized)
+    assert deserialized.tensor.shape == kv_shape
+    assert deserialized.tensor.dtype == torch.bfloat16
+    # Each group is within half a quantization step of the original
+    error = (deserialized.tensor.float() - kv).abs()
+    value_range = kv.max() - kv.min()
+    assert error.max() <= value_range / ((1 << bits) - 1)
+    cos = torch.nn.functional.cosine_similarity(
+        deserialized.tensor.float().flatten(), kv.flatten(), dim=0)
+    assert cos > (0.85 if bits == 2 else 0.99)
+
+    with pytest.raises(ValueError):
+        KIVISerializer(allocator, 3, 3)
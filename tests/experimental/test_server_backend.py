@@ -0,0 +1,297 @@
+import multiprocessing
+import socket
+import threading
+import time
+
+import pytest
+import torch
+
+from lmcache.experimental.memory_management import MemoryFormat
+from lmcache.experimental.protocol import ClientMetaMessage, Constants
+from lmcache.experimental.server.__main__ import LMCacheServer
+from lmcache.experimental.server.admin import LMSAdminClient
+from lmcache.experimental.server.replication import HotKeyTracker
+from lmcache.experimental.server.storage_backend import CreateStorageBackend
+from lmcache.experimental.server.utils import GetMemoryView, LMSStatsMonitor
+from lmcache.utils import CacheEngineKey
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def make_meta(idx, length=CHUNK_SIZE, model_name="test_model", world_size=3):
+    key = CacheEngineKey("vllm", model_name, world_size, 123, f"hash{idx}")
+    return ClientMetaMessage(Constants.CLIENT_PUT, key, length,
+                             MemoryFormat.KV_BLOB, torch.uint8,
+                             torch.Size([length, 0, 0, 0]))
+
+
+def put(backend, meta):
+    memory_obj = backend.allocate(meta)
+    if memory_obj is None:
+        return False
+    GetMemoryView(memory_obj)[:meta.length] = bytes([meta.length % 256
+                                                     ]) * meta.length
+    backend.put(meta, memory_obj)
+    return True
+
+
+@pytest.mark.parametrize("evictor", ["lru", "lfu", "size"])
+def test_server_backend_capacity(evictor):
+    # 4 chunks fit in the arena
+    backend = CreateStorageBackend("cpu", 4 * CHUNK_SIZE / 1024**3, evictor)
+    metas = [make_meta(i) for i in range(10)]
+    for meta in metas:
+        assert put(backend, meta)
+        stats = backend.get_stats()
+        assert stats["used_bytes"] <= stats["capacity_bytes"]
+
+    stats = backend.get_stats()
+    assert stats["num_keys"] == 4
+    assert stats["num_evictions"] == 6
+    assert stats["evicted_bytes"] == 6 * CHUNK_SIZE
+    assert backend.allocator.memcheck()
+
+    # Too big to fit
+    assert not put(backend, make_meta(100, 5 * CHUNK_SIZE))
+    assert backend.get_stats()["num_rejected_puts"] == 1
+
+
+def test_server_backend_lfu():
+    backend = CreateStorageBackend("cpu", 2 * CHUNK_SIZE / 1024**3, "lfu")
+    meta0, meta1, meta2 = make_meta(0), make_meta(1), make_meta(2)
+    assert put(backend, meta0)
+    assert put(backend, meta1)
+
+    # meta0 is used more frequently than meta1
+    for _ in range(3):
+        backend.release(backend.get(meta0.key))
+    backend.release(backend.get(meta1.key))
+
+    assert put(backend, meta2)
+    assert backend.contains(meta0.key)
+    assert not backend.contains(meta1.key)
+
+
+def test_server_backend_pinned_get():
+    backend = CreateStorageBackend("cpu", 2 * CHUNK_SIZE / 1024**3, "lru")
+    meta0 = make_meta(0, 1000)
+    assert put(backend, meta0)
+
+    lms_memory_obj = backend.get(meta0.key)
+    assert lms_memory_obj is not None
+    assert bytes(lms_memory_obj.buffer) == bytes([1000 % 256]) * 1000
+
+    # The chunk is evicted while it is being sent
+    backend.remove(meta0.key)
+    assert lms_memory_obj.data.is_valid()
+
+    backend.release(lms_memory_obj)
+    assert not lms_memory_obj.data.is_valid()
+    assert backend.allocator.memcheck()
+
+
+def test_server_backend_disk_tier(tmp_path):
+    backend = CreateStorageBackend(str(tmp_path), 2 * CHUNK_SIZE / 1024**3,
+                                   "lru", 10 * CHUNK_SIZE / 1024**3)
+    metas = [make_meta(i, CHUNK_SIZE - i) for i in range(5)]
+    for meta in metas:
+        assert put(backend, meta)
+
+    # Wait for the evicted chunks to be written to disk
+    backend.close()
+
+    # The index is rebuilt from the files after restarting
+    backend = CreateStorageBackend(str(tmp_path), 2 * CHUNK_SIZE / 1024**3,
+                                   "lru", 10 * CHUNK_SIZE / 1024**3)
+    for meta in metas[:3]:
+        assert backend.contains(meta.key)
+        lms_memory_obj = backend.get(meta.key)
+        assert lms_memory_obj is not None
+        assert lms_memory_obj.file is not None
+        assert lms_memory_obj.length == meta.length
+        assert lms_memory_obj.shape == meta.shape
+        lms_memory_obj.file.seek(lms_memory_obj.offset)
+        data = lms_memory_obj.file.read(lms_memory_obj.length)
+        assert data == bytes([meta.length % 256]) * meta.length
+        backend.release(lms_memory_obj)
+
+    # The last two chunks were only in memory
+    for meta in metas[3:]:
+        assert not backend.contains(meta.key)
+    backend.close()
+
+
+def test_server_backend_shared():
+    # 16 stripes of 4 MB
+    backend = CreateStorageBackend("cpu",
+                                   64 * CHUNK_SIZE / 1024**3,
+                                   num_workers=2)
+    metas = [make_meta(i, CHUNK_SIZE - i) for i in range(4)]
+
+    def worker(meta):
+        assert put(backend, meta)
+
+    # The chunks put by other processes are visible
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=worker, args=(meta, )) for meta in metas]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    for meta in metas:
+        lms_memory_obj = backend.get(meta.key)
+        assert lms_memory_obj is not None
+        assert lms_memory_obj.shape == meta.shape
+        assert bytes(lms_memory_obj.buffer) == \
+            bytes([meta.length % 256]) * meta.length
+        backend.release(lms_memory_obj)
+    assert backend.get_stats()["num_keys"] == 4
+
+    # The oldest chunks are evicted when a stripe is full
+    for i in range(4, 120):
+        assert put(backend, make_meta(i))
+    stats = backend.get_stats()
+    assert stats["num_evictions"] > 0
+    assert stats["used_bytes"] <= stats["capacity_bytes"]
+
+    # Pinned chunks are not overwritten
+    key = make_meta(119).key
+    lms_memory_obj = backend.get(key)
+    backend.remove(key)
+    assert not backend.contains(key)
+    for i in range(120, 240):
+        put(backend, make_meta(i))
+    assert bytes(
+        lms_memory_obj.buffer) == bytes([CHUNK_SIZE % 256]) * CHUNK_SIZE
+    backend.release(lms_memory_obj)
+    backend.close()
+
+
+def test_server_backend_invalidate():
+    backend = CreateStorageBackend("cpu", 8 * CHUNK_SIZE / 1024**3)
+    for idx in range(2):
+        assert put(backend, make_meta(idx))
+        assert put(backend, make_meta(idx, world_size=4))
+        assert put(backend, make_meta(idx, model_name="other_model"))
+
+    assert backend.invalidate("test_model", 4) == 2
+    assert backend.contains(make_meta(0).key)
+    assert backend.invalidate("test_model") == 2
+    assert not backend.contains(make_meta(0).key)
+    assert backend.contains(make_meta(0, model_name="other_model").key)
+    assert backend.invalidate() == 2
+    assert backend.get_stats()["num_keys"] == 0
+
+
+def test_server_stats_monitor():
+    monitor = LMSStatsMonitor()
+    monitor.on_request("get", 0.0002, True)
+    monitor.on_request("get", 0.004, False)
+    monitor.on_request("put", 10.0)
+
+    stats = monitor.get_stats()["commands"]
+    assert stats["get"]["count"] == 2
+    assert stats["get"]["hits"] == 1
+    assert stats["get"]["misses"] == 1
+    assert stats["get"]["latency_histogram"]["0.25ms"] == 1
+    assert stats["get"]["latency_histogram"]["5ms"] == 1
+    assert stats["put"]["latency_histogram"]["inf"] == 1
+    assert stats["put"]["hits"] == 0
+
+
+def test_hot_key_tracker():
+    tracker = HotKeyTracker(threshold=3, window=60, ttl=60)
+    key = make_meta(0).key
+    assert not tracker.on_access(key)
+    assert not tracker.on_access(key)
+    # Becomes hot on the third hit, and is only replicated once
+    assert tracker.on_access(key)
+    assert not tracker.on_access(key)
+    assert not tracker.is_replicated(key)
+
+    tracker.on_replicated(key, True)
+    assert tracker.is_replicated(key)
+    assert not tracker.on_access(key)
+    assert tracker.num_replicated() == 1
+
+    # A failed replication is retried on the next hit
+    other_key = make_meta(1).key
+    for _ in range(3):
+        tracker.on_access(other_key)
+    tracker.on_replicated(other_key, False)
+    assert not tracker.is_replicated(other_key)
+    assert tracker.on_access(other_key)
+
+    # A removed key is neither replicated nor being replicated
+    third_key = make_meta(2).key
+    for _ in range(3):
+        tracker.on_access(third_key)
+    tracker.forget(third_key)
+    tracker.on_replicated(third_key, True)
+    assert not tracker.is_replicated(third_key)
+    tracker.forget(key)
+    assert not tracker.is_replicated(key)
+    assert tracker.num_replicated() == 0
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_server_replica_removal():
+    ports = []
+    for _ in range(2):
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            ports.append(sock.getsockname()[1])
+    cluster = [("localhost", port) for port in ports]
+    servers = [
+        LMCacheServer("localhost",
+                      port,
+                      "cpu",
+                      max_size=16 * CHUNK_SIZE / 1024**3,
+                      replication_args={
+                          "cluster": cluster,
+                          "index": idx,
+                          "num_replicas": 1,
+                          "hot_threshold": 1,
+                      }) for idx, port in enumerate(ports)
+    ]
+    for server in servers:
+        threading.Thread(target=server.run, daemon=True).start()
+
+    primary = servers[0]
+    metas = [
+        meta for meta in (make_meta(i) for i in range(32))
+        if primary.replicator.ring.get_shard(meta.key.to_string()) == 0
+    ][:3]
+    replica = servers[1].data_store
+
+    def replicate(meta):
+        put(primary.data_store, meta)
+        primary.replicator.on_get(meta.key)
+        wait_until(lambda: primary.replicator.tracker.is_replicated(meta.key))
+        assert replica.contains(meta.key)
+
+    for meta in metas:
+        replicate(meta)
+
+    # Deleted on the primary, and on the replica before the reply
+    admin = LMSAdminClient(*cluster[0])
+    assert admin.delete(metas[0].key) == 1
+    assert not replica.contains(metas[0].key)
+    assert not primary.replicator.tracker.is_replicated(metas[0].key)
+
+    # The stale copy of an overwritten key is removed
+    primary.data_store.free(primary.allocate(metas[1]))
+    assert not primary.replicator.tracker.is_replicated(metas[1].key)
+    wait_until(lambda: not replica.contains(metas[1].key))
+
+    assert admin.invalidate("test_model") == 1
+    assert not replica.contains(metas[2].key)
+    assert primary.replicator.get_stats()["num_failed_removals"] == 0
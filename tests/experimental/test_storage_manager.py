@@ -0,0 +1,168 @@
+import asyncio
+import threading
+import time
+
+import torch
+from utils import dumb_cache_engine_key, dumb_metadata
+
+from lmcache.experimental.config import LMCacheEngineConfig
+from lmcache.experimental.memory_management import PinMemoryAllocator
+from lmcache.experimental.storage_backend.storage_manager import StorageManager
+
+
+class SlowBackend:
+
+    def __init__(self, allocator):
+        self.allocator = allocator
+        self.num_gets = 0
+
+    def get_blocking(self, key):
+        self.num_gets += 1
+        time.sleep(0.2)
+        return self.allocator.allocate(torch.Size([1024]), torch.uint8)
+
+
+def test_storage_manager_single_flight_get():
+    config = LMCacheEngineConfig.from_defaults(local_cpu=False,
+                                               remote_url=None)
+    allocator = PinMemoryAllocator(1024 * 1024)
+    storage_manager = StorageManager(config, dumb_metadata(), allocator)
+    backend = SlowBackend(allocator)
+    storage_manager.storage_backends["SlowBackend"] = backend
+
+    num_gets = 4
+    results = [None] * num_gets
+
+    def get(idx):
+        results[idx] = storage_manager.get(dumb_cache_engine_key())
+
+    threads = [
+        threading.Thread(target=get, args=(idx, )) for idx in range(num_gets)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Fetched once, and each caller holds a reference to the same object
+    assert backend.num_gets == 1
+    assert all(result is results[0] for result in results)
+    assert allocator.get_ref_count(results[0]) == num_gets
+    for result in results:
+        allocator.ref_count_down(result)
+    assert allocator.memcheck()
+    storage_manager.close()
+
+
+class PrefetchBackend:
+
+    def __init__(self, allocator, loop):
+        self.allocator = allocator
+        self.loop = loop
+        self.started = threading.Event()
+        self.release = asyncio.Event()
+
+    async def load(self):
+        self.started.set()
+        await self.release.wait()
+        return self.allocator.allocate(torch.Size([1024]), torch.uint8)
+
+    def submit_prefetch_task(self, key):
+        return asyncio.run_coroutine_threadsafe(self.load(), self.loop)
+
+    def get_blocking(self, key):
+        return None
+
+
+def test_storage_manager_prefetch():
+    config = LMCacheEngineConfig.from_defaults(local_cpu=True, remote_url=None)
+    allocator = PinMemoryAllocator(1024 * 1024)
+    storage_manager = StorageManager(config, dumb_metadata(), allocator)
+    backend = PrefetchBackend(allocator, storage_manager.loop)
+    storage_manager.storage_backends["PrefetchBackend"] = backend
+    key = dumb_cache_engine_key()
+
+    # Cancelled before the load finishes
+    storage_manager.prefetch(key)
+    assert backend.started.wait(5)
+    assert storage_manager.cancel_prefetch(key)
+    assert not storage_manager.cancel_prefetch(key)
+    assert key not in storage_manager.hot_cache
+
+    # The prefetched buffer goes to the hot cache without a copy
+    storage_manager.prefetch(key)
+    storage_manager.loop.call_soon_threadsafe(backend.release.set)
+    memory_obj = storage_manager.get(key)
+    assert memory_obj is storage_manager.hot_cache[key]
+    assert allocator.get_ref_count(memory_obj) == 2
+    assert key not in storage_manager.prefetch_tasks
+
+    allocator.ref_count_down(memory_obj)
+    allocator.ref_count_down(storage_manager.hot_cache.pop(key))
+    assert allocator.memcheck()
+    storage_manager.close()
+
+
+class PayloadBackend:
+    """
+    A backend with the same serde as the local disk
+    """
+    serde_type = "zstd"
+
+    def __init__(self):
+        self.payloads = []
+
+    def exists_in_put_tasks(self, key):
+        return False
+
+    def submit_put_task(self, key, memory_obj, payload=None):
+        self.payloads.append(payload)
+        return None
+
+    def get_blocking(self, key):
+        return None
+
+
+def test_storage_manager_shared_encoding(tmp_path):
+    config = LMCacheEngineConfig.from_defaults(local_cpu=False,
+                                               local_disk=f"{tmp_path}/",
+                                               max_local_disk_size=1,
+                                               remote_url=None)
+    config.local_disk_serde = "zstd"
+    allocator = PinMemoryAllocator(1024 * 1024)
+    storage_manager = StorageManager(config, dumb_metadata(), allocator)
+    disk_backend = storage_manager.storage_backends["LocalDiskBackend"]
+    backend = PayloadBackend()
+    storage_manager.storage_backends["PayloadBackend"] = backend
+
+    encode_threads = []
+    serialize = disk_backend.serializer.serialize
+
+    def counting_serialize(memory_obj):
+        encode_threads.append(threading.current_thread())
+        return serialize(memory_obj)
+
+    disk_backend.serializer.serialize = counting_serialize
+
+    key = dumb_cache_engine_key()
+    memory_obj = allocator.allocate(torch.Size([2, 4, 16, 128]),
+                                    torch.bfloat16)
+    memory_obj.tensor.copy_(torch.rand(2, 4, 16, 128))
+    kv = memory_obj.tensor.clone()
+    storage_manager.put(key, memory_obj)
+    deadline = time.time() + 5
+    while not disk_backend.contains(key) and time.time() < deadline:
+        time.sleep(0.01)
+
+    # Encoded once for both backends, off the thread that put it
+    assert len(encode_threads) == 1
+    assert encode_threads[0] is not threading.current_thread()
+    assert backend.payloads[0].encoded is not None
+
+    # Stored compressed, and decoded when loaded
+    assert disk_backend.dict[key].size < kv.numel() * kv.element_size()
+    loaded = disk_backend.get_blocking(key)
+    assert torch.equal(loaded.tensor, kv)
+    allocator.ref_count_down(loaded)
+    assert allocator.memcheck()
+    storage_manager.close()
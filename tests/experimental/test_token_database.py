@@ -38,3 +38,24 @@ def test_chunked_token_database(chunk_length):
             st, ed, key = new_results[j]
             assert st == original_results[j + i][0]
             assert ed == original_results[j + i][1]
+
+
+def test_chunked_token_database_fp8_keys():
+    metadata = dumb_metadata()
+    tokens = generate_tokens(512, "cpu")
+    keys = {}
+    for fp8_format, granularity in [(None, "token"), ("e4m3", "token"),
+                                    ("e4m3", "channel"), ("e5m2", "token")]:
+        cfg = LMCacheEngineConfig.from_legacy(chunk_size=256, backend="cpu")
+        cfg.fp8_format = fp8_format
+        cfg.fp8_scale_granularity = granularity
+        db = ChunkedTokenDatabase(cfg, metadata)
+        keys[(fp8_format,
+              granularity)] = [key for _, _, key in db.process_tokens(tokens)]
+
+    # Same chunks, but never the same keys across the formats
+    assert keys[(None, "token")][0].fmt == metadata.fmt
+    for fmt_keys in keys.values():
+        assert [key.chunk_hash for key in fmt_keys] == \
+            [key.chunk_hash for key in keys[(None, "token")]]
+    assert len({key for fmt_keys in keys.values() for key in fmt_keys}) == 8
@@ -153,7 +153,7 @@ def test_backends(backend_type, dst_device, autorelease, lmserver_process):
         retrieved = backend.get(key)
         assert retrieved.shape == value.shape
         assert retrieved.device.type == dst_device
-        if config.remote_serde == "torch":
+        if config.remote_serde in ["torch", "fast"]:
             assert torch.equal(value, retrieved.to(value.device))
 
 
@@ -189,7 +189,7 @@ def test_nonblocking_put(backend_type, autorelease, lmserver_process):
         assert backend.contains(key)
         retrieved = backend.get(key)
         assert retrieved.shape == value.shape
-        if config.remote_serde == "torch":
+        if config.remote_serde in ["torch", "fast"]:
             assert torch.equal(value, retrieved.to(value.device))
 
 
@@ -216,5 +216,5 @@ def test_restart(autorelease, lmserver_process):
         assert backend.contains(key)
         retrieved = backend.get(key)
         assert value.shape == retrieved.shape
-        if config.remote_serde == "torch":
+        if config.remote_serde in ["torch", "fast"]:
             assert (value == retrieved.to(value.device)).all()
@@ -3,7 +3,7 @@ import torch
 
 from lmcache.config import LMCacheMemPoolMetadata
 from lmcache.storage_backend.mem_pool import (LocalCPUBufferPool, LocalCPUPool,
-                                              LocalGPUPool)
+                                              LocalGPUPool, PinnedStagingPool)
 
 
 def dumb_metadata(
@@ -53,3 +53,28 @@ def test_alloc_partial(mem_pool_type):
     kv_tensor = torch.rand(kv_shape_partial, dtype=kv_dtype)
     kv_obj = mem_pool.allocate(kv_tensor)
     assert kv_obj.data.shape[2] == partial_tok_num
+
+
+def test_staging_pool():
+    import threading
+
+    kv_shape = (32, 2, 256, 8, 128)
+    mem_pool = PinnedStagingPool(kv_shape, torch.bfloat16, num_buffers=2)
+    kv_obj1 = mem_pool.allocate()
+    kv_obj2 = mem_pool.allocate()
+    assert kv_obj1.data.shape == (32 * 2 * 256 * 8 * 128, )
+    assert kv_obj1.data.dtype == torch.bfloat16
+    assert kv_obj1.data.data_ptr() != kv_obj2.data.data_ptr()
+    # The chunks are decoded into the buffers in place
+    kv_obj1.data.fill_(1)
+
+    # Blocks until a buffer is freed, and recycles it
+    allocated = []
+    thread = threading.Thread(
+        target=lambda: allocated.append(mem_pool.allocate()))
+    thread.start()
+    thread.join(0.1)
+    assert not allocated
+    mem_pool.free(kv_obj1)
+    thread.join()
+    assert allocated[0].data.data_ptr() == kv_obj1.data.data_ptr()
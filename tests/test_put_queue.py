@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from lmcache.observability import LMCStatsMonitor
+from lmcache.storage_backend.put_queue import BoundedPutQueue, PutQueuePolicy
+from lmcache.utils import CacheEngineKey
+
+
+def make_key(idx):
+    return CacheEngineKey("vllm", "test_model", 1, 0, f"hash{idx}")
+
+
+def drain(put_queue):
+    put_queue.close()
+    items = []
+    while (item := put_queue.get()) is not None:
+        items.append(item)
+    return items
+
+
+@pytest.fixture(autouse=True)
+def stats_monitor():
+    LMCStatsMonitor.DestroyInstance()
+    yield LMCStatsMonitor.GetOrCreate()
+    LMCStatsMonitor.DestroyInstance()
+
+
+def test_put_queue_drop_newest(stats_monitor):
+    put_queue = BoundedPutQueue("test", 2, PutQueuePolicy.DROP_NEWEST)
+    assert put_queue.put(make_key(0), 0)
+    assert put_queue.put(make_key(1), 1)
+    assert not put_queue.put(make_key(2), 2)
+    assert put_queue.qsize() == 2
+    assert drain(put_queue) == [(make_key(0), 0), (make_key(1), 1)]
+
+    stats = stats_monitor.get_stats_and_clear()
+    assert stats.num_dropped_puts == 1
+    assert stats.put_queue_depth == 0
+    assert len(stats.put_queue_wait_time) == 2
+
+
+def test_put_queue_drop_oldest():
+    put_queue = BoundedPutQueue("test", 2, PutQueuePolicy.DROP_OLDEST)
+    for idx in range(4):
+        assert put_queue.put(make_key(idx), idx)
+    assert drain(put_queue) == [(make_key(2), 2), (make_key(3), 3)]
+    assert put_queue.num_dropped == 2
+
+
+def test_put_queue_coalesce():
+    put_queue = BoundedPutQueue("test", 2, PutQueuePolicy.COALESCE)
+    assert put_queue.put(make_key(0), "old")
+    assert put_queue.put(make_key(1), 1)
+    # Replaces the queued chunk instead of waiting for room
+    assert put_queue.put(make_key(0), "new")
+    assert drain(put_queue) == [(make_key(0), "new"), (make_key(1), 1)]
+
+
+def test_put_queue_block():
+    put_queue = BoundedPutQueue("test", 1, PutQueuePolicy.BLOCK)
+    assert put_queue.put(make_key(0), 0)
+
+    done = threading.Event()
+
+    def producer():
+        put_queue.put(make_key(1), 1)
+        done.set()
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    assert not done.wait(0.1)
+    assert put_queue.get() == (make_key(0), 0)
+    assert done.wait(5)
+    thread.join()
+    assert drain(put_queue) == [(make_key(1), 1)]
+    # No more puts after closing
+    assert not put_queue.put(make_key(2), 2)
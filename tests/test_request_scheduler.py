@@ -0,0 +1,60 @@
+import asyncio
+
+from lmcache.request_scheduler import (AsyncRequestScheduler, Priority,
+                                       RequestScheduler, TokenBucket)
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=1000)
+    # The first second of traffic goes right away
+    assert bucket.reserve(1000) == 0
+    # Then the puts are paced at the rate
+    assert 0.4 < bucket.reserve(500) <= 0.5
+    # Oversized requests wait for a full bucket instead of forever
+    assert bucket.reserve(10**6) <= 1.5
+
+    assert TokenBucket(rate=0).reserve(10**9) == 0
+
+
+def test_async_request_scheduler():
+    scheduler = AsyncRequestScheduler(max_inflight_puts=1)
+    order = []
+
+    async def request(name, priority, duration):
+        async with scheduler.request(priority):
+            order.append(f"start {name}")
+            await asyncio.sleep(duration)
+            order.append(f"end {name}")
+
+    async def main():
+        get = asyncio.create_task(request("get", Priority.GET, 0.05))
+        await asyncio.sleep(0)
+        puts = [
+            asyncio.create_task(request(f"put{i}", Priority.PUT, 0.01))
+            for i in range(2)
+        ]
+        prefetch = asyncio.create_task(
+            request("prefetch", Priority.PREFETCH, 0.01))
+        await asyncio.gather(get, prefetch, *puts)
+
+    asyncio.run(main())
+    # The prefetch goes before the puts that were submitted earlier, and
+    # the puts are sent one by one
+    assert order == [
+        "start get", "end get", "start prefetch", "end prefetch", "start put0",
+        "end put0", "start put1", "end put1"
+    ]
+
+
+def test_request_scheduler():
+    scheduler = RequestScheduler()
+    with scheduler.request(Priority.GET):
+        assert not scheduler.can_start(Priority.PUT)
+        assert not scheduler.can_start(Priority.PREFETCH)
+        # Gets are never blocked
+        with scheduler.request(Priority.GET):
+            pass
+    with scheduler.request(Priority.PUT):
+        assert scheduler.can_start(Priority.GET)
+        assert not scheduler.can_start(Priority.PUT)
+    assert scheduler.can_start(Priority.PUT)
@@ -1,10 +1,20 @@
 import pytest
 import torch
 
+import lmcache.storage_backend.serde.cachegen_cpu as cachegen_cpu
 from lmcache.config import LMCacheEngineConfig, LMCacheEngineMetadata
-from lmcache.storage_backend.serde.cachegen_basics import CacheGenEncoderOutput
+from lmcache.storage_backend.serde import CreateSerde, cachegen_calibration
+from lmcache.storage_backend.serde.cachegen_basics import (
+    CACHEGEN_GPU_MAX_TOKENS_PER_CHUNK, CacheGenConfig, CacheGenGPUBytestream,
+    CacheGenGPUEncoderOutput, get_codec_device)
 from lmcache.storage_backend.serde.cachegen_decoder import CacheGenDeserializer
-from lmcache.storage_backend.serde.cachegen_encoder import CacheGenSerializer
+from lmcache.storage_backend.serde.cachegen_encoder import (CacheGenSerializer,
+                                                            encode_ntokens)
+from lmcache.storage_backend.serde.fast_serde import (FRAME_HEADER,
+                                                      FastDeserializer,
+                                                      FastSerializer)
+from lmcache.storage_backend.serde.lossless_serde import (LosslessDeserializer,
+                                                          LosslessSerializer)
 
 
 def generate_kv_cache(num_tokens, fmt, device):
@@ -57,7 +67,7 @@ def test_cachegen_encoder(chunk_size):
     output2 = serializer2.to_bytes(kv2)
 
     assert abs(len(output) - len(output2)) < 10
-    output_dict = CacheGenEncoderOutput.from_bytes(output)
+    output_dict = CacheGenGPUEncoderOutput.from_bytes(output)
     assert output_dict.num_heads == 8
     assert output_dict.head_size == 128
 
@@ -105,3 +115,299 @@ def test_cachegen_unmatched_size(fmt):
     decoded_kv = deserializer.from_bytes(output)
     assert decoded_kv.shape == kv.shape
     assert decoded_kv.mean() != 0
+
+
+def generate_symbols(nlayers, ntokens, nchannels, bins):
+    x = torch.randn(nlayers, ntokens, nchannels) * \
+        torch.rand(nlayers, 1, nchannels)
+    C = bins // 2 - 1
+    return torch.round(x * (C / x.abs().amax(dim=-1, keepdim=True)) + C).to(
+        torch.int8)
+
+
+@pytest.mark.parametrize("ntokens", [1, 100, 256])
+def test_cachegen_cpu_codec(ntokens):
+    symbols = generate_symbols(4, ntokens, 64, 32)
+    cdf = cachegen_cpu.calculate_cdf(symbols, 32)
+    bytestream, lengths = cachegen_cpu.encode(cdf, symbols)
+    assert lengths.shape == (4, 64)
+    assert bytestream.numel() == lengths.sum()
+    if ntokens > 1:
+        assert bytestream.numel() < symbols.numel()
+
+    output = torch.zeros(symbols.shape, dtype=torch.uint8)
+    cachegen_cpu.decode_prefsum(
+        cdf, bytestream,
+        lengths.flatten().cumsum(0).reshape(lengths.shape), output)
+    assert torch.equal(output.long(), symbols.long())
+
+
+@pytest.mark.skipif(get_codec_device() != "cuda",
+                    reason="Needs CUDA and torchac_cuda")
+def test_cachegen_cpu_gpu_compat():
+    import torchac_cuda  # type: ignore
+
+    ntokens = CACHEGEN_GPU_MAX_TOKENS_PER_CHUNK
+    symbols = generate_symbols(4, ntokens, 64, 32)
+    cdf = torchac_cuda.calculate_cdf(symbols.cuda(), 32)
+    output_buffer = torch.zeros((4, 64, ntokens),
+                                dtype=torch.uint8,
+                                device="cuda")
+    output_lengths = torch.zeros((4, 64), dtype=torch.int32, device="cuda")
+    gpu_bytestream = encode_ntokens(cdf, symbols.cuda(), output_buffer,
+                                    output_lengths)
+
+    # Same bitstreams for the same CDFs
+    bytestream, lengths = cachegen_cpu.encode(cdf.cpu(), symbols)
+    assert torch.equal(lengths, output_lengths.cpu())
+    assert torch.equal(bytestream, gpu_bytestream.cpu())
+
+    output = torch.zeros(symbols.shape, dtype=torch.uint8, device="cuda")
+    torchac_cuda.decode_fast_prefsum(
+        cdf, bytestream.cuda(),
+        lengths.flatten().cumsum(0).reshape(lengths.shape).cuda(), output)
+    assert torch.equal(output.cpu().long(), symbols.long())
+
+
+@pytest.mark.parametrize("fmt", ["vllm", "huggingface"])
+def test_cachegen_cpu_serde(fmt):
+    chunk_size = 16
+    config = LMCacheEngineConfig.from_defaults(chunk_size=chunk_size)
+    metadata = LMCacheEngineMetadata(
+        model_name="mistralai/Mistral-7B-Instruct-v0.2",
+        world_size=1,
+        worker_id=0,
+        fmt=fmt,
+        kv_dtype=torch.bfloat16,
+        kv_shape=None)
+    serializer = CacheGenSerializer(config, metadata)
+    deserializer = CacheGenDeserializer(config, metadata, torch.bfloat16)
+    serializer.device = deserializer.device = "cpu"
+
+    kv = to_blob(generate_kv_cache(chunk_size, fmt, "cpu"))
+    output = serializer.to_bytes(kv)
+
+    decoded_kv = deserializer.from_bytes(output)
+    assert decoded_kv.device.type == "cpu"
+    assert decoded_kv.shape == kv.shape
+    assert torch.nn.functional.cosine_similarity(decoded_kv.float().flatten(),
+                                                 kv.float().flatten(),
+                                                 dim=0) > 0.95
+
+
+def test_cachegen_calibration(tmp_path):
+    from safetensors.torch import save_file
+    torch.manual_seed(0)
+    chunks = []
+    for i in range(3):
+        kv = torch.randn(8, 2, 64, 2, 16)
+        # Outlier channels in the first layers, as in real models
+        kv[:2] *= torch.rand(1, 1, 1, 2, 16) * 8
+        chunks.append(kv.half())
+        save_file({"kv_chunk": kv.half().permute(0, 1, 3, 2, 4).contiguous()},
+                  str(tmp_path / f"chunk{i}.pt"))
+
+    loaded = cachegen_calibration.load_kv_chunks([str(tmp_path)],
+                                                 "huggingface",
+                                                 max_chunks=2)
+    assert len(loaded) == 2
+    assert any(torch.equal(loaded[0], chunk) for chunk in chunks)
+
+    stats = cachegen_calibration.measure_layers(chunks)
+    assert stats.sizes.shape == stats.errors.shape == (2, 8, 4)
+    # More bins, larger and more accurate
+    assert (stats.sizes.diff(dim=-1) > 0).all()
+    assert (stats.errors.diff(dim=-1) < 0).all()
+
+    def layer_bins(config):
+        return torch.tensor([
+            spec.bins for specs in [config.kspecs, config.vspecs]
+            for spec in specs for _ in range(spec.start_layer, spec.end_layer)
+        ]).reshape(2, -1)
+
+    low = cachegen_calibration.search_profile(stats, target_ratio=2)
+    high = cachegen_calibration.search_profile(stats, target_ratio=3)
+    low.validate()
+    high.validate()
+    assert (layer_bins(high) <= layer_bins(low)).all()
+    assert (layer_bins(high) < layer_bins(low)).any()
+
+    budget = cachegen_calibration.search_profile(stats, error_budget=1e-3)
+    choice = torch.tensor(
+        [[stats.candidate_bins.index(int(bins)) for bins in row]
+         for row in layer_bins(budget)])
+    error = stats.errors.gather(2, choice[..., None]).sum() / stats.energy
+    assert error <= 1e-3
+    with pytest.raises(ValueError):
+        cachegen_calibration.search_profile(stats)
+
+
+def test_cachegen_profile(tmp_path):
+    profile = CacheGenConfig.from_num_layers(32)
+    profile.kspecs[0].bins = 64
+    path = str(tmp_path / "profile.yaml")
+    profile.to_file(path)
+    assert CacheGenConfig.from_file(path) == profile
+
+    config = LMCacheEngineConfig.from_defaults(chunk_size=16)
+    config.cachegen_profile = path
+    metadata = LMCacheEngineMetadata(model_name="unknown/model",
+                                     world_size=1,
+                                     worker_id=0,
+                                     fmt="vllm",
+                                     kv_dtype=torch.bfloat16,
+                                     kv_shape=(32, 2, 16, 8, 128))
+    assert CacheGenSerializer(config, metadata).cachegen_config == profile
+    with pytest.raises(ValueError, match="layers"):
+        CacheGenConfig.load("unknown/model", path, 40)
+
+    profile.vspecs[0].end_layer = 1
+    with pytest.raises(ValueError, match="contiguously"):
+        profile.to_file(path)
+
+
+def test_cachegen_container():
+    nlayers, nchannels, ntokens = 4, 16, 20
+    lengths = torch.randint(1, 8, (2 * nlayers, nchannels), dtype=torch.int32)
+    data_chunk = CacheGenGPUBytestream(bytestream=torch.randint(
+        0, 256, (int(lengths.sum()), ), dtype=torch.uint8),
+                                       bytestream_lengths=lengths,
+                                       ntokens=ntokens)
+    encoder_output = CacheGenGPUEncoderOutput(
+        data_chunks=[data_chunk, data_chunk],
+        cdf=torch.randint(0,
+                          1 << 15, (2 * nlayers, nchannels, 33),
+                          dtype=torch.int16),
+        max_tensors_key=torch.rand(nlayers, ntokens, 1),
+        max_tensors_value=torch.rand(nlayers, ntokens, 1),
+        num_heads=2,
+        head_size=8)
+
+    output = encoder_output.to_bytes()
+    decoded = CacheGenGPUEncoderOutput.from_bytes(output)
+    assert decoded.num_heads == 2 and decoded.head_size == 8
+    assert torch.equal(decoded.cdf, encoder_output.cdf)
+    assert torch.equal(decoded.max_tensors_value,
+                       encoder_output.max_tensors_value)
+    assert len(decoded.data_chunks) == 2
+    assert decoded.data_chunks[1].ntokens == ntokens
+    assert torch.equal(decoded.data_chunks[1].bytestream,
+                       data_chunk.bytestream)
+
+    # Layers [1, 3) of both the keys and the values
+    selected = CacheGenGPUEncoderOutput.from_bytes(output, layers=(1, 3))
+    assert torch.equal(selected.cdf, encoder_output.cdf[[1, 2, 5, 6]])
+    assert torch.equal(selected.max_tensors_key,
+                       encoder_output.max_tensors_key[1:3])
+    selected_chunk = selected.data_chunks[0]
+    assert torch.equal(selected_chunk.bytestream_lengths, lengths[[1, 2, 5,
+                                                                   6]])
+    offsets = [0] + lengths.sum(dim=1).cumsum(0).tolist()
+    assert torch.equal(
+        selected_chunk.bytestream,
+        torch.cat([
+            data_chunk.bytestream[offsets[1]:offsets[3]],
+            data_chunk.bytestream[offsets[5]:offsets[7]]
+        ]))
+
+    with pytest.raises(ValueError):
+        CacheGenGPUEncoderOutput.from_bytes(output[:len(output) // 2])
+    output[0:4] = b"XXXX"
+    with pytest.raises(ValueError, match="magic"):
+        CacheGenGPUEncoderOutput.from_bytes(output)
+
+
+@pytest.mark.parametrize("checksum", [False, True])
+@pytest.mark.parametrize("dtype", [torch.bfloat16, torch.float32])
+def test_fast_serde(checksum, dtype):
+    serializer = FastSerializer(checksum=checksum)
+    deserializer = FastDeserializer(dtype)
+
+    kv = to_blob(generate_kv_cache(16, "vllm", "cpu")).to(dtype)
+    # Non-contiguous tensors are serialized in row-major order
+    kv = kv.permute([0, 1, 3, 2, 4])
+    output = serializer.to_bytes(kv)
+    assert len(output) == serializer.serialized_size(kv)
+
+    decoded_kv = deserializer.from_bytes(output)
+    assert decoded_kv.shape == kv.shape
+    assert decoded_kv.dtype == dtype
+    assert torch.equal(decoded_kv, kv)
+
+    # A view over the received buffer, not a copy
+    output[-1] ^= 0xff
+    assert not torch.equal(decoded_kv, kv)
+    if checksum:
+        with pytest.raises(ValueError, match="checksum"):
+            deserializer.from_bytes(output)
+    # Cut off in the middle of the shape or the payload
+    for size in [FRAME_HEADER.size + 4, len(output) - 1]:
+        with pytest.raises(ValueError, match="Frame"):
+            deserializer.from_bytes(output[:size])
+    output[0:4] = b"XXXX"
+    with pytest.raises(ValueError, match="magic"):
+        deserializer.from_bytes(output)
+
+
+@pytest.mark.parametrize("algorithm", ["zstd", "lz4"])
+@pytest.mark.parametrize("dtype", [torch.bfloat16, torch.uint8])
+def test_lossless_serde(algorithm, dtype):
+    pytest.importorskip("zstandard" if algorithm == "zstd" else "lz4")
+    serializer = LosslessSerializer(algorithm)
+    # Several blocks, the last one being partial
+    serializer.codec.block_size = 64 * 1024 + 8
+    deserializer = LosslessDeserializer(dtype, algorithm)
+
+    kv = to_blob(generate_kv_cache(16, "vllm", "cpu")).to(dtype)
+    output = serializer.to_bytes(kv)
+    assert len(output) < kv.numel() * kv.element_size()
+
+    decoded_kv = deserializer.from_bytes(output)
+    assert decoded_kv.dtype == dtype
+    assert torch.equal(decoded_kv, kv)
+    # The codecs share one block pool
+    assert serializer.codec.executor is deserializer.codec.executor
+
+    # Decompressed into a preallocated buffer
+    out = torch.empty_like(kv)
+    deserializer.codec.decompress_into(output, out)
+    assert torch.equal(out, kv)
+    with pytest.raises(ValueError):
+        deserializer.codec.decompress_into(output, out[0])
+
+    other = "lz4" if algorithm == "zstd" else "zstd"
+    output[4 + 1] = ["zstd", "lz4"].index(other)
+    with pytest.raises(ValueError, match="Expected"):
+        deserializer.from_bytes(output)
+
+
+@pytest.mark.parametrize("serde_type",
+                         ["fast", "zstd", "safetensor", "torch", "cachegen"])
+def test_from_bytes_into(serde_type):
+    pytest.importorskip("zstandard")
+    config = LMCacheEngineConfig.from_defaults(chunk_size=16)
+    metadata = LMCacheEngineMetadata(
+        model_name="mistralai/Mistral-7B-Instruct-v0.2",
+        world_size=1,
+        worker_id=0,
+        fmt="vllm",
+        kv_dtype=torch.bfloat16,
+        kv_shape=(32, 2, 16, 8, 128))
+    serializer, deserializer = CreateSerde(serde_type, config, metadata)
+    if serde_type == "cachegen":
+        serializer.device = deserializer.device = "cpu"
+
+    # A partial chunk, decoded into the front of a full chunk buffer
+    kv = to_blob(generate_kv_cache(10, "vllm", "cpu"))
+    output = serializer.to_bytes(kv)
+    buffer = torch.zeros(32 * 2 * 16 * 8 * 128, dtype=torch.bfloat16)
+    decoded_kv = deserializer.from_bytes_into(output, buffer)
+    assert decoded_kv.data_ptr() == buffer.data_ptr()
+    assert decoded_kv.shape == kv.shape
+    assert decoded_kv.dtype == torch.bfloat16
+    assert torch.equal(decoded_kv, deserializer.from_bytes(output))
+    if serde_type != "cachegen":
+        assert torch.equal(decoded_kv, kv)
+
+    with pytest.raises(ValueError, match="too small"):
+        deserializer.from_bytes_into(output, buffer[:kv.numel() - 1])
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from functools import partial
+
+import pytest
+import torch
+
+from lmcache.config import LMCacheEngineConfig, LMCacheEngineMetadata
+from lmcache.storage_backend.remote_backend import (_create_serializer,
+                                                    _serialize)
+from lmcache.storage_backend.serde import FastDeserializer
+from lmcache.storage_backend.serde_executor import (CreateSerdeExecutor,
+                                                    SerdeExecutor,
+                                                    SerdeWorkerType)
+
+
+def record(state, log, key, idx):
+    # Give the other workers a chance to interleave
+    time.sleep(0.001)
+    with state["lock"]:
+        log.append((key, idx, threading.current_thread().name))
+    return idx
+
+
+def test_serde_executor_order():
+    lock = threading.Lock()
+    num_inits = []
+
+    def initializer():
+        num_inits.append(1)
+        return {"lock": lock}
+
+    executor = SerdeExecutor("test", 4, initializer, queue_size=0)
+    log = []
+    futures = [
+        executor.submit(f"key{idx % 8}", record, log, idx % 8, idx)
+        for idx in range(64)
+    ]
+    assert [future.result() for future in futures] == list(range(64))
+    executor.close()
+    assert len(num_inits) == 4
+
+    # The tasks of a key ran on a single worker, in order
+    for key in range(8):
+        entries = [entry for entry in log if entry[0] == key]
+        assert [idx for _, idx, _ in entries] == list(range(key, 64, 8))
+        assert len({name for _, _, name in entries}) == 1
+    assert len({name for _, _, name in log}) > 1
+
+
+def test_serde_executor_backpressure():
+    release = threading.Event()
+    executor = SerdeExecutor("test", 1, lambda: None, queue_size=1)
+    blocked = executor.submit("key", lambda state: release.wait())
+    queued = executor.submit("key", lambda state: 1)
+
+    submitted = threading.Event()
+
+    def submit():
+        executor.submit("key", lambda state: 2)
+        submitted.set()
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+    # The worker runs a task and holds another one, so the third one waits
+    assert not submitted.wait(0.2)
+    release.set()
+    assert submitted.wait(5)
+    thread.join()
+    assert blocked.result() is True
+    assert queued.result() == 1
+    executor.close()
+
+
+def test_serde_executor_errors():
+
+    def fail(state):
+        raise ValueError("bad chunk")
+
+    executor = SerdeExecutor("test", 1, lambda: None)
+    with pytest.raises(ValueError, match="bad chunk"):
+        executor.submit("key", fail).result()
+    # The worker survives the error
+    assert executor.submit("key", lambda state: 1).result() == 1
+    executor.close()
+    with pytest.raises(RuntimeError):
+        executor.submit("key", lambda state: 1)
+
+    def broken():
+        raise RuntimeError("no serializer")
+
+    executor = SerdeExecutor("test", 1, broken)
+    with pytest.raises(RuntimeError, match="failed to start"):
+        executor.submit("key", lambda state: 1).result()
+    executor.close()
+
+
+def test_serde_executor_config():
+    config = LMCacheEngineConfig.from_defaults()
+    assert CreateSerdeExecutor("test", config, lambda: None) is None
+    config.serde_workers = 2
+    config.serde_worker_type = "fiber"
+    with pytest.raises(ValueError):
+        CreateSerdeExecutor("test", config, lambda: None)
+
+
+def test_serde_executor_process():
+    config = LMCacheEngineConfig.from_defaults(remote_serde="fast")
+    metadata = LMCacheEngineMetadata(model_name="test_model",
+                                     world_size=1,
+                                     worker_id=0,
+                                     fmt="vllm",
+                                     kv_dtype=torch.bfloat16,
+                                     kv_shape=(2, 2, 16, 4, 8))
+    executor = SerdeExecutor("test",
+                             2,
+                             partial(_create_serializer, "fast", config,
+                                     metadata),
+                             queue_size=2,
+                             worker_type=SerdeWorkerType.PROCESS)
+    # A view of a larger buffer is copied compactly to shared memory
+    buffer = torch.rand(8, 2, 2, 16, 4, 8).to(torch.bfloat16)
+    futures = [
+        executor.submit(idx, _serialize, buffer[idx]) for idx in range(8)
+    ]
+    deserializer = FastDeserializer(torch.bfloat16)
+    for idx, future in enumerate(futures):
+        assert torch.equal(deserializer.from_bytes(future.result()),
+                           buffer[idx])
+    executor.close()
+
+
+def test_serde_executor_dead_process():
+    executor = SerdeExecutor("test",
+                             1,
+                             int,
+                             queue_size=1,
+                             worker_type=SerdeWorkerType.PROCESS)
+    # os._exit(0) kills the worker before it returns a result
+    died = executor.submit("key", os._exit)
+    with pytest.raises(RuntimeError, match="died"):
+        died.result(timeout=10)
+
+    # The permit of the failed task is released, so the next submit fails
+    # instead of blocking on the full queue
+    result = []
+
+    def submit():
+        try:
+            executor.submit("key", os._exit)
+        except RuntimeError as e:
+            result.append(e)
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert "dead" in str(result[0])
+    executor.close()
@@ -0,0 +1,33 @@
+from lmcache.server.server_storage_backend import CreateStorageBackend
+
+
+def test_server_local_backend_overwrite():
+    # 1000 bytes of capacity
+    backend = CreateStorageBackend("cpu", 1000 / 1024**3)
+    backend.put("a", bytearray(400))
+    # Overwriting a key replaces its size instead of adding to it
+    backend.put("a", bytearray(b"a" * 400))
+    stats = backend.get_stats()
+    assert stats["used_bytes"] == 400
+    assert stats["num_evictions"] == 0
+    assert backend.get("a") == bytearray(b"a" * 400)
+
+    backend.put("b", bytearray(500))
+    assert backend.get_stats()["used_bytes"] == 900
+    # Overwriting near the capacity does not evict the key being written
+    backend.put("b", bytearray(b"b" * 700))
+    assert backend.get("b") == bytearray(b"b" * 700)
+    assert backend.get("a") is None
+    stats = backend.get_stats()
+    assert stats["used_bytes"] == 700
+    assert stats["num_evictions"] == 1
+    assert stats["evicted_bytes"] == 400
+
+    # The reported failure: the evictor used to run out of keys and leave
+    # the lock held
+    backend.put("a", bytearray(400))
+    backend.put("a", bytearray(400))
+    backend.put("c", bytearray(700))
+    assert backend.contains("c")
+    assert backend.get_stats()["used_bytes"] == 700
+    backend.close()
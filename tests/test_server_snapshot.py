@@ -0,0 +1,39 @@
+from lmcache.server.server_storage_backend import CreateStorageBackend
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def make_chunk(idx):
+    return bytearray([idx % 256]) * CHUNK_SIZE
+
+
+def test_server_snapshot_restore(tmp_path):
+    snapshot_path = str(tmp_path / "lmcache.snapshot")
+    backend = CreateStorageBackend("cpu", 4 * CHUNK_SIZE / 1024**3,
+                                   snapshot_path)
+    for idx in range(6):
+        backend.put(f"key{idx}", make_chunk(idx))
+    backend.snapshot()
+    backend.close()
+
+    # Only the index is read when restoring
+    backend = CreateStorageBackend("cpu", 4 * CHUNK_SIZE / 1024**3,
+                                   snapshot_path)
+    assert sorted(backend.list_keys()) == [f"key{idx}" for idx in range(2, 6)]
+
+    # The chunks are read on demand or in the background
+    for idx in range(2, 6):
+        assert backend.get(f"key{idx}") == make_chunk(idx)
+    assert backend.get_stats()["num_unloaded_keys"] == 0
+
+    # The LRU order survives the restart
+    backend.put("key6", make_chunk(6))
+    assert not backend.contains("key2")
+
+    # A snapshot of a partially restored cache is complete
+    backend.snapshot()
+    backend.close()
+    backend = CreateStorageBackend("cpu", 4 * CHUNK_SIZE / 1024**3,
+                                   snapshot_path)
+    assert backend.get("key6") == make_chunk(6)
+    backend.close()
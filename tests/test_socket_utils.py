@@ -0,0 +1,28 @@
+import socket
+import threading
+
+from lmcache.socket_utils import (configure_socket, recv_exactly,
+                                  recv_exactly_into, send_vectored)
+
+
+def test_send_vectored():
+    sender, receiver = socket.socketpair()
+    configure_socket(sender)
+    configure_socket(receiver)
+
+    header = b"header"
+    payload = bytearray(range(256)) * 40000
+    # Larger than the socket buffer, so the payload is sent in parts
+    thread = threading.Thread(target=send_vectored,
+                              args=(sender, [header, b"", payload]))
+    thread.start()
+
+    assert recv_exactly(receiver, len(header)) == header
+    buffer = bytearray(len(payload))
+    assert recv_exactly_into(receiver, memoryview(buffer))
+    assert buffer == payload
+    thread.join()
+
+    sender.close()
+    assert recv_exactly(receiver, 1) is None
+    receiver.close()